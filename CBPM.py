@@ -37,7 +37,7 @@ except Exception:
     pd = None
     HAS_PANDAS = False
 from typing import Optional
-from config import DATABASE_NAME, ROLE_JOB_SEEKER, SCALABILITY_SETTINGS, CLOUD_DB_SETTINGS
+from config import DATABASE_NAME, ROLE_JOB_SEEKER, CLOUD_DB_SETTINGS
 # Cryptography is optional; app should start without it
 try:
     from cryptography.fernet import Fernet
@@ -49,6 +49,8 @@ import smtplib
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 
+logger = logging.getLogger(__name__)
+
 # Explicit adapters for SQLite to avoid Python 3.12 datetime deprecation warnings
 # Store Python date/datetime as ISO strings when writing to SQLite
 sqlite3.register_adapter(date, lambda d: d.isoformat())
@@ -62,6 +64,8 @@ class CloudSyncManager:
         self.settings = CLOUD_DB_SETTINGS
         self.local_backup_dir = os.path.join(os.path.expanduser('~'), 'Documents', 'CBPM', 'backups')
         os.makedirs(self.local_backup_dir, exist_ok=True)
+        # Set when a download replaced the local file; the offline journal is then replayed into it
+        self.downloaded = False
     
     def sync_from_cloud(self):
         """Download database from cloud storage if enabled"""
@@ -132,6 +136,7 @@ class CloudSyncManager:
                 # Write new content
                 with open(self.db_name, 'wb') as f:
                     f.write(response.content)
+                self.downloaded = True
                 print(f"Successfully downloaded database from Google Drive")
                 return True
             else:
@@ -175,12 +180,31 @@ class CloudSyncManager:
 
 # Database setup and initial data
 class DatabaseManager:
-    def __init__(self, db_name=DATABASE_NAME):
+    def __init__(self, db_name=DATABASE_NAME, cloud_sync=True, backend=None):
         self.db_name = db_name
         self.cloud_sync = CloudSyncManager(db_name)
-        
+        # 'remote': the depot's database service owns the data (db_service.py / remote_db.py)
+        try:
+            from config import DATABASE_BACKEND
+        except Exception:
+            DATABASE_BACKEND = {'mode': 'local'}
+        self.backend = backend or DATABASE_BACKEND.get('mode', 'local')
+        self.remote = None
+        self._journal = None
+        if self.is_remote:
+            from remote_db import RemoteDatabase
+            self.remote = RemoteDatabase(DATABASE_BACKEND.get('url'), DATABASE_BACKEND.get('token'),
+                                         DATABASE_BACKEND.get('timeout'))
+            # The server creates and upgrades the schema; fail early with a clear message if it is down
+            try:
+                self.remote.health()
+            except sqlite3.Error as e:
+                print(f"[WARN] Database server not reachable: {e}")
+            return
+
         # Sync from cloud before initializing
-        self.cloud_sync.sync_from_cloud()
+        if cloud_sync:
+            self.cloud_sync.sync_from_cloud()
         
         try:
             self.create_tables()
@@ -193,6 +217,17 @@ class DatabaseManager:
                 raise
         self.populate_building_materials()
 
+        # Re-apply this terminal's journaled writes that the downloaded copy does not have yet
+        if self.cloud_sync.downloaded:
+            try:
+                from offline_journal import default_path, format_report
+                if os.path.exists(default_path(self.db_name)):
+                    report = self.replay_journal()
+                    if report and report['sent']:
+                        logger.debug("offline journal replay:\n%s", format_report(report))
+            except Exception as e:
+                print(f"[WARN] Offline journal replay failed: {e}")
+
     def _recover_malformed_database(self, error: Exception):
         """Backup malformed SQLite DB and start fresh.
         Renames the existing DB file with a timestamp, then leaves a new empty file to be initialized.
@@ -246,60 +281,115 @@ class DatabaseManager:
             except Exception:
                 pass
 
+    @property
+    def is_remote(self):
+        return self.backend == 'remote'
+
     def create_connection(self):
         """Create and configure a SQLite connection.
 
         Returns:
-            sqlite3.Connection: An open SQLite connection configured with PRAGMA settings.
+            sqlite3.Connection: An open SQLite connection configured with PRAGMA settings,
+            or a ``remote_db.RemoteConnection`` to the database service in remote mode.
         """
+        if self.is_remote:
+            return self.remote.connect()
         # Use a small busy timeout to mitigate 'database is locked' errors and enable WAL for concurrency
+        # Statement timings feed the administrator Performance window (query_stats.py);
+        # OptimizingConnection runs PRAGMA optimize on close (db_maintenance.py)
+        from query_stats import connection_factory
+        from db_maintenance import OptimizingConnection, configure_connection, prepare_new_database
+        is_new = not os.path.exists(self.db_name) or os.path.getsize(self.db_name) == 0
         try:
-            conn = sqlite3.connect(self.db_name, timeout=5)
+            conn = sqlite3.connect(self.db_name, timeout=5, factory=connection_factory(OptimizingConnection))
         except sqlite3.DatabaseError as e:
             # If the database file is malformed, try recovery once, then reconnect
             self._recover_malformed_database(e)
-            conn = sqlite3.connect(self.db_name, timeout=5)
+            conn = sqlite3.connect(self.db_name, timeout=5, factory=connection_factory(OptimizingConnection))
+        if is_new:
+            # auto_vacuum only takes effect before the WAL switch and the first table
+            try:
+                prepare_new_database(conn)
+            except Exception as e:
+                print(f"[WARN] auto_vacuum setup failed: {e}")
         try:
-            print(f"[DEBUG] opened DB at: {self.db_name}")
+            # Apply scalability PRAGMAs from config, tuned by the machine's profile (db_profiles.py)
+            from db_profiles import apply_pragmas, profile_pragmas
+            apply_pragmas(conn, profile_pragmas(), is_new=is_new)
+            configure_connection(conn)
         except Exception:
             pass
+        return conn
+
+    @property
+    def journal(self):
+        """This terminal's offline operation journal (offline_journal.py), opened on first use."""
+        if self._journal is None:
+            from offline_journal import OfflineJournal, default_path
+            self._journal = OfflineJournal(default_path(self.db_name))
+        return self._journal
+
+    @property
+    def journal_is_shared(self):
+        """True when writes land in the shared store: the server, or the only copy when cloud sync is off."""
+        return self.is_remote or not self.cloud_sync.settings.get('enabled', False)
+
+    def apply_operations(self, ops):
+        """Apply journal operations to the authoritative store; returns their outcomes."""
+        if self.is_remote:
+            return self.remote.apply_operations(ops)
+        from offline_journal import apply_operations
+        conn = self.create_connection()
         try:
-            # Apply scalability PRAGMAs from config
-            _s = SCALABILITY_SETTINGS.get('sqlite', {}) if 'SCALABILITY_SETTINGS' in globals() or 'SCALABILITY_SETTINGS' in locals() else {}
-            bt = int(_s.get('busy_timeout', 5000))
-            conn.execute(f"PRAGMA busy_timeout={bt}")
-            jm = _s.get('journal_mode', 'WAL')
-            try:
-                conn.execute(f"PRAGMA journal_mode={jm}")
-            except Exception:
-                # Fallback to WAL if custom failed
-                try:
-                    conn.execute("PRAGMA journal_mode=WAL")
-                except Exception:
-                    pass
-            syn = _s.get('synchronous', 'NORMAL')
-            try:
-                conn.execute(f"PRAGMA synchronous={syn}")
-            except Exception:
-                pass
-            try:
-                if _s.get('foreign_keys', 1):
-                    conn.execute("PRAGMA foreign_keys=ON")
-            except Exception:
-                pass
-            try:
-                cs = int(_s.get('cache_size', -20000))
-                conn.execute(f"PRAGMA cache_size={cs}")
-            except Exception:
-                pass
+            return apply_operations(conn, ops)
+        finally:
+            conn.close()
+
+    def submit_operation(self, kind, payload, user_id=None):
+        """Journal a sale/transfer/payment/adjustment and apply it now.
+
+        Returns:
+            dict: The outcome (``status``, ``detail``, ``result``); ``status`` is ``'queued'`` when the
+            database server is unreachable and the operation will be replayed later.
+
+        Raises:
+            offline_journal.OperationRejected: The operation broke a conflict rule; nothing was written.
+        """
+        from offline_journal import OperationRejected
+        op = self.journal.record(kind, payload, user_id)
+        try:
+            outcome = self.apply_operations([op])[0]
+        except sqlite3.Error as e:
+            from remote_db import ServiceUnavailable
+            if isinstance(e, ServiceUnavailable):
+                print(f"[WARN] Database server unreachable, {kind} queued offline: {e}")
+                return {'op_id': op['op_id'], 'status': 'queued', 'detail': str(e), 'result': None}
+            self.journal.mark([{'op_id': op['op_id'], 'status': 'rejected', 'detail': str(e)}], shared=True)
+            raise
+        self.journal.mark([outcome], shared=self.journal_is_shared)
+        if outcome['status'] == 'rejected':
+            raise OperationRejected(outcome['detail'])
+        if kind == 'transfer':
+            # The destination takes the transferred unit price
             try:
-                ts = int(_s.get('temp_store', 2))
-                conn.execute(f"PRAGMA temp_store={ts}")
+                import estimator
+                estimator.invalidate_prices()
             except Exception:
                 pass
-        except Exception:
-            pass
-        return conn
+        return outcome
+
+    def replay_journal(self):
+        """Send journaled operations not yet in the shared store; returns the replay report, or None.
+
+        Locally the journal is only replayed into a freshly downloaded copy: the current file already
+        holds every operation applied on this terminal.
+        """
+        if not self.journal_is_shared and not self.cloud_sync.downloaded:
+            return None
+        report = self.journal.replay(self.apply_operations, shared=self.journal_is_shared)
+        self.cloud_sync.downloaded = False
+        self.journal.prune()
+        return report
 
     def create_tables(self):
         conn = self.create_connection()
@@ -503,7 +593,7 @@ class DatabaseManager:
                            NOT
                            NULL,
                            unit_price
-                           REAL
+                           INTEGER
                            NOT
                            NULL,
                            reorder_level
@@ -677,7 +767,7 @@ class DatabaseManager:
                        (
                            id INTEGER PRIMARY KEY AUTOINCREMENT,
                            contract_id INTEGER NOT NULL,
-                           amount REAL NOT NULL,
+                           amount INTEGER NOT NULL,
                            method TEXT,
                            reference TEXT,
                            status TEXT DEFAULT 'Pending',
@@ -713,7 +803,7 @@ class DatabaseManager:
                            id INTEGER PRIMARY KEY AUTOINCREMENT,
                            contract_id INTEGER NOT NULL,
                            entry_type TEXT NOT NULL,
-                           amount REAL NOT NULL,
+                           amount INTEGER NOT NULL,
                            ref_payment_id INTEGER,
                            description TEXT,
                            created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
@@ -725,6 +815,30 @@ class DatabaseManager:
             cursor.execute("CREATE INDEX IF NOT EXISTS idx_cl_contract ON contract_ledger(contract_id)")
         except Exception:
             pass
+        # Materialized per-contract paid/pending totals (see contract_balances.py)
+        try:
+            from contract_balances import ensure_schema as ensure_contract_balances_schema
+            ensure_contract_balances_schema(conn)
+        except Exception as e:
+            print(f"[WARN] Contract balances setup failed: {e}")
+        # Timed maintenance runs (see db_maintenance.py)
+        try:
+            from db_maintenance import ensure_schema as ensure_maintenance_schema
+            ensure_maintenance_schema(conn)
+        except Exception as e:
+            print(f"[WARN] Maintenance log setup failed: {e}")
+        # Ledger of replayed offline operations, for idempotent replay (see offline_journal.py)
+        try:
+            from offline_journal import ensure_schema as ensure_journal_schema
+            ensure_journal_schema(conn)
+        except Exception as e:
+            print(f"[WARN] Offline journal ledger setup failed: {e}")
+        # Outbound e-mail queue (see notifications.py)
+        try:
+            from notifications import ensure_schema as ensure_notifications_schema
+            ensure_notifications_schema(conn)
+        except Exception as e:
+            print(f"[WARN] Notification queue setup failed: {e}")
 
         # Transactions table
         cursor.execute('''
@@ -750,11 +864,11 @@ class DatabaseManager:
                            NOT
                            NULL,
                            unit_price
-                           REAL
+                           INTEGER
                            NOT
                            NULL,
                            total_amount
-                           REAL
+                           INTEGER
                            NOT
                            NULL,
                            transaction_type
@@ -1100,6 +1214,13 @@ class DatabaseManager:
         except Exception:
             pass
 
+        # Job board search: job_type/salary_band columns, facet counts and their triggers
+        try:
+            from job_search import ensure_schema as ensure_job_search_schema
+            ensure_job_search_schema(conn)
+        except Exception as e:
+            print(f"[WARN] Job search schema setup failed: {e}")
+
         # Audit log table
         cursor.execute('''
                        CREATE TABLE IF NOT EXISTS audit_log
@@ -1186,6 +1307,41 @@ class DatabaseManager:
                        )
                        ''')
 
+        # Indexed category/phone/region columns of stores, filled from contact_info (store_contacts.py)
+        try:
+            from store_contacts import ensure_schema as ensure_store_contacts_schema
+            ensure_store_contacts_schema(conn)
+        except Exception as e:
+            print(f"[WARN] Store contact columns setup failed: {e}")
+
+        # Attachment metadata; signature BLOBs and resume files move into the file store (attachments.py)
+        try:
+            from attachments import AttachmentStore, ensure_schema as ensure_attachments_schema
+            ensure_attachments_schema(conn, AttachmentStore.for_database(self.db_name))
+        except Exception as e:
+            print(f"[WARN] Attachment store setup failed: {e}")
+
+        # Money columns of databases created before amounts were stored as whole francs (money.py)
+        try:
+            from money import ensure_schema as ensure_money_schema
+            ensure_money_schema(conn)
+        except Exception as e:
+            print(f"[WARN] Money column migration failed: {e}")
+
+        # Resolved price per (store, material) kept by triggers; filled on first use (price_book.py)
+        try:
+            from price_book import ensure_schema as ensure_price_book_schema
+            ensure_price_book_schema(conn)
+        except Exception as e:
+            print(f"[WARN] Price book setup failed: {e}")
+
+        # Change capture triggers for downstream mirrors; last, so every table above is covered
+        try:
+            from change_capture import ensure_schema as ensure_change_capture_schema
+            ensure_change_capture_schema(conn)
+        except Exception as e:
+            print(f"[WARN] Change capture setup failed: {e}")
+
         conn.commit()
         conn.close()
 
@@ -1395,13 +1551,95 @@ class CBPMApp:
         except Exception:
             import traceback; traceback.print_exc()
         self.setup_main_window()
+        self.start_maintenance()
+        self.start_notifications()
+        self.start_journal_replay()
         self.show_login()
 
+    def start_maintenance(self):
+        """Run ANALYZE/optimize/checkpoint/vacuum in the background when the user is idle."""
+        self._maintenance = None
+        if self.db_manager.is_remote:
+            return   # the database service runs maintenance on the server machine
+        try:
+            from db_maintenance import MaintenanceScheduler
+            self._maintenance = MaintenanceScheduler(self.db_manager.db_name, self.db_manager.create_connection)
+            self._maintenance.start(self.root)
+        except Exception as e:
+            print(f"[WARN] Database maintenance not scheduled: {e}")
+
+    def start_notifications(self):
+        """Send queued notification e-mails from a background thread (notifications.py)."""
+        self._notifications = None
+        if self.db_manager.is_remote:
+            return   # the database service sends them from the server machine
+        try:
+            from notifications import NotificationWorker
+            worker = NotificationWorker(self.db_manager.create_connection)
+            if worker.start():
+                self._notifications = worker
+        except Exception as e:
+            print(f"[WARN] Notification sending not started: {e}")
+
+    def start_journal_replay(self):
+        """Remote terminals: resend operations queued while the server was unreachable, every few seconds."""
+        self._journal_replaying = False
+        if not self.db_manager.is_remote:
+            return
+        import threading
+        try:
+            from offline_journal import SETTINGS as JOURNAL_SETTINGS
+            interval_ms = int(float(JOURNAL_SETTINGS.get('retry_interval_s', 60)) * 1000)
+        except Exception:
+            interval_ms = 60000
+
+        def tick():
+            try:
+                if not self._journal_replaying and self.db_manager.journal.counts()['unsent']:
+                    self._journal_replaying = True
+                    threading.Thread(target=work, name='journal-replay', daemon=True).start()
+            except Exception as e:
+                print(f"[WARN] Offline journal check failed: {e}")
+            self.root.after(interval_ms, tick)
+
+        def work():
+            try:
+                self.db_manager.remote.health()
+                report = self.db_manager.replay_journal()
+                if report and report['sent']:
+                    from offline_journal import format_report
+                    logger.debug("offline journal replay:\n%s", format_report(report))
+            except sqlite3.Error:
+                pass   # still offline; retried on the next tick
+            except Exception as e:
+                print(f"[WARN] Offline journal replay failed: {e}")
+            finally:
+                self._journal_replaying = False
+
+        self.root.after(interval_ms, tick)
+
     def run(self):
         # Start the Tkinter main event loop
-        self.root.mainloop()
+        try:
+            self.root.mainloop()
+        finally:
+            svc = getattr(self, '_render_service', None)
+            if svc is not None:
+                svc.shutdown()
+            if getattr(self, '_maintenance', None) is not None:
+                self._maintenance.stop()
+            if getattr(self, '_notifications', None) is not None:
+                self._notifications.stop()
+            if getattr(self, '_snapshot_manager', None) is not None:
+                self._snapshot_manager.stop()
 
     def setup_main_window(self):
+        # Opt-in Tk handler timing (CBPM_UI_PROFILE / UI_PROFILING); must precede widget creation
+        try:
+            from ui_profiler import install_from_settings
+            install_from_settings()
+        except Exception as e:
+            print(f"[WARN] UI profiler not started: {e}")
         self.root = tk.Tk()
         self.root.title("Cameroon Building Project Management System")
         self.root.geometry("1200x800")
@@ -1572,11 +1810,13 @@ class CBPMApp:
         # Use a short-lived connection with timeout and rollback safety to avoid 'database is locked'
         conn = None
         try:
-            conn = sqlite3.connect(self.db_manager.db_name, timeout=5, isolation_level=None)
-            try:
-                print(f"[DEBUG] opened DB at (login): {self.db_manager.db_name}")
-            except Exception:
-                pass
+            from query_stats import connection_factory
+            from db_maintenance import OptimizingConnection
+            if self.db_manager.is_remote:
+                conn = self.db_manager.create_connection()
+            else:
+                conn = sqlite3.connect(self.db_manager.db_name, timeout=5, isolation_level=None,
+                                       factory=connection_factory(OptimizingConnection))
             cursor = conn.cursor()
             # Ensure WAL mode for better concurrency
             try:
@@ -1586,13 +1826,8 @@ class CBPMApp:
             # Explicitly begin immediate to avoid later lock escalation issues
             cursor.execute("BEGIN IMMEDIATE")
 
-            cursor.execute('''
-                           SELECT id, username, role, full_name, is_active, first_login, failed_login_attempts, password_hash
-                           FROM users
-                           WHERE username = ?
-                           ''', (username,))
-
-            user = cursor.fetchone()
+            from queries import get_login_user, record_failed_login, record_login
+            user = get_login_user(cursor, username)
 
             if user:
                 user_id, username_db, role, full_name, is_active, first_login, failed_attempts, stored_hash = user
@@ -1600,18 +1835,12 @@ class CBPMApp:
                 # Verify password using secure method (with legacy fallback)
                 if not self.security_manager.verify_password(password, stored_hash):
                     # Incorrect password: increment failed attempts and possibly suspend
-                    cursor.execute('SELECT id, failed_login_attempts FROM users WHERE username = ?', (username,))
-                    user_data = cursor.fetchone()
-                    if user_data:
-                        u_id, f_attempts = user_data
-                        f_attempts = int(f_attempts or 0) + 1
-                        if f_attempts >= 5:
-                            cursor.execute('UPDATE users SET is_active = 0 WHERE id = ?', (u_id,))
-                            messagebox.showerror("Error", "Account suspended due to multiple failed login attempts!")
-                        else:
-                            cursor.execute('UPDATE users SET failed_login_attempts = ? WHERE id = ?', (f_attempts, u_id))
-                            messagebox.showerror("Error", f"Invalid credentials! {5 - f_attempts} attempts remaining.")
-                        conn.commit()
+                    remaining = record_failed_login(cursor, username)
+                    conn.commit()
+                    if remaining == 0:
+                        messagebox.showerror("Error", "Account suspended due to multiple failed login attempts!")
+                    elif remaining is not None:
+                        messagebox.showerror("Error", f"Invalid credentials! {remaining} attempts remaining.")
                     else:
                         messagebox.showerror("Error", "Invalid username or password!")
                     return
@@ -1630,8 +1859,7 @@ class CBPMApp:
                     pass
 
                 # Reset failed attempts on successful login
-                cursor.execute('UPDATE users SET failed_login_attempts = 0, last_login = ? WHERE id = ?',
-                               (datetime.now(), user_id))
+                record_login(cursor, user_id)
 
                 # Check if first login - require password change
                 if first_login:
@@ -1663,25 +1891,9 @@ class CBPMApp:
 
                 self.show_main_dashboard()
             else:
-                # Handle failed login
-                cursor.execute('SELECT id, failed_login_attempts FROM users WHERE username = ?', (username,))
-                user_data = cursor.fetchone()
-
-                if user_data:
-                    user_id, failed_attempts = user_data
-                    failed_attempts += 1
-
-                    if failed_attempts >= 5:
-                        cursor.execute('UPDATE users SET is_active = 0 WHERE id = ?', (user_id,))
-                        messagebox.showerror("Error", "Account suspended due to multiple failed login attempts!")
-                    else:
-                        cursor.execute('UPDATE users SET failed_login_attempts = ? WHERE id = ?',
-                                       (failed_attempts, user_id))
-                        messagebox.showerror("Error", f"Invalid credentials! {5 - failed_attempts} attempts remaining.")
-                else:
-                    messagebox.showerror("Error", "Invalid username or password!")
-
+                # Unknown username: nothing to count
                 conn.commit()
+                messagebox.showerror("Error", "Invalid username or password!")
         except sqlite3.OperationalError as e:
             # Gracefully handle database locks or similar operational issues
             try:
@@ -1795,7 +2007,79 @@ class CBPMApp:
                        ''', (user_id, action, details, datetime.now()))
         conn.commit()
         conn.close()
-        
+
+    def get_job_search(self):
+        """Return the shared job board search service, creating it on first use."""
+        svc = getattr(self, '_job_search', None)
+        if svc is None:
+            from job_search import JobSearchService
+            svc = JobSearchService(self.db_manager.create_connection)
+            self._job_search = svc
+        return svc
+
+    def get_render_service(self):
+        """Return the shared background PDF renderer, creating it on first use."""
+        svc = getattr(self, '_render_service', None)
+        if svc is None:
+            from render_service import DocumentRenderService
+            svc = DocumentRenderService(root=self.root)
+            self._render_service = svc
+        return svc
+
+    def get_attachment_store(self):
+        """Return the attachment file store of the current database (attachments.py)."""
+        store = getattr(self, '_attachment_store', None)
+        if store is None:
+            from attachments import AttachmentStore
+            store = self._attachment_store = AttachmentStore.for_database(self.db_manager.db_name)
+        return store
+
+    def get_price_book(self):
+        """Return the shared in-memory price book (price_book.py)."""
+        book = getattr(self, '_price_book', None)
+        if book is None:
+            from price_book import PriceBook
+            book = self._price_book = PriceBook(self.db_manager.create_connection)
+        return book
+
+    def prices_changed(self):
+        """Drop the cached prices (price book, Material Calculator) after a price was saved."""
+        book = getattr(self, '_price_book', None)
+        if book is not None:
+            book.invalidate()
+        try:
+            import estimator
+            estimator.invalidate_prices()
+        except Exception:
+            pass
+
+    def _resume_file(self, value):
+        """Path to open for a stored resume (attachment reference or legacy path); None if the file is gone."""
+        from attachments import resolve
+        conn = self.db_manager.create_connection()
+        try:
+            return resolve(conn, self.get_attachment_store(), value)
+        finally:
+            conn.close()
+
+    def _contract_signature_lines(self, own_enc, con_enc):
+        """Decrypt stored contract signatures into printable 'Owner: ...' / 'Contractor: ...' lines."""
+        owner_sig_line = 'Owner: Not signed'
+        cont_sig_line = 'Contractor: Not signed'
+        if own_enc:
+            try:
+                info = json.loads(self.security_manager.decrypt_data(own_enc))
+                owner_sig_line = f"Owner: {info.get('signer_name','')} on {info.get('timestamp','')}"
+            except Exception:
+                owner_sig_line = 'Owner: Signed'
+        if con_enc:
+            try:
+                info2 = json.loads(self.security_manager.decrypt_data(con_enc))
+                cont_sig_line = f"Contractor: {info2.get('signer_name','')} on {info2.get('timestamp','')}"
+            except Exception:
+                cont_sig_line = 'Contractor: Signed'
+        return owner_sig_line, cont_sig_line
+
     def has_contract_permission(self, contract_id: int, perm: str) -> bool:
             try:
                 if not getattr(self, 'current_user', None):
@@ -1836,8 +2120,8 @@ class CBPMApp:
         """Set contract status to 'Active' when both parties have signed.
 
         Checks both digital (digital_signature_owner/digital_signature_contractor)
-        and legacy (owner_signature/contractor_signature) columns. Logs an audit
-        entry when activation occurs.
+        and attachment (owner_signature_id/contractor_signature_id) signatures.
+        Logs an audit entry when activation occurs.
 
         Args:
             contract_id: The contract ID to evaluate.
@@ -1846,7 +2130,7 @@ class CBPMApp:
             conn = self.db_manager.create_connection(); cur = conn.cursor()
             cur.execute(
                 "SELECT digital_signature_owner, digital_signature_contractor, "
-                "owner_signature, contractor_signature, COALESCE(status,'') "
+                "owner_signature_id, contractor_signature_id, COALESCE(status,'') "
                 "FROM contracts WHERE id=?",
                 (contract_id,)
             )
@@ -2053,6 +2337,7 @@ class CBPMApp:
         users_menu = tk.Menu(menubar, tearoff=0)
         menubar.add_cascade(label="Users", menu=users_menu)
         users_menu.add_command(label="Create User", command=self.show_create_user)
+        users_menu.add_command(label="Import Users", command=lambda: self.show_bulk_import(kind='users'))
         users_menu.add_command(label="Manage Users", command=self.show_manage_users)
         users_menu.add_command(label="User Activity", command=self.show_user_activity)
 
@@ -2060,12 +2345,17 @@ class CBPMApp:
         stores_menu = tk.Menu(menubar, tearoff=0)
         menubar.add_cascade(label="Stores", menu=stores_menu)
         stores_menu.add_command(label="Store Management", command=self.show_admin_store_management)
+        stores_menu.add_command(label="Bulk Price Change", command=self.show_bulk_price_change)
 
         # System menu
         system_menu = tk.Menu(menubar, tearoff=0)
         menubar.add_cascade(label="System", menu=system_menu)
         system_menu.add_command(label="Materials Database", command=self.show_materials_database)
         system_menu.add_command(label="System Statistics", command=self.show_system_statistics)
+        system_menu.add_command(label="Performance", command=self.show_performance)
+        system_menu.add_command(label="UI Profiler", command=self.show_ui_profiler)
+        system_menu.add_command(label="Maintenance", command=self.show_maintenance)
+        system_menu.add_command(label="Offline Journal", command=self.show_offline_journal)
         system_menu.add_command(label="Audit Log", command=self.show_audit_log)
 
     def show_admin_store_management(self):
@@ -2233,6 +2523,8 @@ class CBPMApp:
         store_menu.add_command(label="Create Store", command=self.show_create_store)
         store_menu.add_command(label="Manage Stores", command=self.show_manage_stores)
         store_menu.add_command(label="Inventory", command=self.show_inventory)
+        store_menu.add_command(label="Bulk Import", command=self.show_bulk_import)
+        store_menu.add_command(label="Bulk Price Change", command=self.show_bulk_price_change)
         # Catalog of other stores' inventory (all stores except other retail-owned; includes own)
         catalog_cmd = self.show_view_inventory if hasattr(self, 'show_view_inventory') else (lambda: messagebox.showinfo("Catalog", "Catalog view unavailable."))
         store_menu.add_command(label="Retail Catalog", command=catalog_cmd)
@@ -3096,7 +3388,8 @@ class CBPMApp:
                 if not payee_var.get():
                     messagebox.showwarning('Validation', 'Select a payee.'); return
                 try:
-                    amt = float(amount_var.get()); assert amt > 0
+                    from money import payment_amount
+                    amt = payment_amount(amount_var.get(), currency_var.get()); assert amt is not None and amt > 0
                 except Exception:
                     messagebox.showerror('Validation', 'Enter a valid amount (> 0).'); return
                 if not payer_account_var.get().strip():
@@ -3129,19 +3422,13 @@ class CBPMApp:
                     pass
                 ref = _gen_ref('PAY')
                 try:
-                    conn = self.db_manager.create_connection(); cur = conn.cursor()
-                    cur.execute(
-                        """
-                        INSERT INTO payments (
-                            reference, payer_id, payee_id, store_id, amount, currency, method, purpose,
-                            status, created_at, meta, require_receipt, receipt_printed,
-                            payer_account, method_account, link_type, link_id
-                        )
-                        VALUES (?, ?, ?, ?, ?, ?, ?, ?, 'Pending', ?, ?, ?, 0, ?, ?, ?, ?)
-                        """,
-                        (ref, pid, payee, sid, amt, currency_var.get(), m, purpose_var.get().strip(), _now(), json.dumps({}), int(require_receipt.get()), payer_acct, method_acct, lt, lid)
-                    )
-                    conn.commit(); conn.close()
+                    # Journaled first so the payment survives a lost connection (offline_journal.py)
+                    self.db_manager.submit_operation(
+                        'payment', {'reference': ref, 'payee_id': payee, 'store_id': sid, 'amount': amt,
+                                    'currency': currency_var.get(), 'method': m, 'purpose': purpose_var.get().strip(),
+                                    'meta': {}, 'require_receipt': int(require_receipt.get()),
+                                    'payer_account': payer_acct, 'method_account': method_acct,
+                                    'link_type': lt, 'link_id': lid}, pid)
                     try: self.log_audit_action(pid, 'Create Payment', json.dumps({'reference': ref, 'payee_id': payee, 'amount': amt, 'link_type': lt, 'link_id': lid}))
                     except Exception: pass
                     messagebox.showinfo('Payment', f'Payment {ref} created and pending confirmation by receiver.')
@@ -3381,7 +3668,14 @@ class CBPMApp:
                 vals = tree_pr.item(sel[0])['values']
                 pay_id, ref, _from, to_user, amt_total, _cAt = vals
                 try:
-                    val = float(r_amount_var.get()); assert 0 < val <= float(amt_total)
+                    from money import parse_number, payment_amount
+                    conn = self.db_manager.create_connection()
+                    try:
+                        currency_row = conn.execute("SELECT currency FROM payments WHERE id=?", (pay_id,)).fetchone()
+                    finally:
+                        conn.close()
+                    val = payment_amount(r_amount_var.get(), currency_row[0] if currency_row else 'XAF')
+                    assert val is not None and 0 < val <= parse_number(amt_total)
                 except Exception:
                     messagebox.showerror('Refunds', 'Enter a valid refund amount (>0 and <= payment amount).'); return
                 try:
@@ -5458,6 +5752,595 @@ class CBPMApp:
 
         conn.close()
 
+#=============== query performance ======================
+    def show_performance(self):
+        """Administrator view of SQL statement timings and the slow-query log (query_stats.STATS)."""
+        if not self.current_user or self.current_user.get('role') != 'administrator':
+            messagebox.showerror("Access Denied", "Only administrators can view performance data.")
+            return
+        from query_stats import STATS, ENABLED
+        from db_profiles import active_profile
+
+        win = tk.Toplevel(self.root)
+        win.title("Performance")
+        win.geometry("1200x700")
+        win.configure(bg='white')
+
+        header = tk.Frame(win, bg='white')
+        header.pack(fill='x', padx=10, pady=10)
+        tk.Label(header, text="Query Performance", font=('Arial', 16, 'bold'), bg='white').pack(side='left')
+        summary_var = tk.StringVar()
+        tk.Label(header, textvariable=summary_var, font=('Arial', 10), bg='white', fg='#7f8c8d').pack(side='left', padx=15)
+
+        notebook = ttk.Notebook(win)
+        notebook.pack(fill='both', expand=True, padx=10)
+
+        # Aggregates per statement fingerprint
+        agg_tab = tk.Frame(notebook, bg='white')
+        notebook.add(agg_tab, text="Statements")
+        cols = ("Calls", "Total ms", "Avg ms", "p95 ms", "Max ms", "Rows", "Statement")
+        agg_tree = ttk.Treeview(agg_tab, columns=cols, show='headings')
+        for c in cols:
+            agg_tree.heading(c, text=c)
+            agg_tree.column(c, width=80, anchor='e')
+        agg_tree.column("Statement", width=650, anchor='w')
+        sy = ttk.Scrollbar(agg_tab, orient='vertical', command=agg_tree.yview)
+        agg_tree.configure(yscrollcommand=sy.set)
+        agg_tree.pack(side='left', fill='both', expand=True)
+        sy.pack(side='right', fill='y')
+
+        # Slow statements with their query plans
+        slow_tab = tk.Frame(notebook, bg='white')
+        notebook.add(slow_tab, text=f"Slow (> {STATS.slow_ms:.0f} ms)")
+        slow_cols = ("Time", "ms", "Statement")
+        slow_tree = ttk.Treeview(slow_tab, columns=slow_cols, show='headings', height=12)
+        for c, w in zip(slow_cols, (140, 80, 800)):
+            slow_tree.heading(c, text=c)
+            slow_tree.column(c, width=w, anchor='w')
+        slow_tree.pack(fill='both', expand=True)
+        detail = tk.Text(slow_tab, height=10, font=('Consolas', 9), wrap='word')
+        detail.pack(fill='x', pady=(6, 0))
+        slow_items = []
+
+        def show_detail(event=None):
+            sel = slow_tree.selection()
+            if not sel:
+                return
+            item = slow_items[slow_tree.index(sel[0])]
+            detail.delete('1.0', tk.END)
+            detail.insert(tk.END, f"{item['sql']}\n\nParameters: {item['params']}\n\nQuery plan:\n")
+            detail.insert(tk.END, "\n".join(f"  {line}" for line in item['plan']) or "  (not available)")
+
+        slow_tree.bind('<<TreeviewSelect>>', show_detail)
+
+        def refresh():
+            rows = STATS.snapshot()
+            agg_tree.delete(*agg_tree.get_children())
+            for r in rows:
+                agg_tree.insert('', 'end', values=(r['calls'], f"{r['total_ms']:,.1f}", f"{r['avg_ms']:,.2f}",
+                                                   f"{r['p95_ms']:,.2f}", f"{r['max_ms']:,.1f}", r['rows'],
+                                                   r['fingerprint'][:300]))
+            slow_items[:] = STATS.slow_queries()
+            slow_tree.delete(*slow_tree.get_children())
+            for item in slow_items:
+                slow_tree.insert('', 'end', values=(item['time'], f"{item['ms']:,.1f}", item['fingerprint'][:300]))
+            total_ms = sum(r['total_ms'] for r in rows)
+            state = "" if ENABLED else "Instrumentation is disabled (CBPM_QUERY_STATS=0).  "
+            summary_var.set(f"{state}Since {STATS.started:%Y-%m-%d %H:%M}: {sum(r['calls'] for r in rows):,} statements, "
+                            f"{total_ms / 1000:,.1f} s in SQL, {STATS.connections_opened:,} connections, "
+                            f"'{active_profile()}' database profile")
+
+        def reset():
+            if messagebox.askyesno("Reset", "Clear all collected query statistics?", parent=win):
+                STATS.reset()
+                refresh()
+
+        def export_json():
+            filename = filedialog.asksaveasfilename(
+                parent=win, title="Export Query Statistics", defaultextension=".json",
+                initialfile=f"query_stats_{datetime.now():%Y%m%d_%H%M%S}.json",
+                filetypes=[("JSON files", "*.json"), ("All files", "*.*")])
+            if filename:
+                try:
+                    STATS.dump_json(filename)
+                    messagebox.showinfo("Export", f"Statistics saved to {filename}", parent=win)
+                except Exception as e:
+                    messagebox.showerror("Export", f"Failed to export: {str(e)}", parent=win)
+
+        btns = tk.Frame(win, bg='white')
+        btns.pack(fill='x', padx=10, pady=8)
+        tk.Button(btns, text="Refresh", bg="#3498db", fg="white", command=refresh).pack(side='left')
+        tk.Button(btns, text="Export JSON", command=export_json).pack(side='left', padx=8)
+        tk.Button(btns, text="Reset", bg="#e67e22", fg="white", command=reset).pack(side='left')
+        tk.Button(btns, text="Close", command=win.destroy).pack(side='right')
+        win.bind('<F5>', lambda e: refresh())
+        refresh()
+
+    def show_ui_profiler(self):
+        """Administrator view of Tk event-handler timings (ui_profiler.STATS), with an on/off switch."""
+        if not self.current_user or self.current_user.get('role') != 'administrator':
+            messagebox.showerror("Access Denied", "Only administrators can use the UI profiler.")
+            return
+        import ui_profiler
+
+        win = tk.Toplevel(self.root)
+        win.title("UI Profiler")
+        win.geometry("1100x650")
+        win.configure(bg='white')
+
+        header = tk.Frame(win, bg='white')
+        header.pack(fill='x', padx=10, pady=10)
+        tk.Label(header, text="Event Handler Timings", font=('Arial', 16, 'bold'), bg='white').pack(side='left')
+        summary_var = tk.StringVar()
+        tk.Label(header, textvariable=summary_var, font=('Arial', 10), bg='white', fg='#7f8c8d').pack(side='left', padx=15)
+
+        options = tk.Frame(win, bg='white')
+        options.pack(fill='x', padx=10)
+        enabled_var = tk.BooleanVar(value=ui_profiler.is_installed())
+        capture_var = tk.BooleanVar(value=ui_profiler.STATS.capture)
+        slow_var = tk.StringVar(value=f"{ui_profiler.STATS.slow_ms:.0f}")
+        tk.Label(options, text="Flag handlers slower than (ms):", bg='white').pack(side='left')
+        tk.Entry(options, textvariable=slow_var, width=6).pack(side='left', padx=(4, 15))
+        tk.Checkbutton(options, text="Capture cProfile of slow handlers", variable=capture_var,
+                       bg='white').pack(side='left')
+
+        cols = ("Calls", "Total ms", "Avg ms", "Max ms", "Slow", "Modal", "Handler")
+        tree = ttk.Treeview(win, columns=cols, show='headings', height=14)
+        for c in cols:
+            tree.heading(c, text=c)
+            tree.column(c, width=80, anchor='e')
+        tree.column("Handler", width=560, anchor='w')
+        tree.pack(fill='both', expand=True, padx=10, pady=(10, 0))
+
+        tk.Label(win, text="Recent blocking calls", font=('Arial', 11, 'bold'), bg='white').pack(anchor='w', padx=10, pady=(8, 0))
+        events = tk.Listbox(win, height=6, font=('Consolas', 9))
+        events.pack(fill='x', padx=10)
+
+        def apply_settings():
+            try:
+                slow_ms = float(slow_var.get())
+            except ValueError:
+                messagebox.showerror("UI Profiler", "The threshold must be a number of milliseconds.", parent=win)
+                return False
+            if enabled_var.get():
+                ui_profiler.install(capture=capture_var.get(), slow_ms=slow_ms)
+            else:
+                ui_profiler.uninstall()
+                ui_profiler.STATS.slow_ms = slow_ms
+            return True
+
+        def refresh():
+            rows = ui_profiler.STATS.snapshot()
+            tree.delete(*tree.get_children())
+            for r in rows:
+                tree.insert('', 'end', values=(r['calls'], f"{r['total_ms']:,.1f}", f"{r['avg_ms']:,.2f}",
+                                               f"{r['max_ms']:,.1f}", r['slow'], r['nested'], r['handler']))
+            events.delete(0, tk.END)
+            for e in ui_profiler.STATS.slow_events():
+                events.insert(tk.END, f"{e['time']}  {e['ms']:>8,.1f} ms  {e['handler']}")
+            state = "on" if ui_profiler.is_installed() else "off"
+            captures = len(ui_profiler.STATS.captures)
+            summary_var.set(f"Profiler {state}; {sum(r['slow'] for r in rows)} blocking calls, "
+                            f"{captures} profiles in {ui_profiler.STATS.capture_dir}")
+
+        def toggle():
+            enabled_var.set(not enabled_var.get())
+            if not apply_settings():
+                enabled_var.set(not enabled_var.get())
+                return
+            toggle_btn.config(text="Stop Profiling" if enabled_var.get() else "Start Profiling")
+            if enabled_var.get():
+                messagebox.showinfo("UI Profiler", "Profiling started. Screens opened from now on are measured.",
+                                    parent=win)
+            refresh()
+
+        def reset():
+            ui_profiler.STATS.reset()
+            refresh()
+
+        btns = tk.Frame(win, bg='white')
+        btns.pack(fill='x', padx=10, pady=8)
+        toggle_btn = tk.Button(btns, text="Stop Profiling" if enabled_var.get() else "Start Profiling",
+                               bg="#27ae60", fg="white", command=toggle)
+        toggle_btn.pack(side='left')
+        tk.Button(btns, text="Apply", command=lambda: apply_settings() and refresh()).pack(side='left', padx=8)
+        tk.Button(btns, text="Refresh", bg="#3498db", fg="white", command=refresh).pack(side='left')
+        tk.Button(btns, text="Reset", bg="#e67e22", fg="white", command=reset).pack(side='left', padx=8)
+        tk.Button(btns, text="Close", command=win.destroy).pack(side='right')
+        win.bind('<F5>', lambda e: refresh())
+        refresh()
+
+    def show_maintenance(self):
+        """Administrator view of database maintenance runs (db_maintenance.py) with manual triggers."""
+        if not self.current_user or self.current_user.get('role') != 'administrator':
+            messagebox.showerror("Access Denied", "Only administrators can run database maintenance.")
+            return
+        if self.db_manager.is_remote:
+            messagebox.showinfo("Database Maintenance",
+                                "This terminal uses the database server; maintenance runs on the server machine.")
+            return
+        from db_maintenance import MaintenanceScheduler, ensure_schema
+        scheduler = getattr(self, '_maintenance', None)
+        if scheduler is None:
+            scheduler = self._maintenance = MaintenanceScheduler(self.db_manager.db_name,
+                                                                 self.db_manager.create_connection)
+
+        win = tk.Toplevel(self.root)
+        win.title("Database Maintenance")
+        win.geometry("1000x600")
+        win.configure(bg='white')
+
+        tk.Label(win, text="Database Maintenance", font=('Arial', 16, 'bold'), bg='white').pack(anchor='w', padx=10, pady=(10, 0))
+        status_var = tk.StringVar()
+        tk.Label(win, textvariable=status_var, font=('Arial', 10), bg='white', fg='#7f8c8d',
+                 justify='left').pack(anchor='w', padx=10, pady=5)
+
+        cols = ("Started", "Task", "Duration ms", "Status", "Details")
+        tree = ttk.Treeview(win, columns=cols, show='headings')
+        for c, w in zip(cols, (140, 130, 90, 70, 520)):
+            tree.heading(c, text=c)
+            tree.column(c, width=w, anchor='e' if c == "Duration ms" else 'w')
+        tree.pack(fill='both', expand=True, padx=10)
+
+        def refresh():
+            try:
+                conn = self.db_manager.create_connection()
+                try:
+                    ensure_schema(conn)
+                    conn.commit()
+                    st = scheduler.status(conn)
+                    rows = conn.execute("SELECT started_at, task, duration_ms, status, details FROM maintenance_log "
+                                        "ORDER BY id DESC LIMIT 200").fetchall()
+                finally:
+                    conn.close()
+            except Exception as e:
+                messagebox.showerror("Maintenance", f"Failed to load maintenance data: {str(e)}", parent=win)
+                return
+            mb = 1024 * 1024
+            pending = ", ".join(st['pending_analyze']) or "none"
+            state = "Running..." if scheduler.running else f"Idle for {st['idle_seconds']:.0f} s"
+            status_var.set(f"Database {st['db_size'] / mb:,.1f} MB   WAL {st['wal_size'] / mb:,.1f} MB   "
+                           f"Free pages {st['free_bytes'] / mb:,.1f} MB   auto_vacuum {st['auto_vacuum']}\n"
+                           f"Pending ANALYZE: {pending}   {state}")
+            tree.delete(*tree.get_children())
+            for r in rows:
+                tree.insert('', 'end', values=(r[0], r[1], f"{r[2]:,.1f}", r[3], r[4] or ''))
+
+        def wait_for_run():
+            if scheduler.running:
+                win.after(500, wait_for_run)
+            elif win.winfo_exists():
+                refresh()
+
+        def run(force):
+            if not scheduler.run_in_background(force=force):
+                messagebox.showinfo("Maintenance", "Maintenance is already running.", parent=win)
+                return
+            try:
+                self.log_audit_action(self.current_user['id'], "Database Maintenance",
+                                      "Run all tasks" if force else "Run due tasks")
+            except Exception:
+                pass
+            refresh()
+            wait_for_run()
+
+        btns = tk.Frame(win, bg='white')
+        btns.pack(fill='x', padx=10, pady=8)
+        tk.Button(btns, text="Run Due Tasks", bg="#27ae60", fg="white", command=lambda: run(False)).pack(side='left')
+        tk.Button(btns, text="Run All Now", bg="#e67e22", fg="white", command=lambda: run(True)).pack(side='left', padx=8)
+        tk.Button(btns, text="Refresh", bg="#3498db", fg="white", command=refresh).pack(side='left')
+        tk.Button(btns, text="Close", command=win.destroy).pack(side='right')
+        refresh()
+
+    def show_offline_journal(self):
+        """Administrator view of this terminal's offline operation journal (offline_journal.py)."""
+        if not self.current_user or self.current_user.get('role') != 'administrator':
+            messagebox.showerror("Access Denied", "Only administrators can view the offline journal.")
+            return
+        import threading
+        from offline_journal import format_report
+        journal = self.db_manager.journal
+
+        win = tk.Toplevel(self.root)
+        win.title("Offline Journal")
+        win.geometry("1000x650")
+        win.configure(bg='white')
+
+        tk.Label(win, text="Offline Journal", font=('Arial', 16, 'bold'), bg='white').pack(anchor='w', padx=10, pady=(10, 0))
+        status_var = tk.StringVar()
+        tk.Label(win, textvariable=status_var, font=('Arial', 10), bg='white', fg='#7f8c8d',
+                 justify='left').pack(anchor='w', padx=10, pady=5)
+
+        cols = ("#", "Operation", "Created", "Outcome", "In Shared Store", "Details", "Replayed")
+        tree = ttk.Treeview(win, columns=cols, show='headings', height=14)
+        for c, w in zip(cols, (60, 90, 150, 80, 110, 360, 150)):
+            tree.heading(c, text=c)
+            tree.column(c, width=w)
+        tree.pack(fill='both', expand=True, padx=10)
+
+        report_txt = tk.Text(win, height=8, font=('Consolas', 9))
+        report_txt.pack(fill='x', padx=10, pady=(8, 0))
+
+        def show_report(report):
+            report_txt.delete('1.0', 'end')
+            if report:
+                report_txt.insert('end', format_report(report))
+
+        def refresh():
+            try:
+                counts = journal.counts()
+                rows = journal.recent()
+            except Exception as e:
+                messagebox.showerror("Offline Journal", f"Failed to read the journal: {str(e)}", parent=win)
+                return
+            where = "database server" if self.db_manager.is_remote else (
+                "shared file" if self.db_manager.journal_is_shared else "next cloud download")
+            status_var.set(f"Terminal {journal.terminal_id}   Not yet in shared store: {counts.get('unsent', 0)}   "
+                           f"Applied {counts.get('applied', 0)}   Adjusted {counts.get('adjusted', 0)}   "
+                           f"Rejected {counts.get('rejected', 0)}   (replayed to the {where})")
+            tree.delete(*tree.get_children())
+            for seq, kind, created, status, confirmed, detail, replayed in rows:
+                tree.insert('', 'end', values=(seq, kind, str(created)[:19], status, "Yes" if confirmed else "No",
+                                               detail or '', str(replayed or '')[:19]))
+            show_report(journal.last_report)
+
+        state = {'running': False, 'result': None}
+
+        def wait_for_replay():
+            if state['running']:
+                win.after(300, wait_for_replay)
+                return
+            if not win.winfo_exists():
+                return
+            refresh()
+            result = state['result']
+            if isinstance(result, Exception):
+                messagebox.showerror("Offline Journal", f"Replay failed: {result}", parent=win)
+            elif result is None:
+                messagebox.showinfo("Offline Journal", "Operations on this terminal are in the local database and "
+                                                       "are re-applied after the next cloud download.", parent=win)
+
+        def replay_now():
+            if state['running']:
+                return
+
+            def work():
+                try:
+                    if not self.db_manager.is_remote and not self.db_manager.journal_is_shared:
+                        self.db_manager.cloud_sync.sync_from_cloud()
+                    state['result'] = self.db_manager.replay_journal()
+                except Exception as e:
+                    state['result'] = e
+                finally:
+                    state['running'] = False
+
+            state['running'] = True
+            threading.Thread(target=work, name='journal-replay', daemon=True).start()
+            wait_for_replay()
+
+        btns = tk.Frame(win, bg='white')
+        btns.pack(fill='x', padx=10, pady=8)
+        tk.Button(btns, text="Replay Now", bg="#27ae60", fg="white", command=replay_now).pack(side='left')
+        tk.Button(btns, text="Refresh", bg="#3498db", fg="white", command=refresh).pack(side='left', padx=8)
+        tk.Button(btns, text="Close", command=win.destroy).pack(side='right')
+        refresh()
+
+    def show_bulk_price_change(self):
+        """Change inventory prices of many stores and materials at once (price_book.bulk_change).
+
+        Administrators reach every store; retail store owners only their own.
+        """
+        role = (self.current_user or {}).get('role')
+        if role not in ('administrator', 'retail_store'):
+            messagebox.showerror("Access Denied", "Only administrators and store owners can change prices in bulk.")
+            return
+        import price_book
+        from money import format_amount, parse_amount
+
+        own_stores = None
+        try:
+            conn = self.db_manager.create_connection()
+            cur = conn.cursor()
+            categories = [r[0] for r in cur.execute(
+                "SELECT DISTINCT category FROM building_materials WHERE category IS NOT NULL ORDER BY category")]
+            materials = cur.execute("SELECT id, name FROM building_materials ORDER BY name").fetchall()
+            if role == 'retail_store':
+                own_stores = [r[0] for r in cur.execute("SELECT id FROM stores WHERE owner_id = ?",
+                                                        (self.current_user['id'],))]
+                scope = f"WHERE id IN ({', '.join('?' * len(own_stores)) or 'NULL'})"
+            else:
+                scope = ''
+            cities = [r[0] for r in cur.execute(
+                f"SELECT DISTINCT city FROM stores {scope} ORDER BY city", own_stores or []) if r[0]]
+            regions = [r[0] for r in cur.execute(
+                f"SELECT DISTINCT region FROM stores {scope} ORDER BY region", own_stores or []) if r[0]]
+            conn.close()
+        except Exception as e:
+            messagebox.showerror("Bulk Price Change", f"Failed to load stores and materials: {str(e)}")
+            return
+        material_map = {f"{name} (ID:{mid})": mid for mid, name in materials}
+
+        win = tk.Toplevel(self.root)
+        win.title("Bulk Price Change")
+        win.geometry("900x620")
+        win.configure(bg='white')
+        tk.Label(win, text="Bulk Price Change", font=('Arial', 16, 'bold'), bg='white').pack(anchor='w', padx=10, pady=(10, 0))
+        tk.Label(win, text="Changes the shelf price of every matching inventory line" +
+                 (" in your stores." if own_stores is not None else "."),
+                 font=('Arial', 10), bg='white', fg='#7f8c8d').pack(anchor='w', padx=10)
+
+        form = tk.Frame(win, bg='white')
+        form.pack(fill='x', padx=10, pady=8)
+        category_var = tk.StringVar(value='All')
+        material_var = tk.StringVar(value='All')
+        city_var = tk.StringVar(value='All')
+        region_var = tk.StringVar(value='All')
+        mode_var = tk.StringVar(value='percent')
+        value_var = tk.StringVar(value='5')
+        round_var = tk.StringVar(value='5')
+        for row, (label, var, values) in enumerate((("Category:", category_var, categories),
+                                                    ("Material:", material_var, list(material_map)),
+                                                    ("City:", city_var, cities),
+                                                    ("Region:", region_var, regions))):
+            tk.Label(form, text=label, bg='white').grid(row=row % 2, column=(row // 2) * 2, sticky='w', padx=(0, 5), pady=3)
+            ttk.Combobox(form, textvariable=var, values=['All'] + values, width=32,
+                         state='readonly').grid(row=row % 2, column=(row // 2) * 2 + 1, sticky='w', padx=(0, 15), pady=3)
+        change = tk.Frame(form, bg='white')
+        change.grid(row=2, column=0, columnspan=4, sticky='w', pady=(8, 0))
+        for text, mode in (("Percent (+/-)", 'percent'), ("Amount (+/- FCFA)", 'amount'), ("Set price to", 'set_to')):
+            tk.Radiobutton(change, text=text, variable=mode_var, value=mode, bg='white').pack(side='left')
+        tk.Entry(change, textvariable=value_var, width=10).pack(side='left', padx=(8, 15))
+        tk.Label(change, text="Round to (FCFA):", bg='white').pack(side='left')
+        tk.Entry(change, textvariable=round_var, width=6).pack(side='left', padx=5)
+
+        summary_var = tk.StringVar()
+        tk.Label(win, textvariable=summary_var, font=('Arial', 10, 'bold'), bg='white').pack(anchor='w', padx=10)
+        cols = ("Store", "Material", "Quantity", "Current Price", "New Price")
+        tree = ttk.Treeview(win, columns=cols, show='headings', height=14)
+        for c, w in zip(cols, (240, 240, 90, 120, 120)):
+            tree.heading(c, text=c)
+            tree.column(c, width=w)
+        tree.pack(fill='both', expand=True, padx=10)
+
+        def read_change():
+            """Keyword arguments for price_book.preview_change / bulk_change from the form."""
+            mode = mode_var.get()
+            if mode == 'percent':
+                value = float(value_var.get().replace(',', '.').strip())
+            else:
+                value = parse_amount(value_var.get())
+                if value is None:
+                    raise ValueError("Enter an amount in FCFA")
+            spec = {mode: value, 'round_to': int(parse_amount(round_var.get(), 1) or 1)}
+            if category_var.get() != 'All':
+                spec['categories'] = [category_var.get()]
+            if material_var.get() != 'All':
+                spec['material_ids'] = [material_map[material_var.get()]]
+            if city_var.get() != 'All':
+                spec['city'] = city_var.get()
+            if region_var.get() != 'All':
+                spec['region'] = region_var.get()
+            if own_stores is not None:
+                spec['store_ids'] = own_stores
+            return spec
+
+        def preview():
+            try:
+                spec = read_change()
+                conn = self.db_manager.create_connection()
+                try:
+                    count, delta, rows = price_book.preview_change(conn, limit=200, **spec)
+                finally:
+                    conn.close()
+            except Exception as e:
+                messagebox.showerror("Bulk Price Change", f"Cannot preview this change: {str(e)}", parent=win)
+                return None
+            tree.delete(*tree.get_children())
+            for store, material, qty, old, new in rows:
+                tree.insert('', 'end', values=(store, material, qty, format_amount(old), format_amount(new)))
+            shown = f" (first {len(rows)} shown)" if len(rows) < count else ""
+            summary_var.set(f"{count} inventory line(s) change{shown}; stock value "
+                            f"{'+' if delta >= 0 else '-'}{format_amount(abs(delta))} FCFA")
+            return spec, count
+
+        def apply_change():
+            previewed = preview()
+            if not previewed:
+                return
+            spec, count = previewed
+            if not count:
+                messagebox.showinfo("Bulk Price Change", "No inventory line matches this change.", parent=win)
+                return
+            if not messagebox.askyesno("Bulk Price Change", f"Change the price of {count} inventory line(s)?", parent=win):
+                return
+            try:
+                conn = self.db_manager.create_connection()
+                try:
+                    changed = price_book.bulk_change(conn.cursor(), stamp=datetime.now().isoformat(sep=' '), **spec)
+                    conn.commit()
+                except Exception:
+                    conn.rollback()
+                    raise
+                finally:
+                    conn.close()
+            except Exception as e:
+                messagebox.showerror("Bulk Price Change", f"Failed to change prices: {str(e)}", parent=win)
+                return
+            self.prices_changed()
+            described = ', '.join(f"{k}={v}" for k, v in spec.items() if k != 'store_ids')
+            self.log_audit_action(self.current_user['id'], "Bulk Price Change", f"{changed} line(s): {described}")
+            tree.delete(*tree.get_children())
+            summary_var.set(f"{changed} inventory price(s) changed.")
+            messagebox.showinfo("Bulk Price Change", f"{changed} inventory price(s) changed.", parent=win)
+
+        btns = tk.Frame(win, bg='white')
+        btns.pack(fill='x', padx=10, pady=8)
+        tk.Button(btns, text="Preview", bg="#3498db", fg="white", command=preview).pack(side='left')
+        tk.Button(btns, text="Apply", bg="#27ae60", fg="white", command=apply_change).pack(side='left', padx=8)
+        tk.Button(btns, text="Close", command=win.destroy).pack(side='right')
+
+    def _reporting_snapshot(self):
+        """SnapshotManager for the report screens, started the first time one opens (reporting_snapshot.py)."""
+        mgr = getattr(self, '_snapshot_manager', None)
+        if mgr is None:
+            from reporting_snapshot import SnapshotManager
+            # Remote terminals have no local file to copy: report from the server's live data
+            mgr = self._snapshot_manager = SnapshotManager(
+                self.db_manager.db_name, {'enabled': False} if self.db_manager.is_remote else None)
+            mgr.start(self.root)
+        return mgr
+
+    def _report_connection(self):
+        """Connection for heavy report queries: the reporting snapshot when one is published, else the live DB.
+
+        Safe to call from worker threads; the manager itself is created on the UI thread.
+        """
+        mgr = getattr(self, '_snapshot_manager', None)
+        if mgr is not None:
+            try:
+                conn = mgr.connect()
+                if conn is not None:
+                    return conn
+            except Exception as e:
+                print(f"[WARN] reporting snapshot unavailable: {e}")
+        return self.db_manager.create_connection()
+
+    def _add_snapshot_indicator(self, parent, bg='white', fg='#7f8c8d', on_updated=None):
+        """Pack a data-freshness label with an "Update now" button into ``parent``.
+
+        ``on_updated`` runs when a snapshot build started from this window finishes.
+        Returns a function that re-reads the label.
+        """
+        mgr = self._reporting_snapshot()
+        text_var = tk.StringVar(value=mgr.describe())
+        frame = tk.Frame(parent, bg=bg)
+        frame.pack(side='right', padx=10)
+        tk.Label(frame, textvariable=text_var, font=('Arial', 9), bg=bg, fg=fg).pack(side='left')
+        waiting = [mgr.building]
+
+        def poll():
+            if not frame.winfo_exists():
+                return
+            text_var.set(mgr.describe())
+            if mgr.building:
+                frame.after(1000, poll)
+            elif waiting[0]:
+                waiting[0] = False
+                if mgr.last_error:
+                    messagebox.showerror("Reporting Data", f"Snapshot update failed: {mgr.last_error}", parent=frame)
+                elif on_updated is not None:
+                    on_updated()
+
+        def update_now():
+            if mgr.refresh_in_background() or mgr.building:
+                waiting[0] = True
+            poll()
+
+        if mgr.enabled:
+            tk.Button(frame, text="Update now", font=('Arial', 8), command=update_now).pack(side='left', padx=6)
+        poll()
+        return lambda: text_var.set(mgr.describe())
+
 #=============== all system statistics======================
     def show_system_statistics(self):
         # System Statistics window
@@ -5494,7 +6377,8 @@ class CBPMApp:
         refresh_btn.place(relx=0.95, rely=0.5, anchor='center')
 
         try:
-            conn = self.db_manager.create_connection()
+            self._reporting_snapshot()
+            conn = self._report_connection()
             cursor = conn.cursor()
 
             # === OVERVIEW STATISTICS CARDS ===
@@ -5802,7 +6686,8 @@ class CBPMApp:
             health_frame.pack(fill='x', padx=20, pady=(0, 20))
 
             # Database statistics
-            cursor.execute("SELECT name FROM sqlite_master WHERE type='table'")
+            cursor.execute("SELECT name FROM sqlite_master WHERE type='table' "
+                           "AND name NOT IN ('sales_daily', 'snapshot_meta')")
             table_count = len(cursor.fetchall())
 
             cursor.execute("SELECT COUNT(*) FROM audit_log")
@@ -5865,7 +6750,9 @@ class CBPMApp:
         from datetime import datetime
         last_updated = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
         tk.Label(footer_frame, text=f"Last Updated: {last_updated}",
-                 font=('Arial', 10), bg='#34495e', fg='white').pack(expand=True)
+                 font=('Arial', 10), bg='#34495e', fg='white').pack(side='left', expand=True)
+        self._add_snapshot_indicator(footer_frame, bg='#34495e', fg='white',
+                                     on_updated=lambda: refresh_stats())
 
         # Pack canvas and scrollbar
         main_canvas.pack(side="left", fill="both", expand=True)
@@ -5977,29 +6864,11 @@ class CBPMApp:
 
             def refresh():
                 try:
+                    from queries import search_audit_log
                     conn = self.db_manager.create_connection(); cur = conn.cursor()
-                    query = (
-                        "SELECT a.timestamp, COALESCE(u.full_name,u.username) AS user, a.action, substr(COALESCE(a.details,''),1,200), COALESCE(a.ip_address,'') "
-                        "FROM audit_log a LEFT JOIN users u ON u.id = a.user_id WHERE 1=1 "
-                    )
-                    params = []
-                    uid = user_map.get(user_var.get())
-                    if role != 'administrator':
-                        query += "AND a.user_id = ? "; params.append(self.current_user['id'])
-                    elif uid:
-                        query += "AND a.user_id = ? "; params.append(uid)
-                    f = from_var.get().strip()
-                    if f:
-                        query += "AND date(a.timestamp) >= ? "; params.append(f)
-                    t = to_var.get().strip()
-                    if t:
-                        query += "AND date(a.timestamp) <= ? "; params.append(t)
-                    q = q_var.get().strip()
-                    if q:
-                        query += "AND (a.action LIKE ? OR a.details LIKE ?) "; like = f"%{q}%"; params.extend([like, like])
-                    query += "ORDER BY a.timestamp DESC LIMIT 500"
-                    cur.execute(query, params)
-                    rows = cur.fetchall(); conn.close()
+                    uid = self.current_user['id'] if role != 'administrator' else user_map.get(user_var.get())
+                    rows = search_audit_log(cur, uid, from_var.get().strip(), to_var.get().strip(), q_var.get().strip())
+                    conn.close()
                 except Exception as e:
                     try:
                         messagebox.showerror("Audit Log", f"Failed to load audit log: {str(e)}")
@@ -6018,29 +6887,12 @@ class CBPMApp:
                     filename = fd.asksaveasfilename(title="Export Audit Log", defaultextension=".csv", initialfile=default_name, filetypes=[("CSV files","*.csv"),("All files","*.*")])
                     if not filename:
                         return
+                    from queries import search_audit_log
                     conn = self.db_manager.create_connection(); cur = conn.cursor()
-                    query = (
-                        "SELECT a.timestamp, COALESCE(u.full_name,u.username) AS user, a.action, a.details, COALESCE(a.ip_address,'') "
-                        "FROM audit_log a LEFT JOIN users u ON u.id = a.user_id WHERE 1=1 "
-                    )
-                    params = []
-                    uid = user_map.get(user_var.get())
-                    if role != 'administrator':
-                        query += "AND a.user_id = ? "; params.append(self.current_user['id'])
-                    elif uid:
-                        query += "AND a.user_id = ? "; params.append(uid)
-                    f = from_var.get().strip()
-                    if f:
-                        query += "AND date(a.timestamp) >= ? "; params.append(f)
-                    t = to_var.get().strip()
-                    if t:
-                        query += "AND date(a.timestamp) <= ? "; params.append(t)
-                    q = q_var.get().strip()
-                    if q:
-                        query += "AND (a.action LIKE ? OR a.details LIKE ?) "; like = f"%{q}%"; params.extend([like, like])
-                    query += "ORDER BY a.timestamp DESC"
-                    cur.execute(query, params)
-                    rows = cur.fetchall(); conn.close()
+                    uid = self.current_user['id'] if role != 'administrator' else user_map.get(user_var.get())
+                    rows = search_audit_log(cur, uid, from_var.get().strip(), to_var.get().strip(), q_var.get().strip(),
+                                            limit=None, details_length=None)
+                    conn.close()
                     import csv
                     with open(filename, 'w', newline='', encoding='utf-8') as f:
                         w = csv.writer(f)
@@ -6455,10 +7307,12 @@ class CBPMApp:
                     return
 
                 # Insert new store
+                from store_contacts import contact_columns
+                columns = contact_columns(contact_info, city=form_data['city'], region=form_data['region'])
                 cursor.execute('''
                                INSERT INTO stores (name, location, owner_id, manager_id, contact_info,
-                                                   created_date, is_active)
-                               VALUES (?, ?, ?, ?, ?, ?, ?)
+                                                   created_date, is_active, category, phone, email, city, region)
+                               VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
                                ''', (
                                    form_data['name'],
                                    location,
@@ -6466,7 +7320,12 @@ class CBPMApp:
                                    manager_id,
                                    json.dumps(contact_info),
                                    date.today(),
-                                   form_data['is_active']
+                                   form_data['is_active'],
+                                   columns['category'],
+                                   columns['phone'],
+                                   columns['email'],
+                                   columns['city'],
+                                   columns['region']
                                ))
 
                 store_id = cursor.lastrowid
@@ -6668,6 +7527,188 @@ class CBPMApp:
                   command=lambda: [messagebox.showinfo("Info", "Store created successfully!"),
                                    inventory_window.destroy()]).pack(side='left')
 
+        tk.Button(btn_frame, text="Import from File", font=('Arial', 12),
+                  bg='#3498db', fg='white', width=15,
+                  command=lambda: self.show_bulk_import(kind='inventory', store_id=store_id,
+                                                        on_done=inventory_window.destroy)).pack(side='left', padx=(10, 0))
+
+    def show_bulk_import(self, kind=None, store_id=None, on_done=None):
+        """Bulk import inventory, materials or users from a CSV/XLSX file.
+
+        Args:
+            kind (Optional[str]): Preselect 'inventory', 'materials' or 'users'.
+            store_id (Optional[int]): Fix the target store for inventory imports
+                (rows then need no store column).
+            on_done (Optional[callable]): Called after a successful import,
+                e.g. to refresh the calling list.
+        """
+        from importer import BulkImporter, format_report, HAS_OPENPYXL, IMPORT_TABLES
+        role = self.current_user.get('role') if self.current_user else None
+        user_id = self.current_user['id'] if self.current_user else None
+        is_admin = role == 'administrator'
+        if is_admin:
+            kinds = ['inventory', 'materials', 'users']
+        elif role in ('retail_store', 'contract_owner'):
+            kinds = ['inventory', 'materials']
+        else:
+            messagebox.showerror("Access Denied", "You don't have permission to import data.")
+            return
+
+        # Stores the user may import inventory into
+        stores = []
+        try:
+            conn = self.db_manager.create_connection()
+            cur = conn.cursor()
+            if is_admin:
+                cur.execute("SELECT id, name FROM stores WHERE is_active = 1 ORDER BY name")
+            else:
+                cur.execute("SELECT id, name FROM stores WHERE owner_id = ? AND is_active = 1 ORDER BY name", (user_id,))
+            stores = cur.fetchall()
+            conn.close()
+        except Exception as e:
+            print(f"[WARN] bulk import store list failed: {e}")
+        allowed_store_ids = None if is_admin else {sid for sid, _ in stores}
+
+        win = tk.Toplevel(self.root)
+        win.title("Bulk Import")
+        win.geometry("720x560")
+        win.configure(bg='white')
+        win.grab_set()
+
+        tk.Label(win, text="Bulk Import", font=('Arial', 16, 'bold'), bg='white', fg='#2c3e50').pack(pady=(12, 4))
+        types = "CSV or Excel (.xlsx)" if HAS_OPENPYXL else "CSV"
+        tk.Label(win, text=f"{types} file; the first row must hold the column names.",
+                 font=('Arial', 10), bg='white', fg='#7f8c8d').pack()
+
+        form = tk.Frame(win, bg='white')
+        form.pack(fill='x', padx=20, pady=10)
+
+        tk.Label(form, text="Import:", bg='white').grid(row=0, column=0, sticky='w', pady=4)
+        kind_var = tk.StringVar(value=kind if kind in kinds else kinds[0])
+        ttk.Combobox(form, textvariable=kind_var, values=kinds, state='readonly', width=20).grid(row=0, column=1, sticky='w')
+
+        tk.Label(form, text="Store:", bg='white').grid(row=1, column=0, sticky='w', pady=4)
+        store_labels = ["(from file)"] + [f"{name} (ID:{sid})" for sid, name in stores]
+        store_var = tk.StringVar(value=store_labels[0])
+        for sid, name in stores:
+            if sid == store_id:
+                store_var.set(f"{name} (ID:{sid})")
+        store_combo = ttk.Combobox(form, textvariable=store_var, values=store_labels, state='readonly', width=40)
+        store_combo.grid(row=1, column=1, sticky='w')
+
+        tk.Label(form, text="Existing items:", bg='white').grid(row=2, column=0, sticky='w', pady=4)
+        mode_var = tk.StringVar(value='set')
+        mode_frame = tk.Frame(form, bg='white')
+        mode_frame.grid(row=2, column=1, sticky='w')
+        tk.Radiobutton(mode_frame, text="Replace quantity", variable=mode_var, value='set', bg='white').pack(side='left')
+        tk.Radiobutton(mode_frame, text="Add to quantity", variable=mode_var, value='add', bg='white').pack(side='left')
+
+        tk.Label(form, text="File:", bg='white').grid(row=3, column=0, sticky='w', pady=4)
+        file_var = tk.StringVar()
+        tk.Entry(form, textvariable=file_var, width=50).grid(row=3, column=1, sticky='w')
+
+        def browse():
+            filetypes = [("CSV files", "*.csv")]
+            if HAS_OPENPYXL:
+                filetypes.insert(0, ("Spreadsheets", "*.csv *.xlsx"))
+            filetypes.append(("All files", "*.*"))
+            filename = filedialog.askopenfilename(title="Select Import File", filetypes=filetypes, parent=win)
+            if filename:
+                file_var.set(filename)
+
+        tk.Button(form, text="Browse...", command=browse).grid(row=3, column=2, padx=6)
+
+        hint_var = tk.StringVar()
+        tk.Label(win, textvariable=hint_var, font=('Arial', 9), bg='white', fg='#34495e',
+                 justify='left', wraplength=660).pack(fill='x', padx=20)
+        hints = {
+            'inventory': "Columns: store, material, quantity, unit_price (optional), reorder_level (optional). "
+                         "Store and material may be names or IDs.",
+            'materials': "Columns: name, category, unit, standard_price, supplier, description, local_name.",
+            'users': "Columns: username, email, full_name, role, password, phone (optional), address (optional). "
+                     "Users must change their password at first login.",
+        }
+
+        def on_kind(*_):
+            hint_var.set(hints.get(kind_var.get(), ''))
+            state = 'readonly' if kind_var.get() == 'inventory' and store_id is None else 'disabled'
+            store_combo.configure(state=state)
+        kind_var.trace('w', on_kind)
+        on_kind()
+
+        report_text = tk.Text(win, height=14, font=('Consolas', 9), wrap='word')
+        report_text.pack(fill='both', expand=True, padx=20, pady=10)
+
+        def run_import(dry_run):
+            path = file_var.get().strip()
+            if not path or not os.path.exists(path):
+                messagebox.showwarning("Bulk Import", "Please choose a file to import.", parent=win)
+                return
+            selected_kind = kind_var.get()
+            target_store = None
+            if selected_kind == 'inventory':
+                target_store = store_id
+                label = store_var.get()
+                if target_store is None and label != store_labels[0]:
+                    target_store = int(label.rsplit('(ID:', 1)[1].rstrip(')'))
+            report_text.delete('1.0', tk.END)
+            report_text.insert(tk.END, "Working...\n")
+            win.update_idletasks()
+
+            def progress(partial):
+                report_text.delete('1.0', tk.END)
+                report_text.insert(tk.END, f"Processed {partial['total']} rows...\n")
+                win.update_idletasks()
+
+            conn = self.db_manager.create_connection()
+            try:
+                importer = BulkImporter(
+                    conn, selected_kind,
+                    allowed_store_ids=allowed_store_ids,
+                    default_store_id=target_store,
+                    owner_id=None if is_admin else user_id,
+                    inventory_mode=mode_var.get(),
+                    hash_password=self.security_manager.hash_password,
+                    created_by=user_id,
+                )
+                report = importer.run(path, dry_run=dry_run, progress=progress)
+                if not dry_run and report['written'] and selected_kind in ('inventory', 'materials'):
+                    self.prices_changed()
+                if not dry_run and report['written']:
+                    # Refresh planner statistics for the imported table on the maintenance thread
+                    try:
+                        from db_maintenance import request_analyze
+                        request_analyze([IMPORT_TABLES[selected_kind]])
+                        if getattr(self, '_maintenance', None) is not None:
+                            self._maintenance.run_in_background()
+                    except Exception:
+                        pass
+            except Exception as e:
+                report_text.delete('1.0', tk.END)
+                messagebox.showerror("Bulk Import", f"Import failed: {str(e)}", parent=win)
+                return
+            finally:
+                conn.close()
+            report_text.delete('1.0', tk.END)
+            report_text.insert(tk.END, format_report(report))
+            if not dry_run and report['written']:
+                self.log_audit_action(user_id, f"Bulk Import {selected_kind.title()}",
+                                      f"{report['written']} rows from {os.path.basename(path)}, "
+                                      f"{report['rejected']} rejected")
+                if on_done:
+                    try:
+                        on_done()
+                    except Exception:
+                        pass
+
+        btns = tk.Frame(win, bg='white')
+        btns.pack(fill='x', padx=20, pady=(0, 12))
+        tk.Button(btns, text="Dry Run", bg="#3498db", fg="white", width=12,
+                  command=lambda: run_import(True)).pack(side='left')
+        tk.Button(btns, text="Import", bg="#27ae60", fg="white", width=12,
+                  command=lambda: run_import(False)).pack(side='left', padx=8)
+        tk.Button(btns, text="Close", width=12, command=win.destroy).pack(side='right')
+
 
 # ================= store management ==================================
 
@@ -6721,6 +7762,21 @@ class CBPMApp:
         region_filter.set('All')
         region_filter.pack(side='left', padx=(0, 10))
 
+        # Category filter
+        tk.Label(search_frame, text="Category:", font=('Arial', 10),
+                 bg='white').pack(side='left', padx=(0, 5))
+        category_filter_var = tk.StringVar()
+        category_filter = ttk.Combobox(search_frame, textvariable=category_filter_var, width=18, state='readonly')
+        try:
+            from queries import store_categories
+            conn = self.db_manager.create_connection()
+            category_filter['values'] = ['All'] + store_categories(conn.cursor())
+            conn.close()
+        except Exception:
+            category_filter['values'] = ['All']
+        category_filter.set('All')
+        category_filter.pack(side='left', padx=(0, 10))
+
         # Refresh button
         refresh_btn = tk.Button(search_frame, text="Refresh", font=('Arial', 10),
                                 bg='#3498db', fg='white', width=8)
@@ -6785,8 +7841,22 @@ class CBPMApp:
             ('Created', 100, 'center')
         ]
 
+        # Clicking a heading sorts on it (in SQL); clicking it again reverses the order
+        sort_keys = {'ID': 'id', 'Name': 'name', 'Owner': 'owner', 'Manager': 'manager', 'Location': 'location',
+                     'Category': 'category', 'Contact': 'phone', 'Status': 'status', 'Created': 'created'}
+        sort_state = {'key': 'created', 'descending': True}
+
+        def sort_by(col):
+            key = sort_keys[col]
+            if sort_state['key'] == key:
+                sort_state['descending'] = not sort_state['descending']
+            else:
+                sort_state['key'] = key
+                sort_state['descending'] = key in ('created', 'status')
+            load_stores()
+
         for col, width, anchor in columns_config:
-            stores_tree.heading(col, text=col)
+            stores_tree.heading(col, text=col, command=lambda c=col: sort_by(c))
             stores_tree.column(col, width=width, anchor=anchor)
 
         # Configure row colors based on status and ownership
@@ -6873,62 +7943,15 @@ class CBPMApp:
                 stores_tree.delete(item)
 
             try:
+                from queries import list_stores
                 conn = self.db_manager.create_connection()
                 cursor = conn.cursor()
 
-                # Build query based on filters and user role
-                search_text = search_var.get().strip()
-                status_filter_text = status_filter_var.get()
-                region_filter_text = region_filter_var.get()
-
-                query = '''
-                        SELECT s.id,
-                               s.name,
-                               owner.full_name                             as owner_name,
-                               COALESCE(manager.full_name, 'Not Assigned') as manager_name,
-                               s.location,
-                               s.contact_info,
-                               s.is_active,
-                               s.created_date,
-                               s.owner_id
-                        FROM stores s
-                                 JOIN users owner ON s.owner_id = owner.id
-                                 LEFT JOIN users manager ON s.manager_id = manager.id
-                        WHERE 1 = 1
-                        '''
-                params = []
-
-                # Apply user role-based filtering
-                if self.current_user['role'] == 'retail_store':
-                    # Retail store owners can only see their own stores
-                    query += ' AND s.owner_id = ?'
-                    params.append(self.current_user['id'])
-                elif self.current_user['role'] == 'manager':
-                    # Managers can see stores they manage
-                    query += ' AND s.manager_id = ?'
-                    params.append(self.current_user['id'])
-
-                # Apply search filter
-                if search_text:
-                    query += ' AND (s.name LIKE ? OR s.location LIKE ? OR owner.full_name LIKE ?)'
-                    search_pattern = f'%{search_text}%'
-                    params.extend([search_pattern, search_pattern, search_pattern])
-
-                # Apply status filter
-                if status_filter_text == 'Active':
-                    query += ' AND s.is_active = 1'
-                elif status_filter_text == 'Inactive':
-                    query += ' AND s.is_active = 0'
-
-                # Apply region filter
-                if region_filter_text != 'All':
-                    query += ' AND s.location LIKE ?'
-                    params.append(f'%{region_filter_text}%')
-
-                query += ' ORDER BY s.created_date DESC'
-
-                cursor.execute(query, params)
-                stores = cursor.fetchall()
+                # Role, filters and sort order are all applied in SQL
+                stores = list_stores(cursor, self.current_user['role'], self.current_user['id'],
+                                     search=search_var.get(), status=status_filter_var.get(),
+                                     region=region_filter_var.get(), category=category_filter_var.get(),
+                                     sort=sort_state['key'], descending=sort_state['descending'])
 
                 # Statistics counters
                 total_count = 0
@@ -6938,17 +7961,10 @@ class CBPMApp:
 
                 # Insert stores into tree
                 for store in stores:
-                    store_id, name, owner_name, manager_name, location, contact_info, is_active, created_date, owner_id = store
-
-                    # Parse contact info
-                    category = "General"
-                    phone = "N/A"
-                    try:
-                        contact_data = json.loads(contact_info) if contact_info else {}
-                        category = contact_data.get('category', 'General')
-                        phone = contact_data.get('phone', 'N/A')
-                    except:
-                        pass
+                    (store_id, name, owner_name, manager_name, location, category, phone, _email,
+                     is_active, created_date, owner_id, _city, _region) = store
+                    category = category or "General"
+                    phone = phone or "N/A"
 
                     # Format status
                     status = "Active" if is_active else "Inactive"
@@ -7400,6 +8416,9 @@ class CBPMApp:
                         'email': edit_entries['email'].get()
                     })
 
+                    from store_contacts import contact_columns
+                    columns = contact_columns(updated_contact_data, edit_entries['location'].get())
+
                     conn = self.db_manager.create_connection()
                     cursor = conn.cursor()
 
@@ -7409,7 +8428,12 @@ class CBPMApp:
                                        location     = ?,
                                        contact_info = ?,
                                        manager_id   = ?,
-                                       is_active    = ?
+                                       is_active    = ?,
+                                       category     = ?,
+                                       phone        = ?,
+                                       email        = ?,
+                                       city         = ?,
+                                       region       = ?
                                    WHERE id = ?
                                    ''', (
                                        edit_entries['name'].get(),
@@ -7417,6 +8441,11 @@ class CBPMApp:
                                        json.dumps(updated_contact_data),
                                        manager_id,
                                        edit_entries['is_active'].get(),
+                                       columns['category'],
+                                       columns['phone'],
+                                       columns['email'],
+                                       columns['city'],
+                                       columns['region'],
                                        store_id
                                    ))
 
@@ -7621,57 +8650,12 @@ class CBPMApp:
                     conn = self.db_manager.create_connection()
                     cursor = conn.cursor()
 
-                    # Build export query based on current filters
-                    query = '''
-                            SELECT s.id,
-                                   s.name,
-                                   owner.full_name,
-                                   COALESCE(manager.full_name, 'Not Assigned'),
-                                   s.location,
-                                   s.contact_info,
-                                   CASE WHEN s.is_active = 1 THEN 'Active' ELSE 'Inactive' END,
-                                   s.created_date
-                            FROM stores s
-                                     JOIN users owner ON s.owner_id = owner.id
-                                     LEFT JOIN users manager ON s.manager_id = manager.id
-                            '''
-
-                    # Apply same filters as current view
-                    search_text = search_var.get().strip()
-                    status_filter_text = status_filter_var.get()
-                    region_filter_text = region_filter_var.get()
-
-                    params = []
-                    where_conditions = []
-
-                    if self.current_user['role'] == 'retail_store':
-                        where_conditions.append('s.owner_id = ?')
-                        params.append(self.current_user['id'])
-                    elif self.current_user['role'] == 'manager':
-                        where_conditions.append('s.manager_id = ?')
-                        params.append(self.current_user['id'])
-
-                    if search_text:
-                        where_conditions.append('(s.name LIKE ? OR s.location LIKE ? OR owner.full_name LIKE ?)')
-                        search_pattern = f'%{search_text}%'
-                        params.extend([search_pattern, search_pattern, search_pattern])
-
-                    if status_filter_text == 'Active':
-                        where_conditions.append('s.is_active = 1')
-                    elif status_filter_text == 'Inactive':
-                        where_conditions.append('s.is_active = 0')
-
-                    if region_filter_text != 'All':
-                        where_conditions.append('s.location LIKE ?')
-                        params.append(f'%{region_filter_text}%')
-
-                    if where_conditions:
-                        query += ' WHERE ' + ' AND '.join(where_conditions)
-
-                    query += ' ORDER BY s.created_date DESC'
-
-                    cursor.execute(query, params)
-                    stores_data = cursor.fetchall()
+                    # Same filters and order as the current view
+                    from queries import list_stores
+                    stores_data = list_stores(cursor, self.current_user['role'], self.current_user['id'],
+                                              search=search_var.get(), status=status_filter_var.get(),
+                                              region=region_filter_var.get(), category=category_filter_var.get(),
+                                              sort=sort_state['key'], descending=sort_state['descending'])
 
                     import csv
                     with open(filename, 'w', newline='', encoding='utf-8') as csvfile:
@@ -7680,19 +8664,10 @@ class CBPMApp:
                                          'Category', 'Phone', 'Email', 'Status', 'Created Date'])
 
                         for row in stores_data:
-                            # Parse contact info for export
-                            contact_data = {}
-                            try:
-                                contact_data = json.loads(row[5]) if row[5] else {}
-                            except:
-                                pass
-
                             export_row = [
                                 row[0], row[1], row[2], row[3], row[4],
-                                contact_data.get('category', ''),
-                                contact_data.get('phone', ''),
-                                contact_data.get('email', ''),
-                                row[6], row[7]
+                                row[5] or '', row[6] or '', row[7] or '',
+                                'Active' if row[8] else 'Inactive', row[9]
                             ]
                             writer.writerow(export_row)
 
@@ -7911,6 +8886,7 @@ class CBPMApp:
         search_var.trace('w', on_filter_change)
         status_filter_var.trace('w', on_filter_change)
         region_filter_var.trace('w', on_filter_change)
+        category_filter_var.trace('w', on_filter_change)
 
         # Double-click to view details
         stores_tree.bind('<Double-1>', lambda e: view_store())
@@ -8026,57 +9002,24 @@ class CBPMApp:
 
             def load_inventory():
                 try:
+                    from money import format_amount, line_total
+                    from queries import list_inventory
                     conn = self.db_manager.create_connection()
                     cur = conn.cursor()
-                    query = '''
-                        SELECT i.id, s.name AS store, bm.name AS material, i.quantity, i.unit_price, i.reorder_level, i.last_updated
-                        FROM inventory i
-                        JOIN stores s ON s.id = i.store_id
-                        JOIN building_materials bm ON bm.id = i.material_id
-                    '''
-                    params = []
-                    where_clauses = []
-                    # Enforce single-store view if a store was preselected by caller
-                    if preselected_store_id is not None:
-                        where_clauses.append('i.store_id = ?')
-                        params.append(preselected_store_id)
-                    # Role-based store visibility for inventory listing
-                    try:
-                        role = self.current_user.get('role') if self.current_user else None
-                        if role in ('retail_store','contract_owner'):
-                            where_clauses.append('s.owner_id = ?')
-                            params.append(self.current_user['id'])
-                        elif role == 'manager':
-                            where_clauses.append('s.manager_id = ?')
-                            params.append(self.current_user['id'])
-                    except Exception:
-                        pass
-                    if search_var.get().strip():
-                        where_clauses.append('(bm.name LIKE ? OR s.name LIKE ?)')
-                        like = f"%{search_var.get().strip()}%"
-                        params.extend([like, like])
-                    if where_clauses:
-                        query += ' WHERE ' + ' AND '.join(where_clauses)
-                    query += ' ORDER BY i.last_updated DESC'
-                    cur.execute(query, params)
-                    rows = cur.fetchall()
+                    # Single-store view if a store was preselected; role-based store visibility otherwise
+                    role = self.current_user.get('role') if self.current_user else None
+                    user_id = self.current_user.get('id') if self.current_user else None
+                    rows = list_inventory(cur, role, user_id, preselected_store_id, search_var.get())
                     # Populate table
                     for item in inv_tree.get_children():
                         inv_tree.delete(item)
                     total_qty_sum = 0.0
-                    total_value_sum = 0.0
+                    total_value_sum = 0
                     for r in rows:
                         inv_tree.insert('', 'end', values=r)
-                        try:
-                            q = float(r[3] or 0)
-                        except Exception:
-                            q = 0.0
-                        try:
-                            up = float(r[4] or 0)
-                        except Exception:
-                            up = 0.0
-                        total_qty_sum += q
-                        total_value_sum += (q * up)
+                        total_qty_sum += r[3] or 0
+                        # Unit prices are whole francs (money.py), so the stock value adds up exactly
+                        total_value_sum += line_total(r[3], r[4])
                     # Update summary footer
                     try:
                         # Items count
@@ -8087,7 +9030,7 @@ class CBPMApp:
                         else:
                             total_qty_var.set(str(total_qty_sum))
                         # Value formatting with thousands separators
-                        total_value_var.set(f"{float(total_value_sum):,.0f}")
+                        total_value_var.set(format_amount(total_value_sum))
                     except Exception:
                         pass
                     conn.close()
@@ -8158,6 +9101,7 @@ class CBPMApp:
                                 )
                                 new_id = cur2.lastrowid
                                 conn2.commit(); conn2.close()
+                                self.prices_changed()
                                 # Refresh materials list and select new
                                 try:
                                     conn3 = self.db_manager.create_connection(); c3 = conn3.cursor()
@@ -8231,7 +9175,7 @@ class CBPMApp:
                 except Exception:
                     pass
 
-                # Auto-fill price when a material is selected (prefers existing store price; falls back to standard price)
+                # Auto-fill price when a material is selected (store price, else last sale, else standard price)
                 def _autofill_price(*_):
                     try:
                         sel_store = store_var.get().strip()
@@ -8240,24 +9184,9 @@ class CBPMApp:
                             return
                         sid = int(sel_store.split(' - ')[0])
                         mid = int(sel_mat.split(' - ')[0])
-                        conn4 = self.db_manager.create_connection(); cur4 = conn4.cursor()
-                        # 1) Try current inventory price for this store-material
-                        cur4.execute("SELECT unit_price FROM inventory WHERE store_id=? AND material_id=?", (sid, mid))
-                        r = cur4.fetchone()
-                        if r and r[0] is not None:
-                            try:
-                                price_var.set(str(int(float(r[0]))))
-                            except Exception:
-                                price_var.set(str(r[0]))
-                            conn4.close(); return
-                        # 2) Fallback to standard price from materials catalog
-                        cur4.execute("SELECT standard_price FROM building_materials WHERE id=?", (mid,))
-                        r2 = cur4.fetchone(); conn4.close()
-                        if r2 and r2[0] is not None:
-                            try:
-                                price_var.set(str(int(float(r2[0]))))
-                            except Exception:
-                                price_var.set(str(r2[0]))
+                        price = self.get_price_book().price(sid, mid)
+                        if price is not None:
+                            price_var.set(str(price))
                     except Exception:
                         pass
                 try:
@@ -8295,7 +9224,8 @@ class CBPMApp:
                             messagebox.showwarning("Validation", "Invalid store or material selection.")
                             return
                         qty = safe_float(qty_var.get(), 0.0)
-                        price = safe_float(price_var.get(), 0.0)
+                        from money import parse_amount
+                        price = parse_amount(price_var.get(), 0)
                         reorder = safe_float(reorder_var.get(), 10.0)
                         conn = self.db_manager.create_connection()
                         cur = conn.cursor()
@@ -8336,6 +9266,7 @@ class CBPMApp:
                                             (new_qty, new_price, new_reorder, datetime.now(), inv_id))
                                 conn.commit()
                                 conn.close()
+                                self.prices_changed()
                                 try:
                                     self.log_audit_action(self.current_user['id'], "Increase Inventory", f"Store {sid}, Material {mid}, +{qty}")
                                 except Exception:
@@ -8357,6 +9288,7 @@ class CBPMApp:
                             messagebox.showerror("Duplicate", "This material already exists in the selected store's inventory.")
                             return
                         conn.close()
+                        self.prices_changed()
                         try:
                             self.log_audit_action(self.current_user['id'], "Add Inventory", f"Store {sid}, Material {mid}, Qty {qty}")
                         except Exception:
@@ -8405,7 +9337,8 @@ class CBPMApp:
                             except Exception:
                                 return default
                         qty = safe_float(qty_var.get(), 0.0)
-                        price = safe_float(price_var.get(), 0.0)
+                        from money import parse_amount
+                        price = parse_amount(price_var.get(), 0)
                         reorder = safe_float(reorder_var.get(), 10.0)
                         conn = self.db_manager.create_connection()
                         cur = conn.cursor()
@@ -8431,6 +9364,7 @@ class CBPMApp:
                                     (qty, price, reorder, datetime.now(), item_id))
                         conn.commit()
                         conn.close()
+                        self.prices_changed()
                         self.log_audit_action(self.current_user['id'], "Edit Inventory", f"Item {item_id} updated")
                         dlg.destroy()
                         load_inventory()
@@ -8485,6 +9419,9 @@ class CBPMApp:
                 tk.Button(btns, text="Add Item", bg="#27ae60", fg="white", command=add_item).pack(side='left')
                 tk.Button(btns, text="Edit Item", bg="#2980b9", fg="white", command=edit_item).pack(side='left', padx=5)
                 tk.Button(btns, text="Delete Item", bg="#c0392b", fg="white", command=delete_item).pack(side='left')
+                tk.Button(btns, text="Bulk Import", bg="#16a085", fg="white",
+                          command=lambda: self.show_bulk_import(kind='inventory', store_id=preselected_store_id,
+                                                                on_done=load_inventory)).pack(side='left', padx=5)
             else:
                 tk.Button(btns, text="Transfer to Contractor", bg="#8e44ad", fg="white", command=self.show_transfer_products).pack(side='left')
                 tk.Button(btns, text="Consume", bg="#8e44ad", fg="white", command=lambda: consume_item()).pack(side='left', padx=5)
@@ -8563,10 +9500,11 @@ class CBPMApp:
                                 return
                         except Exception:
                             pass
-                        new_qty = max(0.0, float(curr_qty or 0) - qty)
-                        cur.execute('UPDATE inventory SET quantity=?, last_updated=? WHERE id=?', (new_qty, datetime.now(), item_id))
-                        conn.commit()
                         conn.close()
+                        # Applied as a stock delta through the offline journal (offline_journal.py)
+                        self.db_manager.submit_operation(
+                            'adjustment', {'store_id': store_id, 'material_id': material_id, 'delta': -qty,
+                                           'reason': 'consume', 'note': note}, self.current_user['id'])
                         # Audit log with details
                         details = {
                             'store_id': store_id,
@@ -8786,18 +9724,14 @@ class CBPMApp:
                         return
                     conn = self.db_manager.create_connection()
                     cur = conn.cursor()
-                    cur.execute("""
-                        SELECT bm.id, bm.name, i.unit_price
-                        FROM building_materials bm
-                        LEFT JOIN inventory i ON i.material_id = bm.id AND i.store_id = ?
-                        ORDER BY bm.name
-                    """, (sid,))
+                    cur.execute("SELECT id, name FROM building_materials ORDER BY name")
                     rows = cur.fetchall()
                     conn.close()
+                    prices = self.get_price_book().store(sid)
                     values = []
-                    for mid, name, uprice in rows:
+                    for mid, name in rows:
                         disp = f"{name} (ID:{mid})"
-                        mat_map[disp] = (mid, uprice if uprice is not None else 0)
+                        mat_map[disp] = (mid, prices.get(mid, (0, ''))[0])
                         values.append(disp)
                     material_cb['values'] = values
                     if values:
@@ -9066,7 +10000,7 @@ class CBPMApp:
             # Actions
             actions = tk.Frame(win, bg='white'); actions.pack(fill='x', padx=10, pady=(0,10))
             view_btn = tk.Button(actions, text="View Details")
-            approve_btn = tk.Button(actions, text="Approve", bg="#27ae60", fg="white")
+            approve_btn = tk.Button(actions, text="Approve Selected", bg="#27ae60", fg="white")
             reject_btn = tk.Button(actions, text="Reject", bg="#c0392b", fg="white")
             close_btn = tk.Button(actions, text="Close", command=win.destroy)
             view_btn.pack(side='left'); approve_btn.pack(side='left', padx=6); reject_btn.pack(side='left'); close_btn.pack(side='right')
@@ -9189,78 +10123,56 @@ class CBPMApp:
                 tk.Button(d, text="Close", command=d.destroy).pack(pady=6)
 
             def approve_request():
-                rid = get_selected_id()
-                if not rid: return
-                try:
-                    conn = self.db_manager.create_connection(); cur = conn.cursor()
-                    # Fetch full context including buyer destination store
-                    cur.execute("SELECT store_id, buyer_store_id, material_id, quantity, unit_price, status FROM purchase_requests WHERE id=?", (rid,))
-                    row = cur.fetchone()
-                    if not row:
-                        conn.close(); messagebox.showerror("Approve", "Request not found."); return
-                    store_id, buyer_store_id, material_id, qty, price, st = row
-                    if not _has_perm(store_id):
-                        conn.close(); messagebox.showwarning("Access", "You don't have permission for this store."); return
-                    if st != 'Pending':
-                        conn.close(); messagebox.showinfo("Approve", "Only pending requests can be approved."); return
-                    if not buyer_store_id:
-                        conn.close(); messagebox.showerror("Approve", "Destination store is missing on this request."); return
-                    now = datetime.now().isoformat(sep=' ')
-                    total_amount = float(qty or 0) * float(price or 0)
-                    # Validate sufficient stock at retail source (store_id)
-                    cur.execute("SELECT id, COALESCE(quantity,0) FROM inventory WHERE store_id=? AND material_id=?", (store_id, material_id))
-                    src = cur.fetchone()
-                    if not src or float(src[1]) < float(qty or 0):
-                        conn.close(); messagebox.showerror("Approve", "Insufficient stock at retail store to fulfill this request."); return
-                    src_inv_id, src_qty = src
-                    # Start atomic operation
+                sel = tree.selection()
+                if not sel:
+                    messagebox.showinfo("Orders", "Select a request first."); return
+                rids = []
+                for it in sel:
                     try:
-                        cur.execute("BEGIN IMMEDIATE")
+                        rids.append(int(tree.item(it)['values'][0]))
                     except Exception:
                         pass
-                    # Decrease inventory at retail (source)
-                    new_src_qty = float(src_qty or 0) - float(qty or 0)
-                    cur.execute("UPDATE inventory SET quantity=?, last_updated=? WHERE id=?", (new_src_qty, now, src_inv_id))
-                    # Increase inventory at buyer (destination)
-                    cur.execute("SELECT id, COALESCE(quantity,0) FROM inventory WHERE store_id=? AND material_id=?", (buyer_store_id, material_id))
-                    dst = cur.fetchone()
-                    if dst:
-                        dst_inv_id, dst_qty = dst
-                        new_dst_qty = float(dst_qty or 0) + float(qty or 0)
-                        cur.execute("UPDATE inventory SET quantity=?, unit_price=?, last_updated=? WHERE id=?", (new_dst_qty, float(price or 0), now, dst_inv_id))
-                    else:
-                        cur.execute("INSERT INTO inventory(store_id, material_id, quantity, unit_price, reorder_level, last_updated) VALUES (?,?,?,?,?,?)",
-                                    (buyer_store_id, material_id, float(qty or 0), float(price or 0), 10, now))
-                    # Resolve names for transaction notes
-                    try:
-                        cur.execute("SELECT name FROM stores WHERE id=?", (buyer_store_id,)); buyer_store_name = (cur.fetchone() or ("Buyer Store",))[0]
-                        cur.execute("SELECT name FROM stores WHERE id=?", (store_id,)); retail_store_name = (cur.fetchone() or ("Retail Store",))[0]
-                    except Exception:
-                        buyer_store_name = ""; retail_store_name = ""
-                    # Transactions: Sale at retail (source)
-                    cur.execute(
-                        "INSERT INTO transactions(store_id, customer_name, material_id, quantity, unit_price, total_amount, transaction_type, payment_status, transaction_date, user_id) "
-                        "VALUES (?,?,?,?,?,?,?,?,?,?)",
-                        (store_id, f"{buyer_store_name} (ID:{buyer_store_id})", material_id, float(qty or 0), float(price or 0), total_amount, 'Sale', 'Completed', now, self.current_user['id'])
-                    )
-                    # Transactions: Purchase at buyer (destination)
-                    cur.execute(
-                        "INSERT INTO transactions(store_id, customer_name, material_id, quantity, unit_price, total_amount, transaction_type, payment_status, transaction_date, user_id) "
-                        "VALUES (?,?,?,?,?,?,?,?,?,?)",
-                        (buyer_store_id, f"{retail_store_name} (ID:{store_id})", material_id, float(qty or 0), float(price or 0), total_amount, 'Purchase', 'Completed', now, self.current_user['id'])
-                    )
-                    # Approve request
-                    cur.execute("UPDATE purchase_requests SET status='Approved', approved_by=?, approved_at=? WHERE id=?", (self.current_user['id'], now, rid))
-                    conn.commit(); conn.close()
+                if len(rids) > 1 and not messagebox.askyesno("Approve", f"Approve {len(rids)} selected requests and transfer their stock?"):
+                    return
+                try:
+                    from purchase_orders import approve_purchase_requests, summarize_results
+                    conn = self.db_manager.create_connection()
                     try:
-                        self.log_audit_action(self.current_user['id'], "Approve Purchase Request & Transfer", json.dumps({"request_id": rid, "from_store": store_id, "to_store": buyer_store_id, "material_id": material_id, "qty": qty, "price": price}))
-                    except Exception:
-                        pass
-                    messagebox.showinfo("Approved", "Request approved and inventory transferred to the buyer's store.")
-                    refresh()
+                        # One transaction: validate all requests against stock, then apply every move
+                        results = approve_purchase_requests(conn, rids, self.current_user['id'], is_admin=(role == 'administrator'))
+                    finally:
+                        conn.close()
                 except Exception as e:
                     try: messagebox.showerror("Approve", f"Failed to approve: {str(e)}")
                     except Exception: pass
+                    return
+                ok_count, failed_count = summarize_results(results)
+                if ok_count:
+                    # Approved stock lands in the buyer's store at the request's price
+                    self.prices_changed()
+                if len(results) == 1:
+                    if ok_count:
+                        messagebox.showinfo("Approved", "Request approved and inventory transferred to the buyer's store.")
+                    else:
+                        messagebox.showerror("Approve", results[0]['message'])
+                else:
+                    show_approval_report(results, ok_count, failed_count)
+                if ok_count:
+                    refresh()
+
+            def show_approval_report(results, ok_count, failed_count):
+                d = tk.Toplevel(win); d.title("Approval Results"); d.geometry("640x360"); d.configure(bg='white'); d.transient(win)
+                tk.Label(d, text=f"Approved: {ok_count}    Not approved: {failed_count}", bg='white', font=('Arial', 12, 'bold')).pack(anchor='w', padx=10, pady=(10,4))
+                rf = tk.Frame(d, bg='white'); rf.pack(fill='both', expand=True, padx=10, pady=4)
+                rtree = ttk.Treeview(rf, columns=("Request","Result","Details"), show='headings')
+                rtree.heading("Request", text="Request"); rtree.column("Request", width=80)
+                rtree.heading("Result", text="Result"); rtree.column("Result", width=100)
+                rtree.heading("Details", text="Details"); rtree.column("Details", width=420)
+                rtree.pack(fill='both', expand=True, side='left')
+                rsy = ttk.Scrollbar(rf, orient='vertical', command=rtree.yview); rtree.configure(yscrollcommand=rsy.set); rsy.pack(side='right', fill='y')
+                for r in results:
+                    rtree.insert('', 'end', values=(r['request_id'], "Approved" if r['ok'] else "Skipped", r['message']))
+                tk.Button(d, text="Close", command=d.destroy).pack(pady=6)
 
             def reject_request():
                 rid = get_selected_id()
@@ -9313,6 +10225,7 @@ class CBPMApp:
 #   ================= show sales detail =================
     def show_new_sale(self):
         try:
+            from money import format_amount, line_total, parse_amount
             win = tk.Toplevel(self.root)
             win.title("New Sale")
             win.geometry("700x500")
@@ -9448,7 +10361,7 @@ class CBPMApp:
                     # Load materials: global plus store owner's custom materials
                     cur.execute(
                         """
-                        SELECT bm.id, bm.name, i.unit_price, i.quantity
+                        SELECT bm.id, bm.name, i.quantity
                         FROM building_materials bm
                         LEFT JOIN inventory i ON i.material_id = bm.id AND i.store_id = ?
                         LEFT JOIN stores s ON s.id = ?
@@ -9459,10 +10372,12 @@ class CBPMApp:
                     )
                     rows = cur.fetchall()
                     conn.close()
+                    # Effective prices (store, last sale or catalogue) from the price book
+                    prices = self.get_price_book().store(sid) if sid else {}
                     values = []
-                    for mid, name, uprice, qty in rows:
+                    for mid, name, qty in rows:
                         display = f"{name} (ID:{mid})"
-                        mat_map[display] = (mid, uprice if uprice is not None else 0, qty if qty is not None else 0)
+                        mat_map[display] = (mid, prices.get(mid, (0, ''))[0], qty if qty is not None else 0)
                         values.append(display)
                     material_cb['values'] = values
                     if values:
@@ -9486,21 +10401,9 @@ class CBPMApp:
 
             def update_total(*_):
                 try:
-                    def safe_float(s, default=0.0):
-                        try:
-                            if s is None:
-                                return default
-                            s = str(s).strip()
-                            if s == "":
-                                return default
-                            s = s.replace(",", "").replace("$", "").replace("₦", "").replace("£", "").replace("€", "").strip()
-                            return float(s)
-                        except Exception:
-                            return default
-                    q = safe_float(qty_var.get(), 0.0)
-                    p = safe_float(price_var.get(), 0.0)
-                    total = max(0, q * p)
-                    total_var.set(f"{total:,.0f}")
+                    q = float(str(qty_var.get()).replace(",", ".").strip() or 0)
+                    p = parse_amount(price_var.get(), 0)
+                    total_var.set(format_amount(max(0, line_total(q, p))))
                 except Exception:
                     total_var.set("0")
 
@@ -9552,7 +10455,7 @@ class CBPMApp:
                     if qty is None or qty <= 0:
                         messagebox.showwarning("Validation", "Quantity must be a positive number.")
                         return
-                    price = safe_float(price_var.get(), None)
+                    price = parse_amount(price_var.get())
                     if price is None or price < 0:
                         messagebox.showwarning("Validation", "Unit price must be a non-negative number.")
                         return
@@ -9562,40 +10465,22 @@ class CBPMApp:
                         if not messagebox.askyesno("Low Stock", f"Only {stock_qty} in stock. Proceed anyway?"):
                             return
 
-                    total_amount = qty * price
-
-                    conn = self.db_manager.create_connection()
-                    cur = conn.cursor()
-
-                    # Re-check current stock and price from DB to be safe
-                    cur.execute("SELECT quantity, unit_price FROM inventory WHERE store_id=? AND material_id=?", (sid, mid))
-                    inv = cur.fetchone()
-                    current_qty = inv[0] if inv else 0
-                    # Insert transaction
-                    cur.execute(
-                        """
-                        INSERT INTO transactions (store_id, material_id, quantity, unit_price, total_amount, transaction_type, transaction_date, user_id, customer_name)
-                        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-                        """,
-                        (sid, mid, qty, price, total_amount, 'sale', datetime.now().isoformat(sep=' '), self.current_user['id'], customer_var.get().strip())
-                    )
-
-                    # Update inventory (if record exists)
-                    if inv:
-                        new_qty = max(0, current_qty - qty)
-                        cur.execute(
-                            "UPDATE inventory SET quantity=?, last_updated=? WHERE store_id=? AND material_id=?",
-                            (new_qty, datetime.now().isoformat(sep=' '), sid, mid)
-                        )
-                    conn.commit()
-                    conn.close()
+                    # Journaled first so the sale survives a lost connection (offline_journal.py)
+                    outcome = self.db_manager.submit_operation(
+                        'sale', {'store_id': sid, 'material_id': mid, 'quantity': qty, 'unit_price': price,
+                                 'customer_name': customer_var.get().strip()}, self.current_user['id'])
+                    total_amount = outcome['result'] if outcome['result'] is not None else line_total(qty, price)
 
                     try:
                         self.log_audit_action(self.current_user['id'], "New Sale", f"Store {sid}, Material {mid}, Qty {qty}, Total {total_amount}")
                     except Exception:
                         pass
 
-                    messagebox.showinfo("Success", "Sale recorded successfully.")
+                    if outcome['status'] == 'queued':
+                        messagebox.showinfo("Saved Offline", "The server is unreachable. The sale was saved on this "
+                                                             "terminal and will be sent automatically.")
+                    else:
+                        messagebox.showinfo("Success", "Sale recorded successfully.")
                     win.destroy()
                 except Exception as e:
                     try:
@@ -10188,6 +11073,8 @@ class CBPMApp:
             header = tk.Frame(win, bg='white')
             header.pack(fill='x', padx=10, pady=10)
             tk.Label(header, text="Store Analytics", font=('Arial', 16, 'bold'), bg='white').pack(side='left')
+            # Aggregates read the reporting snapshot so they never compete with the tills
+            update_freshness = self._add_snapshot_indicator(header, on_updated=lambda: refresh())
 
             # Filters
             filter_frame = tk.LabelFrame(win, text="Filters", bg='white')
@@ -10257,11 +11144,25 @@ class CBPMApp:
             notebook.add(tab_material, text='Sales by Material')
             notebook.add(tab_tx, text='Transactions')
             tab_charts = None
-            canvas_store = None
-            canvas_mat = None
+            charts_ui = {}
             if HAS_MATPLOTLIB:
                 tab_charts = tk.Frame(notebook, bg='white')
                 notebook.add(tab_charts, text='Charts')
+                # One figure/canvas per chart for the window's lifetime; refresh updates them in place
+                try:
+                    from charts import ReusableBarChart, ReusableLineChart
+                    top_row = tk.Frame(tab_charts, bg='white'); top_row.pack(fill='both', expand=True)
+                    charts_ui['store'] = ReusableBarChart(top_row, 'Top Stores by Sales', color="#3498db").pack(
+                        side='left', fill='both', expand=True, padx=10, pady=10)
+                    charts_ui['material'] = ReusableBarChart(top_row, 'Top Materials by Sales', color="#2ecc71").pack(
+                        side='left', fill='both', expand=True, padx=10, pady=10)
+                    charts_ui['trend'] = ReusableLineChart(tab_charts, 'Daily Sales', figsize=(10, 2.6)).pack(
+                        side='top', fill='both', expand=True, padx=10, pady=(0, 10))
+                except Exception:
+                    charts_ui = {}
+            from charts import BackgroundTask, downsample_labeled
+            loader = BackgroundTask(win)
+            win.bind('<Destroy>', lambda e: loader.close() if e.widget is win else None, add='+')
 
             # Trees
             store_cols = ("Store","Transactions","Total Sales")
@@ -10340,180 +11241,82 @@ class CBPMApp:
                 except Exception:
                     return False
 
-            def refresh():
-                # Validate dates
-                s = start_var.get().strip()
-                e = end_var.get().strip()
-                if not (validate_date(s) and validate_date(e)):
-                    try:
-                        messagebox.showerror("Validation", "Dates must be in YYYY-MM-DD format")
-                    except Exception:
-                        pass
-                    return
-                sid = store_map.get(store_var.get())
-
-                # Build where clause
-                where = "WHERE date(t.transaction_date) BETWEEN ? AND ?"
-                params = [s, e]
-                if sid:
-                    where += " AND t.store_id = ?"
-                    params.append(sid)
-
-                # Summary metrics
+            def load_analytics(s, e, sid):
+                """Run all analytics aggregates; executed on a worker thread with its own connection."""
+                from queries import store_analytics
+                conn = self._report_connection()
                 try:
-                    conn = self.db_manager.create_connection()
-                    cur = conn.cursor()
-                    # Total sales and transactions
-                    cur.execute(
-                        f"SELECT COALESCE(SUM(t.total_amount),0), COUNT(*) FROM transactions t {where}",
-                        params
-                    )
-                    total_sales, tx_count = cur.fetchone()
-                    totals_var.set(f"{float(total_sales):,.0f}")
-                    tx_var.set(str(tx_count))
-                    avg_var.set(f"{(float(total_sales)/tx_count):,.0f}" if tx_count else "0")
-
-                    # Top material by sales amount
-                    cur.execute(
-                        f"""
-                        SELECT bm.name, COALESCE(SUM(t.total_amount),0) AS total
-                        FROM transactions t
-                        JOIN building_materials bm ON bm.id = t.material_id
-                        {where}
-                        GROUP BY bm.id
-                        ORDER BY total DESC
-                        LIMIT 1
-                        """,
-                        params
-                    )
-                    r = cur.fetchone()
-                    top_mat_var.set(r[0] if r else '-')
-
-                    # Low stock count (ignores date range, inventory is current)
-                    cur.execute("SELECT COUNT(*) FROM inventory WHERE quantity <= reorder_level")
-                    low_stock_var.set(str(cur.fetchone()[0]))
-
-                    # Aggregation by store
-                    cur.execute(
-                        f"""
-                        SELECT s.name, COUNT(*) AS tx, COALESCE(SUM(t.total_amount),0) AS total
-                        FROM transactions t
-                        JOIN stores s ON s.id = t.store_id
-                        {where}
-                        GROUP BY s.id
-                        ORDER BY total DESC
-                        """,
-                        params
-                    )
-                    rows_store = cur.fetchall()
-
-                    # Aggregation by material
-                    cur.execute(
-                        f"""
-                        SELECT bm.name, COALESCE(SUM(t.quantity),0) AS qty, COALESCE(SUM(t.total_amount),0) AS total
-                        FROM transactions t
-                        JOIN building_materials bm ON bm.id = t.material_id
-                        {where}
-                        GROUP BY bm.id
-                        ORDER BY total DESC
-                        """,
-                        params
-                    )
-                    rows_mat = cur.fetchall()
-
-                    # Transaction details
-                    cur.execute(
-                        f"""
-                        SELECT t.transaction_date, s.name, COALESCE(t.customer_name,''), bm.name, t.quantity, t.unit_price, t.total_amount
-                        FROM transactions t
-                        JOIN stores s ON s.id = t.store_id
-                        JOIN building_materials bm ON bm.id = t.material_id
-                        {where}
-                        ORDER BY t.transaction_date DESC
-                        """,
-                        params
-                    )
-                    rows_tx = cur.fetchall()
-
+                    data = store_analytics(conn.cursor(), s, e, sid)
+                finally:
                     conn.close()
-                except Exception as e2:
-                    rows_store, rows_mat, rows_tx = [], [], []
-                    try:
-                        messagebox.showerror("Error", f"Failed to load analytics: {str(e2)}")
-                    except Exception:
-                        pass
+                rows_daily = data.pop('rows_daily')
+                data['trend'] = None
+                if charts_ui:
+                    # Downsample off the UI thread so long ranges plot a bounded number of points
+                    data['trend'] = downsample_labeled([r[0] for r in rows_daily], [r[1] for r in rows_daily])
+                return data
+
+            def on_load_error(e2):
+                refresh_btn.config(state='normal')
+                try:
+                    messagebox.showerror("Error", f"Failed to load analytics: {str(e2)}")
+                except Exception:
+                    pass
+
+            def apply_analytics(data):
+                from money import format_rows, formatter
+                refresh_btn.config(state='normal')
+                update_freshness()
+                total_sales, tx_count = data['total_sales'], data['tx_count']
+                rows_store, rows_mat, rows_tx = data['rows_store'], data['rows_mat'], data['rows_tx']
+                fmt = formatter()
+                totals_var.set(fmt(total_sales))
+                tx_var.set(str(tx_count))
+                avg_var.set(fmt(total_sales / tx_count) if tx_count else "0")
+                top_mat_var.set(rows_mat[0][0] if rows_mat else '-')
+                low_stock_var.set(str(data['low_stock']))
 
                 # Update trees
                 for t in store_tree.get_children():
                     store_tree.delete(t)
                 for name, txc, total in rows_store:
-                    try:
-                        total_fmt = f"{float(total):,.0f}"
-                    except Exception:
-                        total_fmt = str(total)
-                    store_tree.insert('', 'end', values=(name, txc, total_fmt))
+                    store_tree.insert('', 'end', values=(name, txc, fmt(total)))
 
                 for t in mat_tree.get_children():
                     mat_tree.delete(t)
-                for name, qty, total in rows_mat:
-                    try:
-                        total_fmt = f"{float(total):,.0f}"
-                    except Exception:
-                        total_fmt = str(total)
-                    try:
-                        qty_fmt = int(qty)
-                    except Exception:
-                        qty_fmt = qty
-                    mat_tree.insert('', 'end', values=(name, qty_fmt, total_fmt))
+                for vals in format_rows(rows_mat, money_columns=(2,), whole_columns=(1,)):
+                    mat_tree.insert('', 'end', values=vals)
 
                 for t in tx_tree.get_children():
                     tx_tree.delete(t)
-                for r in rows_tx:
-                    vals = list(r)
-                    try:
-                        vals[4] = int(vals[4]) if vals[4] is not None else ''
-                    except Exception:
-                        pass
-                    try:
-                        vals[5] = f"{float(vals[5]):,.0f}" if vals[5] is not None else ''
-                    except Exception:
-                        pass
-                    try:
-                        vals[6] = f"{float(vals[6]):,.0f}" if vals[6] is not None else ''
-                    except Exception:
-                        pass
+                for vals in format_rows(rows_tx, money_columns=(5, 6), whole_columns=(4,)):
                     tx_tree.insert('', 'end', values=vals)
 
-                # Charts
-                if HAS_MATPLOTLIB and tab_charts is not None:
-                    for w in tab_charts.winfo_children():
-                        w.destroy()
-                    # Sales by store chart
+                # Charts: update the existing artists in place
+                if charts_ui:
                     try:
-                        fig1 = plt.Figure(figsize=(5,3), dpi=100)
-                        ax1 = fig1.add_subplot(111)
-                        names = [r[0] for r in rows_store][:10]
-                        totals = [r[2] for r in rows_store][:10]
-                        ax1.bar(names, totals, color="#3498db")
-                        ax1.set_title('Top Stores by Sales')
-                        ax1.tick_params(axis='x', rotation=45)
-                        canvas_store = FigureCanvasTkAgg(fig1, master=tab_charts)
-                        canvas_store.get_tk_widget().pack(side='top', fill='both', expand=False, padx=10, pady=10)
+                        charts_ui['store'].update([r[0] for r in rows_store], [r[2] for r in rows_store])
+                        charts_ui['material'].update([r[0] for r in rows_mat], [r[2] for r in rows_mat])
+                        positions, labels, values = data['trend']
+                        charts_ui['trend'].update(labels, values, positions=positions)
                     except Exception:
                         pass
-                    # Sales by material chart
+
+            def refresh():
+                # Validate dates
+                s = start_var.get().strip()
+                e = end_var.get().strip()
+                if not (validate_date(s) and validate_date(e)):
                     try:
-                        fig2 = plt.Figure(figsize=(5,3), dpi=100)
-                        ax2 = fig2.add_subplot(111)
-                        names2 = [r[0] for r in rows_mat][:10]
-                        totals2 = [r[2] for r in rows_mat][:10]
-                        ax2.bar(names2, totals2, color="#2ecc71")
-                        ax2.set_title('Top Materials by Sales')
-                        ax2.tick_params(axis='x', rotation=45)
-                        canvas_mat = FigureCanvasTkAgg(fig2, master=tab_charts)
-                        canvas_mat.get_tk_widget().pack(side='top', fill='both', expand=False, padx=10, pady=10)
+                        messagebox.showerror("Validation", "Dates must be in YYYY-MM-DD format")
                     except Exception:
                         pass
+                    return
+                sid = store_map.get(store_var.get())
+
+                # Aggregates run off the UI thread; results are applied when ready
+                refresh_btn.config(state='disabled')
+                loader.submit(lambda: load_analytics(s, e, sid), apply_analytics, on_load_error)
 
                 # Audit
                 try:
@@ -10596,6 +11399,7 @@ class CBPMApp:
             header = tk.Frame(win, bg='white')
             header.pack(fill='x', padx=10, pady=10)
             tk.Label(header, text="Financial Reports", font=('Arial', 16, 'bold'), bg='white').pack(side='left')
+            update_freshness = self._add_snapshot_indicator(header, on_updated=lambda: refresh())
 
             # Filters
             filt = tk.LabelFrame(win, text="Filters", bg='white')
@@ -10722,101 +11526,31 @@ class CBPMApp:
                         pass
                     return
                 sid = store_map.get(store_var.get())
-
-                where = "WHERE date(t.timestamp) BETWEEN ? AND ?"
-                params = [s, e]
-                if sid:
-                    where += " AND t.store_id = ?"
-                    params.append(sid)
+                from money import format_rows, formatter
+                fmt = formatter()
 
                 try:
-                    conn = self.db_manager.create_connection()
-                    cur = conn.cursor()
-                    # Revenue & tx count
-                    cur.execute(f"SELECT COALESCE(SUM(t.total_amount),0), COUNT(*) FROM transactions t {where}", params)
-                    total_rev, txc = cur.fetchone()
-                    revenue_var.set(f"{float(total_rev):,.0f}")
+                    from queries import financial_report
+                    conn = self._report_connection()
+                    report = financial_report(conn.cursor(), s, e, sid)
+                    conn.close()
+                    update_freshness()
+                    total_rev, txc = report['total_revenue'], report['tx_count']
+                    rows_store, rows_mat, rows_tx = report['rows_store'], report['rows_mat'], report['rows_tx']
+                    revenue_var.set(fmt(total_rev))
                     tx_var.set(str(txc))
-                    avg_ticket_var.set(f"{(float(total_rev)/txc):,.0f}" if txc else "0")
-
-                    # Top store
-                    cur.execute(
-                        f"""
-                        SELECT s.name, COALESCE(SUM(t.total_amount),0) AS total
-                        FROM transactions t
-                        JOIN stores s ON s.id = t.store_id
-                        {where}
-                        GROUP BY s.id
-                        ORDER BY total DESC
-                        LIMIT 1
-                        """, params
-                    )
-                    r = cur.fetchone()
-                    top_store_var.set(r[0] if r else '-')
-
-                    # Top material
-                    cur.execute(
-                        f"""
-                        SELECT bm.name, COALESCE(SUM(t.total_amount),0) AS total
-                        FROM transactions t
-                        JOIN building_materials bm ON bm.id = t.material_id
-                        {where}
-                        GROUP BY bm.id
-                        ORDER BY total DESC
-                        LIMIT 1
-                        """, params
-                    )
-                    r2 = cur.fetchone()
-                    top_material_var.set(r2[0] if r2 else '-')
+                    avg_ticket_var.set(fmt(total_rev / txc) if txc else "0")
+                    top_store_var.set(report['top_store'] or '-')
+                    top_material_var.set(report['top_material'] or '-')
 
                     # P&L text (simplified)
                     pnl_text.delete('1.0', 'end')
                     pnl_text.insert('end', f"Period: {s} to {e}\n")
-                    pnl_text.insert('end', f"Revenue: {float(total_rev):,.0f} FCFA\n")
+                    pnl_text.insert('end', f"Revenue: {fmt(total_rev)} FCFA\n")
                     pnl_text.insert('end', f"Transactions: {txc}\n")
                     if txc:
-                        pnl_text.insert('end', f"Average Ticket: {(float(total_rev)/txc):,.0f} FCFA\n")
+                        pnl_text.insert('end', f"Average Ticket: {fmt(total_rev / txc)} FCFA\n")
                     pnl_text.insert('end', "Note: COGS and Expenses tracking not available; showing revenue only.\n")
-
-                    # Store aggregation
-                    cur.execute(
-                        f"""
-                        SELECT s.name, COUNT(*) AS tx, COALESCE(SUM(t.total_amount),0) AS total
-                        FROM transactions t
-                        JOIN stores s ON s.id = t.store_id
-                        {where}
-                        GROUP BY s.id
-                        ORDER BY total DESC
-                        """, params
-                    )
-                    rows_store = cur.fetchall()
-
-                    # Material aggregation
-                    cur.execute(
-                        f"""
-                        SELECT bm.name, COALESCE(SUM(t.quantity),0) AS qty, COALESCE(SUM(t.total_amount),0) AS total
-                        FROM transactions t
-                        JOIN building_materials bm ON bm.id = t.material_id
-                        {where}
-                        GROUP BY bm.id
-                        ORDER BY total DESC
-                        """, params
-                    )
-                    rows_mat = cur.fetchall()
-
-                    # Transactions
-                    cur.execute(
-                        f"""
-                        SELECT t.timestamp, s.name, COALESCE(t.customer_name,''), bm.name, t.quantity, t.unit_price, t.total_amount
-                        FROM transactions t
-                        JOIN stores s ON s.id = t.store_id
-                        JOIN building_materials bm ON bm.id = t.material_id
-                        {where}
-                        ORDER BY t.timestamp DESC
-                        """, params
-                    )
-                    rows_tx = cur.fetchall()
-                    conn.close()
                 except Exception as e2:
                     rows_store, rows_mat, rows_tx = [], [], []
                     try:
@@ -10828,41 +11562,16 @@ class CBPMApp:
                 for titem in store_tree.get_children():
                     store_tree.delete(titem)
                 for name, txc2, total in rows_store:
-                    try:
-                        total_fmt = f"{float(total):,.0f}"
-                    except Exception:
-                        total_fmt = str(total)
-                    store_tree.insert('', 'end', values=(name, txc2, total_fmt))
+                    store_tree.insert('', 'end', values=(name, txc2, fmt(total)))
 
                 for titem in mat_tree.get_children():
                     mat_tree.delete(titem)
-                for name, qty, total in rows_mat:
-                    try:
-                        total_fmt = f"{float(total):,.0f}"
-                    except Exception:
-                        total_fmt = str(total)
-                    try:
-                        qty_fmt = int(qty)
-                    except Exception:
-                        qty_fmt = qty
-                    mat_tree.insert('', 'end', values=(name, qty_fmt, total_fmt))
+                for vals in format_rows(rows_mat, money_columns=(2,), whole_columns=(1,)):
+                    mat_tree.insert('', 'end', values=vals)
 
                 for titem in tx_tree.get_children():
                     tx_tree.delete(titem)
-                for r in rows_tx:
-                    vals = list(r)
-                    try:
-                        vals[4] = int(vals[4]) if vals[4] is not None else ''
-                    except Exception:
-                        pass
-                    try:
-                        vals[5] = f"{float(vals[5]):,.0f}" if vals[5] is not None else ''
-                    except Exception:
-                        pass
-                    try:
-                        vals[6] = f"{float(vals[6]):,.0f}" if vals[6] is not None else ''
-                    except Exception:
-                        pass
+                for vals in format_rows(rows_tx, money_columns=(5, 6), whole_columns=(4,)):
                     tx_tree.insert('', 'end', values=vals)
 
                 # Audit
@@ -10998,14 +11707,15 @@ class CBPMApp:
             frame = tk.Frame(win, bg='white'); frame.pack(fill='both', expand=True, padx=10, pady=10)
             sy = ttk.Scrollbar(frame); sy.pack(side='right', fill='y')
             sx = ttk.Scrollbar(frame, orient='horizontal'); sx.pack(side='bottom', fill='x')
-            cols = ("ID","Title","Contractor","Kind","Materials","Budget","Start Date","End Date","Status")
+            cols = ("ID","Title","Contractor","Kind","Materials","Budget","Paid","Outstanding","Start Date","End Date","Status")
             tree = ttk.Treeview(frame, columns=cols, show='headings', yscrollcommand=sy.set, xscrollcommand=sx.set)
             tree.pack(fill='both', expand=True)
             sy.config(command=tree.yview); sx.config(command=tree.xview)
             config = [
-                ("ID",60,'center'), ("Title",240,'w'), ("Contractor",160,'w'),
-                ("Kind",150,'center'), ("Materials",100,'center'),
-                ("Budget",110,'e'), ("Start Date",110,'center'), ("End Date",110,'center'), ("Status",110,'center')
+                ("ID",60,'center'), ("Title",220,'w'), ("Contractor",150,'w'),
+                ("Kind",130,'center'), ("Materials",80,'center'),
+                ("Budget",110,'e'), ("Paid",110,'e'), ("Outstanding",110,'e'),
+                ("Start Date",100,'center'), ("End Date",100,'center'), ("Status",100,'center')
             ]
             for c,w,a in config:
                 tree.heading(c, text=c); tree.column(c, width=w, anchor=a)
@@ -11128,6 +11838,8 @@ class CBPMApp:
                         try:
                             cur2 = conn.cursor()
                             cur2.execute('UPDATE contracts SET title=?, description=?, budget=?, start_date=?, end_date=?, status=? WHERE id=? AND contract_owner_id=?', (t, dsc, b, sdv, edv, stv, cid, self.current_user['id']))
+                            from contract_balances import refresh_balances
+                            refresh_balances(cur2, [cid])
                             conn.commit()
                             try:
                                 self.log_audit_action(self.current_user['id'], 'Edit Contract', f'Contract {cid} updated')
@@ -11214,35 +11926,48 @@ class CBPMApp:
 
             def print_contract_pdf():
                 try:
-                    cid = get_selected_contract_id()
-                    if not cid:
+                    sel = tree.selection()
+                    if not sel:
+                        messagebox.showwarning('Select', 'Please select one or more contracts first.')
                         return
-                    # Load contract details with access check
+                    ids = []
+                    for it in sel:
+                        try:
+                            ids.append(int(tree.item(it)['values'][0]))
+                        except Exception:
+                            pass
+                    if not ids:
+                        return
+                    # Load contract details with access check (one query for the whole batch)
                     conn = self.db_manager.create_connection(); cur = conn.cursor()
+                    marks = ','.join('?' * len(ids))
                     cur.execute(
-                        '''
+                        f'''
                         SELECT c.id, c.title, c.description,
                                COALESCE(c.contract_kind,'Labour Only') AS contract_kind,
                                COALESCE(c.includes_materials,0) AS includes_materials,
                                c.budget, c.start_date, c.end_date, c.status, c.created_date,
                                owner.full_name AS owner_name,
-                               COALESCE(con.full_name, 'Not Assigned') AS contractor_name
+                               COALESCE(con.full_name, 'Not Assigned') AS contractor_name,
+                               c.digital_signature_owner, c.digital_signature_contractor
                         FROM contracts c
                         JOIN users owner ON c.contract_owner_id = owner.id
                         LEFT JOIN users con ON c.contractor_id = con.id
-                        WHERE c.id = ? AND c.contract_owner_id = ?
-                        ''', (cid, self.current_user['id'])
+                        WHERE c.id IN ({marks}) AND c.contract_owner_id = ?
+                        ORDER BY c.id
+                        ''', (*ids, self.current_user['id'])
                     )
-                    row = cur.fetchone(); conn.close()
-                    if not row:
+                    rows = cur.fetchall(); conn.close()
+                    if not rows:
                         messagebox.showerror('Error', 'Contract not found or access denied.')
                         return
-                    # Ask for destination file
+                    # Ask for destination file (one combined PDF for a multi-selection)
+                    initial = f'contract_{rows[0][0]}.pdf' if len(rows) == 1 else f'contracts_{datetime.now():%Y%m}.pdf'
                     filename = filedialog.asksaveasfilename(
                         defaultextension='.pdf',
                         filetypes=[('PDF files','*.pdf'), ('All files','*.*')],
-                        title='Save Contract as PDF',
-                        initialfile=f'contract_{cid}.pdf'
+                        title='Save Contract as PDF' if len(rows) == 1 else f'Save {len(rows)} Contracts as PDF',
+                        initialfile=initial
                     )
                     if not filename:
                         return
@@ -11252,99 +11977,34 @@ class CBPMApp:
                     except Exception as vex:
                         messagebox.showerror('Security', f'Invalid file path: {vex}')
                         return
-                    # Lazy import ReportLab
-                    try:
-                        from reportlab.lib.pagesizes import A4
-                        from reportlab.pdfgen import canvas
-                        from reportlab.lib.units import cm
-                        from reportlab.lib.utils import simpleSplit
-                    except Exception:
-                        messagebox.showerror('Missing Library', 'ReportLab is required to print PDF. Please install it with:\n\npip install reportlab')
-                        return
-                    # Unpack
-                    (cid2, title, description, kind, inc, budget, sd, ed, status, created, owner_name, contractor_name) = row
-                    c = canvas.Canvas(filename, pagesize=A4)
-                    width, height = A4
-                    left = 2.0*cm
-                    top = height - 2.0*cm
-                    # Header
-                    c.setFont('Helvetica-Bold', 16)
-                    c.drawString(left, top, 'Building Project Contract')
-                    c.setFont('Helvetica', 10)
-                    c.drawString(left, top-14, f'Contract ID: {cid2}')
-                    c.drawString(left, top-28, f'Title: {title}')
-                    c.drawString(left, top-42, f'Status: {status}')
-                    c.drawString(left, top-56, f'Created: {str(created)}')
-                    c.line(left, top-64, width-2.0*cm, top-64)
-                    # Parties and info
-                    y = top-80
-                    c.setFont('Helvetica-Bold', 12); c.drawString(left, y, 'Parties'); y -= 14
-                    c.setFont('Helvetica', 10)
-                    c.drawString(left, y, f'Owner: {owner_name}'); y -= 14
-                    c.drawString(left, y, f'Contractor: {contractor_name}'); y -= 20
-                    c.setFont('Helvetica-Bold', 12); c.drawString(left, y, 'Project'); y -= 14
-                    c.setFont('Helvetica', 10)
-                    c.drawString(left, y, f'Contract Kind: {kind or "Labour Only"}'); y -= 14
-                    c.drawString(left, y, f'Includes Materials: {"Yes" if (inc==1 or inc==True) else "No"}'); y -= 14
-                    c.drawString(left, y, f'Budget: {"{:,.0f}".format(budget) if budget is not None else "N/A"} FCFA'); y -= 14
-                    c.drawString(left, y, f'Start Date: {sd or "N/A"}'); y -= 14
-                    c.drawString(left, y, f'End Date: {ed or "N/A"}'); y -= 20
-                    # Description (wrapped)
-                    c.setFont('Helvetica-Bold', 12); c.drawString(left, y, 'Description'); y -= 14
-                    c.setFont('Helvetica', 10)
-                    maxw = width - 4.0*cm
-                    text = description or ''
-                    lines = simpleSplit(text, 'Helvetica', 10, maxw)
-                    for line in lines:
-                        if y < 2.5*cm:
-                            c.showPage()
-                            y = height - 2.0*cm
-                            c.setFont('Helvetica', 10)
-                        c.drawString(left, y, line); y -= 12
-                    # Signatures footer
-                    # Fetch and show digital signatures (names and dates) at the bottom
-                    try:
-                        conn2 = self.db_manager.create_connection(); cur2 = conn2.cursor()
-                        cur2.execute('SELECT digital_signature_owner, digital_signature_contractor FROM contracts WHERE id=?', (cid2,))
-                        sigrow = cur2.fetchone(); conn2.close()
-                    except Exception:
-                        sigrow = None
-                    owner_sig_line = 'Owner: Not signed'
-                    cont_sig_line = 'Contractor: Not signed'
-                    if sigrow:
+                    printed_at = datetime.now().strftime('%Y-%m-%d %H:%M')
+                    contracts = []
+                    for (cid2, title, description, kind, inc, budget, sd, ed, status, created,
+                         owner_name, contractor_name, own_enc, con_enc) in rows:
+                        owner_sig_line, cont_sig_line = self._contract_signature_lines(own_enc, con_enc)
+                        contracts.append({
+                            'id': cid2, 'title': title, 'description': description,
+                            'contract_kind': kind, 'includes_materials': inc, 'budget': budget,
+                            'start_date': sd, 'end_date': ed, 'status': status, 'created_date': str(created or ''),
+                            'owner_name': owner_name, 'contractor_name': contractor_name,
+                            'owner_signature_line': owner_sig_line, 'contractor_signature_line': cont_sig_line,
+                            'printed_at': printed_at,
+                        })
+                    printed_ids = ', '.join(str(c['id']) for c in contracts)
+
+                    def on_ready(result):
+                        if not result.get('ok'):
+                            title_ = 'Missing Library' if result.get('error') == 'missing_reportlab' else 'Error'
+                            messagebox.showerror(title_, result.get('message') or 'Failed to print contract.')
+                            return
                         try:
-                            own_enc, con_enc = sigrow
-                            if own_enc:
-                                try:
-                                    info = json.loads(self.security_manager.decrypt_data(own_enc))
-                                    owner_sig_line = f"Owner: {info.get('signer_name','')} on {info.get('timestamp','')}"
-                                except Exception:
-                                    owner_sig_line = 'Owner: Signed'
-                            if con_enc:
-                                try:
-                                    info2 = json.loads(self.security_manager.decrypt_data(con_enc))
-                                    cont_sig_line = f"Contractor: {info2.get('signer_name','')} on {info2.get('timestamp','')}"
-                                except Exception:
-                                    cont_sig_line = 'Contractor: Signed'
+                            self.log_audit_action(self.current_user['id'], 'Print Contract PDF', f'Contract {printed_ids} -> {filename}')
                         except Exception:
                             pass
-                    # Ensure space
-                    if y < 3.0*cm:
-                        c.showPage(); y = height - 2.0*cm
-                    c.setFont('Helvetica-Bold', 12)
-                    c.drawString(left, 3.2*cm, 'Digital Signatures')
-                    c.setFont('Helvetica', 10)
-                    c.drawString(left, 2.6*cm, owner_sig_line)
-                    c.drawString(left, 2.2*cm, cont_sig_line)
-                    # Footer note
-                    c.setFont('Helvetica-Oblique', 9)
-                    c.drawString(left, 1.6*cm, 'Generated by Cameroon Building Project Management System')
-                    c.save()
-                    try:
-                        self.log_audit_action(self.current_user['id'], 'Print Contract PDF', f'Contract {cid2} -> {filename}')
-                    except Exception:
-                        pass
-                    messagebox.showinfo('Success', f'Contract PDF saved to:\n{filename}')
+                        messagebox.showinfo('Success', f"{result.get('documents', 1)} contract(s) saved to:\n{filename}")
+
+                    # Layout happens in the background renderer; the window stays usable meanwhile
+                    self.get_render_service().submit_contracts(contracts, filename, on_done=on_ready)
                 except Exception as e:
                     try:
                         messagebox.showerror('Error', f'Failed to print contract: {e}')
@@ -11366,6 +12026,7 @@ class CBPMApp:
                         return
                     budget = float(row[0] or 0.0)
                     conn.close()
+                    from contract_balances import refresh_balances
 
                     pay_win = tk.Toplevel(win)
                     pay_win.title(f"Contract Payments - #{cid}")
@@ -11382,6 +12043,8 @@ class CBPMApp:
                     lbl_budget.pack(side='left', padx=12)
                     lbl_paid = tk.Label(inner, text=f"Paid: 0", bg='#ecf0f1', font=('Arial', 10, 'bold'), fg='#27ae60')
                     lbl_paid.pack(side='left', padx=12)
+                    lbl_pending = tk.Label(inner, text=f"Pending: 0", bg='#ecf0f1', font=('Arial', 10, 'bold'), fg='#f39c12')
+                    lbl_pending.pack(side='left', padx=12)
                     lbl_balance = tk.Label(inner, text=f"Balance: 0", bg='#ecf0f1', font=('Arial', 10, 'bold'), fg='#c0392b')
                     lbl_balance.pack(side='left', padx=12)
 
@@ -11431,9 +12094,11 @@ class CBPMApp:
                             for r in rows:
                                 amt = float(r[1] or 0.0)
                                 p_tree.insert('', 'end', values=(r[0], f"{amt:,.0f}", r[2] or '', r[3] or '', r[4] or '', r[5] or '', r[6] or '', r[7] or '', r[8] or '', r[9] or ''))
-                            cur.execute("SELECT COALESCE(SUM(amount),0) FROM contract_payments WHERE contract_id=? AND status='Confirmed'", (cid,))
-                            paid = float(cur.fetchone()[0] or 0.0)
+                            cur.execute("SELECT paid, pending FROM contract_balances WHERE contract_id=?", (cid,))
+                            bal_row = cur.fetchone() or (0.0, 0.0)
+                            paid = float(bal_row[0] or 0.0)
                             lbl_paid.config(text=f"Paid: {paid:,.0f}")
+                            lbl_pending.config(text=f"Pending: {float(bal_row[1] or 0.0):,.0f}")
                             bal = (budget or 0.0) - paid
                             lbl_balance.config(text=f"Balance: {bal:,.0f}")
                             conn.close()
@@ -11476,12 +12141,9 @@ class CBPMApp:
                         method_var.trace('w', _update_method_fields); _update_method_fields()
 
                         def save_payment():
-                            try:
-                                try:
-                                    amount = float(amt_var.get().replace(',', '').strip())
-                                except Exception:
-                                    amount = float(amt_var.get().strip())
-                            except Exception:
+                            from money import parse_amount
+                            amount = parse_amount(amt_var.get())
+                            if amount is None:
                                 messagebox.showwarning('Invalid', 'Enter a valid amount.'); return
                             if amount <= 0:
                                 messagebox.showwarning('Invalid', 'Amount must be greater than zero.'); return
@@ -11512,7 +12174,11 @@ class CBPMApp:
                                     'INSERT INTO contract_payments(contract_id, amount, method, reference, status, requested_by, notes, payer_account, method_account) VALUES (?,?,?,?,"Pending",?,?,?,?)',
                                     (cid, amount, m or None, ref_val, self.current_user['id'], notes_txt.get('1.0','end').strip() or None, payer_acct or None, method_acct or None)
                                 )
+                                from notifications import payment_pending, wake
+                                payment_pending(cur, 'contract', cur.lastrowid)
+                                refresh_balances(cur, [cid])
                                 conn.commit(); conn.close()
+                                wake()
                                 try:
                                     self.log_audit_action(self.current_user['id'], 'Add Contract Payment', f'Contract {cid}, amount {amount}')
                                 except Exception:
@@ -11547,12 +12213,13 @@ class CBPMApp:
                             return
                         # Check status first
                         try:
+                            from money import to_amount
                             conn = self.db_manager.create_connection(); cur = conn.cursor()
                             cur.execute("SELECT amount, status FROM contract_payments WHERE id=? AND contract_id=?", (pid, cid))
                             r = cur.fetchone()
                             if not r:
                                 conn.close(); messagebox.showerror('Error', 'Payment not found.'); return
-                            amount, status = float(r[0] or 0.0), r[1]
+                            amount, status = to_amount(r[0]), r[1]
                             if status == 'Confirmed':
                                 conn.close(); messagebox.showinfo('Info', 'Payment already confirmed.'); return
                             # Begin confirmation and ledger entry
@@ -11564,6 +12231,7 @@ class CBPMApp:
                                     'INSERT INTO contract_ledger(contract_id, entry_type, amount, ref_payment_id, description) VALUES (?,?,?,?,?)',
                                     (cid, 'PaymentConfirmed', amount, pid, f'Payment confirmed (ref {pid})')
                                 )
+                                refresh_balances(cur, [cid])
                                 conn.commit(); conn.close()
                                 try:
                                     self.log_audit_action(self.current_user['id'], 'Confirm Contract Payment', f'Contract {cid}, payment {pid}, amount {amount}')
@@ -11644,12 +12312,9 @@ class CBPMApp:
                         method_var.trace('w', _update_method_fields); _update_method_fields()
                         def save_edit():
                             # Validate
-                            try:
-                                try:
-                                    amount = float(amt_var.get().replace(',', '').strip())
-                                except Exception:
-                                    amount = float(amt_var.get().strip())
-                            except Exception:
+                            from money import parse_amount
+                            amount = parse_amount(amt_var.get())
+                            if amount is None:
                                 messagebox.showwarning('Invalid', 'Enter a valid amount.'); return
                             if amount <= 0:
                                 messagebox.showwarning('Invalid', 'Amount must be greater than zero.'); return
@@ -11680,6 +12345,7 @@ class CBPMApp:
                                 )
                                 if cur.rowcount == 0:
                                     conn.rollback(); conn.close(); messagebox.showinfo('Edit', 'Payment is no longer editable.'); return
+                                refresh_balances(cur, [cid])
                                 conn.commit(); conn.close()
                                 try:
                                     self.log_audit_action(self.current_user['id'], 'Edit Contract Payment', f'Payment {pid} of contract {cid} edited')
@@ -11710,8 +12376,9 @@ class CBPMApp:
                     base_sql = (
                         "SELECT c.id, c.title, COALESCE(u.full_name,'Not Assigned') AS contractor, "
                         "COALESCE(c.contract_kind,'Labour Only') AS ckind, COALESCE(c.includes_materials,0) AS im, "
-                        "c.budget, c.start_date, c.end_date, c.status "
+                        "c.budget, c.start_date, c.end_date, c.status, COALESCE(cb.paid,0) AS paid "
                         "FROM contracts c LEFT JOIN users u ON c.contractor_id = u.id "
+                        "LEFT JOIN contract_balances cb ON cb.contract_id = c.id "
                         "WHERE c.contract_owner_id = ?"
                     )
                     params = [self.current_user['id']]
@@ -11730,7 +12397,8 @@ class CBPMApp:
                         materials = 'Yes' if (r[4]==1 or r[4]==True) else 'No'
                         budget = r[5] or 0
                         sd = r[6] or ''; ed = r[7] or ''; status = r[8] or ''
-                        tree.insert('', 'end', values=(bid, title, contractor, kind, materials, f"{budget:,.0f}", sd, ed, status))
+                        paid = r[9] or 0
+                        tree.insert('', 'end', values=(bid, title, contractor, kind, materials, f"{budget:,.0f}", f"{paid:,.0f}", f"{budget - paid:,.0f}", sd, ed, status))
                 except Exception as e:
                     try:
                         messagebox.showerror("Error", f"Failed to load contracts: {e}")
@@ -11770,6 +12438,10 @@ class CBPMApp:
                         cur.execute("DELETE FROM contracts WHERE id=?", (cid,))
                     else:
                         cur.execute("DELETE FROM contracts WHERE id=? AND contract_owner_id=?", (cid, self.current_user['id']))
+                    try:
+                        cur.execute("DELETE FROM contract_balances WHERE contract_id=? AND contract_id NOT IN (SELECT id FROM contracts)", (cid,))
+                    except Exception:
+                        pass
                     conn.commit(); conn.close()
                     try:
                         self.log_audit_action(self.current_user['id'], 'Delete Contract', f'Contract {cid} deleted')
@@ -12261,121 +12933,48 @@ class CBPMApp:
                 if not messagebox.askyesno('Confirm', f"Execute transfer of {len(transfer_items)} items?"):
                     return
                 try:
-                    source_id = int(from_var.get().split(' - ')[0])
-                    dest_id = int(to_var.get().split(' - ')[0])
-                    # Managers can only transfer to contractor-owned stores
-                    try:
-                        _role = self.current_user.get('role') if getattr(self, 'current_user', None) else None
-                    except Exception:
-                        _role = None
-                    if _role == 'manager':
-                        try:
-                            _conn_chk = self.db_manager.create_connection(); _cur_chk = _conn_chk.cursor()
-                            _cur_chk.execute("SELECT COALESCE(u.role,'') FROM stores s JOIN users u ON u.id = s.owner_id WHERE s.id = ?", (dest_id,))
-                            _row_chk = _cur_chk.fetchone(); _conn_chk.close()
-                            if not _row_chk or str(_row_chk[0]).lower() != 'contractor':
-                                messagebox.showerror('Permission', 'Managers can only transfer to contractor stores.')
-                                return
-                        except Exception:
-                            messagebox.showerror('Permission', 'Unable to verify destination store ownership.'); return
-                    now = datetime.now()
-                    reference = f"TR-{now.strftime('%Y%m%d-%H%M%S')}-{self.current_user['id']}"
-
-                    conn = self.db_manager.create_connection()
-                    cur = conn.cursor()
-
-                    # Start transaction
-                    cur.execute('BEGIN')
-
-                    # Compute totals
-                    total_items = len(transfer_items)
-                    total_value = sum(i['total'] for i in transfer_items)
-
-                    # Insert transfer header
-                    cur.execute(
-                        """
-                        INSERT INTO transfers (reference, source_store_id, dest_store_id, total_items, total_value,
-                                               status, reason, notes, signature_name, signature_date, created_at, initiated_by)
-                        VALUES (?, ?, ?, ?, ?, 'Completed', ?, ?, ?, ?, ?, ?)
-                        """,
-                        (
-                            reference,
-                            source_id,
-                            dest_id,
-                            total_items,
-                            total_value,
-                            ', '.join(sorted(set(i['reason'] for i in transfer_items if i['reason']))),
-                            '; '.join(filter(None, (i['notes'] for i in transfer_items))),
-                            self.current_user.get('full_name') or self.current_user.get('username') or 'User',
-                            now.isoformat(sep=' '),
-                            now.isoformat(sep=' '),
-                            self.current_user['id']
-                        )
-                    )
-                    transfer_row_id = cur.lastrowid
-
-                    # For each item: find material id, update inventories, insert line
-                    for it in transfer_items:
-                        # Resolve material id
-                        cur.execute("SELECT id, unit FROM building_materials WHERE name = ?", (it['material'],))
-                        res = cur.fetchone()
-                        if not res:
-                            raise Exception(f"Material not found: {it['material']}")
-                        material_id, unit_from_db = res
-                        qty = float(it['quantity'])
-
-                        # Decrease source inventory
-                        cur.execute(
-                            """
-                            UPDATE inventory SET quantity = quantity - ?, last_updated = ?
-                            WHERE store_id = ? AND material_id = ? AND quantity >= ?
-                            """,
-                            (qty, now.isoformat(sep=' '), source_id, material_id, qty)
-                        )
-                        if cur.rowcount == 0:
-                            raise Exception(f"Insufficient stock for {it['material']} at source store")
-
-                        # Increase or insert destination inventory
-                        cur.execute(
-                            "SELECT quantity FROM inventory WHERE store_id = ? AND material_id = ?",
-                            (dest_id, material_id)
-                        )
-                        row = cur.fetchone()
-                        if row:
-                            cur.execute(
-                                """
-                                UPDATE inventory SET quantity = quantity + ?, last_updated = ?, unit_price = ?
-                                WHERE store_id = ? AND material_id = ?
-                                """,
-                                (qty, now.isoformat(sep=' '), it['unit_price'], dest_id, material_id)
-                            )
-                        else:
-                            cur.execute(
-                                """
-                                INSERT INTO inventory (store_id, material_id, quantity, unit_price, reorder_level, last_updated)
-                                VALUES (?, ?, ?, ?, 10, ?)
-                                """,
-                                (dest_id, material_id, qty, it['unit_price'], now.isoformat(sep=' '))
-                            )
-
-                        # Insert transfer line
-                        cur.execute(
-                            """
-                            INSERT INTO transfer_items (transfer_id, material_id, quantity, unit, unit_price, total)
-                            VALUES (?, ?, ?, ?, ?, ?)
-                            """,
-                            (transfer_row_id, material_id, qty, unit_from_db or it['unit'], it['unit_price'], it['total'])
-                        )
+                    source_id = int(from_var.get().split(' - ')[0])
+                    dest_id = int(to_var.get().split(' - ')[0])
+                    # Managers can only transfer to contractor-owned stores
+                    try:
+                        _role = self.current_user.get('role') if getattr(self, 'current_user', None) else None
+                    except Exception:
+                        _role = None
+                    if _role == 'manager':
+                        try:
+                            _conn_chk = self.db_manager.create_connection(); _cur_chk = _conn_chk.cursor()
+                            _cur_chk.execute("SELECT COALESCE(u.role,'') FROM stores s JOIN users u ON u.id = s.owner_id WHERE s.id = ?", (dest_id,))
+                            _row_chk = _cur_chk.fetchone(); _conn_chk.close()
+                            if not _row_chk or str(_row_chk[0]).lower() != 'contractor':
+                                messagebox.showerror('Permission', 'Managers can only transfer to contractor stores.')
+                                return
+                        except Exception:
+                            messagebox.showerror('Permission', 'Unable to verify destination store ownership.'); return
+                    now = datetime.now()
+                    reference = f"TR-{now.strftime('%Y%m%d-%H%M%S')}-{self.current_user['id']}"
 
-                    conn.commit()
-                    conn.close()
+                    # Journaled first so the transfer survives a lost connection (offline_journal.py)
+                    outcome = self.db_manager.submit_operation(
+                        'transfer', {'source_id': source_id, 'dest_id': dest_id, 'items': transfer_items,
+                                     'reference': reference,
+                                     'signature_name': self.current_user.get('full_name')
+                                     or self.current_user.get('username') or 'User'},
+                        self.current_user['id'])
+                    if outcome['result'] is not None:
+                        _, total_items, total_value = outcome['result']
+                    else:
+                        total_items, total_value = len(transfer_items), sum(i['total'] for i in transfer_items)
 
                     try:
                         self.log_audit_action(self.current_user['id'], 'Product Transfer', f'{reference} {total_items} items {total_value:,.0f} FCFA from {source_id} to {dest_id}')
                     except Exception:
                         pass
 
-                    messagebox.showinfo('Success', f'Transfer {reference} completed successfully.')
+                    if outcome['status'] == 'queued':
+                        messagebox.showinfo('Saved Offline', f'The server is unreachable. Transfer {reference} was '
+                                                             f'saved on this terminal and will be sent automatically.')
+                    else:
+                        messagebox.showinfo('Success', f'Transfer {reference} completed successfully.')
                     clear_list()
                     load_inventory()
                 except Exception as e:
@@ -12455,15 +13054,21 @@ class CBPMApp:
             status_cb['values'] = ['Open','Closed','On Hold']
             status_cb.grid(row=4, column=1, sticky='w')
 
+            # Job type
+            from job_search import JOB_TYPES, DEFAULT_JOB_TYPE, salary_band
+            tk.Label(form, text="Job Type:", bg='white').grid(row=5, column=0, sticky='e', padx=6, pady=6)
+            job_type_var = tk.StringVar(value=DEFAULT_JOB_TYPE)
+            ttk.Combobox(form, textvariable=job_type_var, values=JOB_TYPES, state='readonly', width=20).grid(row=5, column=1, sticky='w')
+
             # Description
-            tk.Label(form, text="Description:", bg='white').grid(row=5, column=0, sticky='ne', padx=6, pady=6)
+            tk.Label(form, text="Description:", bg='white').grid(row=6, column=0, sticky='ne', padx=6, pady=6)
             desc_text = tk.Text(form, width=60, height=8)
-            desc_text.grid(row=5, column=1, sticky='w')
+            desc_text.grid(row=6, column=1, sticky='w')
 
             # Requirements
-            tk.Label(form, text="Requirements:", bg='white').grid(row=6, column=0, sticky='ne', padx=6, pady=6)
+            tk.Label(form, text="Requirements:", bg='white').grid(row=7, column=0, sticky='ne', padx=6, pady=6)
             req_text = tk.Text(form, width=60, height=6)
-            req_text.grid(row=6, column=1, sticky='w')
+            req_text.grid(row=7, column=1, sticky='w')
 
             # Buttons
             btns = tk.Frame(win, bg='white')
@@ -12501,8 +13106,8 @@ class CBPMApp:
                     cur = conn.cursor()
                     cur.execute(
                         """
-                        INSERT INTO jobs (title, description, employer_id, location, salary_range, requirements, status, posted_date, deadline)
-                        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                        INSERT INTO jobs (title, description, employer_id, location, salary_range, requirements, status, posted_date, deadline, job_type, salary_band)
+                        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
                         """,
                         (
                             title,
@@ -12513,7 +13118,9 @@ class CBPMApp:
                             requirements,
                             status,
                             date.today().isoformat(),
-                            deadline if deadline else None
+                            deadline if deadline else None,
+                            job_type_var.get() or DEFAULT_JOB_TYPE,
+                            salary_band(salary)
                         )
                     )
                     conn.commit()
@@ -12640,8 +13247,9 @@ class CBPMApp:
                     q = search_var.get().strip()
                     conn = self.db_manager.create_connection()
                     cur = conn.cursor()
+                    from attachments import label_sql
                     query = (
-                        "SELECT ja.id, j.title, u.full_name, ja.application_date, ja.status, ja.resume_path, substr(ja.cover_letter,1,50) "
+                        "SELECT ja.id, j.title, u.full_name, ja.application_date, ja.status, " + label_sql('ja.resume_path') + ", substr(ja.cover_letter,1,50) "
                         "FROM job_applications ja "
                         "JOIN jobs j ON j.id = ja.job_id "
                         "JOIN users u ON u.id = ja.applicant_id WHERE 1=1 "
@@ -12690,16 +13298,22 @@ class CBPMApp:
                     return None
                 return tree.item(sel[0], 'values')[0]
 
-            def update_status(new_status):
+            def update_status(new_status, interview=None):
                 app_id = get_selected_id()
                 if not app_id:
                     return
                 try:
+                    from notifications import application_status, interview_scheduled, wake
                     conn = self.db_manager.create_connection()
                     cur = conn.cursor()
                     cur.execute("UPDATE job_applications SET status=? WHERE id=?", (new_status, app_id))
+                    if interview:
+                        interview_scheduled(cur, app_id, *interview)
+                    else:
+                        application_status(cur, app_id, new_status)
                     conn.commit()
                     conn.close()
+                    wake()
                     try:
                         self.log_audit_action(self.current_user['id'], "Update Application Status", f"{app_id} -> {new_status}")
                     except Exception:
@@ -12729,7 +13343,8 @@ class CBPMApp:
                     notes_text.pack(padx=10, pady=5)
                     def save_itv():
                         # For now, just record status change and log note (no interviews table yet)
-                        update_status('Interview')
+                        when = date_var.get().strip()
+                        update_status('Interview', (when, '', notes_text.get('1.0', 'end-1c').strip()) if when else None)
                         dlg.destroy()
                     tk.Button(dlg, text="Save", bg="#27ae60", fg="white", command=save_itv).pack(padx=10, pady=8, anchor='w')
                     tk.Button(dlg, text="Cancel", bg="#e74c3c", fg="white", command=dlg.destroy).pack(padx=10, pady=8, anchor='e')
@@ -12750,11 +13365,11 @@ class CBPMApp:
                     if not row or not row[0]:
                         messagebox.showinfo("Resume", "No resume uploaded for this application.")
                         return
-                    path = row[0]
-                    if os.path.exists(path):
+                    path = self._resume_file(row[0])
+                    if path:
                         os.startfile(path)
                     else:
-                        messagebox.showwarning("Resume", f"File not found: {path}")
+                        messagebox.showwarning("Resume", f"File not found: {row[0]}")
                 except Exception as e:
                     try:
                         messagebox.showerror("Error", f"Failed to open resume: {str(e)}")
@@ -12799,8 +13414,9 @@ class CBPMApp:
                     q = search_var.get().strip()
                     conn = self.db_manager.create_connection()
                     cur = conn.cursor()
+                    from attachments import label_sql
                     query = (
-                        "SELECT ja.id, j.title, u.full_name, ja.application_date, ja.status, ja.resume_path, ja.cover_letter "
+                        "SELECT ja.id, j.title, u.full_name, ja.application_date, ja.status, " + label_sql('ja.resume_path') + ", ja.cover_letter "
                         "FROM job_applications ja "
                         "JOIN jobs j ON j.id = ja.job_id "
                         "JOIN users u ON u.id = ja.applicant_id WHERE 1=1 "
@@ -12981,7 +13597,7 @@ class CBPMApp:
         tree_scroll_x.pack(side='bottom', fill='x')
 
         contracts_tree = ttk.Treeview(tree_frame,
-                                      columns=('ID', 'Title', 'Owner', 'Budget', 'Start Date', 'End Date', 'Status',
+                                      columns=('ID', 'Title', 'Owner', 'Budget', 'Paid', 'Start Date', 'End Date', 'Status',
                                                'Assignment'),
                                       show='headings',
                                       yscrollcommand=tree_scroll_y.set,
@@ -12997,6 +13613,7 @@ class CBPMApp:
             ('Title', 220, 'w'),
             ('Owner', 150, 'w'),
             ('Budget', 120, 'e'),
+            ('Paid', 110, 'e'),
             ('Start Date', 100, 'center'),
             ('End Date', 100, 'center'),
             ('Status', 100, 'center'),
@@ -13077,9 +13694,11 @@ class CBPMApp:
                                c.status,
                                c.contractor_id,
                                c.created_date,
-                               c.description
+                               c.description,
+                               COALESCE(cb.paid, 0) as paid
                         FROM contracts c
                                  JOIN users owner ON c.contract_owner_id = owner.id
+                                 LEFT JOIN contract_balances cb ON cb.contract_id = c.id
                         WHERE 1 = 1
                         '''
                 params = []
@@ -13124,7 +13743,7 @@ class CBPMApp:
                 today = dt_date.today()
 
                 for contract in contracts:
-                    contract_id, title, owner, budget, start_date, end_date, status, contractor_id, created_date, description = contract
+                    contract_id, title, owner, budget, start_date, end_date, status, contractor_id, created_date, description, paid = contract
 
                     # Determine assignment status
                     if contractor_id == self.current_user['id']:
@@ -13170,6 +13789,7 @@ class CBPMApp:
                         title[:35] + '...' if len(title) > 35 else title,
                         owner,
                         budget_display,
+                        f"{paid:,.0f}",
                         start_date or 'N/A',
                         end_date or 'N/A',
                         status,
@@ -13479,7 +14099,7 @@ class CBPMApp:
                 if not rows:
                     messagebox.showinfo("No Data", "There are no contracts to export.")
                     return
-                cols = ['ID','Title','Owner','Budget','Start Date','End Date','Status','Assignment']
+                cols = ['ID','Title','Owner','Budget','Paid','Start Date','End Date','Status','Assignment']
                 if HAS_PANDAS:
                     df = pd.DataFrame(rows, columns=cols)
                 else:
@@ -13679,12 +14299,12 @@ class CBPMApp:
                 # Load only contracts assigned to this contractor
                 query = """
                         SELECT c.id, c.title, owner.full_name, c.budget,
-                               CASE WHEN c.owner_signature IS NOT NULL THEN 'Yes' ELSE 'No' END AS owner_signed,
-                               CASE WHEN c.contractor_signature IS NOT NULL THEN 'Yes' ELSE 'No' END AS my_signed,
+                               CASE WHEN c.owner_signature_id IS NOT NULL THEN 'Yes' ELSE 'No' END AS owner_signed,
+                               CASE WHEN c.contractor_signature_id IS NOT NULL THEN 'Yes' ELSE 'No' END AS my_signed,
                                c.status,
                                CASE
-                                 WHEN c.contractor_signature IS NULL THEN 'Your Signature'
-                                 WHEN c.owner_signature IS NULL THEN 'Owner Signature'
+                                 WHEN c.contractor_signature_id IS NULL THEN 'Your Signature'
+                                 WHEN c.owner_signature_id IS NULL THEN 'Owner Signature'
                                  ELSE 'None'
                                END as action_required
                         FROM contracts c JOIN users owner ON c.contract_owner_id=owner.id
@@ -13695,14 +14315,9 @@ class CBPMApp:
                 try:
                     cur.execute(query, (self.current_user['id'],))
                 except Exception:
-                    try:
-                        cur.execute("ALTER TABLE contracts ADD COLUMN owner_signature BLOB")
-                    except Exception:
-                        pass
-                    try:
-                        cur.execute("ALTER TABLE contracts ADD COLUMN contractor_signature BLOB")
-                    except Exception:
-                        pass
+                    from attachments import ensure_schema as ensure_attachments_schema
+                    ensure_attachments_schema(conn)
+                    conn.commit()
                     cur.execute(query, (self.current_user['id'],))
                 rows = cur.fetchall()
                 total = len(rows)
@@ -13735,7 +14350,7 @@ class CBPMApp:
             try:
                 conn = self.db_manager.create_connection()
                 cur = conn.cursor()
-                cur.execute("SELECT contractor_signature, owner_signature, title FROM contracts WHERE id=? AND contractor_id=?", (cid, self.current_user['id']))
+                cur.execute("SELECT contractor_signature_id, owner_signature_id, title FROM contracts WHERE id=? AND contractor_id=?", (cid, self.current_user['id']))
                 row = cur.fetchone()
                 if not row:
                     conn.close()
@@ -13760,14 +14375,36 @@ class CBPMApp:
                 entry = tk.Entry(d, textvariable=name_var, width=40)
                 entry.pack()
 
+                # Optional scanned or photographed handwritten signature
+                image_var = tk.StringVar(value="")
+
+                def choose_signature_image():
+                    path = filedialog.askopenfilename(title="Signature image",
+                                                      filetypes=[("Images", "*.png *.jpg *.jpeg *.gif *.bmp")])
+                    if path:
+                        image_var.set(path)
+
+                img_row = tk.Frame(d, bg='white')
+                img_row.pack(pady=(10, 0))
+                tk.Button(img_row, text="Attach signature image...", command=choose_signature_image).pack(side='left')
+                tk.Label(img_row, textvariable=image_var, bg='white', fg='#555', wraplength=300).pack(side='left', padx=6)
+
                 def create_contractor_signature():
                     sig_text = name_var.get().strip()
                     if not sig_text:
                         messagebox.showwarning("Missing", "Please enter your name to sign.")
                         return
                     try:
-                        # Store a simple text signature; could be extended to digital signature
-                        cur.execute("UPDATE contracts SET contractor_signature=? WHERE id=?", (sig_text.encode('utf-8'), cid))
+                        # The typed name (and image, if any) go to the attachment store; the row keeps the id
+                        from attachments import add as add_attachment
+                        store = self.get_attachment_store()
+                        if image_var.get():
+                            add_attachment(conn, store, 'contracts', cid, 'contractor_signature_image',
+                                           path=image_var.get(), uploaded_by=self.current_user['id'])
+                        sig_id = add_attachment(conn, store, 'contracts', cid, 'contractor_signature',
+                                                data=sig_text.encode('utf-8'), filename='signature.txt',
+                                                mime_type='text/plain', uploaded_by=self.current_user['id'])
+                        cur.execute("UPDATE contracts SET contractor_signature_id=? WHERE id=?", (sig_id, cid))
                         conn.commit()
                         try:
                             self.ensure_contract_active_if_fully_signed(cid)
@@ -13803,8 +14440,8 @@ class CBPMApp:
                     """
                     SELECT c.id, c.title, u.full_name, c.description, c.requirements, c.budget,
                            c.start_date, c.end_date, c.status,
-                           CASE WHEN c.owner_signature IS NOT NULL THEN 'Yes' ELSE 'No' END,
-                           CASE WHEN c.contractor_signature IS NOT NULL THEN 'Yes' ELSE 'No' END
+                           CASE WHEN c.owner_signature_id IS NOT NULL THEN 'Yes' ELSE 'No' END,
+                           CASE WHEN c.contractor_signature_id IS NOT NULL THEN 'Yes' ELSE 'No' END
                     FROM contracts c JOIN users u ON c.contract_owner_id=u.id
                     WHERE c.id=?
                     """, (cid,)
@@ -13863,21 +14500,51 @@ class CBPMApp:
                 messagebox.showwarning("Select", "Please select a contract.")
                 return
             try:
+                from attachments import get as get_attachment, latest as latest_attachment
                 conn = self.db_manager.create_connection()
                 cur = conn.cursor()
-                cur.execute("SELECT owner_signature, contractor_signature FROM contracts WHERE id=?", (cid,))
+                cur.execute("SELECT owner_signature_id, contractor_signature_id FROM contracts WHERE id=?", (cid,))
                 row = cur.fetchone()
-                conn.close()
                 if not row:
+                    conn.close()
                     messagebox.showerror("Error", "Contract not found.")
                     return
-                owner_sig, my_sig = row
-                info = []
-                info.append(f"Owner Signature: {'Present' if owner_sig else 'Missing'}")
-                info.append(f"My Signature: {'Present' if my_sig else 'Missing'}")
-                messagebox.showinfo("Signature Status", "\n".join(info))
+                owner_sig = get_attachment(conn, row[0]) if row[0] else None
+                my_sig = get_attachment(conn, row[1]) if row[1] else None
+                my_image = latest_attachment(conn, 'contracts', cid, 'contractor_signature_image')
+                conn.close()
             except Exception as e:
                 messagebox.showerror("Error", f"Failed to retrieve signatures: {e}")
+                return
+
+            # Signature text is read from the store only now; the image thumbnail is made on first view
+            store = self.get_attachment_store()
+            w = tk.Toplevel(sign_window)
+            w.title(f"Signatures - Contract #{cid}")
+            w.configure(bg='white')
+            w.grab_set()
+            for label, meta in (("Owner Signature", owner_sig), ("My Signature", my_sig)):
+                text = 'Missing'
+                if meta:
+                    try:
+                        text = store.preview_text(meta['sha256'], 200) or f"Present ({meta['mime_type']})"
+                        text += f"  - {meta['created_at']}"
+                    except OSError:
+                        text = 'Present (file not found in the attachment store)'
+                tk.Label(w, text=f"{label}: {text}", bg='white', anchor='w', justify='left').pack(fill='x', padx=12, pady=4)
+            if my_image:
+                try:
+                    thumb = store.thumbnail(my_image['sha256'])
+                except OSError:
+                    thumb = None
+                if thumb:
+                    photo = tk.PhotoImage(file=thumb)
+                    img_label = tk.Label(w, image=photo, bg='white')
+                    img_label.image = photo
+                    img_label.pack(padx=12, pady=6)
+                else:
+                    tk.Label(w, text=f"Signature image: {my_image['filename'] or 'attached'}", bg='white').pack(padx=12, pady=4)
+            tk.Button(w, text="Close", bg="#dc3545", fg="white", command=w.destroy).pack(pady=8)
 
         def download_contract():
             cid = get_selected_id()
@@ -14101,8 +14768,9 @@ class CBPMApp:
                     q = search_var.get().strip()
                     conn = self.db_manager.create_connection()
                     cur = conn.cursor()
+                    from attachments import label_sql
                     query = (
-                        "SELECT ja.id, j.title, u.full_name, ja.application_date, ja.status, ja.resume_path, substr(ja.cover_letter,1,50) "
+                        "SELECT ja.id, j.title, u.full_name, ja.application_date, ja.status, " + label_sql('ja.resume_path') + ", substr(ja.cover_letter,1,50) "
                         "FROM job_applications ja "
                         "JOIN jobs j ON j.id = ja.job_id "
                         "JOIN users u ON u.id = ja.applicant_id WHERE 1=1 "
@@ -14159,8 +14827,9 @@ class CBPMApp:
                     q = search_var.get().strip()
                     conn = self.db_manager.create_connection()
                     cur = conn.cursor()
+                    from attachments import label_sql
                     query = (
-                        "SELECT ja.id, j.title, u.full_name, ja.application_date, ja.status, ja.resume_path, ja.cover_letter "
+                        "SELECT ja.id, j.title, u.full_name, ja.application_date, ja.status, " + label_sql('ja.resume_path') + ", ja.cover_letter "
                         "FROM job_applications ja "
                         "JOIN jobs j ON j.id = ja.job_id "
                         "JOIN users u ON u.id = ja.applicant_id WHERE 1=1 "
@@ -15618,26 +16287,29 @@ def show_create_contract(self):
                 if not selected:
                     messagebox.showwarning("Warning", "Please select a contract to print")
                     return
-                contract_id = contracts_tree.item(selected[0])['values'][0]
+                contract_ids = [contracts_tree.item(s)['values'][0] for s in selected]
 
-                # Load the full contract details
+                # Load the full contract details for every selected contract in one query
                 conn = self.db_manager.create_connection()
                 cur = conn.cursor()
+                marks = ','.join('?' * len(contract_ids))
                 cur.execute(
-                    '''
+                    f'''
                     SELECT c.id, c.title, c.description, c.requirements, c.budget,
                            c.start_date, c.end_date, c.status, c.created_date,
                            owner.full_name AS owner_name,
-                           COALESCE(con.full_name, 'Not Assigned') AS contractor_name
+                           COALESCE(con.full_name, 'Not Assigned') AS contractor_name,
+                           c.digital_signature_owner, c.digital_signature_contractor
                     FROM contracts c
                     JOIN users owner ON c.contract_owner_id = owner.id
                     LEFT JOIN users con ON c.contractor_id = con.id
-                    WHERE c.id = ? AND c.contract_owner_id = ?
-                    ''', (contract_id, self.current_user['id'])
+                    WHERE c.id IN ({marks}) AND c.contract_owner_id = ?
+                    ORDER BY c.id
+                    ''', (*contract_ids, self.current_user['id'])
                 )
-                row = cur.fetchone()
+                rows = cur.fetchall()
                 conn.close()
-                if not row:
+                if not rows:
                     messagebox.showerror("Error", "Contract details not found or access denied")
                     return
 
@@ -15645,142 +16317,40 @@ def show_create_contract(self):
                 filename = filedialog.asksaveasfilename(
                     defaultextension=".pdf",
                     filetypes=[("PDF files","*.pdf"), ("All files","*.*")],
-                    title="Save Contract as PDF",
-                    initialfile=f"contract_{contract_id}.pdf"
+                    title="Save Contract as PDF" if len(rows) == 1 else f"Save {len(rows)} Contracts as PDF",
+                    initialfile=f"contract_{rows[0][0]}.pdf" if len(rows) == 1 else f"contracts_{datetime.now():%Y%m}.pdf"
                 )
                 if not filename:
                     return
 
-                # Try to import reportlab locally to avoid hard dependency at module import
-                try:
-                    from reportlab.lib.pagesizes import A4
-                    from reportlab.pdfgen import canvas
-                    from reportlab.lib.units import cm
-                    from reportlab.lib.utils import simpleSplit
-                except Exception:
-                    messagebox.showerror(
-                        "Missing Library",
-                        "ReportLab is required to print PDF. Please install it with:\n\npip install reportlab"
-                    )
-                    return
+                printed_at = datetime.now().strftime("%Y-%m-%d %H:%M")
+                contracts = []
+                for (cid, title, description, requirements, budget, start_date, end_date,
+                     status, created_date, owner_name, contractor_name, own_enc, con_enc) in rows:
+                    owner_sig_line, cont_sig_line = self._contract_signature_lines(own_enc, con_enc)
+                    contracts.append({
+                        'id': cid, 'title': title, 'description': description, 'requirements': requirements,
+                        'budget': budget or 0, 'start_date': start_date, 'end_date': end_date, 'status': status,
+                        'created_date': str(created_date or ''), 'owner_name': owner_name,
+                        'contractor_name': contractor_name, 'owner_signature_line': owner_sig_line,
+                        'contractor_signature_line': cont_sig_line, 'printed_at': printed_at,
+                    })
 
-                # Unpack row
-                (cid, title, description, requirements, budget, start_date, end_date,
-                 status, created_date, owner_name, contractor_name) = row
-
-                # Create PDF
-                c = canvas.Canvas(filename, pagesize=A4)
-                width, height = A4
-                left = 2.0*cm
-                right = width - 2.0*cm
-                top = height - 2.0*cm
-                y = top
-
-                def draw_heading(text):
-                    nonlocal y
-                    c.setFont("Helvetica-Bold", 16)
-                    c.drawString(left, y, text)
-                    y -= 0.8*cm
-
-                def draw_label_value(label, value):
-                    nonlocal y
-                    c.setFont("Helvetica-Bold", 11)
-                    c.drawString(left, y, f"{label}:")
-                    c.setFont("Helvetica", 11)
-                    txt = str(value or "")
-                    # wrap
-                    wrapped = simpleSplit(txt, "Helvetica", 11, right-left)
-                    if wrapped:
-                        c.drawString(left+3.7*cm, y, wrapped[0])
-                        for line in wrapped[1:]:
-                            y -= 0.55*cm
-                            c.drawString(left+3.7*cm, y, line)
-                    y -= 0.7*cm
-
-                def draw_paragraph(label, text_content):
-                    nonlocal y
-                    c.setFont("Helvetica-Bold", 12)
-                    c.drawString(left, y, f"{label}:")
-                    y -= 0.5*cm
-                    c.setFont("Helvetica", 11)
-                    txt = str(text_content or "")
-                    lines = simpleSplit(txt, "Helvetica", 11, right-left)
-                    for line in lines:
-                        if y < 2.5*cm:
-                            c.showPage()
-                            y = top
-                            c.setFont("Helvetica", 11)
-                        c.drawString(left, y, line)
-                        y -= 0.5*cm
-                    y -= 0.3*cm
-
-                # Header
-                draw_heading(f"Contract #{cid}: {title}")
-                c.setFont("Helvetica", 10)
-                c.drawString(left, y, f"Owner: {owner_name}")
-                c.drawRightString(right, y, f"Date Created: {created_date or ''}")
-                y -= 0.6*cm
-                c.drawString(left, y, f"Contractor: {contractor_name}")
-                c.drawRightString(right, y, f"Status: {status}")
-                y -= 0.8*cm
-
-                # Summary fields
-                draw_label_value("Budget", f"{(budget or 0):,.0f} FCFA")
-                draw_label_value("Start Date", start_date or 'N/A')
-                draw_label_value("End Date", end_date or 'N/A')
-
-                # Long sections
-                draw_paragraph("Description", description or "No description provided.")
-                draw_paragraph("Requirements", requirements or "No requirements provided.")
-
-                # Digital signatures at bottom
-                try:
-                    conn2 = self.db_manager.create_connection(); cur2 = conn2.cursor()
-                    cur2.execute('SELECT digital_signature_owner, digital_signature_contractor FROM contracts WHERE id=?', (cid,))
-                    sigrow = cur2.fetchone(); conn2.close()
-                except Exception:
-                    sigrow = None
-                owner_sig_line = 'Owner: Not signed'
-                cont_sig_line = 'Contractor: Not signed'
-                if sigrow:
+                def on_ready(result):
+                    if not result.get('ok'):
+                        title_ = "Missing Library" if result.get('error') == 'missing_reportlab' else "Error"
+                        messagebox.showerror(title_, result.get('message') or "Failed to print PDF")
+                        return
                     try:
-                        own_enc, con_enc = sigrow
-                        if own_enc:
-                            try:
-                                info = json.loads(self.security_manager.decrypt_data(own_enc))
-                                owner_sig_line = f"Owner: {info.get('signer_name','')} on {info.get('timestamp','')}"
-                            except Exception:
-                                owner_sig_line = 'Owner: Signed'
-                        if con_enc:
-                            try:
-                                info2 = json.loads(self.security_manager.decrypt_data(con_enc))
-                                cont_sig_line = f"Contractor: {info2.get('signer_name','')} on {info2.get('timestamp','')}"
-                            except Exception:
-                                cont_sig_line = 'Contractor: Signed'
+                        self.log_audit_action(self.current_user['id'], "Print Contract PDF",
+                                              f"Contract {', '.join(str(c['id']) for c in contracts)}")
                     except Exception:
                         pass
-                if y < 3.0*cm:
-                    c.showPage(); y = top
-                c.setFont('Helvetica-Bold', 12)
-                c.drawString(left, 3.2*cm, 'Digital Signatures')
-                c.setFont('Helvetica', 10)
-                c.drawString(left, 2.6*cm, owner_sig_line)
-                c.drawString(left, 2.2*cm, cont_sig_line)
-
-                # Footer
-                c.setFont("Helvetica-Oblique", 9)
-                c.drawString(left, 1.6*cm, "Generated by CBPM - Contract Management")
-                from datetime import datetime as _dt
-                c.drawRightString(right, 1.6*cm, _dt.now().strftime("%Y-%m-%d %H:%M"))
+                    messagebox.showinfo("Success", f"{result.get('documents', 1)} contract(s) saved to PDF:\n{filename}")
 
-                c.save()
-
-                try:
-                    self.log_audit_action(self.current_user['id'], "Print Contract PDF", f"Contract {contract_id}")
-                except Exception:
-                    pass
-
-                messagebox.showinfo("Success", f"Contract saved to PDF:\n{filename}")
+                self.get_render_service().submit_contracts(
+                    contracts, filename, on_done=on_ready,
+                    footer="Generated by CBPM - Contract Management")
 
             except Exception as e:
                 messagebox.showerror("Error", f"Failed to print PDF: {e}")
@@ -17025,11 +17595,13 @@ def show_create_contract(self):
 
                     # Get stores owned or managed by current user
                     cursor.execute('''
-                                   SELECT id, name, location, contact_info
-                                   FROM stores
-                                   WHERE (owner_id = ? OR manager_id = ?)
-                                     AND is_active = 1
-                                   ORDER BY name
+                                   SELECT s.id, s.name, s.location,
+                                          COALESCE(s.category, s.json_category, 'General'),
+                                          COALESCE(s.phone, s.json_phone, 'N/A')
+                                   FROM stores s
+                                   WHERE (s.owner_id = ? OR s.manager_id = ?)
+                                     AND s.is_active = 1
+                                   ORDER BY s.name
                                    ''', (self.current_user['id'], self.current_user['id']))
 
                     stores = cursor.fetchall()
@@ -17037,18 +17609,10 @@ def show_create_contract(self):
                     store_options = []
                     store_info = {}
 
-                    for store_id, name, location, contact_info in stores:
+                    for store_id, name, location, category, phone in stores:
                         option = f"{store_id} - {name}"
                         store_options.append(option)
-
-                        # Parse contact info for additional details
-                        try:
-                            contact_data = json.loads(contact_info) if contact_info else {}
-                            category = contact_data.get('category', 'General')
-                            phone = contact_data.get('phone', 'N/A')
-                            store_info[option] = f"Location: {location}\nCategory: {category}\nPhone: {phone}"
-                        except:
-                            store_info[option] = f"Location: {location}"
+                        store_info[option] = f"Location: {location}\nCategory: {category}\nPhone: {phone}"
 
                     source_store_combo['values'] = store_options
                     dest_store_combo['values'] = store_options
@@ -17360,75 +17924,20 @@ def show_create_contract(self):
                     try:
                         source_store_id = int(source_store_var.get().split(' - ')[0])
                         dest_store_id = int(dest_store_var.get().split(' - ')[0])
-
-                        conn = self.db_manager.create_connection()
-                        cursor = conn.cursor()
-
-                        # Create transfer record (in real implementation, would have transfers table)
-                        from datetime import datetime
-                        transfer_id = f"T{datetime.now().strftime('%Y%m%d%H%M%S')}"
-
-                        transfer_summary = {
-                            'transfer_id': transfer_id,
-                            'date': datetime.now().isoformat(),
-                            'from_store_id': source_store_id,
-                            'to_store_id': dest_store_id,
-                            'items': current_transfer_items,
-                            'total_value': sum(item['total_value'] for item in current_transfer_items),
-                            'initiated_by': self.current_user['id'],
-                            'status': 'Completed'
-                        }
-
-                        # For each item in transfer, update inventory
-                        for item in current_transfer_items:
-                            material_name = item['material']
-                            transfer_qty = item['quantity']
-
-                            # Get material ID
-                            cursor.execute('SELECT id FROM building_materials WHERE name = ?', (material_name,))
-                            material_result = cursor.fetchone()
-                            if not material_result:
-                                continue
-
-                            material_id = material_result[0]
-
-                            # Update source store inventory (decrease)
-                            cursor.execute('''
-                                           UPDATE inventory
-                                           SET quantity = quantity - ?
-                                           WHERE store_id = ?
-                                             AND material_id = ?
-                                           ''', (transfer_qty, source_store_id, material_id))
-
-                            # Check if destination store has this item
-                            cursor.execute('''
-                                           SELECT quantity
-                                           FROM inventory
-                                           WHERE store_id = ?
-                                             AND material_id = ?
-                                           ''', (dest_store_id, material_id))
-
-                            dest_inventory = cursor.fetchone()
-
-                            if dest_inventory:
-                                # Update existing inventory (increase)
-                                cursor.execute('''
-                                               UPDATE inventory
-                                               SET quantity     = quantity + ?,
-                                                   last_updated = datetime('now')
-                                               WHERE store_id = ?
-                                                 AND material_id = ?
-                                               ''', (transfer_qty, dest_store_id, material_id))
-                            else:
-                                # Create new inventory record
-                                cursor.execute('''
-                                               INSERT INTO inventory (store_id, material_id, quantity, unit_price,
-                                                                      reorder_level, last_updated)
-                                               VALUES (?, ?, ?, ?, 10, datetime('now'))
-                                               ''', (dest_store_id, material_id, transfer_qty, item['unit_price']))
-
-                        conn.commit()
-                        conn.close()
+                        now = datetime.now()
+                        transfer_id = f"TR-{now.strftime('%Y%m%d-%H%M%S')}-{self.current_user['id']}"
+
+                        # Journaled first so the transfer survives a lost connection (offline_journal.py)
+                        outcome = self.db_manager.submit_operation(
+                            'transfer', {'source_id': source_store_id, 'dest_id': dest_store_id,
+                                         'items': [{'material': item['material'], 'quantity': item['quantity'],
+                                                    'unit': item['unit'], 'unit_price': item['unit_price'],
+                                                    'total': item['total_value'], 'reason': item['reason'],
+                                                    'notes': item['notes']} for item in current_transfer_items],
+                                         'reference': transfer_id,
+                                         'signature_name': self.current_user.get('full_name')
+                                         or self.current_user.get('username') or 'User'},
+                            self.current_user['id'])
 
                         # Log the transfer
                         self.log_audit_action(
@@ -17438,10 +17947,14 @@ def show_create_contract(self):
                         )
 
                         # Success message
-                        messagebox.showinfo("Transfer Complete",
-                                            f"Transfer {transfer_id} completed successfully!\n\n"
-                                            f"Transferred {len(current_transfer_items)} items\n"
-                                            f"Total value: {sum(item['total_value'] for item in current_transfer_items):,.0f} FCFA")
+                        if outcome['status'] == 'queued':
+                            messagebox.showinfo('Saved Offline', f'The server is unreachable. Transfer {transfer_id} '
+                                                                 f'was saved on this terminal and will be sent automatically.')
+                        else:
+                            messagebox.showinfo("Transfer Complete",
+                                                f"Transfer {transfer_id} completed successfully!\n\n"
+                                                f"Transferred {len(current_transfer_items)} items\n"
+                                                f"Total value: {sum(item['total_value'] for item in current_transfer_items):,.0f} FCFA")
 
                         # Clear transfer list
                         clear_transfer_list()
@@ -20320,7 +20833,7 @@ def show_create_contract(self):
         def show_material_calculator():
             calc_window = tk.Toplevel(reports_window)
             calc_window.title("Material Calculator")
-            calc_window.geometry("500x600")
+            calc_window.geometry("560x760")
             calc_window.configure(bg='#f8f9fa')
             calc_window.grab_set()
             calc_window.transient(reports_window)
@@ -20337,10 +20850,9 @@ def show_create_contract(self):
 
             project_type_var = tk.StringVar()
             project_type_combo = ttk.Combobox(main_frame, textvariable=project_type_var, width=40, state='readonly')
-            project_type_combo['values'] = [
-                'Single Story House', 'Two Story House', 'Apartment Building',
-                'Commercial Building', 'Warehouse', 'Custom Project'
-            ]
+            from estimator import BomEstimator
+            bom_estimator = BomEstimator()
+            project_type_combo['values'] = list(bom_estimator.project_types)
             project_type_combo.pack(anchor='w', pady=(0, 15))
 
             # Dimensions
@@ -20367,7 +20879,30 @@ def show_create_contract(self):
                      bg='#f8f9fa').pack(anchor='w', padx=10, pady=(5, 0))
             height_var = tk.StringVar()
             height_entry = tk.Entry(dimensions_frame, textvariable=height_var, font=('Arial', 10), width=20)
-            height_entry.pack(anchor='w', padx=10, pady=(0, 10))
+            height_entry.pack(anchor='w', padx=10, pady=(0, 5))
+
+            # Storeys (blank = usual for the project type)
+            tk.Label(dimensions_frame, text="Storeys (blank = usual for the project type):", font=('Arial', 10),
+                     bg='#f8f9fa').pack(anchor='w', padx=10, pady=(5, 0))
+            storeys_var = tk.StringVar()
+            tk.Entry(dimensions_frame, textvariable=storeys_var, font=('Arial', 10), width=20).pack(anchor='w', padx=10,
+                                                                                                  pady=(0, 10))
+
+            # Prices: one store's shelf prices, or the average over the stores stocking each material
+            tk.Label(main_frame, text="Prices From:", font=('Arial', 11, 'bold'),
+                     bg='#f8f9fa', fg='#2c3e50').pack(anchor='w', pady=(0, 5))
+            price_store_var = tk.StringVar(value="All stores (average)")
+            price_store_map = {"All stores (average)": None}
+            try:
+                conn = self.db_manager.create_connection()
+                for sid, sname in conn.execute("SELECT id, name FROM stores WHERE is_active = 1 ORDER BY name"):
+                    price_store_map[f"{sname} (ID:{sid})"] = sid
+                conn.close()
+            except Exception:
+                pass
+            price_store_combo = ttk.Combobox(main_frame, textvariable=price_store_var, width=40, state='readonly',
+                                             values=list(price_store_map))
+            price_store_combo.pack(anchor='w', pady=(0, 15))
 
             # Results frame
             results_frame = tk.LabelFrame(main_frame, text="Estimated Material Requirements",
@@ -20378,93 +20913,44 @@ def show_create_contract(self):
                                    wrap='word', state='disabled', bg='white')
             results_text.pack(fill='both', expand=True, padx=10, pady=10)
 
+            def read_layout():
+                """Project type, height and storeys from the form; None after showing an error."""
+                height = float(height_var.get() or 0)
+                storeys = int(storeys_var.get()) if storeys_var.get().strip() else None
+                if height <= 0 or (storeys is not None and storeys <= 0):
+                    messagebox.showerror("Error", "Please enter valid dimensions")
+                    return None
+                return project_type_var.get() or 'Custom Project', height, storeys
+
+            def current_prices():
+                from estimator import price_index
+                conn = self.db_manager.create_connection()
+                try:
+                    return price_index(conn, price_store_map.get(price_store_var.get()))
+                finally:
+                    conn.close()
+
             def calculate_materials():
                 try:
+                    from estimator import format_estimate
+                    layout = read_layout()
+                    if layout is None:
+                        return
+                    project_type, height, storeys = layout
                     length = float(length_var.get() or 0)
                     width = float(width_var.get() or 0)
-                    height = float(height_var.get() or 0)
-
-                    if length <= 0 or width <= 0 or height <= 0:
+                    if length <= 0 or width <= 0:
                         messagebox.showerror("Error", "Please enter valid dimensions")
                         return
 
-                    # Basic calculations (simplified)
-                    floor_area = length * width
-                    wall_area = 2 * (length + width) * height
-                    volume = length * width * height
-
-                    # Estimated materials (basic formulas)
-                    cement_bags = int((floor_area * 0.5) + (wall_area * 0.3))  # Rough estimate
-                    sand_cubic_meters = floor_area * 0.15
-                    gravel_cubic_meters = floor_area * 0.2
-                    blocks = int(wall_area * 8)  # Rough estimate for blocks
-                    roofing_sheets = int(floor_area * 1.2 / 1.8)  # Assuming 1.8 sqm per sheet
-
-                    # Calculate costs (get from database)
-                    conn = self.db_manager.create_connection()
-                    cursor = conn.cursor()
-
-                    cursor.execute('SELECT standard_price FROM building_materials WHERE name LIKE "%Cement%" LIMIT 1')
-                    cement_price = cursor.fetchone()[0] if cursor.fetchone() else 6500
-
-                    cursor.execute('SELECT standard_price FROM building_materials WHERE name LIKE "%Sand%" LIMIT 1')
-                    sand_price = cursor.fetchone()[0] if cursor.fetchone() else 15000
-
-                    cursor.execute('SELECT standard_price FROM building_materials WHERE name LIKE "%Gravel%" LIMIT 1')
-                    gravel_price = cursor.fetchone()[0] if cursor.fetchone() else 20000
-
-                    cursor.execute('SELECT standard_price FROM building_materials WHERE name LIKE "%Block%" LIMIT 1')
-                    block_price = cursor.fetchone()[0] if cursor.fetchone() else 350
-
-                    conn.close()
-
-                    # Calculate total costs
-                    cement_cost = cement_bags * cement_price
-                    sand_cost = sand_cubic_meters * sand_price
-                    gravel_cost = gravel_cubic_meters * gravel_price
-                    blocks_cost = blocks * block_price
-                    total_cost = cement_cost + sand_cost + gravel_cost + blocks_cost
+                    prices = current_prices()
+                    result = bom_estimator.estimate({'project_type': project_type, 'length': length, 'width': width,
+                                                     'height': height, 'storeys': storeys}, prices)
 
                     # Display results
                     results_text.config(state='normal')
                     results_text.delete('1.0', 'end')
-
-                    results = f"""
-    PROJECT CALCULATIONS
-    Project Type: {project_type_var.get() or 'Custom Project'}
-    Dimensions: {length}m x {width}m x {height}m
-    Floor Area: {floor_area:.2f} sq meters
-    Wall Area: {wall_area:.2f} sq meters
-
-    ESTIMATED MATERIAL REQUIREMENTS:
-
-    CEMENT & BINDING:
-    • Cement Portland: {cement_bags} bags
-      Cost: {cement_cost:,.0f} FCFA
-
-    AGGREGATES:
-    • Sand (River): {sand_cubic_meters:.2f} cubic meters
-      Cost: {sand_cost:,.0f} FCFA
-    • Gravel: {gravel_cubic_meters:.2f} cubic meters
-      Cost: {gravel_cost:,.0f} FCFA
-
-    MASONRY:
-    • Concrete Blocks: {blocks} pieces
-      Cost: {blocks_cost:,.0f} FCFA
-
-    ESTIMATED TOTAL COST: {total_cost:,.0f} FCFA
-
-    NOTE: These are rough estimates for basic construction.
-    Actual requirements may vary based on:
-    - Construction method
-    - Design specifications
-    - Local building codes
-    - Quality requirements
-    - Weather conditions
-
-    Consult with construction professionals for detailed planning.
-    """
-                    results_text.insert('1.0', results)
+                    results_text.insert('1.0', format_estimate(result, prices))
                     results_text.config(state='disabled')
 
                 except ValueError:
@@ -20472,6 +20958,97 @@ def show_create_contract(self):
                 except Exception as e:
                     messagebox.showerror("Error", f"Calculation failed: {str(e)}")
 
+            def compare_layouts():
+                """Price every length x width combination at once and list them by cost per m2."""
+                from estimator import SETTINGS as ESTIMATOR_SETTINGS, layout_grid
+                try:
+                    layout = read_layout()
+                except ValueError:
+                    messagebox.showerror("Error", "Please enter valid numeric dimensions")
+                    return
+                if layout is None:
+                    return
+                project_type, height, storeys = layout
+
+                cmp_window = tk.Toplevel(calc_window)
+                cmp_window.title(f"Compare Layouts - {project_type}")
+                cmp_window.geometry("900x560")
+                cmp_window.configure(bg='#f8f9fa')
+                cmp_window.transient(calc_window)
+
+                ranges = tk.Frame(cmp_window, bg='#f8f9fa')
+                ranges.pack(fill='x', padx=10, pady=10)
+                range_vars = {}
+                for row, (dim, current) in enumerate((('Length', length_var.get()), ('Width', width_var.get()))):
+                    try:
+                        base = float(current)
+                    except ValueError:
+                        base = 10.0
+                    tk.Label(ranges, text=f"{dim} (m) from", bg='#f8f9fa').grid(row=row, column=0, sticky='e', padx=5, pady=3)
+                    for col, (key, value) in enumerate((('from', max(1.0, base - 4)), ('to', base + 4), ('step', 1.0))):
+                        if key != 'from':
+                            tk.Label(ranges, text=key, bg='#f8f9fa').grid(row=row, column=col * 2, sticky='e', padx=5)
+                        var = range_vars[(dim, key)] = tk.StringVar(value=f"{value:g}")
+                        tk.Entry(ranges, textvariable=var, width=8).grid(row=row, column=col * 2 + 1, sticky='w')
+                run_btn = tk.Button(ranges, text="Compare", bg='#28a745', fg='white', width=12)
+                run_btn.grid(row=0, column=6, rowspan=2, padx=15)
+                summary_var = tk.StringVar()
+                tk.Label(cmp_window, textvariable=summary_var, bg='#f8f9fa', fg='#7f8c8d').pack(anchor='w', padx=10)
+
+                cols = ("Layout", "Floor Area m2", "Cement bags", "Blocks", "Rebar bars", "Total FCFA", "FCFA per m2")
+                frame = tk.Frame(cmp_window)
+                frame.pack(fill='both', expand=True, padx=10, pady=10)
+                tree = ttk.Treeview(frame, columns=cols, show='headings')
+                for c in cols:
+                    tree.heading(c, text=c)
+                    tree.column(c, width=110 if c != "Layout" else 140, anchor='w' if c == "Layout" else 'e')
+                sy = ttk.Scrollbar(frame, orient='vertical', command=tree.yview)
+                tree.configure(yscrollcommand=sy.set)
+                tree.pack(side='left', fill='both', expand=True)
+                sy.pack(side='right', fill='y')
+
+                def steps(dim):
+                    start, stop, step = (float(range_vars[(dim, k)].get()) for k in ('from', 'to', 'step'))
+                    if start <= 0 or stop < start or step <= 0:
+                        raise ValueError(f"{dim} range")
+                    count = int((stop - start) / step + 1e-9) + 1
+                    return [round(start + i * step, 2) for i in range(count)]
+
+                def run():
+                    try:
+                        variants = layout_grid(project_type, steps('Length'), steps('Width'), height, storeys)
+                    except ValueError as e:
+                        messagebox.showerror("Compare Layouts", f"Please enter a valid {e}.", parent=cmp_window)
+                        return
+                    limit = int(ESTIMATOR_SETTINGS.get('max_variants', 400))
+                    if len(variants) > limit:
+                        messagebox.showerror("Compare Layouts", f"{len(variants)} layouts; please narrow the ranges "
+                                                                f"(at most {limit}).", parent=cmp_window)
+                        return
+                    try:
+                        results = bom_estimator.estimate_many(variants, current_prices())
+                    except Exception as e:
+                        messagebox.showerror("Compare Layouts", f"Estimate failed: {e}", parent=cmp_window)
+                        return
+                    rows = []
+                    for r in results:
+                        v = r['variant']
+                        q = r['quantities']
+                        levels = storeys or bom_estimator.project_types[project_type].get('storeys', 1)
+                        area = v['length'] * v['width'] * levels
+                        rows.append((r['total'] / area, v['name'], area, q.get('cement', 0),
+                                     q.get('block_15', 0) + q.get('block_20', 0),
+                                     q.get('rebar_10', 0) + q.get('rebar_12', 0), r['total']))
+                    rows.sort()
+                    tree.delete(*tree.get_children())
+                    for per_m2, name, area, cement, blocks, rebar, total in rows:
+                        tree.insert('', 'end', values=(name, f"{area:,.0f}", f"{cement:,}", f"{blocks:,}", f"{rebar:,}",
+                                                       f"{total:,}", f"{per_m2:,.0f}"))
+                    summary_var.set(f"{len(rows)} layouts, cheapest per m2 first; prices: {price_store_var.get()}")
+
+                run_btn.config(command=run)
+                run()
+
             # Buttons
             btn_frame = tk.Frame(main_frame, bg='#f8f9fa')
             btn_frame.pack(pady=10)
@@ -20480,9 +21057,13 @@ def show_create_contract(self):
                       bg='#28a745', fg='white', width=15,
                       command=calculate_materials).pack(side='left', padx=(0, 10))
 
+            tk.Button(btn_frame, text="Compare Layouts", font=('Arial', 11),
+                      bg='#17a2b8', fg='white', width=15,
+                      command=compare_layouts).pack(side='left', padx=(0, 10))
+
             tk.Button(btn_frame, text="Clear", font=('Arial', 11),
                       bg='#6c757d', fg='white', width=15,
-                      command=lambda: [length_var.set(''), width_var.set(''), height_var.set(''),
+                      command=lambda: [length_var.set(''), width_var.set(''), height_var.set(''), storeys_var.set(''),
                                        results_text.config(state='normal'),
                                        results_text.delete('1.0', 'end'),
                                        results_text.config(state='disabled')]).pack(side='left', padx=(0, 10))
@@ -21859,47 +22440,37 @@ def show_create_contract(self):
                     if not filename:
                         return
                     # Collect current table data
-                    data = [["ID","Store","Material","Category","Qty","Unit","Unit Price","Reorder","Total","Updated"]]
-                    for it in tree.get_children():
-                        data.append(list(tree.item(it)['values']))
+                    header = ["ID","Store","Material","Category","Qty","Unit","Unit Price","Reorder","Total","Updated"]
+                    rows = [list(tree.item(it)['values']) for it in tree.get_children()]
                     total_items = items_var.get(); total_qty_str = qty_var.get(); total_val_str = value_var.get(); low_str = low_var.get()
                     filt_txt = f"Store: {store_var.get()} | Category: {cat_var.get()} | Stock: {stock_var.get()} | Search: {q_var.get()}"
                     summary_txt = f"Distinct Items: {total_items} | Total Qty: {total_qty_str} | Total Value (FCFA): {total_val_str} | Low Stock: {low_str}"
-                    # Try reportlab
-                    try:
-                        from reportlab.lib.pagesizes import A4
-                        from reportlab.lib import colors
-                        from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
-                        from reportlab.lib.styles import getSampleStyleSheet
-                        doc = SimpleDocTemplate(filename, pagesize=A4)
-                        styles = getSampleStyleSheet(); story = []
-                        story.append(Paragraph("Inventory Report", styles['Title']))
-                        story.append(Paragraph(filt_txt, styles['Normal']))
-                        story.append(Spacer(1, 8))
-                        story.append(Paragraph(summary_txt, styles['Normal']))
-                        story.append(Spacer(1, 12))
-                        tbl = Table(data, repeatRows=1)
-                        tbl.setStyle(TableStyle([
-                            ('BACKGROUND', (0,0), (-1,0), colors.lightgrey),
-                            ('GRID', (0,0), (-1,-1), 0.5, colors.grey),
-                            ('FONTSIZE', (0,0), (-1,-1), 8),
-                            ('ALIGN', (4,1), (8,-1), 'RIGHT')
-                        ]))
-                        story.append(tbl)
-                        doc.build(story)
-                        messagebox.showinfo("PDF", f"Inventory report exported to:\n{filename}")
-                    except Exception:
-                        # Fallback to text
-                        alt = filename[:-4] + ".txt" if filename.lower().endswith('.pdf') else filename + ".txt"
-                        with open(alt, 'w', encoding='utf-8') as f:
-                            from datetime import datetime as _dt
-                            f.write(f"Inventory Report\nGenerated: {_dt.now().isoformat(sep=' ')}\n{filt_txt}\n{summary_txt}\n\n")
-                            headers = data[0]
-                            f.write(" | ".join([str(h) for h in headers]) + "\n")
-                            f.write("-"*120 + "\n")
-                            for row in data[1:]:
-                                f.write(" | ".join([str(x) for x in row]) + "\n")
-                        messagebox.showinfo("Export", f"Reportlab not available. Saved TXT report:\n{alt}")
+                    # A multi-store view becomes one document with a section per store, after the overall summary
+                    by_store = {}
+                    for r in rows:
+                        by_store.setdefault(str(r[1]) if len(r) > 1 else '', []).append(r)
+                    if len(by_store) > 1:
+                        sections = [{'heading': None, 'filters': filt_txt, 'summary': summary_txt, 'rows': None}]
+                        for store_name, store_rows in sorted(by_store.items()):
+                            try:
+                                store_total = sum(float(str(r[8]).replace(',', '') or 0) for r in store_rows)
+                            except Exception:
+                                store_total = 0.0
+                            sections.append({'heading': f"Store: {store_name}", 'filters': None,
+                                             'summary': f"Items: {len(store_rows)} | Total Value (FCFA): {store_total:,.0f}",
+                                             'rows': store_rows, 'page_break': len(sections) > 1})
+                    else:
+                        sections = [{'heading': None, 'filters': filt_txt, 'summary': summary_txt, 'rows': rows}]
+
+                    def on_ready(result):
+                        if not result.get('ok'):
+                            messagebox.showerror("Export", f"Failed to export PDF: {result.get('message')}")
+                        elif result.get('fallback'):
+                            messagebox.showinfo("Export", f"Reportlab not available. Saved TXT report:\n{result.get('path')}")
+                        else:
+                            messagebox.showinfo("PDF", f"Inventory report exported to:\n{result.get('path')}")
+
+                    self.get_render_service().submit_inventory(sections, header, filename, on_done=on_ready)
                 except Exception as e:
                     try:
                         messagebox.showerror("Export", f"Failed to export PDF: {str(e)}")
@@ -22467,36 +23038,14 @@ def show_create_contract(self):
                 return frame
 
             # Compute metrics
+            from queries import daily_report
             conn = self.db_manager.create_connection()
-            cur = conn.cursor()
             today_date = date.today().isoformat()
-
-            # Total transactions today
-            cur.execute("SELECT COUNT(*), COALESCE(SUM(total_amount), 0) FROM transactions WHERE date(transaction_date) = ?", (today_date,))
-            tx_count, tx_total = cur.fetchone()
-
-            # Top store by sales today
-            cur.execute("""
-                SELECT s.name, COALESCE(SUM(t.total_amount),0) AS total
-                FROM stores s
-                LEFT JOIN transactions t ON t.store_id = s.id AND date(t.timestamp)=?
-                GROUP BY s.id
-                ORDER BY total DESC
-                LIMIT 1
-            """, (today_date,))
-            row = cur.fetchone()
-            top_store = row[0] if row else 'N/A'
-            top_store_total = row[1] if row else 0
-
-            # Low stock items (reorder level exceeded)
-            cur.execute("""
-                SELECT COUNT(*)
-                FROM inventory
-                WHERE quantity <= reorder_level
-            """)
-            low_stock_count = cur.fetchone()[0]
-
+            report = daily_report(conn.cursor(), today_date)
             conn.close()
+            tx_count, tx_total = report['tx_count'], report['tx_total']
+            top_store, top_store_total = report['top_store'], report['top_store_total']
+            low_stock_count = report['low_stock']
 
             make_card(cards, "Transactions Today", tx_count, "#3498db")
             make_card(cards, "Sales Total (FCFA)", f"{tx_total:,.0f}", "#2ecc71")
@@ -22525,36 +23074,9 @@ def show_create_contract(self):
 
             # Load transactions
             try:
-                conn = self.db_manager.create_connection()
-                cur = conn.cursor()
-                cur.execute(
-                    """
-                    SELECT t.timestamp, s.name, COALESCE(t.customer_name,''), bm.name, t.quantity, t.unit_price, t.total_amount
-                    FROM transactions t
-                    JOIN stores s ON s.id = t.store_id
-                    JOIN building_materials bm ON bm.id = t.material_id
-                    WHERE date(t.timestamp)=?
-                    ORDER BY t.timestamp DESC
-                    """,
-                    (today_date,)
-                )
-                for r in cur.fetchall():
-                    # format numeric columns
-                    values = list(r)
-                    try:
-                        values[4] = int(values[4]) if values[4] is not None else ''
-                    except Exception:
-                        pass
-                    try:
-                        values[5] = f"{float(values[5]):,.0f}" if values[5] is not None else ''
-                    except Exception:
-                        pass
-                    try:
-                        values[6] = f"{float(values[6]):,.0f}" if values[6] is not None else ''
-                    except Exception:
-                        pass
+                from money import format_rows
+                for values in format_rows(report['rows_tx'], money_columns=(5, 6), whole_columns=(4,)):
                     tx_tree.insert('', 'end', values=values)
-                conn.close()
             except Exception as e:
                 try:
                     messagebox.showerror("Error", f"Failed to load transactions: {str(e)}")
@@ -22575,21 +23097,8 @@ def show_create_contract(self):
             sy2.pack(side='right', fill='y')
 
             try:
-                conn = self.db_manager.create_connection()
-                cur = conn.cursor()
-                cur.execute(
-                    """
-                    SELECT s.name, bm.name, i.quantity, i.reorder_level, i.last_updated
-                    FROM inventory i
-                    JOIN stores s ON s.id = i.store_id
-                    JOIN building_materials bm ON bm.id = i.material_id
-                    WHERE i.quantity <= i.reorder_level
-                    ORDER BY i.quantity ASC
-                    """
-                )
-                for r in cur.fetchall():
+                for r in report['rows_low']:
                     low_tree.insert('', 'end', values=r)
-                conn.close()
             except Exception as e:
                 try:
                     messagebox.showerror("Error", f"Failed to load low stock list: {str(e)}")
@@ -22856,14 +23365,19 @@ def show_create_contract(self):
 
             def load_status():
                 try:
+                    from attachments import get as get_attachment, parse_reference
                     conn = self.db_manager.create_connection()
                     cur = conn.cursor()
                     cur.execute("SELECT resume_path FROM users WHERE id = ?", (self.current_user['id'],))
                     row = cur.fetchone()
-                    conn.close()
                     current = row[0] if row else None
+                    meta = get_attachment(conn, parse_reference(current)) if parse_reference(current) else None
+                    conn.close()
                     path_var.set(current or "")
-                    if current and os.path.exists(current):
+                    if meta:
+                        info_var.set(f"Current resume: {meta['filename']} (size: {meta['size']:,} bytes)\n"
+                                     f"Uploaded: {meta['created_at']}")
+                    elif current and os.path.exists(current):
                         size = os.path.getsize(current)
                         info_var.set(f"Current resume: {os.path.basename(current)} (size: {size:,} bytes)\nLocation: {current}")
                     elif current:
@@ -22873,15 +23387,6 @@ def show_create_contract(self):
                 except Exception as e:
                     info_var.set(f"Failed to load status: {str(e)}")
 
-            def ensure_folder():
-                try:
-                    base = os.path.join(os.getcwd(), 'uploads')
-                    resumes = os.path.join(base, 'resumes')
-                    os.makedirs(resumes, exist_ok=True)
-                    return resumes
-                except Exception:
-                    return os.getcwd()
-
             def choose_and_upload():
                 try:
                     filetypes = [
@@ -22902,26 +23407,19 @@ def show_create_contract(self):
                     if path_var.get():
                         if not messagebox.askyesno("Replace", "You already have a resume uploaded. Replace it?"):
                             return
-                    # Copy to uploads/resumes with sanitized name
-                    target_dir = ensure_folder()
-                    ts = datetime.now().strftime('%Y%m%d%H%M%S')
-                    safe_name = f"user{self.current_user['id']}_{ts}{ext}"
-                    target_path = os.path.join(target_dir, safe_name)
-                    # Perform copy
-                    try:
-                        # Use binary read/write to avoid extra deps
-                        with open(filename, 'rb') as src, open(target_path, 'wb') as dst:
-                            dst.write(src.read())
-                    except Exception as e:
-                        messagebox.showerror("Resume", f"Failed to copy file: {str(e)}")
-                        return
-                    # Save to DB
+                    # Stream into the attachment store (the same file uploaded again is stored once)
+                    from attachments import add as add_attachment, reference
+                    safe_name = f"user{self.current_user['id']}_{datetime.now().strftime('%Y%m%d%H%M%S')}{ext}"
                     try:
                         conn = self.db_manager.create_connection()
                         cur = conn.cursor()
-                        cur.execute("UPDATE users SET resume_path = ? WHERE id = ?", (target_path, self.current_user['id']))
+                        attachment_id = add_attachment(conn, self.get_attachment_store(), 'users',
+                                                       self.current_user['id'], 'resume', path=filename,
+                                                       filename=safe_name, uploaded_by=self.current_user['id'])
+                        cur.execute("UPDATE users SET resume_path = ? WHERE id = ?",
+                                    (reference(attachment_id), self.current_user['id']))
                         conn.commit(); conn.close()
-                        self.log_audit_action(self.current_user['id'], "Upload Resume", os.path.basename(target_path))
+                        self.log_audit_action(self.current_user['id'], "Upload Resume", safe_name)
                         messagebox.showinfo("Resume", "Resume uploaded successfully.")
                         load_status()
                     except Exception as e:
@@ -22937,7 +23435,8 @@ def show_create_contract(self):
                 if not p:
                     messagebox.showinfo("Resume", "No resume to open.")
                     return
-                if not os.path.exists(p):
+                p = self._resume_file(p)
+                if not p:
                     messagebox.showerror("Resume", "The saved resume file was not found on disk.")
                     return
                 try:
@@ -22954,14 +23453,20 @@ def show_create_contract(self):
                 if not messagebox.askyesno("Remove", "Remove your current resume? This cannot be undone."):
                     return
                 try:
-                    # Clear DB first
+                    from attachments import parse_reference, remove as remove_attachment
                     conn = self.db_manager.create_connection()
                     cur = conn.cursor()
                     cur.execute("UPDATE users SET resume_path = NULL WHERE id = ?", (self.current_user['id'],))
+                    attachment_id = parse_reference(p)
+                    if attachment_id is not None:
+                        # Applications already sent keep their copy; otherwise the file is collected later
+                        cur.execute("SELECT 1 FROM job_applications WHERE resume_path = ? LIMIT 1", (p,))
+                        if not cur.fetchone():
+                            remove_attachment(conn, attachment_id)
                     conn.commit(); conn.close()
-                    # Attempt to delete the file (ignore errors)
+                    # Legacy uploads are plain files: attempt to delete (ignore errors)
                     try:
-                        if os.path.exists(p):
+                        if attachment_id is None and os.path.exists(p):
                             os.remove(p)
                     except Exception:
                         pass
@@ -23003,6 +23508,9 @@ def show_create_contract(self):
             header.pack(fill='x', padx=10, pady=10)
             tk.Label(header, text="Find Jobs", font=('Arial', 16, 'bold'), bg='white').pack(side='left')
 
+            from job_search import UNSPECIFIED
+            svc = self.get_job_search()
+
             # Filters
             filters = tk.Frame(win, bg='white')
             filters.pack(fill='x', padx=10)
@@ -23011,10 +23519,12 @@ def show_create_contract(self):
             tk.Entry(filters, textvariable=q_var, width=30).grid(row=0, column=1, padx=6, pady=4)
             tk.Label(filters, text="Location:", bg='white').grid(row=0, column=2, sticky='w')
             loc_var = tk.StringVar()
-            tk.Entry(filters, textvariable=loc_var, width=20).grid(row=0, column=3, padx=6, pady=4)
+            loc_cb = ttk.Combobox(filters, textvariable=loc_var, width=20)
+            loc_cb.grid(row=0, column=3, padx=6, pady=4)
             tk.Label(filters, text="Salary:", bg='white').grid(row=0, column=4, sticky='w')
-            salary_var = tk.StringVar()
-            tk.Entry(filters, textvariable=salary_var, width=15).grid(row=0, column=5, padx=6, pady=4)
+            salary_var = tk.StringVar(value='All')
+            salary_cb = ttk.Combobox(filters, textvariable=salary_var, state='readonly', width=18)
+            salary_cb.grid(row=0, column=5, padx=6, pady=4)
             tk.Label(filters, text="Status:", bg='white').grid(row=0, column=6, sticky='w')
             status_var = tk.StringVar(value='Open')
             status_cb = ttk.Combobox(filters, textvariable=status_var, values=['All','Open','Closed'], state='readonly', width=10)
@@ -23024,16 +23534,21 @@ def show_create_contract(self):
             tk.Entry(filters, textvariable=since_var, width=20).grid(row=1, column=2, padx=6, pady=4, sticky='w')
             tk.Button(filters, text="Search", bg="#3498db", fg="white", command=lambda: refresh()).grid(row=1, column=3, padx=6)
             tk.Button(filters, text="Reset", command=lambda: do_reset()).grid(row=1, column=4, padx=6)
+            tk.Label(filters, text="Type:", bg='white').grid(row=1, column=5, sticky='e')
+            type_var = tk.StringVar(value='All')
+            type_cb = ttk.Combobox(filters, textvariable=type_var, state='readonly', width=16)
+            type_cb.grid(row=1, column=6, columnspan=2, padx=6, pady=4, sticky='w')
 
             # Results table
             table_frame = tk.Frame(win, bg='white')
             table_frame.pack(fill='both', expand=True, padx=10, pady=10)
-            cols = ("ID","Title","Employer","Location","Salary","Posted","Deadline","Status")
+            cols = ("ID","Title","Employer","Location","Type","Salary","Posted","Deadline","Status")
             tree = ttk.Treeview(table_frame, columns=cols, show='headings')
             for c in cols:
                 tree.heading(c, text=c)
-                tree.column(c, width=120)
-            tree.column("Title", width=220)
+                tree.column(c, width=110)
+            tree.column("ID", width=50)
+            tree.column("Title", width=200)
             tree.pack(fill='both', expand=True, side='left')
             sy = ttk.Scrollbar(table_frame, orient='vertical', command=tree.yview)
             tree.configure(yscrollcommand=sy.set)
@@ -23048,56 +23563,101 @@ def show_create_contract(self):
             apply_btn.pack(side='left')
             view_btn.pack(side='left', padx=6)
             refresh_btn.pack(side='right')
+            next_btn = tk.Button(actions, text="Next >", state='disabled', command=lambda: show_page(page_state['index'] + 1))
+            next_btn.pack(side='right', padx=6)
+            page_lbl = tk.Label(actions, text="", bg='white')
+            page_lbl.pack(side='right', padx=6)
+            prev_btn = tk.Button(actions, text="< Prev", state='disabled', command=lambda: show_page(page_state['index'] - 1))
+            prev_btn.pack(side='right')
+
+            # cursors[i] is the keyset cursor that starts page i; facet combobox text -> facet value
+            page_state = {'index': 0, 'cursors': [None], 'pending': None}
+            facet_choices = {'location': {}, 'job_type': {}, 'salary_band': {}}
+
+            def facet_label(value, count):
+                return f"{value or UNSPECIFIED} ({count})"
+
+            def load_facets():
+                st = status_var.get()
+                facets = svc.facets(st if st and st != 'All' else None)
+                for facet, widget, var in (('location', loc_cb, loc_var), ('job_type', type_cb, type_var), ('salary_band', salary_cb, salary_var)):
+                    selected = facet_choices[facet].get(var.get())
+                    choices = {facet_label(v, n): v for v, n in facets.get(facet, [])}
+                    facet_choices[facet] = choices
+                    widget['values'] = ['All'] + list(choices)
+                    if selected is not None:
+                        # Keep the selection when its count label changes
+                        var.set(next((lbl for lbl, v in choices.items() if v == selected), 'All'))
+
+            def current_query():
+                st = status_var.get()
+                loc = loc_var.get().strip()
+                location = facet_choices['location'].get(loc)
+                return dict(
+                    keyword=q_var.get(),
+                    location=location,
+                    location_text='' if (location is not None or loc == 'All') else loc,
+                    job_type=facet_choices['job_type'].get(type_var.get()),
+                    band=facet_choices['salary_band'].get(salary_var.get()),
+                    status=st if st and st != 'All' else None,
+                    posted_since=since_var.get(),
+                )
+
+            def show_page(index):
+                try:
+                    if index < 0 or index >= len(page_state['cursors']):
+                        return
+                    page = svc.search(cursor=page_state['cursors'][index], **current_query())
+                    page_state['index'] = index
+                    del page_state['cursors'][index + 1:]
+                    if page['next_cursor'] is not None:
+                        page_state['cursors'].append(page['next_cursor'])
+                    for it in tree.get_children():
+                        tree.delete(it)
+                    for job in page['rows']:
+                        tree.insert('', 'end', values=(
+                            job['id'], job['title'], job['employer'], job['location'] or '', job['job_type'] or '',
+                            job['salary_range'] or '', job['posted_date'], job['deadline'] or '', job['status']))
+                    first = index * svc.page_size + 1 if page['rows'] else 0
+                    page_lbl.config(text=f"Page {index + 1}  ({first}-{index * svc.page_size + len(page['rows'])})")
+                    prev_btn.config(state='normal' if index > 0 else 'disabled')
+                    next_btn.config(state='normal' if page['next_cursor'] is not None else 'disabled')
+                except Exception as e:
+                    try:
+                        messagebox.showerror("Jobs", f"Failed to search jobs: {str(e)}")
+                    except Exception:
+                        pass
 
             def do_reset():
                 q_var.set("")
                 loc_var.set("")
+                type_var.set('All')
+                salary_var.set('All')
                 status_var.set('Open')
                 since_var.set("")
                 refresh()
 
             def refresh():
+                page_state['pending'] = None
+                page_state['cursors'] = [None]
                 try:
-                    conn = self.db_manager.create_connection()
-                    cur = conn.cursor()
-                    query = (
-                        "SELECT j.id, j.title, COALESCE(u.full_name,u.username) AS employer, j.location, j.salary_range, j.posted_date, j.deadline, j.status "
-                        "FROM jobs j JOIN users u ON u.id = j.employer_id WHERE 1=1 "
-                    )
-                    params = []
-                    q = q_var.get().strip()
-                    if q:
-                        query += "AND (j.title LIKE ? OR j.description LIKE ? OR j.requirements LIKE ?) "
-                        like = f"%{q}%"; params.extend([like, like, like])
-                    loc = loc_var.get().strip()
-                    if loc:
-                        query += "AND (j.location LIKE ?) "
-                        params.append(f"%{loc}%")
-                    st = status_var.get()
-                    if st and st != 'All':
-                        query += "AND j.status = ? "
-                        params.append(st)
-                    since = since_var.get().strip()
-                    if since:
-                        query += "AND date(j.posted_date) >= ? "
-                        params.append(since)
-                    query += "ORDER BY j.posted_date DESC"
-                    cur.execute(query, params)
-                    rows = cur.fetchall()
-                    conn.close()
-                    try:
-                        print(f"[DEBUG] show_search_jobs.refresh loaded {len(rows)} rows")
-                    except Exception:
-                        pass
-                    for it in tree.get_children():
-                        tree.delete(it)
-                    for r in rows:
-                        tree.insert('', 'end', values=r)
-                except Exception as e:
+                    load_facets()
+                except Exception:
+                    pass
+                show_page(0)
+
+            def show_page_first():
+                page_state['cursors'] = [None]
+                show_page(0)
+
+            def schedule_refresh(*_):
+                # Debounce keystrokes so typing a keyword runs one search, not one per character
+                if page_state['pending'] is not None:
                     try:
-                        messagebox.showerror("Jobs", f"Failed to search jobs: {str(e)}")
+                        win.after_cancel(page_state['pending'])
                     except Exception:
                         pass
+                page_state['pending'] = win.after(250, refresh)
 
             def get_selected_job_id():
                 sel = tree.selection()
@@ -23112,21 +23672,16 @@ def show_create_contract(self):
                     messagebox.showinfo("Jobs", "Select a job to view details.")
                     return
                 try:
-                    conn = self.db_manager.create_connection()
-                    cur = conn.cursor()
-                    cur.execute(
-                        "SELECT j.title, j.description, COALESCE(u.full_name,u.username), j.location, j.salary_range, j.requirements, j.posted_date, j.deadline, j.status "
-                        "FROM jobs j JOIN users u ON u.id = j.employer_id WHERE j.id = ?",
-                        (jid,)
-                    )
-                    r = cur.fetchone(); conn.close()
-                    if not r:
+                    # Served from the cached result page; only queries when the page was evicted
+                    job = svc.get_job(jid)
+                    if not job:
                         messagebox.showerror("Jobs", "Job not found.")
                         return
-                    title, desc, employer, loc, salary, reqs, posted, deadline, status = r
                     info = (
-                        f"Title: {title}\nEmployer: {employer}\nLocation: {loc or ''}\nSalary: {salary or ''}\n"
-                        f"Posted: {posted or ''}\nDeadline: {deadline or ''}\nStatus: {status}\n\nDescription:\n{desc or ''}\n\nRequirements:\n{reqs or ''}"
+                        f"Title: {job['title']}\nEmployer: {job['employer']}\nLocation: {job['location'] or ''}\n"
+                        f"Type: {job['job_type'] or ''}\nSalary: {job['salary_range'] or ''}\n"
+                        f"Posted: {job['posted_date'] or ''}\nDeadline: {job['deadline'] or ''}\nStatus: {job['status']}\n\n"
+                        f"Description:\n{job['description'] or ''}\n\nRequirements:\n{job['requirements'] or ''}"
                     )
                     # Show in a scrollable text window
                     d = tk.Toplevel(win); d.title("Job Details"); d.geometry("600x500"); d.configure(bg='white'); d.grab_set(); d.transient(win)
@@ -23200,8 +23755,11 @@ def show_create_contract(self):
             view_btn.config(command=view_details)
             apply_btn.config(command=apply_to_job)
             refresh_btn.config(command=refresh)
-            q_var.trace('w', lambda *a: refresh())
+            q_var.trace('w', schedule_refresh)
             status_var.trace('w', lambda *a: refresh())
+            for _cb in (loc_cb, type_cb, salary_cb):
+                _cb.bind('<<ComboboxSelected>>', lambda e: show_page_first())
+            loc_cb.bind('<Return>', lambda e: show_page_first())
 
             # Initial load
             refresh()
@@ -23379,10 +23937,11 @@ def show_create_contract(self):
                     if not rp:
                         messagebox.showinfo("Applications", "No resume associated with this application.")
                         return
-                    if not os.path.exists(rp):
+                    path = self._resume_file(rp)
+                    if not path:
                         messagebox.showerror("Applications", "The stored resume file was not found.")
                         return
-                    os.startfile(rp)
+                    os.startfile(path)
                 except Exception as e:
                     messagebox.showerror("Applications", f"Failed to open resume: {str(e)}")
 
@@ -23609,10 +24168,11 @@ def show_create_contract(self):
                                 datetime.strptime(dls, '%Y-%m-%d')
                             except Exception:
                                 messagebox.showerror("Validation", "Deadline must be YYYY-MM-DD"); return
+                        from job_search import salary_band
                         conn = self.db_manager.create_connection(); cur = conn.cursor()
                         cur.execute(
-                            "UPDATE jobs SET title=?, location=?, salary_range=?, deadline=?, status=?, description=?, requirements=? WHERE id=?",
-                            (title_var.get().strip(), loc_var.get().strip(), sal_var.get().strip(), dls if dls else None, st_var.get(), desc_txt.get('1.0','end-1c').strip(), req_txt.get('1.0','end-1c').strip(), jid)
+                            "UPDATE jobs SET title=?, location=?, salary_range=?, salary_band=?, deadline=?, status=?, description=?, requirements=? WHERE id=?",
+                            (title_var.get().strip(), loc_var.get().strip(), sal_var.get().strip(), salary_band(sal_var.get().strip()), dls if dls else None, st_var.get(), desc_txt.get('1.0','end-1c').strip(), req_txt.get('1.0','end-1c').strip(), jid)
                         )
                         conn.commit(); conn.close()
                         try:
@@ -23804,8 +24364,9 @@ def show_create_contract(self):
                     st = status_var.get()
                     q = search_var.get().strip()
                     conn = self.db_manager.create_connection(); cur = conn.cursor()
+                    from attachments import label_sql
                     query = (
-                        "SELECT ja.id, j.title, COALESCE(u.full_name,u.username) AS applicant, ja.application_date, ja.status, ja.resume_path, substr(ja.cover_letter,1,50) "
+                        "SELECT ja.id, j.title, COALESCE(u.full_name,u.username) AS applicant, ja.application_date, ja.status, " + label_sql('ja.resume_path') + ", substr(ja.cover_letter,1,50) "
                         "FROM job_applications ja JOIN jobs j ON j.id = ja.job_id JOIN users u ON u.id = ja.applicant_id WHERE 1=1 "
                     )
                     params = []
@@ -23848,9 +24409,12 @@ def show_create_contract(self):
                 if not app_id:
                     return
                 try:
+                    from notifications import application_status, wake
                     conn = self.db_manager.create_connection(); cur = conn.cursor()
                     cur.execute("UPDATE job_applications SET status=? WHERE id=?", (new_status, app_id))
+                    application_status(cur, app_id, new_status)
                     conn.commit(); conn.close()
+                    wake()
                     try:
                         self.log_audit_action(self.current_user['id'], "Update Application Status", f"{app_id} -> {new_status}")
                     except Exception:
@@ -23874,10 +24438,11 @@ def show_create_contract(self):
                     if not rp:
                         messagebox.showinfo("Resume", "No resume uploaded for this application.")
                         return
-                    if not os.path.exists(rp):
+                    path = self._resume_file(rp)
+                    if not path:
                         messagebox.showerror("Resume", "The stored resume file was not found.")
                         return
-                    os.startfile(rp)
+                    os.startfile(path)
                 except Exception as e:
                     try:
                         messagebox.showerror("Resume", f"Failed to open resume: {str(e)}")
@@ -24093,9 +24658,12 @@ def show_create_contract(self):
                 notes = notes_txt.get('1.0','end-1c').strip()
                 try:
                     # For now, store the schedule as a status update to 'Interview' and write to audit log with details
+                    from notifications import interview_scheduled, wake
                     conn = self.db_manager.create_connection(); cur = conn.cursor()
                     cur.execute("UPDATE job_applications SET status='Interview' WHERE id=?", (app_id,))
+                    interview_scheduled(cur, app_id, scheduled_dt, location, notes)
                     conn.commit(); conn.close()
+                    wake()
                     details = json.dumps({
                         'application_id': app_id,
                         'scheduled_at': scheduled_dt,
@@ -24141,6 +24709,10 @@ def show_create_contract(self):
 
 # Initialize and run the application
 if __name__ == "__main__":
+    # Required for the background PDF renderer when frozen with PyInstaller
+    import multiprocessing
+    multiprocessing.freeze_support()
+
     # Create default admin users if they don't exist
     db_manager = DatabaseManager()
     security_manager = SecurityManager()
@@ -24789,31 +25361,27 @@ def show_transfer_products(self):
         src_id = int(source_store_var.get().split(" - ")[0])
         dst_id = int(dest_store_var.get().split(" - ")[0])
         try:
-            conn = self.db_manager.create_connection(); cur = conn.cursor()
-            # For each item: decrement from src inventory, increment/add to dst inventory
-            for item in current_transfer_items:
-                # Get material_id by joining inventory id
-                cur.execute("SELECT material_id FROM inventory WHERE id=?", (item['item_id'],))
-                row = cur.fetchone()
-                if not row:
-                    raise Exception("Inventory item not found")
-                mat_id = row[0]
-                qty = float(item['quantity'])
-                # Decrement source
-                cur.execute("UPDATE inventory SET quantity = quantity - ?, last_updated=? WHERE id=? AND store_id=?",
-                            (qty, datetime.now().isoformat(sep=' '), item['item_id'], src_id))
-                # Increment destination: if not exists, create with same price/uom
-                cur.execute("SELECT id FROM inventory WHERE store_id=? AND material_id=?", (dst_id, mat_id))
-                dst_row = cur.fetchone()
-                if dst_row:
-                    cur.execute("UPDATE inventory SET quantity = quantity + ?, last_updated=? WHERE id=?",
-                                (qty, datetime.now().isoformat(sep=' '), dst_row[0]))
-                else:
-                    cur.execute("SELECT unit, ? as price FROM building_materials WHERE id=?", (item['unit_price'], mat_id))
-                    uom = item['uom']
-                    cur.execute("INSERT INTO inventory (store_id, material_id, quantity, unit_price, last_updated) VALUES (?,?,?,?,?)",
-                                (dst_id, mat_id, qty, item['unit_price'], datetime.now().isoformat(sep=' ')))
-            conn.commit(); conn.close()
+            conn = self.db_manager.create_connection()
+            try:
+                items = []
+                for item in current_transfer_items:
+                    row = conn.execute("SELECT bm.name FROM inventory i JOIN building_materials bm ON bm.id = i.material_id "
+                                       "WHERE i.id = ? AND i.store_id = ?", (item['item_id'], src_id)).fetchone()
+                    if not row:
+                        raise Exception("Inventory item not found")
+                    items.append({'material': row[0], 'quantity': float(item['quantity']), 'unit': item['uom'],
+                                  'unit_price': item['unit_price'], 'total': item['total'],
+                                  'reason': item['reason'], 'notes': item['notes']})
+            finally:
+                conn.close()
+            now = datetime.now()
+            reference = f"TR-{now.strftime('%Y%m%d-%H%M%S')}-{self.current_user['id']}"
+            # Journaled first so the transfer survives a lost connection (offline_journal.py)
+            outcome = self.db_manager.submit_operation(
+                'transfer', {'source_id': src_id, 'dest_id': dst_id, 'items': items, 'reference': reference,
+                             'signature_name': self.current_user.get('full_name')
+                             or self.current_user.get('username') or 'User'},
+                self.current_user['id'])
             try:
                 self.log_audit_action(self.current_user['id'], "Transfer Products",
                                       json.dumps({
@@ -24823,7 +25391,11 @@ def show_transfer_products(self):
                                       }))
             except Exception:
                 pass
-            messagebox.showinfo("Transfer", "Transfer completed successfully")
+            if outcome['status'] == 'queued':
+                messagebox.showinfo("Transfer", f"The server is unreachable. Transfer {reference} was saved on this "
+                                                f"terminal and will be sent automatically.")
+            else:
+                messagebox.showinfo("Transfer", f"Transfer {reference} completed successfully")
             # Clear list and refresh views
             clear_transfer_list(); load_inventory(); load_transfer_history(); load_pending_transfers()
         except Exception as e:
@@ -112,4 +112,7 @@ def main():
 
 
 if __name__ == "__main__":
+    # Required for the background PDF renderer when frozen with PyInstaller
+    import multiprocessing
+    multiprocessing.freeze_support()
     main()
@@ -0,0 +1,489 @@
+"""
+Content-addressed attachment store
+
+Files attached to records (resumes, contract signatures) are kept on disk
+under their SHA-256, next to the database, and described by rows of the
+``attachments`` table. The same file uploaded twice is stored once, and the
+records themselves only hold an id, so contract rows no longer carry
+signature BLOBs that every contract query has to step over.
+
+Layout of the store root (``attachments/`` next to the database unless
+``config.ATTACHMENTS['root']`` says otherwise; terminals on a remote database
+must point it at a shared folder)::
+
+    objects/ab/ab12...      file contents, named by their SHA-256
+    files/ab12.../name.pdf  named copies for opening with the OS
+    thumbs/ab12...-256.png  thumbnails, made the first time they are asked for
+    tmp/                    uploads in progress
+
+* :class:`AttachmentStore` writes and reads the files. Writes are streamed
+  through the hash into a temporary file and renamed into place, so a
+  partial upload is never visible under a hash; reads are streamed too.
+* :func:`add`, :func:`get`, :func:`latest` and :func:`remove` manage the
+  ``attachments`` rows; :func:`resolve` turns a stored reference
+  (``attachment:<id>``, or a legacy file path) into a path to open.
+* :func:`collect_garbage` deletes files no row refers to any more; the
+  ``collect_attachments`` maintenance task runs it.
+* :func:`ensure_schema` creates the table and moves existing signature BLOBs
+  and resume files into the store.
+"""
+
+import hashlib
+import io
+import mimetypes
+import os
+import re
+import shutil
+import sqlite3
+import tempfile
+import time
+from typing import Any, BinaryIO, Dict, Iterator, List, Optional, Tuple
+
+try:
+    from config import ATTACHMENTS as SETTINGS
+except Exception:
+    SETTINGS = {'root': None, 'max_mb': 25, 'thumbnail_px': 256, 'orphan_grace_s': 3600}
+
+REF_PREFIX = 'attachment:'
+CHUNK_SIZE = 1 << 16
+
+# contracts column -> signature id column that replaces it
+SIGNATURE_COLUMNS = {
+    'owner_signature': 'owner_signature_id',
+    'contractor_signature': 'contractor_signature_id',
+}
+
+_SHA_RE = re.compile(r'^[0-9a-f]{64}$')
+_UNSAFE_NAME_RE = re.compile(r'[^\w.\- ()]+')
+_MAGIC = (
+    (b'\x89PNG\r\n\x1a\n', 'image/png'),
+    (b'\xff\xd8\xff', 'image/jpeg'),
+    (b'GIF8', 'image/gif'),
+    (b'%PDF', 'application/pdf'),
+)
+_THUMBNAIL_TYPES = ('image/png', 'image/jpeg', 'image/gif', 'image/bmp')
+
+
+class AttachmentTooLarge(ValueError):
+    """The file is larger than ``ATTACHMENTS['max_mb']``."""
+
+
+def _check_sha(sha256: str) -> str:
+    if not _SHA_RE.match(sha256 or ''):
+        raise ValueError(f"not a SHA-256: {sha256!r}")
+    return sha256
+
+
+def guess_mime(filename: Optional[str], head: bytes = b'') -> str:
+    """MIME type from the first bytes of a file, else its name."""
+    for magic, mime in _MAGIC:
+        if head.startswith(magic):
+            return mime
+    guessed = mimetypes.guess_type(filename or '')[0]
+    if guessed:
+        return guessed
+    try:
+        head.decode('utf-8')
+        return 'text/plain' if head else 'application/octet-stream'
+    except UnicodeDecodeError:
+        return 'application/octet-stream'
+
+
+class AttachmentStore:
+    """Files under ``root``, addressed by SHA-256.
+
+    Args:
+        root: Directory of the store (created on first write).
+        settings: Overrides for ``config.ATTACHMENTS``.
+    """
+
+    def __init__(self, root: str, settings: Optional[Dict[str, Any]] = None):
+        self.root = os.path.abspath(root)
+        self.settings = dict(SETTINGS, **(settings or {}))
+
+    @classmethod
+    def for_database(cls, db_path: str, settings: Optional[Dict[str, Any]] = None) -> 'AttachmentStore':
+        """The store of a database file: ``ATTACHMENTS['root']`` or ``attachments/`` beside it."""
+        merged = dict(SETTINGS, **(settings or {}))
+        root = merged.get('root') or os.path.join(os.path.dirname(os.path.abspath(db_path)), 'attachments')
+        return cls(root, merged)
+
+    @property
+    def max_bytes(self) -> int:
+        return int(float(self.settings.get('max_mb', 25)) * 1024 * 1024)
+
+    def object_path(self, sha256: str) -> str:
+        _check_sha(sha256)
+        return os.path.join(self.root, 'objects', sha256[:2], sha256)
+
+    def exists(self, sha256: str) -> bool:
+        return os.path.isfile(self.object_path(sha256))
+
+    # ---- writing ----
+    def put_stream(self, stream: BinaryIO) -> Tuple[str, int]:
+        """Store the contents of a binary stream; returns ``(sha256, size)``.
+
+        Raises:
+            AttachmentTooLarge: The stream is longer than the configured limit.
+        """
+        tmp_dir = os.path.join(self.root, 'tmp')
+        os.makedirs(tmp_dir, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=tmp_dir, suffix='.part')
+        digest = hashlib.sha256()
+        size = 0
+        limit = self.max_bytes
+        try:
+            with os.fdopen(fd, 'wb') as out:
+                while True:
+                    chunk = stream.read(CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    size += len(chunk)
+                    if limit and size > limit:
+                        raise AttachmentTooLarge(f"file is larger than {limit // (1024 * 1024)} MB")
+                    digest.update(chunk)
+                    out.write(chunk)
+                out.flush()
+                os.fsync(out.fileno())
+            sha256 = digest.hexdigest()
+            final = self.object_path(sha256)
+            try:
+                # Already stored: deduplicated. Touching it restarts collect_garbage's grace period,
+                # which protects the row about to reference it until that row commits.
+                os.utime(final, None)
+                os.remove(tmp_path)
+            except FileNotFoundError:
+                os.makedirs(os.path.dirname(final), exist_ok=True)
+                os.replace(tmp_path, final)
+            return sha256, size
+        except BaseException:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            raise
+
+    def put_file(self, path: str) -> Tuple[str, int]:
+        with open(path, 'rb') as f:
+            return self.put_stream(f)
+
+    def put_bytes(self, data: bytes) -> Tuple[str, int]:
+        return self.put_stream(io.BytesIO(data))
+
+    # ---- reading ----
+    def open(self, sha256: str) -> BinaryIO:
+        """The stored file, opened for binary reading (raises FileNotFoundError when missing)."""
+        return open(self.object_path(sha256), 'rb')
+
+    def iter_chunks(self, sha256: str, chunk_size: int = CHUNK_SIZE) -> Iterator[bytes]:
+        with self.open(sha256) as f:
+            while True:
+                chunk = f.read(chunk_size)
+                if not chunk:
+                    return
+                yield chunk
+
+    def read_head(self, sha256: str, size: int = 4096) -> bytes:
+        with self.open(sha256) as f:
+            return f.read(size)
+
+    def verify(self, sha256: str) -> bool:
+        """True when the file still hashes to its name."""
+        digest = hashlib.sha256()
+        for chunk in self.iter_chunks(sha256):
+            digest.update(chunk)
+        return digest.hexdigest() == sha256
+
+    def export(self, sha256: str, filename: Optional[str] = None) -> str:
+        """Path of a copy named ``filename`` (for opening with the default program), made on first use.
+
+        Always a real copy, never a link: a program that saves the file in place must not
+        change the stored object, which every deduplicated reference shares.
+        """
+        name = _UNSAFE_NAME_RE.sub('_', os.path.basename(filename or '')).strip(' .') or sha256[:16]
+        target = os.path.join(self.root, 'files', _check_sha(sha256), name)
+        source = self.object_path(sha256)
+        # Copies made by earlier versions were hard links to the object; replace them
+        if not os.path.exists(target) or os.path.samefile(source, target):
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            tmp = target + '.part'
+            shutil.copyfile(source, tmp)
+            os.replace(tmp, target)
+        return target
+
+    def thumbnail(self, sha256: str, max_px: Optional[int] = None) -> Optional[str]:
+        """PNG thumbnail of a stored image, made the first time it is asked for.
+
+        Returns None for files that are not images or when Pillow is not installed.
+        """
+        max_px = int(max_px or self.settings.get('thumbnail_px', 256))
+        target = os.path.join(self.root, 'thumbs', f"{_check_sha(sha256)}-{max_px}.png")
+        if os.path.exists(target):
+            return target
+        if guess_mime(None, self.read_head(sha256, 16)) not in _THUMBNAIL_TYPES:
+            return None
+        try:
+            from PIL import Image
+        except ImportError:
+            return None
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        tmp = target + '.part'
+        with self.open(sha256) as f, Image.open(f) as image:
+            image.thumbnail((max_px, max_px))
+            image.save(tmp, format='PNG')
+        os.replace(tmp, target)
+        return target
+
+    def preview_text(self, sha256: str, limit: int = 500) -> Optional[str]:
+        """Start of a stored text file, or None for binary files."""
+        head = self.read_head(sha256, limit * 4)
+        if guess_mime(None, head) != 'text/plain':
+            return None
+        return head.decode('utf-8', errors='ignore')[:limit]
+
+    # ---- housekeeping ----
+    def stored_hashes(self) -> Iterator[str]:
+        objects = os.path.join(self.root, 'objects')
+        if not os.path.isdir(objects):
+            return
+        for prefix in os.listdir(objects):
+            folder = os.path.join(objects, prefix)
+            if os.path.isdir(folder):
+                for name in os.listdir(folder):
+                    if _SHA_RE.match(name):
+                        yield name
+
+    def delete(self, sha256: str) -> None:
+        """Remove a file and everything derived from it."""
+        for path in (self.object_path(sha256),
+                     *(os.path.join(self.root, 'thumbs', n) for n in self._thumbs_of(sha256))):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+        shutil.rmtree(os.path.join(self.root, 'files', sha256), ignore_errors=True)
+        try:
+            os.rmdir(os.path.dirname(self.object_path(sha256)))
+        except OSError:
+            pass   # other files share the folder
+
+    def _thumbs_of(self, sha256: str) -> List[str]:
+        folder = os.path.join(self.root, 'thumbs')
+        return [n for n in os.listdir(folder) if n.startswith(sha256 + '-')] if os.path.isdir(folder) else []
+
+
+# ---- metadata ----
+
+def ensure_schema(conn: sqlite3.Connection, store: Optional[AttachmentStore] = None) -> Dict[str, int]:
+    """Create ``attachments`` and the contract signature id columns (idempotent).
+
+    With a ``store``, signature BLOBs still in ``contracts`` and resume files
+    still referenced by path are moved into it; returns how many of each.
+    """
+    cur = conn.cursor()
+    cur.execute('''
+                CREATE TABLE IF NOT EXISTS attachments
+                (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    sha256 TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    mime_type TEXT,
+                    filename TEXT,
+                    owner_table TEXT NOT NULL,
+                    owner_id INTEGER NOT NULL,
+                    kind TEXT NOT NULL,
+                    uploaded_by INTEGER,
+                    created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+                )
+                ''')
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_attachments_owner ON attachments(owner_table, owner_id, kind)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_attachments_sha ON attachments(sha256)")
+    columns = {r[1] for r in cur.execute("PRAGMA table_info(contracts)")}
+    for id_column in SIGNATURE_COLUMNS.values():
+        if columns and id_column not in columns:
+            cur.execute(f"ALTER TABLE contracts ADD COLUMN {id_column} INTEGER")
+    moved = {'signatures': 0, 'resumes': 0}
+    if store is not None and columns:
+        moved['signatures'] = _move_signature_blobs(conn, store, columns)
+        moved['resumes'] = _move_resume_files(conn, store)
+    return moved
+
+
+def _move_signature_blobs(conn: sqlite3.Connection, store: AttachmentStore, columns) -> int:
+    moved = 0
+    for blob_column, id_column in SIGNATURE_COLUMNS.items():
+        if blob_column not in columns:
+            continue
+        # One row at a time: only a single signature is held in memory
+        ids = [r[0] for r in conn.execute(f"SELECT id FROM contracts WHERE {blob_column} IS NOT NULL")]
+        for contract_id in ids:
+            row = conn.execute(f"SELECT {blob_column}, {id_column} FROM contracts WHERE id = ?",
+                               (contract_id,)).fetchone()
+            value, existing = row
+            if existing is None:
+                data = value.encode('utf-8') if isinstance(value, str) else bytes(value)
+                mime_type = guess_mime(None, data[:512])
+                attachment_id = add(conn, store, 'contracts', contract_id, blob_column, data=data,
+                                    filename=blob_column + (mimetypes.guess_extension(mime_type) or ''),
+                                    mime_type=mime_type)
+                conn.execute(f"UPDATE contracts SET {id_column} = ? WHERE id = ?", (attachment_id, contract_id))
+            conn.execute(f"UPDATE contracts SET {blob_column} = NULL WHERE id = ?", (contract_id,))
+            moved += 1
+    return moved
+
+
+def _move_resume_files(conn: sqlite3.Connection, store: AttachmentStore) -> int:
+    """Copy resume files saved by path into the store; the original files are left where they are."""
+    if not any(r[1] == 'resume_path' for r in conn.execute("PRAGMA table_info(users)")):
+        return 0
+    moved = 0
+    rows = conn.execute("SELECT id, resume_path FROM users WHERE resume_path IS NOT NULL "
+                        "AND resume_path NOT LIKE ?", (REF_PREFIX + '%',)).fetchall()
+    for user_id, path in rows:
+        if not os.path.isfile(path):
+            continue
+        try:
+            attachment_id = add(conn, store, 'users', user_id, 'resume', path=path)
+        except (OSError, AttachmentTooLarge) as e:
+            print(f"[WARN] Resume of user {user_id} not moved to the attachment store: {e}")
+            continue
+        ref = reference(attachment_id)
+        conn.execute("UPDATE users SET resume_path = ? WHERE id = ?", (ref, user_id))
+        conn.execute("UPDATE job_applications SET resume_path = ? WHERE resume_path = ?", (ref, path))
+        moved += 1
+    return moved
+
+
+def add(conn: sqlite3.Connection, store: AttachmentStore, owner_table: str, owner_id: int, kind: str,
+        path: Optional[str] = None, data: Optional[bytes] = None, stream: Optional[BinaryIO] = None,
+        filename: Optional[str] = None, mime_type: Optional[str] = None,
+        uploaded_by: Optional[int] = None) -> int:
+    """Store a file (``path``, ``data`` or ``stream``) and record it; returns the attachment id.
+
+    The row is written on ``conn`` without committing, so it can share the
+    caller's transaction; if that rolls back, the file is collected later.
+    """
+    if path is not None:
+        sha256, size = store.put_file(path)
+        filename = filename or os.path.basename(path)
+    elif data is not None:
+        sha256, size = store.put_bytes(data)
+    elif stream is not None:
+        sha256, size = store.put_stream(stream)
+    else:
+        raise ValueError("add() needs a path, data or stream")
+    if mime_type is None:
+        mime_type = guess_mime(filename, store.read_head(sha256, 512))
+    cur = conn.execute(
+        "INSERT INTO attachments (sha256, size, mime_type, filename, owner_table, owner_id, kind, uploaded_by) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+        (sha256, size, mime_type, filename, owner_table, owner_id, kind, uploaded_by))
+    return cur.lastrowid
+
+
+_COLUMNS = ('id', 'sha256', 'size', 'mime_type', 'filename', 'owner_table', 'owner_id', 'kind', 'uploaded_by',
+            'created_at')
+_SELECT = f"SELECT {', '.join(_COLUMNS)} FROM attachments"
+
+
+def get(conn: sqlite3.Connection, attachment_id: int) -> Optional[Dict[str, Any]]:
+    row = conn.execute(_SELECT + " WHERE id = ?", (attachment_id,)).fetchone()
+    return dict(zip(_COLUMNS, row)) if row else None
+
+
+def latest(conn: sqlite3.Connection, owner_table: str, owner_id: int, kind: str) -> Optional[Dict[str, Any]]:
+    """Newest attachment of a kind on a record."""
+    row = conn.execute(_SELECT + " WHERE owner_table = ? AND owner_id = ? AND kind = ? ORDER BY id DESC LIMIT 1",
+                       (owner_table, owner_id, kind)).fetchone()
+    return dict(zip(_COLUMNS, row)) if row else None
+
+
+def list_for(conn: sqlite3.Connection, owner_table: str, owner_id: int) -> List[Dict[str, Any]]:
+    rows = conn.execute(_SELECT + " WHERE owner_table = ? AND owner_id = ? ORDER BY id",
+                        (owner_table, owner_id)).fetchall()
+    return [dict(zip(_COLUMNS, r)) for r in rows]
+
+
+def remove(conn: sqlite3.Connection, attachment_id: int) -> None:
+    """Delete the row; the file goes with the next garbage collection if nothing else uses it."""
+    conn.execute("DELETE FROM attachments WHERE id = ?", (attachment_id,))
+
+
+def reference(attachment_id: int) -> str:
+    """Value stored in path columns (``users.resume_path``) for an attachment."""
+    return f"{REF_PREFIX}{int(attachment_id)}"
+
+
+def parse_reference(value: Optional[str]) -> Optional[int]:
+    if isinstance(value, str) and value.startswith(REF_PREFIX):
+        try:
+            return int(value[len(REF_PREFIX):])
+        except ValueError:
+            return None
+    return None
+
+
+def label_sql(column: str) -> str:
+    """SQL expression showing the file name of a reference held in ``column`` (legacy paths unchanged)."""
+    return (f"CASE WHEN {column} LIKE '{REF_PREFIX}%' THEN (SELECT a.filename FROM attachments a "
+            f"WHERE a.id = CAST(substr({column}, {len(REF_PREFIX) + 1}) AS INTEGER)) ELSE {column} END")
+
+
+def resolve(conn: sqlite3.Connection, store: AttachmentStore, value: Optional[str]) -> Optional[str]:
+    """Openable path for a stored reference or legacy file path; None when the file is gone."""
+    if not value:
+        return None
+    attachment_id = parse_reference(value)
+    if attachment_id is None:
+        return value if os.path.exists(value) else None
+    meta = get(conn, attachment_id)
+    if not meta or not store.exists(meta['sha256']):
+        return None
+    return store.export(meta['sha256'], meta['filename'])
+
+
+# ---- garbage collection ----
+
+def collect_garbage(conn: sqlite3.Connection, store: AttachmentStore,
+                    grace_s: Optional[float] = None) -> Dict[str, int]:
+    """Delete stored files no ``attachments`` row refers to, and stale upload leftovers.
+
+    Files younger than ``grace_s`` are kept: their row may be in a transaction
+    that has not committed yet.
+    """
+    grace_s = float(store.settings.get('orphan_grace_s', 3600) if grace_s is None else grace_s)
+    cutoff = time.time() - grace_s
+    referenced = {r[0] for r in conn.execute("SELECT DISTINCT sha256 FROM attachments")}
+    removed = kept = freed = 0
+    for sha256 in list(store.stored_hashes()):
+        if sha256 in referenced:
+            kept += 1
+            continue
+        path = store.object_path(sha256)
+        try:
+            stat = os.stat(path)
+        except OSError:
+            continue
+        if stat.st_mtime > cutoff:
+            kept += 1
+            continue
+        store.delete(sha256)
+        removed += 1
+        freed += stat.st_size
+    tmp_dir = os.path.join(store.root, 'tmp')
+    if os.path.isdir(tmp_dir):
+        for name in os.listdir(tmp_dir):
+            path = os.path.join(tmp_dir, name)
+            try:
+                if os.path.getmtime(path) < cutoff:
+                    os.remove(path)
+            except OSError:
+                pass
+    return {'removed': removed, 'kept': kept, 'freed_bytes': freed}
+
+
+def run_collect(conn: sqlite3.Connection, db_path: str) -> str:
+    """``collect_attachments`` maintenance task."""
+    result = collect_garbage(conn, AttachmentStore.for_database(db_path))
+    return (f"{result['removed']} unused files removed ({result['freed_bytes'] / (1024 * 1024):.1f} MB), "
+            f"{result['kept']} kept")
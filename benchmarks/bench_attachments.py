@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+Contract signatures as BLOBs versus the attachment store.
+
+On a copy of a database generated by seed_data.py, every contract is given
+owner and contractor signature images of ``--signature-kb`` KB in the legacy
+BLOB columns. Reported:
+
+* contract list - a list query reading columns stored after the BLOBs
+  (``contract_kind``, ``includes_materials``), with the BLOBs in the rows and
+  again after ``attachments.ensure_schema`` has moved them out and the file
+  has been vacuumed;
+* migration - time to move the BLOBs into the store, and the bytes on disk
+  (identical signatures are stored once);
+* upload - streaming a file of ``--upload-mb`` MB into the store, cold and
+  again for the same file (deduplicated).
+
+Usage (PowerShell examples):
+  py .\\benchmarks\\bench_attachments.py --scale small
+  py .\\benchmarks\\bench_attachments.py --scale medium --signature-kb 80 --json attachments.json
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import datetime
+from typing import Callable
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import seed_data  # noqa: E402
+from bench_queries import DEFAULT_DATA_DIR, connect, ensure_database  # noqa: E402
+import attachments  # noqa: E402
+
+LIST_SQL = '''
+    SELECT c.id, c.title, COALESCE(u.full_name, 'Not Assigned'), COALESCE(c.contract_kind, 'Labour Only'),
+           COALESCE(c.includes_materials, 0), c.budget, c.status, c.created_date
+    FROM contracts c LEFT JOIN users u ON c.contractor_id = u.id
+    ORDER BY c.created_date DESC
+'''
+PNG_HEADER = b'\x89PNG\r\n\x1a\n'
+
+
+def best_of(fn: Callable[[], object], repeat: int) -> float:
+    best = float('inf')
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def add_signature_blobs(conn: sqlite3.Connection, kb: int, seed: int) -> int:
+    """Signature images in the legacy columns; owners reuse one image across their contracts."""
+    rng = random.Random(seed)
+    images = {}
+
+    def image(key):
+        if key not in images:
+            images[key] = PNG_HEADER + rng.randbytes(kb * 1024 - len(PNG_HEADER))
+        return images[key]
+
+    rows = conn.execute("SELECT id, contract_owner_id, contractor_id FROM contracts").fetchall()
+    for contract_id, owner_id, contractor_id in rows:
+        conn.execute("UPDATE contracts SET owner_signature = ?, contractor_signature = ?, owner_signature_id = NULL, "
+                     "contractor_signature_id = NULL WHERE id = ?",
+                     (image(('owner', owner_id)), image(('contractor', contractor_id or contract_id)), contract_id))
+    conn.commit()
+    return len(rows)
+
+
+def folder_size(path: str) -> int:
+    return sum(os.path.getsize(os.path.join(d, f)) for d, _, files in os.walk(path) for f in files)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark contract signature BLOBs against the attachment store.")
+    parser.add_argument('--scale', default='small', help=f"Scale preset ({', '.join(seed_data.SCALES)}) or factor")
+    parser.add_argument('--repeat', type=int, default=10, help='Timed repetitions (best is reported)')
+    parser.add_argument('--signature-kb', type=int, default=40, help='Size of each signature image')
+    parser.add_argument('--upload-mb', type=int, default=20, help='Size of the streamed upload')
+    parser.add_argument('--data-dir', default=DEFAULT_DATA_DIR, help='Where generated databases are cached')
+    parser.add_argument('--seed', type=int, default=seed_data.DEFAULT_SEED, help='Data seed')
+    parser.add_argument('--json', help='Also write the results to this JSON file')
+    args = parser.parse_args()
+
+    source = ensure_database(args.data_dir, args.scale, args.seed)
+    tmp_dir = tempfile.mkdtemp(prefix='cbpm_attachments_')
+    report = {'created': datetime.now().isoformat(timespec='seconds'), 'python': platform.python_version(),
+              'sqlite': sqlite3.sqlite_version, 'platform': platform.platform(), 'scale': args.scale,
+              'signature_kb': args.signature_kb}
+    try:
+        db_path = os.path.join(tmp_dir, 'contracts.db')
+        shutil.copyfile(source, db_path)
+        store = attachments.AttachmentStore(os.path.join(tmp_dir, 'store'), {'max_mb': 0})
+        conn = connect(db_path)
+        attachments.ensure_schema(conn)
+        report['contracts'] = add_signature_blobs(conn, args.signature_kb, args.seed)
+        conn.execute("VACUUM")
+        report['db_mb_blobs'] = os.path.getsize(db_path) / (1024 * 1024)
+        report['list_blobs_s'] = best_of(lambda: conn.execute(LIST_SQL).fetchall(), args.repeat)
+
+        t0 = time.perf_counter()
+        moved = attachments.ensure_schema(conn, store)
+        conn.commit()
+        report['migration_s'] = time.perf_counter() - t0
+        report['moved'] = moved['signatures']
+        conn.execute("VACUUM")
+        report['db_mb_ids'] = os.path.getsize(db_path) / (1024 * 1024)
+        report['store_mb'] = folder_size(store.root) / (1024 * 1024)
+        report['list_ids_s'] = best_of(lambda: conn.execute(LIST_SQL).fetchall(), args.repeat)
+        conn.close()
+
+        upload = os.path.join(tmp_dir, 'upload.bin')
+        with open(upload, 'wb') as f:
+            for _ in range(args.upload_mb):
+                f.write(os.urandom(1024 * 1024))
+        t0 = time.perf_counter()
+        store.put_file(upload)
+        report['upload_cold_s'] = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        store.put_file(upload)
+        report['upload_dedup_s'] = time.perf_counter() - t0
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    print(f"scale {args.scale}: {report['contracts']} contracts, {args.signature_kb} KB signatures")
+    print(f"  contract list   BLOBs in rows {report['list_blobs_s'] * 1000:8.2f} ms   "
+          f"ids {report['list_ids_s'] * 1000:8.2f} ms")
+    print(f"  database        {report['db_mb_blobs']:.1f} MB -> {report['db_mb_ids']:.1f} MB; "
+          f"store {report['store_mb']:.1f} MB for {report['moved']} signatures ({report['migration_s']:.2f} s)")
+    print(f"  upload {args.upload_mb} MB    {report['upload_cold_s'] * 1000:.0f} ms, "
+          f"same file again {report['upload_dedup_s'] * 1000:.0f} ms")
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
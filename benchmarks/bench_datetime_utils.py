@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmarks for utils.DateTimeUtils and utils.DateParser.
+
+Compares the original strptime loop against the cached parser, the per-column
+format-sniffing parser and the cached formatter, on columns with many unique
+timestamps (cold cache) and with heavy repetition (warm cache).
+
+Usage (PowerShell examples):
+  py .\benchmarks\bench_datetime_utils.py
+  py .\benchmarks\bench_datetime_utils.py --values 200000
+"""
+import argparse
+import datetime
+import os
+import random
+import sys
+import time
+from typing import Callable, List, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils import DateParser, DateTimeUtils  # noqa: E402
+
+LEGACY_FORMATS = ['%Y-%m-%d', '%d/%m/%Y', '%m/%d/%Y', '%Y-%m-%d %H:%M:%S']
+
+
+def legacy_parse(date_str: str) -> Optional[datetime.datetime]:
+    """The pre-cache implementation of DateTimeUtils.parse_date."""
+    for fmt in LEGACY_FORMATS:
+        try:
+            return datetime.datetime.strptime(date_str, fmt)
+        except ValueError:
+            continue
+    return None
+
+
+def legacy_format(date_obj, format_str: str = '%d/%m/%Y') -> str:
+    """The pre-cache implementation of DateTimeUtils.format_date."""
+    if isinstance(date_obj, str):
+        try:
+            date_obj = datetime.datetime.fromisoformat(date_obj.replace('Z', '+00:00'))
+        except ValueError:
+            return date_obj
+    return date_obj.strftime(format_str)
+
+
+def make_column(n: int, fmt: str, distinct: int, seed: int = 7) -> List[str]:
+    rng = random.Random(seed)
+    base = datetime.datetime(2025, 1, 1)
+    pool = [(base + datetime.timedelta(seconds=rng.randint(0, 86400 * 365))).strftime(fmt) for _ in range(distinct)]
+    return [pool[rng.randrange(distinct)] for _ in range(n)]
+
+
+def timed(fn: Callable[[], object], repeat: int) -> float:
+    best = float('inf')
+    for _ in range(repeat):
+        DateTimeUtils.clear_caches()
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Micro-benchmarks for date parsing and formatting.")
+    parser.add_argument('--values', type=int, default=100_000, help='Values per column')
+    parser.add_argument('--repeat', type=int, default=3, help='Runs per measurement (best is reported)')
+    args = parser.parse_args()
+    n = args.values
+
+    columns = [
+        ('ISO datetime, all unique', make_column(n, '%Y-%m-%d %H:%M:%S', n)),
+        ('ISO datetime, 500 distinct', make_column(n, '%Y-%m-%d %H:%M:%S', 500)),
+        ('dd/mm/yyyy, 365 distinct', make_column(n, '%d/%m/%Y', 365)),
+        ('ISO date, 90 distinct', make_column(n, '%Y-%m-%d', 90)),
+    ]
+
+    print(f"{'column':<28} {'legacy (s)':>11} {'parse_date':>11} {'DateParser':>11} {'speedup':>8}")
+    for name, values in columns:
+        legacy_t = timed(lambda: [legacy_parse(v) for v in values], args.repeat)
+        cached_t = timed(lambda: [DateTimeUtils.parse_date(v) for v in values], args.repeat)
+        column_t = timed(lambda: DateParser().parse_many(values), args.repeat)
+        best = min(cached_t, column_t)
+        print(f"{name:<28} {legacy_t:>11.3f} {cached_t:>11.3f} {column_t:>11.3f} {legacy_t / best:>7.1f}x")
+
+    iso = make_column(n, '%Y-%m-%d %H:%M:%S', 500)
+    legacy_t = timed(lambda: [legacy_format(v) for v in iso], args.repeat)
+    cached_t = timed(lambda: [DateTimeUtils.format_date(v) for v in iso], args.repeat)
+    print(f"\n{'format_date, 500 distinct':<28} {legacy_t:>11.3f} {cached_t:>11.3f} {'':>11} {legacy_t / cached_t:>7.1f}x")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
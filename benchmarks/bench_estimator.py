@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Material Calculator: per-click price queries versus the BOM estimator.
+
+For ``--variants`` layouts (a length x width grid), on a database generated
+by seed_data.py, times:
+
+* old - what the calculator did per click: four ``name LIKE '%...%'`` price
+  queries and the fixed formulas (with its double ``fetchone()`` corrected,
+  since as written it raised for any material that existed);
+* estimator, cold - building the :class:`estimator.PriceIndex` (two queries)
+  and pricing every layout with ``estimate_many``;
+* estimator, cached - the same with the price index from the cache, as on
+  the next click or comparison;
+* a single layout, cached, as the Calculate button now does it.
+
+Usage (PowerShell examples):
+  py .\\benchmarks\\bench_estimator.py --scale medium
+  py .\\benchmarks\\bench_estimator.py --scale large --variants 400 --json estimator.json
+"""
+import argparse
+import json
+import os
+import platform
+import sqlite3
+import sys
+import time
+from datetime import datetime
+from typing import Callable, Dict, List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import seed_data  # noqa: E402
+from bench_queries import DEFAULT_DATA_DIR, connect, ensure_database  # noqa: E402
+import estimator  # noqa: E402
+
+
+def best_of(fn: Callable[[], object], repeat: int) -> float:
+    best = float('inf')
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def old_click(cur: sqlite3.Cursor, length: float, width: float, height: float) -> float:
+    floor_area = length * width
+    wall_area = 2 * (length + width) * height
+    cement_bags = int((floor_area * 0.5) + (wall_area * 0.3))
+    sand = floor_area * 0.15
+    gravel = floor_area * 0.2
+    blocks = int(wall_area * 8)
+    prices = []
+    for pattern, fallback in (('%Cement%', 6500), ('%Sand%', 15000), ('%Gravel%', 20000), ('%Block%', 350)):
+        cur.execute('SELECT standard_price FROM building_materials WHERE name LIKE ? LIMIT 1', (pattern,))
+        row = cur.fetchone()
+        prices.append(row[0] if row else fallback)
+    return cement_bags * prices[0] + sand * prices[1] + gravel * prices[2] + blocks * prices[3]
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the Material Calculator estimate.")
+    parser.add_argument('--scale', default='medium', help=f"Scale preset ({', '.join(seed_data.SCALES)}) or factor")
+    parser.add_argument('--variants', type=int, default=100, help='Layouts priced per comparison')
+    parser.add_argument('--repeat', type=int, default=10, help='Timed repetitions (best is reported)')
+    parser.add_argument('--data-dir', default=DEFAULT_DATA_DIR, help='Where generated databases are cached')
+    parser.add_argument('--seed', type=int, default=seed_data.DEFAULT_SEED, help='Data seed')
+    parser.add_argument('--json', help='Also write the results to this JSON file')
+    args = parser.parse_args()
+
+    db_path = ensure_database(args.data_dir, args.scale, args.seed)
+    side = max(1, int(args.variants ** 0.5))
+    variants = estimator.layout_grid('Two Story House', [8 + i for i in range(side)],
+                                     [6 + 0.5 * i for i in range(-(-args.variants // side))], 3.0)[:args.variants]
+    bom = estimator.BomEstimator()
+    conn = connect(db_path)
+    cur = conn.cursor()
+    report: Dict[str, object] = {'created': datetime.now().isoformat(timespec='seconds'),
+                                 'python': platform.python_version(), 'sqlite': sqlite3.sqlite_version,
+                                 'platform': platform.platform(), 'scale': args.scale, 'variants': len(variants),
+                                 'numpy': estimator.HAS_NUMPY,
+                                 'inventory_rows': cur.execute("SELECT COUNT(*) FROM inventory").fetchone()[0]}
+
+    def cold() -> List[dict]:
+        estimator.invalidate_prices()
+        return bom.estimate_many(variants, estimator.price_index(conn))
+
+    report['old_s'] = best_of(lambda: [old_click(cur, v['length'], v['width'], v['height']) for v in variants],
+                              args.repeat)
+    report['cold_s'] = best_of(cold, args.repeat)
+    report['cached_s'] = best_of(lambda: bom.estimate_many(variants, estimator.price_index(conn)), args.repeat)
+    report['single_s'] = best_of(lambda: bom.estimate(variants[0], estimator.price_index(conn)), args.repeat)
+    prices = estimator.price_index(conn)
+    report['price_sources'] = {k: prices.sources[k] for k in estimator.MATERIALS}
+    conn.close()
+
+    n = report['variants']
+    print(f"scale {args.scale}: {n} layouts, {report['inventory_rows']} inventory rows, "
+          f"NumPy {'yes' if estimator.HAS_NUMPY else 'no'}")
+    print(f"  old (4 LIKE queries per layout)   {report['old_s'] * 1000:8.2f} ms")
+    print(f"  estimator, price index built      {report['cold_s'] * 1000:8.2f} ms")
+    print(f"  estimator, price index cached     {report['cached_s'] * 1000:8.2f} ms")
+    print(f"  one layout, cached                {report['single_s'] * 1000:8.3f} ms")
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
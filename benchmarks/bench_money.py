@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+"""
+REAL versus INTEGER money columns.
+
+Builds two copies of the sales ledger of a database generated by seed_data.py
+in a throwaway file: one the way it used to be stored (``REAL`` totals of
+``quantity * unit_price``, with fractional prices and quantities), one in whole
+francs as money.py stores it. Reported:
+
+* month-end totals - time of ``SUM(total_amount) GROUP BY month`` on each;
+* drift - how far the REAL sums are from the exact sum of the same values;
+* row formatting - the old ``f"{float(v):,.0f}"`` loop against
+  ``money.format_rows`` on the transaction list;
+* migration - time of ``money.ensure_schema`` on a copy of the database with
+  its money columns declared REAL again.
+
+Usage (PowerShell examples):
+  py .\\benchmarks\\bench_money.py --scale small
+  py .\\benchmarks\\bench_money.py --scale medium --repeat 20 --json money.json
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import datetime
+from decimal import Decimal
+from typing import Callable, Dict
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import seed_data  # noqa: E402
+from bench_queries import DEFAULT_DATA_DIR, connect, ensure_database  # noqa: E402
+import money  # noqa: E402
+
+MONTHLY_SQL = "SELECT substr(transaction_date, 1, 7) AS m, SUM(total_amount) FROM {table} GROUP BY m ORDER BY m"
+
+
+def best_of(fn: Callable[[], object], repeat: int) -> float:
+    best = float('inf')
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def build_ledgers(conn: sqlite3.Connection, seed: int) -> int:
+    """``ledger_real`` and ``ledger_int`` with the same sales; returns the row count."""
+    rng = random.Random(seed)
+    rows = []
+    for tx_date, qty, price in conn.execute("SELECT transaction_date, quantity, unit_price FROM transactions"):
+        # Fractional quantities (metres, bags split on site) and prices as they were typed before the migration
+        qty = float(qty or 1) + rng.choice((0, 0, 0.25, 0.5))
+        price = float(price or 0) + rng.choice((0, 0.5, 0.35))
+        rows.append((tx_date, qty, price))
+    conn.execute("CREATE TABLE ledger_real (transaction_date TEXT, quantity REAL, unit_price REAL, total_amount REAL)")
+    conn.execute("CREATE TABLE ledger_int (transaction_date TEXT, quantity REAL, unit_price INTEGER, "
+                 "total_amount INTEGER)")
+    conn.executemany("INSERT INTO ledger_real VALUES (?, ?, ?, ?)", [(d, q, p, q * p) for d, q, p in rows])
+    conn.executemany("INSERT INTO ledger_int VALUES (?, ?, ?, ?)",
+                     [(d, q, money.to_amount(p), money.line_total(q, money.to_amount(p))) for d, q, p in rows])
+    conn.commit()
+    return len(rows)
+
+
+def drift(conn: sqlite3.Connection) -> Dict[str, float]:
+    """Largest and total difference between the REAL monthly sums and the exact sums of the stored values."""
+    exact: Dict[str, Decimal] = {}
+    for month, total in conn.execute("SELECT substr(transaction_date, 1, 7), total_amount FROM ledger_real"):
+        exact[month] = exact.get(month, Decimal(0)) + Decimal(total)
+    worst = total_drift = 0.0
+    for month, total in conn.execute(MONTHLY_SQL.format(table='ledger_real')):
+        off = abs(float(Decimal(total) - exact[month]))
+        worst = max(worst, off)
+        total_drift += off
+    return {'max_month_drift': worst, 'total_drift': total_drift}
+
+
+def old_format(rows):
+    out = []
+    for r in rows:
+        vals = list(r)
+        try:
+            vals[1] = int(vals[1]) if vals[1] is not None else ''
+        except Exception:
+            pass
+        for i in (2, 3):
+            try:
+                vals[i] = f"{float(vals[i]):,.0f}" if vals[i] is not None else ''
+            except Exception:
+                pass
+        out.append(vals)
+    return out
+
+
+def time_migration(source: str, tmp_dir: str) -> Dict[str, object]:
+    """Declare the money columns REAL again (as before the migration) and time ensure_schema."""
+    db_path = os.path.join(tmp_dir, 'legacy.db')
+    shutil.copyfile(source, db_path)
+    conn = connect(db_path)
+    conn.execute("PRAGMA writable_schema=ON")
+    for table, columns in money.MONEY_COLUMNS.items():
+        for column in columns:
+            conn.execute("UPDATE sqlite_master SET sql = replace(sql, ?, ?) WHERE type = 'table' AND name = ?",
+                         (f"{column} INTEGER", f"{column} REAL", table))
+    conn.execute("PRAGMA writable_schema=OFF")
+    conn.commit()
+    conn.close()
+    conn = connect(db_path)
+    pending = sum(len(c) for c in money.pending_migrations(conn).values())
+    t0 = time.perf_counter()
+    tables = money.ensure_schema(conn)
+    seconds = time.perf_counter() - t0
+    ok = conn.execute("PRAGMA integrity_check").fetchone()[0]
+    conn.close()
+    return {'columns': pending, 'tables': tables, 'seconds': seconds, 'integrity': ok}
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark REAL versus INTEGER money columns.")
+    parser.add_argument('--scale', default='small', help=f"Scale preset ({', '.join(seed_data.SCALES)}) or factor")
+    parser.add_argument('--repeat', type=int, default=10, help='Timed repetitions (best is reported)')
+    parser.add_argument('--data-dir', default=DEFAULT_DATA_DIR, help='Where generated databases are cached')
+    parser.add_argument('--seed', type=int, default=seed_data.DEFAULT_SEED, help='Data seed')
+    parser.add_argument('--json', help='Also write the results to this JSON file')
+    args = parser.parse_args()
+
+    source = ensure_database(args.data_dir, args.scale, args.seed)
+    tmp_dir = tempfile.mkdtemp(prefix='cbpm_money_')
+    try:
+        db_path = os.path.join(tmp_dir, 'ledgers.db')
+        shutil.copyfile(source, db_path)
+        conn = connect(db_path)
+        count = build_ledgers(conn, args.seed)
+        report = {'created': datetime.now().isoformat(timespec='seconds'), 'python': platform.python_version(),
+                  'sqlite': sqlite3.sqlite_version, 'platform': platform.platform(), 'scale': args.scale,
+                  'rows': count}
+        for table in ('ledger_real', 'ledger_int'):
+            sql = MONTHLY_SQL.format(table=table)
+            report[f'{table}_monthly_s'] = best_of(lambda: conn.execute(sql).fetchall(), args.repeat)
+        report.update(drift(conn))
+
+        rows_real = conn.execute("SELECT transaction_date, quantity, unit_price, total_amount FROM ledger_real").fetchall()
+        rows_int = conn.execute("SELECT transaction_date, quantity, unit_price, total_amount FROM ledger_int").fetchall()
+        conn.close()
+        report['format_old_s'] = best_of(lambda: old_format(rows_real), args.repeat)
+        report['format_money_s'] = best_of(lambda: money.format_rows(rows_int, (2, 3), (1,)), args.repeat)
+        report['migration'] = time_migration(source, tmp_dir)
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    print(f"scale {args.scale}: {count} sales")
+    print(f"  monthly SUM   REAL {report['ledger_real_monthly_s'] * 1000:8.2f} ms   "
+          f"INTEGER {report['ledger_int_monthly_s'] * 1000:8.2f} ms")
+    print(f"  REAL drift    worst month {report['max_month_drift']:.6f} FCFA, all months {report['total_drift']:.6f} FCFA")
+    print(f"  format rows   float loop {report['format_old_s'] * 1000:8.2f} ms   "
+          f"money.format_rows {report['format_money_s'] * 1000:8.2f} ms")
+    m = report['migration']
+    print(f"  migration     {m['columns']} columns in {len(m['tables'])} tables, {m['seconds']:.2f} s ({m['integrity']})")
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,208 @@
+#!/usr/bin/env python3
+"""
+Notification e-mails: sending inline versus the queue and worker.
+
+A small SMTP sink is started on localhost (each new connection waits
+``--connect-ms`` before its greeting, standing in for the TCP/TLS set-up and
+login of a real provider, and each command waits ``--command-ms``). Then
+``--messages`` application-status e-mails, for applications in a copy of a
+database generated by seed_data.py, are delivered:
+
+* inline - one SMTP session per message, as a handler on the Tk thread would
+  have to do: the time the caller is blocked is the whole send;
+* queued - ``notifications.application_status`` in the status update
+  transaction (the caller's cost), then ``NotificationWorker.run_once`` in
+  batches of ``--batch`` over one connection each (the worker's time).
+
+With ``--reject`` a share of the recipients is refused by the sink (550) and
+as many again are deferred (451) on the first try, so the report also shows
+rows failed at once and rows left for a retry.
+
+Usage (PowerShell examples):
+  py .\\benchmarks\\bench_notifications.py --scale small
+  py .\\benchmarks\\bench_notifications.py --messages 500 --connect-ms 150 --reject 0.05 --json notifications.json
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import socketserver
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+from typing import Dict, List, Set
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import seed_data  # noqa: E402
+from bench_queries import DEFAULT_DATA_DIR, connect, ensure_database  # noqa: E402
+import notifications  # noqa: E402
+
+
+class SinkHandler(socketserver.StreamRequestHandler):
+    """Just enough SMTP for smtplib: EHLO/HELO, MAIL, RCPT, DATA, RSET, NOOP, QUIT."""
+
+    def reply(self, line: str) -> None:
+        self.wfile.write((line + '\r\n').encode())
+
+    def handle(self) -> None:
+        server = self.server
+        time.sleep(server.connect_s)
+        self.reply('220 sink ESMTP')
+        recipient = None
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command = line.decode(errors='replace').strip()
+            verb = command[:4].upper()
+            time.sleep(server.command_s)
+            if verb == 'EHLO':
+                self.reply('250-sink')
+                self.reply('250 8BITMIME')
+            elif verb in ('HELO', 'MAIL', 'RSET', 'NOOP'):
+                self.reply('250 OK')
+            elif verb == 'RCPT':
+                recipient = command.partition(':')[2].strip().strip('<>')
+                if recipient in server.refused:
+                    self.reply('550 no such user')
+                elif recipient in server.deferred and recipient not in server.seen:
+                    server.seen.add(recipient)
+                    self.reply('451 try again later')
+                else:
+                    self.reply('250 OK')
+            elif verb == 'DATA':
+                self.reply('354 end with .')
+                while self.rfile.readline() not in (b'.\r\n', b'.\n', b''):
+                    pass
+                with server.lock:
+                    server.delivered.append(recipient)
+                self.reply('250 queued')
+            elif verb == 'QUIT':
+                self.reply('221 bye')
+                return
+            else:
+                self.reply('502 not implemented')
+
+
+class Sink(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, connect_s: float, command_s: float):
+        super().__init__(('127.0.0.1', 0), SinkHandler)
+        self.connect_s, self.command_s = connect_s, command_s
+        self.refused: Set[str] = set()
+        self.deferred: Set[str] = set()
+        self.seen: Set[str] = set()
+        self.delivered: List[str] = []
+        self.lock = threading.Lock()
+
+
+def prepare(conn: sqlite3.Connection, messages: int, reject: float) -> List[int]:
+    """Applications to notify; every applicant gets a distinct address."""
+    apps = [r[0] for r in conn.execute("SELECT id FROM job_applications ORDER BY id LIMIT ?", (messages,))]
+    conn.execute("UPDATE users SET email = 'user' || id || '@example.cm'")
+    conn.commit()
+    return apps
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark inline e-mail sending against the notification queue.")
+    parser.add_argument('--scale', default='small', help=f"Scale preset ({', '.join(seed_data.SCALES)}) or factor")
+    parser.add_argument('--messages', type=int, default=200, help='E-mails to send')
+    parser.add_argument('--batch', type=int, default=20, help='Messages per SMTP connection for the worker')
+    parser.add_argument('--connect-ms', type=float, default=80, help='Sink delay before its greeting')
+    parser.add_argument('--command-ms', type=float, default=2, help='Sink delay per command')
+    parser.add_argument('--reject', type=float, default=0.0, help='Share of recipients refused (and deferred)')
+    parser.add_argument('--data-dir', default=DEFAULT_DATA_DIR, help='Where generated databases are cached')
+    parser.add_argument('--seed', type=int, default=seed_data.DEFAULT_SEED, help='Data seed')
+    parser.add_argument('--json', help='Also write the results to this JSON file')
+    args = parser.parse_args()
+
+    source = ensure_database(args.data_dir, args.scale, args.seed)
+    tmp_dir = tempfile.mkdtemp(prefix='cbpm_notifications_')
+    sink = Sink(args.connect_ms / 1000.0, args.command_ms / 1000.0)
+    threading.Thread(target=sink.serve_forever, daemon=True).start()
+    settings = {'enabled': True, 'events': None, 'smtp_host': '127.0.0.1', 'smtp_port': sink.server_address[1],
+                'starttls': False, 'ssl': False, 'username': '', 'batch_size': args.batch,
+                'rate_per_minute': 10 ** 6, 'max_attempts': 3, 'backoff_base_s': 30}
+    notifications.SETTINGS.update(enabled=True, events=None)
+    report: Dict[str, object] = {'created': datetime.now().isoformat(timespec='seconds'),
+                                 'python': platform.python_version(), 'sqlite': sqlite3.sqlite_version,
+                                 'platform': platform.platform(), 'scale': args.scale, 'batch': args.batch,
+                                 'connect_ms': args.connect_ms, 'command_ms': args.command_ms}
+    try:
+        db_path = os.path.join(tmp_dir, 'notifications.db')
+        shutil.copyfile(source, db_path)
+        conn = connect(db_path)
+        notifications.ensure_schema(conn)
+        apps = prepare(conn, args.messages, args.reject)
+        report['messages'] = len(apps)
+        emails = [r[0] for r in conn.execute(
+            "SELECT u.email FROM job_applications ja JOIN users u ON u.id = ja.applicant_id "
+            "WHERE ja.id IN (%s)" % ','.join('?' * len(apps)), apps)]
+        step = int(1 / args.reject) if args.reject > 0 else 0
+        if step:
+            sink.refused.update(emails[::step])
+            sink.deferred.update(emails[step // 2::step])
+
+        # Inline: a session per message on the caller's thread
+        worker = notifications.NotificationWorker(lambda: connect(db_path), settings)
+        t0 = time.perf_counter()
+        for app_id in apps:
+            row = conn.execute("SELECT u.email, j.title FROM job_applications ja JOIN users u ON u.id = ja.applicant_id "
+                               "JOIN jobs j ON j.id = ja.job_id WHERE ja.id = ?", (app_id,)).fetchone()
+            try:
+                smtp = notifications.smtp_connect(settings)
+                try:
+                    smtp.send_message(worker._message(row[0], f"Your application for {row[1]}", 'Status: Interview'))
+                finally:
+                    smtp.quit()
+            except Exception:
+                pass
+        report['inline_s'] = time.perf_counter() - t0
+        report['inline_delivered'] = len(sink.delivered)
+        sink.delivered.clear()
+        sink.seen.clear()
+
+        # Queued: enqueue in the status update, then the worker drains the queue
+        t0 = time.perf_counter()
+        for app_id in apps:
+            conn.execute("UPDATE job_applications SET status = 'Interview' WHERE id = ?", (app_id,))
+            notifications.application_status(conn.cursor(), app_id, 'Interview')
+            conn.commit()
+        report['enqueue_s'] = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        while worker.run_once():
+            pass
+        report['worker_s'] = time.perf_counter() - t0
+        report['queued_delivered'] = len(sink.delivered)
+        report['queue'] = notifications.queue_status(conn)
+        conn.close()
+    finally:
+        sink.shutdown()
+        sink.server_close()
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    n = report['messages']
+    print(f"scale {args.scale}: {n} e-mails, {args.connect_ms:g} ms per connection, {args.command_ms:g} ms per command")
+    print(f"  inline    caller blocked {report['inline_s']:8.2f} s "
+          f"({report['inline_s'] * 1000 / max(n, 1):.1f} ms per status change), {report['inline_delivered']} delivered")
+    print(f"  queued    caller blocked {report['enqueue_s']:8.2f} s "
+          f"({report['enqueue_s'] * 1000 / max(n, 1):.2f} ms per status change)")
+    print(f"            worker {report['worker_s']:.2f} s in batches of {args.batch}, "
+          f"{report['queued_delivered']} delivered; queue {report['queue']}")
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+"""
+Price lookups: per-screen LEFT JOINs versus the price book.
+
+On a copy of a database generated by seed_data.py, times:
+
+* build - filling ``store_prices`` on first use (price_book.rebuild);
+* store list - loading a store's material list with prices, as the New Sale
+  dialog did (a connection and a LEFT JOIN over the catalogue) versus
+  ``PriceBook.store`` on first use and from memory;
+* one price - the inventory dialog's connection and two queries (store
+  price, then the catalogue) versus ``PriceBook.price``;
+* bulk change - +5% on one category in one city's stores, one UPDATE per
+  inventory line (as editing them one by one did) versus ``bulk_change``;
+* sale overhead - inserting ``--sales`` sale rows without and with the
+  price book triggers.
+
+Usage (PowerShell examples):
+  py .\\benchmarks\\bench_price_book.py --scale medium
+  py .\\benchmarks\\bench_price_book.py --scale large --stores 200 --json price_book.json
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import datetime
+from typing import Callable, Dict
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import seed_data  # noqa: E402
+from bench_queries import DEFAULT_DATA_DIR, connect, ensure_database  # noqa: E402
+import price_book  # noqa: E402
+
+
+def best_of(fn: Callable[[], object], repeat: int) -> float:
+    best = float('inf')
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def old_store_list(db_path: str, store_id: int) -> dict:
+    conn = connect(db_path)
+    cur = conn.cursor()
+    cur.execute("""
+        SELECT bm.id, bm.name, i.unit_price, i.quantity
+        FROM building_materials bm
+        LEFT JOIN inventory i ON i.material_id = bm.id AND i.store_id = ?
+        LEFT JOIN stores s ON s.id = ?
+        WHERE (bm.owner_id IS NULL OR bm.owner_id = s.owner_id)
+        ORDER BY bm.name
+    """, (store_id, store_id))
+    prices = {mid: (price or 0, qty or 0) for mid, _, price, qty in cur.fetchall()}
+    conn.close()
+    return prices
+
+
+def old_price(db_path: str, store_id: int, material_id: int):
+    conn = connect(db_path)
+    try:
+        r = conn.execute("SELECT unit_price FROM inventory WHERE store_id=? AND material_id=?",
+                         (store_id, material_id)).fetchone()
+        if r and r[0] is not None:
+            return r[0]
+        r = conn.execute("SELECT standard_price FROM building_materials WHERE id=?", (material_id,)).fetchone()
+        return r[0] if r else None
+    finally:
+        conn.close()
+
+
+def insert_sales(conn: sqlite3.Connection, pairs, n: int) -> float:
+    stamp = datetime.now().isoformat(sep=' ')
+    t0 = time.perf_counter()
+    for k in range(n):
+        store_id, material_id = pairs[k % len(pairs)]
+        conn.execute("INSERT INTO transactions (store_id, material_id, quantity, unit_price, total_amount, "
+                     "transaction_type, transaction_date, user_id) VALUES (?, ?, 1, 1000, 1000, 'sale', ?, 1)",
+                     (store_id, material_id, stamp))
+    elapsed = time.perf_counter() - t0
+    conn.rollback()
+    return elapsed
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark price lookups against the price book.")
+    parser.add_argument('--scale', default='medium', help=f"Scale preset ({', '.join(seed_data.SCALES)}) or factor")
+    parser.add_argument('--stores', type=int, default=50, help='Stores whose material list is loaded')
+    parser.add_argument('--lookups', type=int, default=2000, help='Single price lookups')
+    parser.add_argument('--sales', type=int, default=2000, help='Sale rows inserted for the trigger overhead')
+    parser.add_argument('--category', default='Cement', help='Category of the bulk change')
+    parser.add_argument('--city', default='Douala', help='City of the bulk change')
+    parser.add_argument('--repeat', type=int, default=5, help='Timed repetitions (best is reported)')
+    parser.add_argument('--data-dir', default=DEFAULT_DATA_DIR, help='Where generated databases are cached')
+    parser.add_argument('--seed', type=int, default=seed_data.DEFAULT_SEED, help='Data seed')
+    parser.add_argument('--json', help='Also write the results to this JSON file')
+    args = parser.parse_args()
+
+    source = ensure_database(args.data_dir, args.scale, args.seed)
+    tmp_dir = tempfile.mkdtemp(prefix='cbpm_price_book_')
+    report: Dict[str, object] = {'created': datetime.now().isoformat(timespec='seconds'),
+                                 'python': platform.python_version(), 'sqlite': sqlite3.sqlite_version,
+                                 'platform': platform.platform(), 'scale': args.scale}
+    try:
+        db_path = os.path.join(tmp_dir, 'price_book.db')
+        shutil.copyfile(source, db_path)
+        conn = connect(db_path)
+        cur = conn.cursor()
+        stores = [r[0] for r in cur.execute("SELECT id FROM stores ORDER BY id LIMIT ?", (args.stores,))]
+        pairs = cur.execute("SELECT store_id, material_id FROM inventory ORDER BY id LIMIT ?",
+                            (args.lookups,)).fetchall()
+        report['inventory_rows'] = cur.execute("SELECT COUNT(*) FROM inventory").fetchone()[0]
+        report['stores'], report['lookups'], report['sales'] = len(stores), len(pairs), args.sales
+
+        report['sale_plain_s'] = insert_sales(conn, pairs, args.sales)
+        t0 = time.perf_counter()
+        price_book.ensure_schema(conn)
+        conn.commit()
+        report['build_s'] = time.perf_counter() - t0
+        report['sale_triggers_s'] = insert_sales(conn, pairs, args.sales)
+
+        report['old_store_list_s'] = best_of(lambda: [old_store_list(db_path, s) for s in stores], args.repeat)
+        book = price_book.PriceBook(lambda: connect(db_path), recheck_s=3600)
+        report['book_store_cold_s'] = best_of(lambda: (book.invalidate(), [book.store(s) for s in stores]), args.repeat)
+        report['book_store_warm_s'] = best_of(lambda: [book.store(s) for s in stores], args.repeat)
+        report['old_price_s'] = best_of(lambda: [old_price(db_path, s, m) for s, m in pairs], args.repeat)
+        [book.store(s) for s, _ in pairs]
+        report['book_price_s'] = best_of(lambda: [book.price(s, m) for s, m in pairs], args.repeat)
+
+        change = {'percent': 5, 'round_to': 5, 'categories': [args.category], 'city': args.city}
+        report['bulk_lines'] = price_book.preview_change(conn, **change)[0]
+
+        def one_by_one() -> None:
+            rows = cur.execute("SELECT i.id, i.unit_price FROM inventory i JOIN building_materials m ON m.id = "
+                               "i.material_id JOIN stores s ON s.id = i.store_id WHERE m.category = ? AND s.city = ? "
+                               "AND i.unit_price > 0", (args.category, args.city)).fetchall()
+            for inv_id, price in rows:
+                cur.execute("UPDATE inventory SET unit_price = ?, last_updated = ? WHERE id = ?",
+                            (int(round(price * 1.05 / 5) * 5), datetime.now().isoformat(sep=' '), inv_id))
+            conn.rollback()
+
+        def bulk() -> None:
+            price_book.bulk_change(cur, **change)
+            conn.rollback()
+
+        report['bulk_old_s'] = best_of(one_by_one, args.repeat)
+        report['bulk_s'] = best_of(bulk, args.repeat)
+        conn.close()
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    print(f"scale {args.scale}: {report['inventory_rows']} inventory rows")
+    print(f"  build store_prices                       {report['build_s'] * 1000:9.1f} ms")
+    print(f"  {report['stores']} store lists, LEFT JOIN            {report['old_store_list_s'] * 1000:9.2f} ms")
+    print(f"  {report['stores']} store lists, price book (load)    {report['book_store_cold_s'] * 1000:9.2f} ms")
+    print(f"  {report['stores']} store lists, price book (memory)  {report['book_store_warm_s'] * 1000:9.3f} ms")
+    print(f"  {report['lookups']} prices, two queries each          {report['old_price_s'] * 1000:9.2f} ms")
+    print(f"  {report['lookups']} prices, price book                {report['book_price_s'] * 1000:9.3f} ms")
+    print(f"  +5% {args.category} in {args.city} ({report['bulk_lines']} lines): one by one "
+          f"{report['bulk_old_s'] * 1000:.2f} ms, one statement {report['bulk_s'] * 1000:.2f} ms")
+    print(f"  {report['sales']} sales inserted: {report['sale_plain_s'] * 1000:.1f} ms without triggers, "
+          f"{report['sale_triggers_s'] * 1000:.1f} ms with")
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
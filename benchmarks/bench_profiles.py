@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+"""
+Compare the SQLite performance profiles on the report queries.
+
+For each profile in SCALABILITY_SETTINGS['profiles'] the database generated by
+seed_data.py is copied with VACUUM INTO at the profile's page_size, opened with
+the profile's PRAGMAs (db_profiles.apply_pragmas, as DatabaseManager does) and
+the report screens' queries are timed twice:
+
+* cold - a new connection per iteration, so the page cache starts empty and
+  reads come from the OS cache (or the mmap window);
+* warm - one connection reused, as a report window that is refreshed.
+
+Usage (PowerShell examples):
+  py .\\benchmarks\\bench_profiles.py --scale small
+  py .\\benchmarks\\bench_profiles.py --scale medium --profiles terminal reporting --json profiles.json
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import datetime
+from typing import Callable, Dict, List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import queries  # noqa: E402
+import seed_data  # noqa: E402
+from bench_queries import DEFAULT_DATA_DIR, ensure_database, percentile, pick_fixtures  # noqa: E402
+from config import SCALABILITY_SETTINGS  # noqa: E402
+from db_profiles import apply_pragmas, profile_pragmas  # noqa: E402
+
+CASES = ('store_analytics_30d', 'financial_report_30d', 'daily_report', 'inventory_list', 'transactions_scan')
+
+
+def run_case(name: str, cur: sqlite3.Cursor, fx: Dict) -> int:
+    if name == 'store_analytics_30d':
+        d = queries.store_analytics(cur, fx['start_30d'], fx['today'])
+        return len(d['rows_tx']) + len(d['rows_store']) + len(d['rows_mat']) + len(d['rows_daily'])
+    if name == 'financial_report_30d':
+        d = queries.financial_report(cur, fx['start_30d'], fx['today'])
+        return len(d['rows_tx']) + len(d['rows_store']) + len(d['rows_mat'])
+    if name == 'daily_report':
+        d = queries.daily_report(cur, fx['today'])
+        return len(d['rows_tx']) + len(d['rows_low'])
+    if name == 'inventory_list':
+        return len(queries.list_inventory(cur))
+    if name == 'transactions_scan':
+        # Whole-history aggregate: the read pattern mmap helps most with
+        cur.execute("SELECT store_id, material_id, COUNT(*), SUM(total_amount) FROM transactions "
+                    "GROUP BY store_id, material_id")
+        return len(cur.fetchall())
+    raise ValueError(name)
+
+
+def prepare_copy(source: str, tmp_dir: str, page_size: int) -> str:
+    """A copy of ``source`` at ``page_size`` (cached per page size), in WAL mode."""
+    target = os.path.join(tmp_dir, f"profile_{page_size}.db")
+    if not os.path.exists(target):
+        conn = sqlite3.connect(source)
+        conn.execute(f"PRAGMA page_size={page_size}")
+        conn.execute("VACUUM INTO ?", (target,))
+        conn.close()
+        conn = sqlite3.connect(target)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.close()
+    return target
+
+
+def time_iterations(fn: Callable[[], int], iterations: int) -> Dict[str, float]:
+    times: List[float] = []
+    rows = 0
+    for _ in range(iterations):
+        start = time.perf_counter()
+        rows += fn()
+        times.append(time.perf_counter() - start)
+    times.sort()
+    return {'p50_ms': percentile(times, 50) * 1000, 'p95_ms': percentile(times, 95) * 1000,
+            'rows': rows // max(1, iterations)}
+
+
+def run_profile(name: str, path: str, fx: Dict, iterations: int) -> Dict[str, Dict]:
+    pragmas = profile_pragmas(name)
+
+    def connect() -> sqlite3.Connection:
+        conn = sqlite3.connect(path, timeout=5)
+        apply_pragmas(conn, pragmas)
+        return conn
+
+    results = {}
+    warm_conn = connect()
+    warm_cur = warm_conn.cursor()
+    try:
+        for case in CASES:
+            def cold() -> int:
+                conn = connect()
+                try:
+                    return run_case(case, conn.cursor(), fx)
+                finally:
+                    conn.close()
+
+            run_case(case, warm_cur, fx)   # warm-up
+            results[case] = {'cold': time_iterations(cold, iterations),
+                             'warm': time_iterations(lambda: run_case(case, warm_cur, fx), iterations)}
+    finally:
+        warm_conn.close()
+    return results
+
+
+def main() -> int:
+    profiles = list(SCALABILITY_SETTINGS.get('profiles', {}))
+    parser = argparse.ArgumentParser(description="Benchmark the SQLite profiles on the report queries.")
+    parser.add_argument('--scale', default='small', help=f"Scale preset ({', '.join(seed_data.SCALES)}) or factor")
+    parser.add_argument('--profiles', nargs='+', default=profiles, help='Profiles to compare')
+    parser.add_argument('--data-dir', default=DEFAULT_DATA_DIR, help='Where generated databases are cached')
+    parser.add_argument('--iterations', type=int, default=10, help='Timed iterations per case and mode')
+    parser.add_argument('--seed', type=int, default=seed_data.DEFAULT_SEED, help='Data seed')
+    parser.add_argument('--json', help='Also write the results to this JSON file')
+    args = parser.parse_args()
+    unknown = [p for p in args.profiles if p not in profiles]
+    if unknown:
+        parser.error(f"Unknown profile(s): {', '.join(unknown)} (choose from {', '.join(profiles)})")
+
+    source = ensure_database(args.data_dir, args.scale, args.seed)
+    conn = sqlite3.connect(source)
+    fx = pick_fixtures(conn)
+    conn.close()
+    print(f"scale {args.scale} ({os.path.getsize(source) / 1e6:.1f} MB), {args.iterations} iterations")
+
+    report = {'created': datetime.now().isoformat(timespec='seconds'), 'python': platform.python_version(),
+              'sqlite': sqlite3.sqlite_version, 'platform': platform.platform(), 'scale': args.scale,
+              'iterations': args.iterations, 'profiles': {}}
+    tmp_dir = tempfile.mkdtemp(prefix='cbpm_profiles_')
+    try:
+        for name in args.profiles:
+            page_size = int(profile_pragmas(name).get('page_size', 4096))
+            path = prepare_copy(source, tmp_dir, page_size)
+            report['profiles'][name] = run_profile(name, path, fx, args.iterations)
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    for mode in ('cold', 'warm'):
+        print(f"\n{mode} p50 / p95 ms")
+        print(f"{'case':<22}" + ''.join(f"{name:>22}" for name in args.profiles))
+        for case in CASES:
+            cells = []
+            for name in args.profiles:
+                r = report['profiles'][name][case][mode]
+                cells.append(f"{r['p50_ms']:.2f} / {r['p95_ms']:.2f}")
+            print(f"{case:<22}" + ''.join(f"{c:>22}" for c in cells))
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
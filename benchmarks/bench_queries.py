@@ -0,0 +1,277 @@
+#!/usr/bin/env python3
+"""
+Headless benchmarks for the SQL behind the busiest CBPM screens.
+
+Every case calls the same function the Tk window uses (queries.py,
+job_search.py), against databases generated by seed_data.py at one or more
+scale factors. Each case reports p50/p95 latency and rows/s. Results can be
+saved as JSON and compared against a stored baseline; a case whose p95 grew
+by more than --threshold is flagged as a regression and the exit code is 1.
+
+Generated databases are cached in --data-dir (cbpm_<scale>.db) and reused.
+Write cases (sale posting, transfer execution) run on a throwaway copy.
+
+Usage (PowerShell examples):
+  py .\\benchmarks\\bench_queries.py --scales tiny small
+  py .\\benchmarks\\bench_queries.py --scales small --output bench.json --save-baseline baseline.json
+  py .\\benchmarks\\bench_queries.py --scales small --compare baseline.json --threshold 1.25
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+from typing import Callable, Dict, List, Optional, Tuple
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import queries  # noqa: E402
+import seed_data  # noqa: E402
+from job_search import JobSearchService  # noqa: E402
+from utils import SecurityUtils  # noqa: E402
+
+DEFAULT_DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data')
+
+# (name, kind) — 'read' cases share one connection, 'write' cases run on a copy
+CASES = [
+    ('inventory_list_owner', 'read'),
+    ('inventory_search', 'read'),
+    ('store_analytics_30d', 'read'),
+    ('financial_report_30d', 'read'),
+    ('daily_report', 'read'),
+    ('audit_log_search', 'read'),
+    ('job_search_keyword', 'read'),
+    ('job_search_facets', 'read'),
+    ('login_verify', 'read'),
+    ('sale_posting', 'write'),
+    ('transfer_execution', 'write'),
+]
+
+
+def connect(path: str) -> sqlite3.Connection:
+    conn = sqlite3.connect(path, timeout=5)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA foreign_keys=ON")
+    conn.execute("PRAGMA cache_size=-20000")
+    conn.execute("PRAGMA temp_store=2")
+    return conn
+
+
+def ensure_database(data_dir: str, scale: str, seed: int) -> str:
+    os.makedirs(data_dir, exist_ok=True)
+    path = os.path.join(data_dir, f"cbpm_{scale}.db")
+    if not os.path.exists(path):
+        print(f"Generating {path} (scale {scale})...")
+        seed_data.generate(path, seed_data.scale_factor(scale), seed, log=lambda msg: None)
+    return path
+
+
+def pick_fixtures(conn: sqlite3.Connection) -> Dict:
+    """Deterministic parameters: the owner with the most stock rows, the busiest audit user, a login."""
+    cur = conn.cursor()
+    owner = cur.execute("SELECT s.owner_id FROM stores s JOIN inventory i ON i.store_id = s.id "
+                        "GROUP BY s.owner_id ORDER BY COUNT(*) DESC LIMIT 1").fetchone()[0]
+    busy_user = cur.execute("SELECT user_id FROM audit_log GROUP BY user_id ORDER BY COUNT(*) DESC LIMIT 1").fetchone()[0]
+    username = cur.execute("SELECT username FROM users WHERE role = 'manager' ORDER BY id LIMIT 1").fetchone()[0]
+    stock = cur.execute("SELECT i.store_id, i.material_id, bm.name, i.unit_price FROM inventory i "
+                        "JOIN building_materials bm ON bm.id = i.material_id WHERE i.quantity > 100").fetchall()
+    stores = [r[0] for r in cur.execute("SELECT id FROM stores WHERE is_active = 1")]
+    today = date.today()
+    return {
+        'owner': owner, 'busy_user': busy_user, 'username': username,
+        'stock': stock, 'stores': stores,
+        'today': today.isoformat(), 'start_30d': (today - timedelta(days=30)).isoformat(),
+        'start_7d': (today - timedelta(days=7)).isoformat(),
+    }
+
+
+def build_case(name: str, conn: sqlite3.Connection, fx: Dict, path: str, rng: random.Random) -> Callable[[], int]:
+    """A zero-argument callable running one iteration and returning the row count it produced."""
+    cur = conn.cursor()
+    if name == 'inventory_list_owner':
+        return lambda: len(queries.list_inventory(cur, 'retail_store', fx['owner']))
+    if name == 'inventory_search':
+        return lambda: len(queries.list_inventory(cur, search='Cement'))
+    if name == 'store_analytics_30d':
+        def run():
+            d = queries.store_analytics(cur, fx['start_30d'], fx['today'])
+            return len(d['rows_tx']) + len(d['rows_store']) + len(d['rows_mat']) + len(d['rows_daily'])
+        return run
+    if name == 'financial_report_30d':
+        def run():
+            d = queries.financial_report(cur, fx['start_30d'], fx['today'])
+            return len(d['rows_tx']) + len(d['rows_store']) + len(d['rows_mat'])
+        return run
+    if name == 'daily_report':
+        def run():
+            d = queries.daily_report(cur, fx['today'])
+            return len(d['rows_tx']) + len(d['rows_low'])
+        return run
+    if name == 'audit_log_search':
+        return lambda: len(queries.search_audit_log(cur, fx['busy_user'], fx['start_7d'], fx['today'], 'Sale'))
+    if name in ('job_search_keyword', 'job_search_facets'):
+        svc = JobSearchService(lambda: connect(path))
+
+        def run():
+            svc.invalidate()   # measure the uncached path
+            if name == 'job_search_keyword':
+                return len(svc.search(keyword='Mason')['rows'])
+            facets = svc.facets('Open')
+            return sum(len(v) for v in facets.values()) + len(svc.search(location='Douala', job_type='Full-time')['rows'])
+        return run
+    if name == 'login_verify':
+        def run():
+            user = queries.get_login_user(cur, fx['username'])
+            hash_val, salt = str(user[7]).split(':', 1)
+            SecurityUtils.verify_password(seed_data.DEFAULT_PASSWORD, hash_val, salt)
+            return 1
+        return run
+    if name == 'sale_posting':
+        def run():
+            sid, mid, _, price = rng.choice(fx['stock'])
+            queries.record_sale(conn, sid, mid, 1.0, float(price), 1, 'Benchmark')
+            return 1
+        return run
+    if name == 'transfer_execution':
+        def run():
+            sid, _, mname, price = rng.choice(fx['stock'])
+            dest = rng.choice(fx['stores'])
+            while dest == sid:
+                dest = rng.choice(fx['stores'])
+            items = [{'material': mname, 'quantity': 1.0, 'unit_price': float(price), 'total': float(price)}]
+            queries.execute_transfer(conn, sid, dest, items, f"TR-BENCH-{rng.random():.10f}", 1, 'Benchmark')
+            return len(items)
+        return run
+    raise ValueError(name)
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    k = min(len(sorted_values) - 1, max(0, int(round(pct / 100.0 * (len(sorted_values) - 1)))))
+    return sorted_values[k]
+
+
+def measure(fn: Callable[[], int], iterations: int, warmup: int) -> Dict[str, float]:
+    for _ in range(warmup):
+        fn()
+    times: List[float] = []
+    rows = 0
+    for _ in range(iterations):
+        start = time.perf_counter()
+        rows += fn()
+        times.append(time.perf_counter() - start)
+    times.sort()
+    total = sum(times)
+    return {
+        'iterations': iterations,
+        'p50_ms': percentile(times, 50) * 1000,
+        'p95_ms': percentile(times, 95) * 1000,
+        'rows': rows // iterations,
+        'rows_per_s': rows / total if total else 0.0,
+    }
+
+
+def run_scale(path: str, iterations: int, warmup: int, only: Optional[List[str]], seed: int) -> Dict[str, Dict]:
+    results = {}
+    conn = connect(path)
+    fx = pick_fixtures(conn)
+    tmp_dir = tempfile.mkdtemp(prefix='cbpm_bench_')
+    try:
+        write_copy = os.path.join(tmp_dir, 'write.db')
+        write_conn = None
+        for name, kind in CASES:
+            if only and name not in only:
+                continue
+            if kind == 'write':
+                if write_conn is None:
+                    conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+                    shutil.copyfile(path, write_copy)
+                    write_conn = connect(write_copy)
+                fn = build_case(name, write_conn, fx, write_copy, random.Random(seed))
+            else:
+                fn = build_case(name, conn, fx, path, random.Random(seed))
+            # PBKDF2 dominates login; fewer iterations keep the run short
+            n = max(3, iterations // 10) if name == 'login_verify' else iterations
+            results[name] = measure(fn, n, warmup)
+            r = results[name]
+            print(f"  {name:<24} p50 {r['p50_ms']:>9.2f} ms   p95 {r['p95_ms']:>9.2f} ms   "
+                  f"{r['rows']:>7} rows   {r['rows_per_s']:>12,.0f} rows/s")
+        if write_conn is not None:
+            write_conn.close()
+    finally:
+        conn.close()
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+    return results
+
+
+def compare(current: Dict, baseline: Dict, threshold: float,
+            min_delta_ms: float = 1.0) -> List[Tuple[str, str, float, float]]:
+    """Cases whose p95 grew by more than ``threshold`` times the baseline (and by at least ``min_delta_ms``)."""
+    regressions = []
+    for scale, cases in current.get('scales', {}).items():
+        base_cases = baseline.get('scales', {}).get(scale, {})
+        for name, r in cases.items():
+            base = base_cases.get(name)
+            if not base or not base.get('p95_ms'):
+                continue
+            ratio = r['p95_ms'] / base['p95_ms']
+            regressed = ratio > threshold and r['p95_ms'] - base['p95_ms'] >= min_delta_ms
+            marker = 'REGRESSION' if regressed else ('faster' if ratio < 1 / threshold else 'ok')
+            print(f"  {scale:<8} {name:<24} {base['p95_ms']:>9.2f} -> {r['p95_ms']:>9.2f} ms  x{ratio:.2f}  {marker}")
+            if regressed:
+                regressions.append((scale, name, base['p95_ms'], r['p95_ms']))
+    return regressions
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the SQL behind the CBPM screens.")
+    parser.add_argument('--scales', nargs='+', default=['tiny'],
+                        help=f"Scale presets ({', '.join(seed_data.SCALES)}) or factors")
+    parser.add_argument('--data-dir', default=DEFAULT_DATA_DIR, help='Where generated databases are cached')
+    parser.add_argument('--iterations', type=int, default=30, help='Timed iterations per case')
+    parser.add_argument('--warmup', type=int, default=2, help='Untimed iterations per case')
+    parser.add_argument('--only', nargs='*', help='Run only these cases')
+    parser.add_argument('--seed', type=int, default=seed_data.DEFAULT_SEED, help='Data and workload seed')
+    parser.add_argument('--output', help='Write results to this JSON file')
+    parser.add_argument('--save-baseline', help='Also write results to this baseline file')
+    parser.add_argument('--compare', help='Baseline JSON to compare against')
+    parser.add_argument('--threshold', type=float, default=1.25, help='p95 ratio that counts as a regression')
+    parser.add_argument('--min-delta-ms', type=float, default=1.0,
+                        help='Ignore p95 increases smaller than this (timer noise on sub-millisecond cases)')
+    args = parser.parse_args()
+
+    report = {
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(), 'sqlite': sqlite3.sqlite_version, 'platform': platform.platform(),
+        'iterations': args.iterations, 'scales': {},
+    }
+    for scale in args.scales:
+        path = ensure_database(args.data_dir, scale, args.seed)
+        print(f"scale {scale} ({os.path.getsize(path) / 1e6:.1f} MB)")
+        report['scales'][scale] = run_scale(path, args.iterations, args.warmup, args.only, args.seed)
+
+    for target in (args.output, args.save_baseline):
+        if target:
+            with open(target, 'w', encoding='utf-8') as f:
+                json.dump(report, f, indent=2)
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            baseline = json.load(f)
+        print(f"\nComparison with {args.compare} (threshold x{args.threshold:.2f} on p95):")
+        regressions = compare(report, baseline, args.threshold, args.min_delta_ms)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s)")
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+Offline journal replay throughput.
+
+Generates a mix of journaled operations (sales, stock adjustments, transfers,
+payments) against the stores and stock of a database generated by
+seed_data.py, then replays them with offline_journal.OfflineJournal.replay into
+a throwaway copy, once per batch size. Reported per batch size:
+
+* replay ops/s - the first replay, applying every operation;
+* duplicate ops/s - the same operations sent again, all recognised as
+  already applied (the retry-after-timeout path);
+* outcome counts (applied / adjusted / rejected), which must be identical for
+  every batch size because the conflict rules are deterministic.
+
+Usage (PowerShell examples):
+  py .\\benchmarks\\bench_replay.py --scale small
+  py .\\benchmarks\\bench_replay.py --scale medium --ops 50000 --batch-sizes 100 500 2000 --json replay.json
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import datetime
+from typing import Dict, List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import seed_data  # noqa: E402
+from bench_queries import DEFAULT_DATA_DIR, connect, ensure_database, pick_fixtures  # noqa: E402
+from offline_journal import OfflineJournal, apply_operations, ensure_schema  # noqa: E402
+
+MIX = (('sale', 0.70), ('adjustment', 0.15), ('transfer', 0.10), ('payment', 0.05))
+
+
+def generate(journal: OfflineJournal, fx: Dict, users: List[int], count: int, seed: int) -> List[Dict]:
+    """Record ``count`` operations; quantities are sized so some sales and transfers conflict."""
+    rng = random.Random(seed)
+    recorded = []
+    kinds = [k for k, _ in MIX]
+    weights = [w for _, w in MIX]
+    for n in range(count):
+        kind = rng.choices(kinds, weights)[0]
+        store_id, material_id, name, price = rng.choice(fx['stock'])
+        price = float(price or 1000)
+        if kind == 'sale':
+            payload = {'store_id': store_id, 'material_id': material_id, 'quantity': rng.randint(1, 60),
+                       'unit_price': price, 'customer_name': f"Bench {n}"}
+        elif kind == 'adjustment':
+            payload = {'store_id': store_id, 'material_id': material_id, 'delta': rng.randint(-40, 20),
+                       'reason': 'count'}
+        elif kind == 'transfer':
+            qty = rng.randint(1, 80)
+            dest = rng.choice([s for s in fx['stores'] if s != store_id] or fx['stores'])
+            payload = {'source_id': store_id, 'dest_id': dest, 'reference': f"BENCH-TR-{seed}-{n}",
+                       'signature_name': 'Bench',
+                       'items': [{'material': name, 'quantity': qty, 'unit_price': price, 'total': qty * price}]}
+        else:
+            payload = {'reference': f"BENCH-PAY-{seed}-{n}", 'payee_id': rng.choice(users),
+                       'amount': rng.randint(1, 500) * 1000, 'currency': 'XAF', 'method': 'Cash',
+                       'purpose': 'Advance'}
+        recorded.append(journal.record(kind, payload, rng.choice(users)))
+    return recorded
+
+
+def run_batch_size(source: str, tmp_dir: str, fx: Dict, users: List[int], ops: int, batch_size: int,
+                   seed: int) -> Dict:
+    db_path = os.path.join(tmp_dir, f"replay_{batch_size}.db")
+    shutil.copyfile(source, db_path)
+    conn = connect(db_path)
+    ensure_schema(conn)
+    conn.commit()
+    journal = OfflineJournal(os.path.join(tmp_dir, f"replay_{batch_size}.journal.db"))
+    try:
+        t0 = time.perf_counter()
+        recorded = generate(journal, fx, users, ops, seed)
+        record_s = time.perf_counter() - t0
+
+        report = journal.replay(lambda batch: apply_operations(conn, batch), shared=True, batch_size=batch_size)
+
+        # Send everything again: every operation must come back as a duplicate
+        t0 = time.perf_counter()
+        duplicates = 0
+        for start in range(0, len(recorded), batch_size):
+            outcomes = apply_operations(conn, recorded[start:start + batch_size])
+            duplicates += sum(1 for o in outcomes if o['status'] == 'duplicate')
+        duplicate_s = time.perf_counter() - t0
+        left_unsent = journal.counts()['unsent']
+    finally:
+        journal.close()
+        conn.close()
+    return {'record_ops_per_s': ops / record_s, 'replay_ops_per_s': report['ops_per_s'],
+            'duplicate_ops_per_s': ops / duplicate_s if duplicate_s else 0.0,
+            'duplicates': duplicates, 'left_unsent': left_unsent, 'counts': report['counts'],
+            'error': report['error']}
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark offline journal replay.")
+    parser.add_argument('--scale', default='small', help=f"Scale preset ({', '.join(seed_data.SCALES)}) or factor")
+    parser.add_argument('--ops', type=int, default=10000, help='Operations to generate')
+    parser.add_argument('--batch-sizes', type=int, nargs='+', default=[50, 500, 2000], help='Replay batch sizes')
+    parser.add_argument('--data-dir', default=DEFAULT_DATA_DIR, help='Where generated databases are cached')
+    parser.add_argument('--seed', type=int, default=seed_data.DEFAULT_SEED, help='Data seed')
+    parser.add_argument('--json', help='Also write the results to this JSON file')
+    args = parser.parse_args()
+
+    source = ensure_database(args.data_dir, args.scale, args.seed)
+    conn = sqlite3.connect(source)
+    fx = pick_fixtures(conn)
+    users = [r[0] for r in conn.execute("SELECT id FROM users WHERE is_active = 1 ORDER BY id")]
+    conn.close()
+    print(f"scale {args.scale} ({os.path.getsize(source) / 1e6:.1f} MB), {args.ops} operations")
+
+    report = {'created': datetime.now().isoformat(timespec='seconds'), 'python': platform.python_version(),
+              'sqlite': sqlite3.sqlite_version, 'platform': platform.platform(), 'scale': args.scale,
+              'ops': args.ops, 'batch_sizes': {}}
+    tmp_dir = tempfile.mkdtemp(prefix='cbpm_replay_')
+    try:
+        for size in args.batch_sizes:
+            report['batch_sizes'][size] = run_batch_size(source, tmp_dir, fx, users, args.ops, size, args.seed)
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    print(f"\n{'batch':>6} {'record/s':>10} {'replay/s':>10} {'dup/s':>10}  applied adjusted rejected")
+    for size, r in report['batch_sizes'].items():
+        c = r['counts']
+        print(f"{size:>6} {r['record_ops_per_s']:>10,.0f} {r['replay_ops_per_s']:>10,.0f} "
+              f"{r['duplicate_ops_per_s']:>10,.0f}  {c['applied']:>7} {c['adjusted']:>8} {c['rejected']:>8}"
+              + (f"  ERROR {r['error']}" if r['error'] else ''))
+    outcomes = {json.dumps(r['counts'], sort_keys=True) for r in report['batch_sizes'].values()}
+    if len(outcomes) > 1:
+        print("\n[WARN] outcomes differ between batch sizes")
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
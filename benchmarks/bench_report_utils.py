@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Benchmark the pure-Python and columnar paths of utils.ReportUtils.
+
+Builds a throwaway SQLite database with synthetic transactions and inventory rows,
+then times each report both ways and prints the speedup.
+
+Usage (PowerShell examples):
+  py .\benchmarks\bench_report_utils.py
+  py .\benchmarks\bench_report_utils.py --rows 200000 --repeat 5
+"""
+import argparse
+import datetime
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+from typing import Callable, List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils import HAS_PANDAS, ReportUtils  # noqa: E402
+
+
+def build_database(path: str, rows: int, seed: int = 42) -> None:
+    rng = random.Random(seed)
+    conn = sqlite3.connect(path)
+    conn.executescript('''
+        CREATE TABLE building_materials (id INTEGER PRIMARY KEY, name TEXT, category TEXT);
+        CREATE TABLE inventory (id INTEGER PRIMARY KEY, store_id INTEGER, material_id INTEGER,
+                                quantity REAL, unit_price REAL);
+        CREATE TABLE transactions (id INTEGER PRIMARY KEY, store_id INTEGER, material_id INTEGER,
+                                   total_amount REAL, transaction_type TEXT, transaction_date TEXT);
+    ''')
+    categories = ['Cement', 'Steel', 'Masonry', 'Timber', 'Roofing', 'Plumbing', 'Electrical', 'Paint']
+    conn.executemany("INSERT INTO building_materials VALUES (?,?,?)",
+                     [(i, f"Material {i}", categories[i % len(categories)]) for i in range(1, 201)])
+    now = datetime.datetime.now()
+
+    def tx_rows():
+        for i in range(rows):
+            when = now - datetime.timedelta(minutes=rng.randint(0, 60 * 24 * 90))
+            yield (i + 1, rng.randint(1, 50), rng.randint(1, 200), float(rng.randint(500, 500000)),
+                   'sale', when.strftime('%Y-%m-%d %H:%M:%S'))
+
+    conn.executemany("INSERT INTO transactions VALUES (?,?,?,?,?,?)", tx_rows())
+    inv_rows = max(1000, rows // 10)
+    conn.executemany("INSERT INTO inventory VALUES (?,?,?,?,?)",
+                     ((i + 1, 1 + i // 200, 1 + i % 200, float(rng.randint(0, 500)), float(rng.randint(100, 90000)))
+                      for i in range(inv_rows)))
+    conn.commit()
+    conn.close()
+
+
+def best_of(fn: Callable[[], object], repeat: int) -> float:
+    timings: List[float] = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark ReportUtils pure-Python vs columnar paths.")
+    parser.add_argument('--rows', type=int, default=1_000_000, help='Number of transactions to generate')
+    parser.add_argument('--repeat', type=int, default=3, help='Runs per measurement (best is reported)')
+    args = parser.parse_args()
+
+    if not HAS_PANDAS:
+        print("pandas/numpy are not installed; only the pure-Python path is available.")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'bench.db')
+        print(f"Generating {args.rows:,} transactions ...")
+        build_database(path, args.rows)
+        conn = sqlite3.connect(path)
+
+        def python_sales():
+            cur = conn.execute("SELECT transaction_date, total_amount FROM transactions WHERE transaction_type='sale'")
+            data = [{'transaction_date': d, 'total_amount': a} for d, a in cur]
+            return ReportUtils.generate_sales_report(data, columnar=False)
+
+        def python_inventory():
+            cur = conn.execute("SELECT i.quantity, i.unit_price, bm.category FROM inventory i "
+                               "JOIN building_materials bm ON bm.id = i.material_id")
+            data = [{'quantity': q, 'price': p, 'category': c} for q, p, c in cur]
+            return ReportUtils.generate_inventory_report(data, columnar=False)
+
+        # (name, pure-Python path, columnar path, columnar path needs pandas)
+        cases = [('sales report', python_sales, lambda: ReportUtils.generate_sales_report_from_db(conn), True),
+                 ('inventory report', python_inventory, lambda: ReportUtils.generate_inventory_report_from_db(conn), False)]
+        print(f"{'report':<18} {'python (s)':>11} {'columnar (s)':>13} {'speedup':>8}")
+        for name, py_fn, col_fn, needs_pandas in cases:
+            py_t = best_of(py_fn, args.repeat)
+            if HAS_PANDAS or not needs_pandas:
+                col_t = best_of(col_fn, args.repeat)
+                print(f"{name:<18} {py_t:>11.3f} {col_t:>13.3f} {py_t / col_t:>7.1f}x")
+            else:
+                print(f"{name:<18} {py_t:>11.3f} {'n/a':>13} {'n/a':>8}")
+        conn.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""
+Manage Stores list: JSON decoding versus the store contact columns.
+
+Times one refresh of the store list the way it used to run (select
+``contact_info`` for every row, ``json.loads`` it in Python, region filter as
+``location LIKE '%region%'``, category filter impossible in SQL so done in
+Python) against ``queries.list_stores`` on the indexed columns added by
+store_contacts.py, for a copy of a database generated by seed_data.py:
+
+* all stores, newest first;
+* one region;
+* one category (old: decode everything, keep the matches);
+* ``store_contacts.ensure_schema`` on the copy before the columns exist.
+
+Usage (PowerShell examples):
+  py .\\benchmarks\\bench_stores.py --scale medium
+  py .\\benchmarks\\bench_stores.py --scale large --repeat 20 --json stores.json
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import datetime
+from typing import Callable, List, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import seed_data  # noqa: E402
+from bench_queries import DEFAULT_DATA_DIR, connect, ensure_database  # noqa: E402
+import queries  # noqa: E402
+import store_contacts  # noqa: E402
+
+OLD_SQL = '''
+    SELECT s.id, s.name, owner.full_name, COALESCE(manager.full_name, 'Not Assigned'), s.location,
+           s.contact_info, s.is_active, s.created_date, s.owner_id
+    FROM stores s
+    JOIN users owner ON s.owner_id = owner.id
+    LEFT JOIN users manager ON s.manager_id = manager.id
+    WHERE 1 = 1
+'''
+
+
+def best_of(fn: Callable[[], object], repeat: int) -> float:
+    best = float('inf')
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def old_list(cur: sqlite3.Cursor, region: str = 'All', category: str = 'All') -> List[tuple]:
+    query, params = OLD_SQL, []
+    if region != 'All':
+        query += ' AND s.location LIKE ?'
+        params.append(f'%{region}%')
+    cur.execute(query + ' ORDER BY s.created_date DESC', params)
+    rows = []
+    for store_id, name, owner, manager, location, contact_info, is_active, created, owner_id in cur.fetchall():
+        try:
+            contact = json.loads(contact_info) if contact_info else {}
+        except Exception:
+            contact = {}
+        if category != 'All' and contact.get('category') != category:
+            continue
+        rows.append((store_id, name, owner, manager, location, contact.get('category', 'General'),
+                     contact.get('phone', 'N/A'), is_active, created, owner_id))
+    return rows
+
+
+def prepare(source: str, db_path: str, seed: int) -> None:
+    """Copy with JSON contact_info (databases seeded before the columns have free text) and no columns."""
+    shutil.copyfile(source, db_path)
+    conn = connect(db_path)
+    rng = random.Random(seed)
+    stores = conn.execute("SELECT id, location FROM stores").fetchall()
+    conn.executemany("UPDATE stores SET contact_info = ? WHERE id = ?",
+                     [(json.dumps({'phone': f"2376{rng.randrange(10**8):08d}",
+                                   'category': rng.choice(seed_data.STORE_CATEGORIES),
+                                   'address': f"{location} town centre", 'hours': '07:30-18:00'}), sid)
+                      for sid, location in stores])
+    conn.commit()
+    conn.close()
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the Manage Stores list query.")
+    parser.add_argument('--scale', default='medium', help=f"Scale preset ({', '.join(seed_data.SCALES)}) or factor")
+    parser.add_argument('--repeat', type=int, default=10, help='Timed repetitions (best is reported)')
+    parser.add_argument('--data-dir', default=DEFAULT_DATA_DIR, help='Where generated databases are cached')
+    parser.add_argument('--seed', type=int, default=seed_data.DEFAULT_SEED, help='Data seed')
+    parser.add_argument('--json', help='Also write the results to this JSON file')
+    args = parser.parse_args()
+
+    source = ensure_database(args.data_dir, args.scale, args.seed)
+    tmp_dir = tempfile.mkdtemp(prefix='cbpm_stores_')
+    region, category = 'Littoral', seed_data.STORE_CATEGORIES[1]
+    report = {'created': datetime.now().isoformat(timespec='seconds'), 'python': platform.python_version(),
+              'sqlite': sqlite3.sqlite_version, 'platform': platform.platform(), 'scale': args.scale}
+    conn: Optional[sqlite3.Connection] = None
+    try:
+        db_path = os.path.join(tmp_dir, 'stores.db')
+        prepare(source, db_path, args.seed)
+        conn = connect(db_path)
+        cur = conn.cursor()
+        for column in store_contacts.CONTACT_COLUMNS:
+            if column in {r[1] for r in cur.execute("PRAGMA table_xinfo(stores)")}:
+                # Benchmark databases seeded with the columns: start from the legacy layout
+                cur.execute("UPDATE stores SET category = NULL, phone = NULL, email = NULL, city = NULL, "
+                            "region = NULL")
+                break
+        conn.commit()
+        report['stores'] = cur.execute("SELECT COUNT(*) FROM stores").fetchone()[0]
+        t0 = time.perf_counter()
+        report['filled'] = store_contacts.ensure_schema(conn)
+        conn.commit()
+        report['migration_s'] = time.perf_counter() - t0
+
+        cases = {
+            'all': ({}, {}),
+            'region': ({'region': region}, {'region': region}),
+            'category': ({'category': category}, {'category': category}),
+        }
+        for name, (old_kwargs, new_kwargs) in cases.items():
+            report[f'{name}_rows'] = [len(old_list(cur, **old_kwargs)),
+                                      len(queries.list_stores(cur, 'administrator', 1, **new_kwargs))]
+            report[f'{name}_old_s'] = best_of(lambda: old_list(cur, **old_kwargs), args.repeat)
+            report[f'{name}_new_s'] = best_of(lambda: queries.list_stores(cur, 'administrator', 1, **new_kwargs),
+                                              args.repeat)
+    finally:
+        if conn is not None:
+            conn.close()
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    print(f"scale {args.scale}: {report['stores']} stores, {report['filled']} filled in "
+          f"{report['migration_s'] * 1000:.1f} ms")
+    for name in ('all', 'region', 'category'):
+        old_rows, new_rows = report[f'{name}_rows']
+        print(f"  {name:9s} json.loads {report[f'{name}_old_s'] * 1000:8.2f} ms ({old_rows} rows)   "
+              f"columns {report[f'{name}_new_s'] * 1000:8.2f} ms ({new_rows} rows)")
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
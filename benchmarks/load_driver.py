@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+"""
+Multi-process load driver for a CBPM database.
+
+Replays the write paths that contend in production (recording a sale, executing
+a store-to-store transfer, approving purchase requests) from several processes
+against one WAL database, through the same queries.py functions and connection
+PRAGMAs the application uses. Reports throughput, p50/p95/p99 latency and how often writers
+hit "database is locked".
+
+Generate a database first with seed_data.py (or ``setup.py --synthetic``).
+
+Usage (PowerShell examples):
+  py .\\seed_data.py --scale small --db load_test.db
+  py .\\benchmarks\\load_driver.py --db load_test.db --processes 8 --duration 30
+  py .\\benchmarks\\load_driver.py --db load_test.db --mix sale=50,transfer=30,approval=20 --json load.json
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import sqlite3
+import sys
+import time
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import queries  # noqa: E402
+from db_profiles import apply_pragmas, profile_pragmas  # noqa: E402
+
+DEFAULT_MIX = 'sale=70,transfer=20,approval=10'
+
+
+def connect(db_path: str, profile: Optional[str] = None) -> sqlite3.Connection:
+    """Open a connection configured like DatabaseManager.create_connection."""
+    conn = sqlite3.connect(db_path, timeout=5)
+    apply_pragmas(conn, profile_pragmas(profile))
+    return conn
+
+
+def parse_mix(text: str) -> Dict[str, int]:
+    mix = {}
+    for part in text.split(','):
+        name, _, weight = part.partition('=')
+        name = name.strip()
+        if name not in WORKLOADS:
+            raise ValueError(f"Unknown workload '{name}' (choose from {', '.join(WORKLOADS)})")
+        mix[name] = int(weight or 1)
+    return mix
+
+
+# ---- workloads: each mirrors the statements issued by the corresponding screen ----
+
+def record_sale(conn: sqlite3.Connection, rng: random.Random, ctx: Dict) -> None:
+    """Sales window: queries.record_sale, then the audit row."""
+    sid, mid, user_id = rng.choice(ctx['stock'])
+    qty = float(rng.randint(1, 5))
+    queries.record_sale(conn, sid, mid, qty, ctx['prices'][mid], user_id, 'Load test')
+    conn.execute("INSERT INTO audit_log (user_id, action, details, timestamp) VALUES (?, ?, ?, ?)",
+                 (user_id, "New Sale", f"Store {sid}, Material {mid}, Qty {qty}", datetime.now()))
+    conn.commit()
+
+
+def execute_transfer(conn: sqlite3.Connection, rng: random.Random, ctx: Dict) -> None:
+    """Transfer Products window: queries.execute_transfer, then the audit row."""
+    source_id, _, user_id = rng.choice(ctx['stock'])
+    dest_id = rng.choice(ctx['stores'])
+    while dest_id == source_id:
+        dest_id = rng.choice(ctx['stores'])
+    materials = ctx['store_materials'][source_id]
+    items = []
+    for mid in rng.sample(materials, min(rng.randint(1, 4), len(materials))):
+        qty = float(rng.randint(1, 3))
+        price = ctx['prices'][mid]
+        items.append({'material': ctx['names'][mid], 'quantity': qty, 'unit_price': price, 'total': qty * price,
+                      'reason': 'Load test'})
+    now = datetime.now()
+    reference = f"TR-LOAD-{os.getpid()}-{rng.random():.8f}"
+    _, total_items, total_value = queries.execute_transfer(conn, source_id, dest_id, items, reference, user_id,
+                                                           'Load test', now)
+    conn.execute("INSERT INTO audit_log (user_id, action, details, timestamp) VALUES (?, ?, ?, ?)",
+                 (user_id, 'Product Transfer', f"{reference} {total_items} items {total_value:,.0f} FCFA", now))
+    conn.commit()
+
+
+def approve_requests(conn: sqlite3.Connection, rng: random.Random, ctx: Dict) -> None:
+    """Buy Materials + Approve Orders: file a few requests, then approve them in one batch."""
+    from purchase_orders import approve_purchase_requests
+    sid, _, user_id = rng.choice(ctx['stock'])
+    buyer_store = rng.choice(ctx['stores'])
+    while buyer_store == sid:
+        buyer_store = rng.choice(ctx['stores'])
+    now = datetime.now().isoformat(sep=' ')
+    ids = []
+    for mid in rng.sample(ctx['store_materials'][sid], min(rng.randint(1, 3), len(ctx['store_materials'][sid]))):
+        cur = conn.execute(
+            "INSERT INTO purchase_requests (created_at, buyer_id, store_id, buyer_store_id, material_id, quantity, "
+            "unit_price, status) VALUES (?, ?, ?, ?, ?, ?, ?, 'Pending')",
+            (now, user_id, sid, buyer_store, mid, float(rng.randint(1, 5)), 1000.0))
+        ids.append(cur.lastrowid)
+    conn.commit()
+    approve_purchase_requests(conn, ids, user_id, is_admin=True)
+
+
+WORKLOADS = {'sale': record_sale, 'transfer': execute_transfer, 'approval': approve_requests}
+
+
+def load_context(conn: sqlite3.Connection) -> Dict:
+    """Stocked (store, material, acting user) triples and per-store material lists."""
+    stock = conn.execute(
+        "SELECT i.store_id, i.material_id, COALESCE(s.manager_id, s.owner_id) FROM inventory i "
+        "JOIN stores s ON s.id = i.store_id WHERE i.quantity > 50 AND s.is_active = 1").fetchall()
+    if not stock:
+        raise SystemExit("No stocked inventory found; generate data with seed_data.py first")
+    store_materials: Dict[int, List[int]] = {}
+    for sid, mid, _ in stock:
+        store_materials.setdefault(sid, []).append(mid)
+    materials = conn.execute("SELECT id, name, standard_price FROM building_materials").fetchall()
+    return {'stock': stock, 'stores': sorted(store_materials), 'store_materials': store_materials,
+            'names': {mid: name for mid, name, _ in materials},
+            'prices': {mid: float(price or 1000) for mid, _, price in materials}}
+
+
+def worker(args: Tuple[str, int, Dict[str, int], float, int]) -> Dict[str, Dict]:
+    db_path, index, mix, duration, seed = args
+    rng = random.Random(seed + index)
+    conn = connect(db_path)
+    ctx = load_context(conn)
+    names = list(mix)
+    weights = [mix[n] for n in names]
+    stats = {n: {'latencies': [], 'locked': 0, 'failed': 0} for n in names}
+    deadline = time.perf_counter() + duration
+    while time.perf_counter() < deadline:
+        name = rng.choices(names, weights)[0]
+        start = time.perf_counter()
+        try:
+            WORKLOADS[name](conn, rng, ctx)
+            stats[name]['latencies'].append(time.perf_counter() - start)
+        except sqlite3.OperationalError as e:
+            try:
+                conn.rollback()
+            except Exception:
+                pass
+            key = 'locked' if 'locked' in str(e) or 'busy' in str(e) else 'failed'
+            stats[name][key] += 1
+        except Exception:
+            try:
+                conn.rollback()
+            except Exception:
+                pass
+            stats[name]['failed'] += 1
+    conn.close()
+    return stats
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    k = min(len(sorted_values) - 1, max(0, int(round(pct / 100.0 * (len(sorted_values) - 1)))))
+    return sorted_values[k]
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Replay concurrent write workloads against a CBPM database.")
+    parser.add_argument('--db', default='load_test.db', help='Database generated by seed_data.py')
+    parser.add_argument('--processes', type=int, default=4, help='Concurrent writer processes')
+    parser.add_argument('--duration', type=float, default=20.0, help='Seconds to run')
+    parser.add_argument('--mix', default=DEFAULT_MIX, help='Workload weights, e.g. sale=70,transfer=20,approval=10')
+    parser.add_argument('--seed', type=int, default=42, help='RNG seed (each process adds its index)')
+    parser.add_argument('--profile', help='Database profile from SCALABILITY_SETTINGS (default: as the app selects)')
+    parser.add_argument('--json', help='Also write the results to this JSON file')
+    args = parser.parse_args()
+    if not os.path.exists(args.db):
+        parser.error(f"{args.db} not found; generate it with seed_data.py")
+    mix = parse_mix(args.mix)
+
+    with multiprocessing.Pool(args.processes) as pool:
+        per_process = pool.map(worker, [(args.db, i, mix, args.duration, args.seed, args.profile)
+                                            for i in range(args.processes)])
+
+    results = {}
+    print(f"{args.processes} processes, {args.duration:.0f}s, mix {args.mix}")
+    print(f"{'workload':<10} {'ok':>8} {'ops/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'locked':>7} {'failed':>7}")
+    for name in mix:
+        lat = sorted(x for stats in per_process for x in stats[name]['latencies'])
+        locked = sum(stats[name]['locked'] for stats in per_process)
+        failed = sum(stats[name]['failed'] for stats in per_process)
+        row = {'ok': len(lat), 'ops_per_s': len(lat) / args.duration,
+               'p50_ms': percentile(lat, 50) * 1000, 'p95_ms': percentile(lat, 95) * 1000,
+               'p99_ms': percentile(lat, 99) * 1000, 'locked': locked, 'failed': failed}
+        results[name] = row
+        print(f"{name:<10} {row['ok']:>8} {row['ops_per_s']:>8.1f} {row['p50_ms']:>8.1f} {row['p95_ms']:>8.1f} "
+              f"{row['p99_ms']:>8.1f} {locked:>7} {failed:>7}")
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({'processes': args.processes, 'duration': args.duration, 'mix': mix, 'seed': args.seed,
+                       'results': results}, f, indent=2)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,271 @@
+"""
+Change-data capture for incremental mirroring
+
+Triggers on every tracked table append ``(version, tbl, row_id, op)`` to
+``change_log`` (op ``I``/``U``/``D``). A consumer (backup site, analytics
+copy, the mobile API) copies the database once. It then calls
+:func:`changes_since` with the last version it applied, in batches, so its sync
+cost follows the number of changes rather than the size of the database.
+
+Versions are the log's rowid (max + 1, cheaper than AUTOINCREMENT in a
+per-row trigger); compaction always keeps the newest entry, so numbering never
+restarts. SQLite has one writer at a time, so the versions of committed changes
+never go backwards, and a reader that has seen version N will never later find a
+new change below N.
+
+Consumers register by name (:func:`register_consumer`) and acknowledge the
+version they have applied (:func:`acknowledge`). :func:`compact` deletes the
+entries every consumer has acknowledged; the ``compact_changes`` maintenance
+task runs it when idle. Consumers not seen for ``stale_consumer_days`` are
+dropped so they cannot pin the log forever. A dropped or new consumer asking
+for compacted history gets :class:`ChangesCompacted` and must take a fresh copy.
+
+Settings come from ``config.CHANGE_CAPTURE``.
+"""
+
+import sqlite3
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+try:
+    from config import CHANGE_CAPTURE as SETTINGS
+except Exception:
+    SETTINGS = {'enabled': True, 'tables': None, 'exclude_tables': []}
+
+# Bookkeeping tables never captured, whatever the settings say
+INTERNAL_TABLES = ('change_log', 'change_consumers', 'change_log_state')
+TRIGGER_PREFIX = 'cdc_'
+
+
+class ChangesCompacted(LookupError):
+    """The requested changes were compacted away; the consumer must re-copy the database."""
+
+
+def ensure_schema(conn: sqlite3.Connection, settings: Optional[Dict[str, Any]] = None) -> List[str]:
+    """Create the log tables and (re)align the capture triggers with the settings; returns the tracked tables."""
+    settings = SETTINGS if settings is None else settings
+    conn.execute(
+        '''
+        CREATE TABLE IF NOT EXISTS change_log
+        (
+            version INTEGER PRIMARY KEY,
+            tbl TEXT NOT NULL,
+            row_id INTEGER NOT NULL,
+            op TEXT NOT NULL CHECK (op IN ('I', 'U', 'D'))
+        )
+        '''
+    )
+    conn.execute(
+        '''
+        CREATE TABLE IF NOT EXISTS change_consumers
+        (
+            name TEXT PRIMARY KEY,
+            acked_version INTEGER NOT NULL DEFAULT 0,
+            registered_at TEXT NOT NULL,
+            last_seen TEXT NOT NULL
+        )
+        '''
+    )
+    conn.execute("CREATE TABLE IF NOT EXISTS change_log_state (key TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+
+    wanted = set(tracked_tables(conn, settings)) if settings.get('enabled', True) else set()
+    existing = {name: tbl for name, tbl in conn.execute(
+        "SELECT name, tbl_name FROM sqlite_master WHERE type = 'trigger' AND name LIKE 'cdc\\_%' ESCAPE '\\'")}
+    for name, tbl in existing.items():
+        if tbl not in wanted:
+            conn.execute(f'DROP TRIGGER IF EXISTS "{name}"')
+    for tbl in sorted(wanted):
+        _create_triggers(conn, tbl)
+    return sorted(wanted)
+
+
+def _create_triggers(conn: sqlite3.Connection, tbl: str) -> None:
+    q = tbl.replace("'", "''")
+    conn.execute(f'CREATE TRIGGER IF NOT EXISTS "{TRIGGER_PREFIX}{tbl}_ins" AFTER INSERT ON "{tbl}" BEGIN '
+                 f"INSERT INTO change_log (tbl, row_id, op) VALUES ('{q}', NEW.rowid, 'I'); END")
+    conn.execute(f'CREATE TRIGGER IF NOT EXISTS "{TRIGGER_PREFIX}{tbl}_upd" AFTER UPDATE ON "{tbl}" BEGIN '
+                 f"INSERT INTO change_log (tbl, row_id, op) SELECT '{q}', OLD.rowid, 'D' WHERE OLD.rowid <> NEW.rowid; "
+                 f"INSERT INTO change_log (tbl, row_id, op) VALUES ('{q}', NEW.rowid, 'U'); END")
+    conn.execute(f'CREATE TRIGGER IF NOT EXISTS "{TRIGGER_PREFIX}{tbl}_del" AFTER DELETE ON "{tbl}" BEGIN '
+                 f"INSERT INTO change_log (tbl, row_id, op) VALUES ('{q}', OLD.rowid, 'D'); END")
+
+
+def tracked_tables(conn: sqlite3.Connection, settings: Optional[Dict[str, Any]] = None) -> List[str]:
+    """Tables to capture: ``tables`` from the settings (default all), minus exclusions.
+
+    Virtual tables, their shadow tables and WITHOUT ROWID tables are skipped: they have no stable rowid.
+    """
+    settings = SETTINGS if settings is None else settings
+    rows = conn.execute("SELECT name, sql FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite\\_%' "
+                        "ESCAPE '\\'").fetchall()
+    virtual = [name for name, sql in rows if (sql or '').upper().startswith('CREATE VIRTUAL')]
+    excluded = set(INTERNAL_TABLES) | set(settings.get('exclude_tables') or [])
+    only = settings.get('tables')
+    out = []
+    for name, sql in rows:
+        upper = ' '.join((sql or '').upper().split())
+        if name in excluded or (only and name not in only):
+            continue
+        if name in virtual or any(name.startswith(v + '_') for v in virtual) or 'WITHOUT ROWID' in upper:
+            continue
+        out.append(name)
+    return sorted(out)
+
+
+# ---- reading ----
+
+def current_version(conn: sqlite3.Connection) -> int:
+    """Highest version assigned so far (0 before the first change)."""
+    row = conn.execute("SELECT MAX(version) FROM change_log").fetchone()
+    return int(row[0]) if row[0] is not None else compacted_through(conn)
+
+
+def compacted_through(conn: sqlite3.Connection) -> int:
+    row = conn.execute("SELECT value FROM change_log_state WHERE key = 'compacted_through'").fetchone()
+    return int(row[0]) if row else 0
+
+
+def changes_since(conn: sqlite3.Connection, since: int, limit: Optional[int] = None,
+                  tables: Optional[Iterable[str]] = None, coalesce: bool = True,
+                  with_rows: bool = False) -> Dict[str, Any]:
+    """The next batch of changes after version ``since``.
+
+    Args:
+        since: Last version the consumer has applied (0, or the version returned at registration).
+        limit: Log entries read per batch (``batch_size`` setting by default).
+        tables: Only report changes to these tables (the cursor still advances past the others).
+        coalesce: Report each row once per batch with its net operation (``I`` then ``U`` stays ``I``).
+        with_rows: Attach the current row as a dict (``row``) to ``I``/``U`` changes; a row deleted
+            since is reported as ``D``.
+
+    Returns:
+        Dict: ``changes`` (dicts with ``version``, ``table``, ``row_id``, ``op``), ``next`` (pass it as
+        ``since`` for the following batch, and acknowledge it once applied), ``more`` and ``current``.
+
+    Raises:
+        ChangesCompacted: Changes after ``since`` are no longer all in the log.
+    """
+    limit = int(limit or SETTINGS.get('batch_size', 1000))
+    horizon = compacted_through(conn)
+    if since < horizon:
+        raise ChangesCompacted(f"changes up to version {horizon} have been compacted; copy the database again "
+                               f"and continue from version {current_version(conn)}")
+    rows = conn.execute("SELECT version, tbl, row_id, op FROM change_log WHERE version > ? ORDER BY version LIMIT ?",
+                        (since, limit)).fetchall()
+    next_version = rows[-1][0] if rows else since
+    wanted = set(tables) if tables else None
+    changes: List[Dict[str, Any]] = []
+    latest: Dict[tuple, Dict[str, Any]] = {}
+    for version, tbl, row_id, op in rows:
+        if wanted is not None and tbl not in wanted:
+            continue
+        key = (tbl, row_id)
+        if coalesce and key in latest:
+            prev = latest[key]
+            prev['op'] = 'I' if prev['op'] == 'I' and op == 'U' else op
+            prev['version'] = version
+            continue
+        change = {'version': version, 'table': tbl, 'row_id': row_id, 'op': op}
+        latest[key] = change
+        changes.append(change)
+    if coalesce:
+        changes.sort(key=lambda c: c['version'])
+    if with_rows:
+        _attach_rows(conn, changes)
+    return {'since': since, 'next': next_version, 'more': len(rows) == limit,
+            'current': current_version(conn), 'changes': changes}
+
+
+def _attach_rows(conn: sqlite3.Connection, changes: Sequence[Dict[str, Any]]) -> None:
+    by_table: Dict[str, List[Dict[str, Any]]] = {}
+    for change in changes:
+        if change['op'] != 'D':
+            by_table.setdefault(change['table'], []).append(change)
+    for tbl, items in by_table.items():
+        found: Dict[int, Dict[str, Any]] = {}
+        ids = [c['row_id'] for c in items]
+        for start in range(0, len(ids), 500):
+            chunk = ids[start:start + 500]
+            cur = conn.execute(f'SELECT rowid AS "__rowid__", * FROM "{tbl}" WHERE rowid IN '
+                               f'({",".join("?" * len(chunk))})', chunk)
+            columns = [d[0] for d in cur.description]
+            for r in cur.fetchall():
+                found[r[0]] = dict(zip(columns[1:], r[1:]))
+        for change in items:
+            row = found.get(change['row_id'])
+            if row is None:
+                change['op'] = 'D'
+            else:
+                change['row'] = row
+
+
+# ---- consumers and compaction ----
+
+def register_consumer(conn: sqlite3.Connection, name: str, from_version: Optional[int] = None) -> int:
+    """Register (or re-register) a consumer; returns the version to read from.
+
+    A new consumer starts at the current version: take the copy of the database right after
+    registering, then read changes from the returned version.
+    """
+    now = datetime.now().isoformat(sep=' ', timespec='seconds')
+    start = current_version(conn) if from_version is None else int(from_version)
+    conn.execute(
+        "INSERT INTO change_consumers (name, acked_version, registered_at, last_seen) VALUES (?, ?, ?, ?) "
+        "ON CONFLICT(name) DO UPDATE SET acked_version = excluded.acked_version, last_seen = excluded.last_seen",
+        (name, start, now, now))
+    conn.commit()
+    return start
+
+
+def acknowledge(conn: sqlite3.Connection, name: str, version: int) -> None:
+    """Record that consumer ``name`` has applied every change up to ``version``."""
+    cur = conn.execute("UPDATE change_consumers SET acked_version = MAX(acked_version, ?), last_seen = ? "
+                       "WHERE name = ?", (int(version), datetime.now().isoformat(sep=' ', timespec='seconds'), name))
+    if cur.rowcount == 0:
+        raise ValueError(f"Unknown change consumer: {name} (register it first)")
+    conn.commit()
+
+
+def consumers(conn: sqlite3.Connection) -> List[tuple]:
+    """``(name, acked_version, registered_at, last_seen)`` for every consumer."""
+    return conn.execute("SELECT name, acked_version, registered_at, last_seen FROM change_consumers "
+                        "ORDER BY name").fetchall()
+
+
+def _horizon(conn: sqlite3.Connection) -> int:
+    row = conn.execute("SELECT MIN(acked_version), COUNT(*) FROM change_consumers").fetchone()
+    # With no consumers nobody needs history; a new consumer starts from a fresh copy
+    return int(row[0]) if row[1] else current_version(conn)
+
+
+def compactable(conn: sqlite3.Connection) -> bool:
+    """Whether :func:`compact` would delete anything."""
+    return conn.execute("SELECT EXISTS (SELECT 1 FROM change_log WHERE version <= ? AND "
+                        "version < (SELECT MAX(version) FROM change_log))", (_horizon(conn),)).fetchone()[0] == 1
+
+
+def compact(conn: sqlite3.Connection, stale_days: Optional[float] = None) -> Dict[str, Any]:
+    """Delete entries every consumer has acknowledged, after dropping consumers not seen for ``stale_days``."""
+    days = SETTINGS.get('stale_consumer_days', 30) if stale_days is None else stale_days
+    dropped: List[str] = []
+    if days:
+        cutoff = (datetime.now() - timedelta(days=float(days))).isoformat(sep=' ', timespec='seconds')
+        dropped = [r[0] for r in conn.execute("SELECT name FROM change_consumers WHERE last_seen < ?", (cutoff,))]
+        conn.execute("DELETE FROM change_consumers WHERE last_seen < ?", (cutoff,))
+    horizon = _horizon(conn)
+    # The newest entry stays: new versions continue from the highest rowid
+    deleted = conn.execute("DELETE FROM change_log WHERE version <= ? AND "
+                           "version < (SELECT MAX(version) FROM change_log)", (horizon,)).rowcount
+    conn.execute("INSERT INTO change_log_state (key, value) VALUES ('compacted_through', ?) "
+                 "ON CONFLICT(key) DO UPDATE SET value = MAX(value, excluded.value)", (horizon,))
+    conn.commit()
+    return {'deleted': deleted, 'through': horizon, 'dropped_consumers': dropped}
+
+
+def run_compact(conn: sqlite3.Connection) -> str:
+    """Maintenance task wrapper around :func:`compact`."""
+    result = compact(conn)
+    details = f"deleted {result['deleted']} change(s) through version {result['through']}"
+    if result['dropped_consumers']:
+        details += f"; dropped stale consumer(s): {', '.join(result['dropped_consumers'])}"
+    return details
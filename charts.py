@@ -0,0 +1,248 @@
+"""
+Reusable Tkinter charts for the Cameroon Construction Project Management System
+
+Each chart owns exactly one matplotlib Figure and one FigureCanvasTkAgg for the
+lifetime of its window. Refreshing a chart updates the existing artists in place
+(bar heights, line data) and schedules an idle redraw, so repeated refreshes do not
+accumulate figures, canvases or Tk widgets. Long time series are downsampled
+before they reach matplotlib, and data loading runs on a worker thread via
+:class:`BackgroundTask`.
+"""
+
+import logging
+import queue
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, List, Optional, Sequence, Tuple
+
+try:
+    from matplotlib.figure import Figure
+    from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+    HAS_MATPLOTLIB = True
+except Exception:
+    Figure = None
+    FigureCanvasTkAgg = None
+    HAS_MATPLOTLIB = False
+
+logger = logging.getLogger(__name__)
+
+# Upper bound of points handed to matplotlib for a single line
+DEFAULT_MAX_POINTS = 400
+
+
+def downsample_series(xs: Sequence[Any], ys: Sequence[float],
+                      max_points: int = DEFAULT_MAX_POINTS) -> Tuple[List[Any], List[float]]:
+    """Reduce a series to at most ``max_points`` while keeping its visual shape.
+
+    Uses Largest-Triangle-Three-Buckets: the first and last points are kept and, for
+    each bucket in between, the point forming the largest triangle with its
+    neighbours is chosen, so peaks and troughs survive.
+
+    Args:
+        xs: X values (numbers, or any labels; their index is used for geometry).
+        ys: Y values.
+        max_points: Maximum number of points to return (at least 3).
+
+    Returns:
+        Tuple[List, List]: Downsampled x and y values.
+    """
+    n = len(ys)
+    if max_points < 3 or n <= max_points:
+        return list(xs), [float(y or 0) for y in ys]
+
+    def _x(i: int) -> float:
+        try:
+            return float(xs[i])
+        except (TypeError, ValueError):
+            return float(i)
+
+    out_x = [xs[0]]
+    out_y = [float(ys[0] or 0)]
+    bucket = (n - 2) / (max_points - 2)
+    a = 0
+    for i in range(max_points - 2):
+        start = int(i * bucket) + 1
+        end = int((i + 1) * bucket) + 1
+        nxt_start, nxt_end = end, min(int((i + 2) * bucket) + 1, n)
+        if nxt_start >= nxt_end:
+            nxt_start, nxt_end = n - 1, n
+        avg_x = sum(_x(j) for j in range(nxt_start, nxt_end)) / (nxt_end - nxt_start)
+        avg_y = sum(float(ys[j] or 0) for j in range(nxt_start, nxt_end)) / (nxt_end - nxt_start)
+        ax_, ay_ = _x(a), float(ys[a] or 0)
+        best, best_area = start, -1.0
+        for j in range(start, min(end, n - 1)):
+            area = abs((ax_ - avg_x) * (float(ys[j] or 0) - ay_) - (ax_ - _x(j)) * (avg_y - ay_))
+            if area > best_area:
+                best, best_area = j, area
+        out_x.append(xs[best])
+        out_y.append(float(ys[best] or 0))
+        a = best
+    out_x.append(xs[-1])
+    out_y.append(float(ys[-1] or 0))
+    return out_x, out_y
+
+
+def downsample_labeled(labels: Sequence[Any], values: Sequence[float],
+                       max_points: int = DEFAULT_MAX_POINTS) -> Tuple[List[int], List[Any], List[float]]:
+    """Downsample a labelled series, keeping each point's original index as its x position.
+
+    Returns:
+        Tuple[List[int], List, List[float]]: Positions, labels and values.
+    """
+    positions, ys = downsample_series(list(range(len(values))), values, max_points)
+    return positions, [labels[i] for i in positions], ys
+
+
+class _ReusableChart:
+    """Base class: one Figure + one canvas, created once and packed into ``master``."""
+
+    def __init__(self, master: Any, title: str, figsize: Tuple[float, float] = (5, 3), dpi: int = 100):
+        if not HAS_MATPLOTLIB:
+            raise RuntimeError("matplotlib is not available")
+        self.figure = Figure(figsize=figsize, dpi=dpi)
+        self.ax = self.figure.add_subplot(111)
+        self.ax.set_title(title)
+        self.canvas = FigureCanvasTkAgg(self.figure, master=master)
+        self.widget = self.canvas.get_tk_widget()
+        self.widget.bind('<Destroy>', lambda e: self.close(), add='+')
+
+    def pack(self, **kwargs: Any) -> "_ReusableChart":
+        self.widget.pack(**kwargs)
+        return self
+
+    def redraw(self) -> None:
+        try:
+            self.canvas.draw_idle()
+        except Exception:
+            pass
+
+    def close(self) -> None:
+        """Release the figure's artists; safe to call more than once."""
+        try:
+            self.figure.clear()
+        except Exception:
+            pass
+
+
+class ReusableBarChart(_ReusableChart):
+    """Top-N bar chart whose bars are allocated once and resized on update."""
+
+    def __init__(self, master: Any, title: str, color: str = "#3498db", max_bars: int = 10, **kwargs: Any):
+        super().__init__(master, title, **kwargs)
+        self.max_bars = max_bars
+        self.bars = list(self.ax.bar(range(max_bars), [0] * max_bars, color=color))
+        self.ax.set_xticks(range(max_bars))
+        self.ax.set_xticklabels([''] * max_bars, rotation=45, ha='right', fontsize=8)
+        self.figure.subplots_adjust(bottom=0.35)
+
+    def update(self, labels: Sequence[str], values: Sequence[float]) -> None:
+        """Show the first ``max_bars`` label/value pairs."""
+        labels = [str(x) for x in list(labels)[:self.max_bars]]
+        values = [float(v or 0) for v in list(values)[:self.max_bars]]
+        for i, bar in enumerate(self.bars):
+            if i < len(values):
+                bar.set_height(values[i])
+                bar.set_visible(True)
+            else:
+                bar.set_height(0)
+                bar.set_visible(False)
+        self.ax.set_xticklabels(labels + [''] * (self.max_bars - len(labels)))
+        top = max(values) if values else 0
+        self.ax.set_ylim(0, top * 1.1 if top > 0 else 1)
+        self.redraw()
+
+
+class ReusableLineChart(_ReusableChart):
+    """Single-line time series chart updated with ``set_data``."""
+
+    def __init__(self, master: Any, title: str, color: str = "#e67e22",
+                 max_points: int = DEFAULT_MAX_POINTS, **kwargs: Any):
+        super().__init__(master, title, **kwargs)
+        self.max_points = max_points
+        (self.line,) = self.ax.plot([], [], color=color, linewidth=1.5)
+        self.figure.subplots_adjust(bottom=0.25)
+
+    def update(self, labels: Sequence[Any], values: Sequence[float],
+               positions: Optional[Sequence[float]] = None) -> None:
+        """Plot a series, labelling a handful of x ticks.
+
+        Args:
+            labels: Tick label per point (e.g. ISO dates).
+            values: Y values.
+            positions: X position per point; defaults to ``0..n-1``. Pass the
+                output of :func:`downsample_labeled` (typically computed on the
+                worker thread) so spacing of the original series is preserved.
+        """
+        if positions is None:
+            positions, labels, values = downsample_labeled(labels, values, self.max_points)
+        self.line.set_data(list(positions), [float(v or 0) for v in values])
+        self.ax.relim()
+        self.ax.autoscale_view()
+        step = max(1, len(positions) // 6)
+        self.ax.set_xticks(list(positions)[::step])
+        self.ax.set_xticklabels([str(x) for x in list(labels)[::step]], rotation=30, ha='right', fontsize=8)
+        self.redraw()
+
+
+class BackgroundTask:
+    """Run loaders on a worker thread and hand results back on the Tk thread.
+
+    Only the most recent submission is delivered; results of superseded runs (for
+    example when Refresh is pressed twice) are dropped.
+    """
+
+    def __init__(self, root: Any, poll_ms: int = 50):
+        self.root = root
+        self.poll_ms = poll_ms
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='cbpm-charts')
+        self._results: "queue.Queue[tuple]" = queue.Queue()
+        self._generation = 0
+        self._outstanding = 0
+        self._polling = False
+        self._closed = False
+
+    def submit(self, loader: Callable[[], Any], on_result: Callable[[Any], None],
+               on_error: Optional[Callable[[Exception], None]] = None) -> None:
+        """Call ``loader()`` off-thread, then ``on_result(value)`` on the Tk thread."""
+        if self._closed:
+            return
+        self._generation += 1
+        gen = self._generation
+
+        def _work() -> None:
+            try:
+                self._results.put((gen, on_result, loader(), None))
+            except Exception as e:
+                self._results.put((gen, on_error, None, e))
+
+        self._executor.submit(_work)
+        self._outstanding += 1
+        if not self._polling:
+            self._polling = True
+            self.root.after(self.poll_ms, self._poll)
+
+    def _poll(self) -> None:
+        if self._closed:
+            return
+        while True:
+            try:
+                gen, callback, value, error = self._results.get_nowait()
+            except queue.Empty:
+                break
+            self._outstanding -= 1
+            if gen != self._generation or callback is None:
+                continue
+            try:
+                callback(error if error is not None else value)
+            except Exception:
+                logger.exception("Chart callback failed")
+        if self._outstanding <= 0:
+            self._polling = False
+            return
+        try:
+            self.root.after(self.poll_ms, self._poll)
+        except Exception:
+            self._polling = False
+
+    def close(self) -> None:
+        self._closed = True
+        self._executor.shutdown(wait=False, cancel_futures=True)
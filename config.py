@@ -13,6 +13,64 @@ CLOUD_DB_SETTINGS = {
     'google_drive_file_id': '1mtyBi86H4WPTJze8KQ4K2Ow3D-LiFrU7'  # Your Google Drive file ID
 }
 
+# Where this terminal's data lives. 'local' opens DATABASE_NAME directly (Google Drive sync
+# above applies); 'remote' uses the depot's database service (db_service.py) over the LAN
+DATABASE_BACKEND = {
+    'mode': 'local',  # 'local' or 'remote'
+    'url': 'http://192.168.1.10:8765',  # Database service on the depot's server machine
+    'token': '',  # Must match DATABASE_SERVICE['token'] on the server
+    'timeout': 15  # Seconds per request before the terminal reports the server unreachable
+}
+
+# Offline operation journal (offline_journal.py): sales, transfers, payments and stock adjustments
+# are journaled on the terminal and replayed to the shared store when it is reachable again
+OFFLINE_JOURNAL = {
+    'path': None,  # None = <database name>.journal.db next to the database
+    'terminal_id': None,  # None = this computer's name
+    'batch_size': 500,  # Operations applied per replay transaction
+    'retry_interval_s': 60,  # Remote terminals: how often to retry sending queued operations
+    'retention_days': 90  # Operations confirmed in the shared store are kept this long
+}
+
+# Change capture (change_capture.py): triggers log row changes so mirrors can sync incrementally
+CHANGE_CAPTURE = {
+    'enabled': True,
+    'tables': None,  # None = every table except the ones below
+    # Derived or internal tables that mirrors rebuild themselves
+    'exclude_tables': ['maintenance_log', 'job_facets', 'job_search_meta', 'applied_operations',
+                       'notification_queue', 'store_prices', 'price_book_state'],
+    'batch_size': 1000,  # Log entries returned per changes_since call
+    # Consumers that have not acknowledged anything for this long stop holding back compaction
+    'stale_consumer_days': 30
+}
+
+# Database service (db_service.py) run on the machine that owns the database file
+DATABASE_SERVICE = {
+    'host': '0.0.0.0',
+    'port': 8765,
+    # Shared secret; set the same value in DATABASE_BACKEND on every till. Required unless host is loopback
+    'token': '',
+    'read_connections': 4,
+    # Queued write batches from different tills committed together in one transaction
+    'group_commit_max': 32,
+    # Roll back an interactive transaction whose till has gone quiet for this long
+    'tx_timeout_s': 30
+}
+
+# Read API for the mobile front-end (mobile_api.py)
+MOBILE_API = {
+    'host': '0.0.0.0',
+    'port': 8770,
+    'secret': '',  # Signs login tokens; empty = random per run, so phones log in again after a restart
+    'token_ttl_h': 12,
+    'page_size': 100,
+    'max_page_size': 500,
+    # ?since= requests with more changed rows than this get the full listing instead
+    'max_delta': 1000,
+    'cache_entries': 2000,  # Rendered responses kept across all users
+    'gzip_min_bytes': 512
+}
+
 # Default system settings
 SYSTEM_NAME = "Cameroon Construction Project Management System"
 VERSION = "1.0.0"
@@ -156,9 +214,173 @@ SCALABILITY_SETTINGS = {
         'temp_store': 2,
         # Busy timeout in ms to reduce "database is locked" errors
         'busy_timeout': 5000
+    },
+    # Machine profile layered over 'sqlite' (db_profiles.py): a name from 'profiles' or 'auto'
+    # (by installed memory). CBPM_DB_PROFILE overrides it per machine.
+    'profile': 'auto',
+    'low_memory_below_gb': 4,
+    'reporting_from_gb': 16,
+    'profiles': {
+        # Sales tills: writes dominate, keep the WAL short and the footprint modest
+        'terminal': {
+            'cache_size': -20000,
+            'mmap_size': 64 * 1024 * 1024,
+            'wal_autocheckpoint': 1000,
+            'journal_size_limit': 64 * 1024 * 1024,
+            'page_size': 4096
+        },
+        # Back-office analytics: large cache, mmap reads of transactions and other big tables
+        'reporting': {
+            'cache_size': -262144,
+            'cache_spill': 0,
+            'mmap_size': 1024 * 1024 * 1024,
+            'wal_autocheckpoint': 2000,
+            'journal_size_limit': 128 * 1024 * 1024,
+            'page_size': 8192
+        },
+        # Older laptops: small cache, no mmap, temp tables on disk
+        'low_memory': {
+            'cache_size': -4000,
+            'temp_store': 1,
+            'mmap_size': 0,
+            'wal_autocheckpoint': 500,
+            'journal_size_limit': 16 * 1024 * 1024,
+            'page_size': 4096
+        }
     }
 }
 
+# SQL statement timing (query_stats.py); CBPM_QUERY_STATS=0 disables it at startup
+QUERY_INSTRUMENTATION = {
+    'enabled': True,
+    # Statements slower than this (execute + fetch) go to the slow-query log with their query plan
+    'slow_ms': 200,
+    'explain_slow': True,
+    # Slow statements kept in memory for the Performance window
+    'max_slow_entries': 200,
+    # JSON-lines file the slow log is appended to; None keeps it in memory only
+    'slow_log_path': 'logs/slow_queries.jsonl',
+    # Write the full statistics here when the application exits; None disables
+    'dump_on_exit': None
+}
+
+# Tk event-handler timing (ui_profiler.py); CBPM_UI_PROFILE=1 or =capture enables it at startup
+UI_PROFILING = {
+    'enabled': False,
+    # Handlers that hold the event loop longer than this are flagged as blocking
+    'slow_ms': 100,
+    # Profile the next run of a blocking handler with cProfile and save it under capture_dir
+    'capture': False,
+    'capture_dir': 'logs/ui_profiles',
+    'max_captures': 20
+}
+
+# SQLite maintenance (db_maintenance.py): runs on a background thread once the user is idle
+DB_MAINTENANCE = {
+    'enabled': True,
+    # How often to look for due tasks, and how long without keyboard/mouse input counts as idle
+    'check_interval_s': 300,
+    'idle_seconds': 60,
+    # PRAGMA optimize when a connection closes, at most once per interval per process
+    'optimize_on_close': True,
+    'optimize_min_interval_s': 300,
+    # Rows sampled per index by ANALYZE/optimize (0 = unlimited)
+    'analysis_limit': 400,
+    # Full PRAGMA optimize pass from the scheduler
+    'optimize_interval_s': 6 * 3600,
+    # wal_checkpoint(TRUNCATE) once the -wal file is larger than this
+    'wal_checkpoint_mb': 64,
+    # Use auto_vacuum=INCREMENTAL and release free pages once there are this many
+    'incremental_vacuum': True,
+    'vacuum_free_pages': 2048,
+    # Existing files up to this size are converted to incremental auto_vacuum with one VACUUM
+    'convert_auto_vacuum_max_mb': 500,
+    'log_retention_days': 180
+}
+
+# Read-only reporting snapshot (reporting_snapshot.py) used by analytics and financial screens
+REPORTING_SNAPSHOT = {
+    'enabled': True,
+    # Rebuild the snapshot this often while a report screen has been opened in this session
+    'refresh_interval_s': 900,
+    # Show the data as out of date after this long (default: twice the refresh interval)
+    'stale_after_s': 1800,
+    # Where snapshot files are written; None = reporting_snapshots/ next to the database
+    'directory': None
+}
+
+# Background document rendering (contract and inventory PDFs)
+DOCUMENT_RENDER_SETTINGS = {
+    # Lay out PDFs in a separate process so the UI stays responsive; falls back to a thread
+    'use_worker_process': True,
+    # One worker keeps font/template caches warm; raise for very large batch exports
+    'max_workers': 1,
+    # Optional TTF used for body text (e.g. for full accent coverage); None keeps Helvetica
+    'font_path': None
+}
+
+# Content-addressed attachment store (attachments.py): resumes and contract signatures
+ATTACHMENTS = {
+    # Folder of the store; None = attachments/ next to the database. Terminals using a
+    # remote database need a folder shared by all of them (e.g. a network drive)
+    'root': None,
+    # Largest file accepted
+    'max_mb': 25,
+    # Longest side of generated thumbnails, in pixels
+    'thumbnail_px': 256,
+    # Unreferenced files younger than this are kept by garbage collection (uploads in progress)
+    'orphan_grace_s': 3600,
+    # How often the maintenance scheduler collects unreferenced files
+    'collect_interval_s': 24 * 3600
+}
+
+# Material Calculator bill-of-materials estimator (estimator.py)
+BOM_ESTIMATOR = {
+    # Shelf prices are re-read after this long; prices saved in this application (inventory dialogs,
+    # bulk price change, imports, transfers, approved purchases) drop them at once, other terminals' wait
+    'price_ttl_s': 300,
+    # Extra or replacement recipes / project types, in the format of estimator.RECIPES and PROJECT_TYPES
+    'recipes': None,
+    'project_types': None,
+    # Largest number of layouts the Compare Layouts grid generates
+    'max_variants': 400
+}
+
+# Outbound e-mail notifications (notifications.py): queued with the change, sent by a background worker
+NOTIFICATIONS = {
+    'enabled': True,
+    # Events that are queued; None = all (low_stock, payment_pending, application_status, interview_scheduled)
+    'events': None,
+    # SMTP server; empty = queue only, nothing is sent until a server is configured
+    'smtp_host': '',
+    'smtp_port': 587,
+    'starttls': True,
+    'ssl': False,  # SMTP over SSL (usually port 465) instead of STARTTLS
+    'username': '',
+    'password': '',
+    'from_address': 'noreply@cameroonconstruction.cm',
+    'timeout_s': 30,
+    # Messages sent per SMTP connection, and at most this many per minute
+    'batch_size': 20,
+    'rate_per_minute': 60,
+    # Retries of a failed send, waiting backoff_base_s, doubling up to backoff_max_s
+    'max_attempts': 8,
+    'backoff_base_s': 30,
+    'backoff_max_s': 3600,
+    # How often the worker looks at the queue when nothing wakes it
+    'poll_interval_s': 15,
+    # Rows claimed by a worker that stopped are handed out again after this long
+    'stale_claim_s': 600,
+    # Sent and failed rows are deleted after this many days
+    'retention_days': 30
+}
+
+# Per-store effective prices (price_book.py)
+PRICE_BOOK = {
+    # A store's cached prices are re-checked against the database after this long
+    'recheck_s': 2
+}
+
 # Common Cameroon cities for location dropdown
 CAMEROON_CITIES = [
     'Douala',
@@ -0,0 +1,76 @@
+"""
+Materialized contract balances for the Cameroon Construction Project Management System
+
+``contract_balances`` holds one row per contract with its budget, confirmed
+(paid) and pending payment totals and the date of the last confirmed payment.
+Screens that write ``contract_payments`` or a contract's budget call
+:func:`refresh_balances` on the same cursor before committing, so the row is
+updated in the same transaction as the change it summarizes. Contract lists
+then LEFT JOIN the table instead of aggregating payments for every row.
+"""
+
+import sqlite3
+from typing import Iterable, List
+
+_REFRESH_SQL = '''
+    INSERT INTO contract_balances(contract_id, budget, paid, pending, last_payment_date, updated_at)
+    SELECT c.id,
+           COALESCE(c.budget, 0),
+           COALESCE(SUM(CASE WHEN cp.status = 'Confirmed' THEN cp.amount END), 0),
+           COALESCE(SUM(CASE WHEN cp.status = 'Pending' THEN cp.amount END), 0),
+           MAX(CASE WHEN cp.status = 'Confirmed' THEN cp.confirmed_at END),
+           CURRENT_TIMESTAMP
+    FROM contracts c
+    LEFT JOIN contract_payments cp ON cp.contract_id = c.id
+    WHERE {where}
+    GROUP BY c.id
+    ON CONFLICT(contract_id) DO UPDATE SET
+        budget = excluded.budget,
+        paid = excluded.paid,
+        pending = excluded.pending,
+        last_payment_date = excluded.last_payment_date,
+        updated_at = excluded.updated_at
+'''
+
+
+def ensure_schema(conn: sqlite3.Connection) -> None:
+    """Create ``contract_balances`` (idempotent) and populate it on first use."""
+    cur = conn.cursor()
+    cur.execute('''
+                CREATE TABLE IF NOT EXISTS contract_balances
+                (
+                    contract_id INTEGER PRIMARY KEY,
+                    budget REAL NOT NULL DEFAULT 0,
+                    paid INTEGER NOT NULL DEFAULT 0,
+                    pending INTEGER NOT NULL DEFAULT 0,
+                    last_payment_date DATETIME,
+                    updated_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+                    FOREIGN KEY(contract_id) REFERENCES contracts(id)
+                )
+                ''')
+    cur.execute("SELECT EXISTS(SELECT 1 FROM contract_balances)")
+    if not cur.fetchone()[0]:
+        rebuild_balances(conn)
+
+
+def refresh_balances(cur: sqlite3.Cursor, contract_ids: Iterable[int]) -> None:
+    """Recompute the balance rows of ``contract_ids`` inside the caller's transaction.
+
+    Each contract is an indexed aggregate over its own payments
+    (``idx_cp_contract``), so this is cheap enough to run on every write.
+    """
+    ids: List[int] = [int(c) for c in contract_ids if c is not None]
+    if not ids:
+        return
+    cur.execute(_REFRESH_SQL.format(where=f"c.id IN ({','.join('?' * len(ids))})"), ids)
+    # Contracts that no longer exist
+    cur.execute(
+        f"DELETE FROM contract_balances WHERE contract_id IN ({','.join('?' * len(ids))}) "
+        "AND contract_id NOT IN (SELECT id FROM contracts)", ids)
+
+
+def rebuild_balances(conn: sqlite3.Connection) -> None:
+    """Recompute every contract's balance (first run and repair)."""
+    cur = conn.cursor()
+    cur.execute(_REFRESH_SQL.format(where="1 = 1"))
+    cur.execute("DELETE FROM contract_balances WHERE contract_id NOT IN (SELECT id FROM contracts)")
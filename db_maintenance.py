@@ -0,0 +1,405 @@
+"""
+SQLite maintenance for the Cameroon Construction Project Management System
+
+Keeps query plans and the database files healthy without anyone having to
+remember to do it:
+
+* connections opened by ``DatabaseManager.create_connection`` are
+  :class:`OptimizingConnection` objects that run ``PRAGMA optimize`` when
+  closed (throttled, and only outside a transaction), with
+  ``PRAGMA analysis_limit`` bounding the work;
+* :class:`MaintenanceScheduler` checks every few minutes from the Tk loop and,
+  once the user has been idle, runs the due tasks on a background thread:
+  pending ``ANALYZE`` requests (bulk imports call :func:`request_analyze`),
+  periodic ``PRAGMA optimize``, ``wal_checkpoint(TRUNCATE)`` when the WAL is
+  larger than the threshold, ``change_log`` compaction once every consumer
+  has acknowledged entries (change_capture.py), daily removal of attachment
+  files no record refers to (attachments.py), and ``incremental_vacuum`` once the free list
+  grows (converting the file to ``auto_vacuum=INCREMENTAL`` first if needed);
+* each run is timed and recorded in ``maintenance_log``, which the
+  administrator Maintenance window lists.
+
+Settings come from ``config.DB_MAINTENANCE``.
+"""
+
+import logging
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set
+
+try:
+    from config import DB_MAINTENANCE as SETTINGS
+except Exception:
+    SETTINGS = {'enabled': True}
+
+logger = logging.getLogger(__name__)
+
+TASKS = ('analyze', 'optimize', 'checkpoint', 'compact_changes', 'collect_attachments', 'auto_vacuum',
+         'incremental_vacuum')
+
+_pending_analyze: Set[str] = set()
+_pending_lock = threading.Lock()
+_last_close_optimize = 0.0
+
+
+def _setting(key: str, default: Any) -> Any:
+    return SETTINGS.get(key, default)
+
+
+def ensure_schema(conn: sqlite3.Connection) -> None:
+    """Create ``maintenance_log`` (idempotent)."""
+    cur = conn.cursor()
+    cur.execute('''
+                CREATE TABLE IF NOT EXISTS maintenance_log
+                (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    task TEXT NOT NULL,
+                    started_at DATETIME NOT NULL,
+                    duration_ms REAL NOT NULL,
+                    status TEXT NOT NULL DEFAULT 'ok',
+                    details TEXT
+                )
+                ''')
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_maintenance_task ON maintenance_log(task, started_at)")
+
+
+def prepare_new_database(conn: sqlite3.Connection) -> None:
+    """Use incremental auto-vacuum for a database that has no tables yet.
+
+    SQLite only honours ``auto_vacuum`` before the first table is created and
+    before ``journal_mode=WAL`` writes the header, so this runs right after
+    connecting; existing files are converted later by the ``auto_vacuum`` task.
+    """
+    if not _setting('incremental_vacuum', True):
+        return
+    if conn.execute("SELECT COUNT(*) FROM sqlite_master").fetchone()[0] == 0:
+        conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+
+
+def configure_connection(conn: sqlite3.Connection) -> None:
+    """Per-connection settings; ``analysis_limit`` keeps ANALYZE/optimize cheap on large tables."""
+    limit = int(_setting('analysis_limit', 400))
+    if limit:
+        try:
+            conn.execute(f"PRAGMA analysis_limit={limit}")
+        except sqlite3.DatabaseError:
+            pass
+
+
+class OptimizingConnection(sqlite3.Connection):
+    """Connection that runs ``PRAGMA optimize`` before closing.
+
+    The application opens a connection per screen action, so the pragma is
+    throttled to once per ``optimize_min_interval_s`` per process. It is skipped
+    inside an open transaction and uses a short busy timeout so closing never
+    waits on another writer.
+    """
+
+    def close(self):
+        global _last_close_optimize
+        if _setting('optimize_on_close', True) and not self.in_transaction:
+            now = time.monotonic()
+            if now - _last_close_optimize >= float(_setting('optimize_min_interval_s', 300)):
+                _last_close_optimize = now
+                try:
+                    self.execute("PRAGMA busy_timeout=100")
+                    self.execute("PRAGMA optimize")
+                except sqlite3.DatabaseError:
+                    pass
+        super().close()
+
+
+def request_analyze(tables: Iterable[str]) -> None:
+    """Queue ``ANALYZE`` for ``tables`` (after a bulk write); runs at the next idle check."""
+    with _pending_lock:
+        _pending_analyze.update(t for t in tables if t)
+
+
+def pending_analyze() -> List[str]:
+    with _pending_lock:
+        return sorted(_pending_analyze)
+
+
+def wal_size(db_path: str) -> int:
+    try:
+        return os.path.getsize(db_path + '-wal')
+    except OSError:
+        return 0
+
+
+def _pragma(conn: sqlite3.Connection, name: str) -> int:
+    return int(conn.execute(f"PRAGMA {name}").fetchone()[0])
+
+
+def _mb(size: float) -> str:
+    return f"{size / (1024 * 1024):,.1f} MB"
+
+
+# ---- tasks: each returns a details string for maintenance_log ----
+
+def run_analyze(conn: sqlite3.Connection, tables: Optional[Iterable[str]] = None) -> str:
+    tables = list(tables or [])
+    if not tables:
+        conn.execute("ANALYZE")
+        return "all tables"
+    existing = {r[0] for r in conn.execute("SELECT name FROM sqlite_master WHERE type='table'")}
+    done = [t for t in tables if t in existing]
+    for table in done:
+        conn.execute(f'ANALYZE "{table}"')
+    return ", ".join(done) or "no matching tables"
+
+
+def run_optimize(conn: sqlite3.Connection) -> str:
+    conn.execute("PRAGMA optimize")
+    return "PRAGMA optimize"
+
+
+def run_checkpoint(conn: sqlite3.Connection, db_path: str) -> str:
+    before = wal_size(db_path)
+    busy, log_frames, checkpointed = conn.execute("PRAGMA wal_checkpoint(TRUNCATE)").fetchone()
+    after = wal_size(db_path)
+    state = "blocked by readers" if busy else "truncated"
+    return f"WAL {_mb(before)} -> {_mb(after)} ({state}; {checkpointed}/{log_frames} frames)"
+
+
+def _checkpoint_quietly(conn: sqlite3.Connection) -> None:
+    # In WAL mode the main file only shrinks once the WAL is checkpointed
+    try:
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)").fetchone()
+    except sqlite3.DatabaseError:
+        pass
+
+
+def run_convert_auto_vacuum(conn: sqlite3.Connection, db_path: str) -> str:
+    before = os.path.getsize(db_path)
+    conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+    conn.execute("VACUUM")
+    _checkpoint_quietly(conn)
+    return f"auto_vacuum=INCREMENTAL, file {_mb(before)} -> {_mb(os.path.getsize(db_path))}"
+
+
+def run_incremental_vacuum(conn: sqlite3.Connection, db_path: str) -> str:
+    free = _pragma(conn, 'freelist_count')
+    before = os.path.getsize(db_path)
+    # executescript steps the pragma to completion; execute() would free a single page
+    conn.executescript(f"PRAGMA incremental_vacuum({free});")
+    _checkpoint_quietly(conn)
+    return f"{free} free pages released, file {_mb(before)} -> {_mb(os.path.getsize(db_path))}"
+
+
+class MaintenanceScheduler:
+    """Runs due maintenance tasks when the application is idle.
+
+    Args:
+        db_path: Database file (used for WAL and file sizes).
+        connect: Returns a new configured connection (``DatabaseManager.create_connection``).
+        settings: Overrides for ``config.DB_MAINTENANCE``.
+    """
+
+    def __init__(self, db_path: str, connect: Callable[[], sqlite3.Connection],
+                 settings: Optional[Dict[str, Any]] = None):
+        self.db_path = db_path
+        self.connect = connect
+        self.settings = dict(SETTINGS, **(settings or {}))
+        self.running = False
+        self.last_results: List[Dict[str, Any]] = []
+        self._root = None
+        self._after_id = None
+        self._thread: Optional[threading.Thread] = None
+        self._last_input = time.monotonic()
+
+    # ---- scheduling from the Tk loop ----
+    def start(self, root) -> None:
+        """Check for due tasks every ``check_interval_s`` seconds on ``root``'s event loop."""
+        if not self.settings.get('enabled', True):
+            return
+        self._root = root
+        if self._tk_inactive_ms() < 0:
+            # No native idle timer on this platform: track input ourselves
+            root.bind_all('<Any-KeyPress>', self._note_input, add='+')
+            root.bind_all('<Any-ButtonPress>', self._note_input, add='+')
+        self._schedule()
+
+    def stop(self) -> None:
+        if self._root is not None and self._after_id is not None:
+            try:
+                self._root.after_cancel(self._after_id)
+            except Exception:
+                pass
+        self._after_id = None
+        self._root = None
+
+    def _schedule(self) -> None:
+        if self._root is not None:
+            self._after_id = self._root.after(int(self.settings.get('check_interval_s', 300) * 1000), self._tick)
+
+    def _note_input(self, event=None) -> None:
+        self._last_input = time.monotonic()
+
+    def _tk_inactive_ms(self) -> int:
+        try:
+            return int(self._root.tk.call('tk', 'inactive'))
+        except Exception:
+            return -1
+
+    def idle_seconds(self) -> float:
+        ms = self._tk_inactive_ms() if self._root is not None else -1
+        return ms / 1000.0 if ms >= 0 else time.monotonic() - self._last_input
+
+    def _tick(self) -> None:
+        try:
+            if not self.running and self.idle_seconds() >= float(self.settings.get('idle_seconds', 60)):
+                self.run_in_background()
+        finally:
+            self._schedule()
+
+    def run_in_background(self, force: bool = False) -> bool:
+        """Start :meth:`run_due` on a daemon thread; False if a run is already in progress.
+
+        Callers on the Tk thread poll :attr:`running` rather than being called back.
+        """
+        if self.running:
+            return False
+        self.running = True
+
+        def work():
+            try:
+                self.run_due(force=force)
+            except Exception as e:
+                print(f"[WARN] database maintenance failed: {e}")
+            finally:
+                self.running = False
+
+        self._thread = threading.Thread(target=work, name='db-maintenance', daemon=True)
+        self._thread.start()
+        return True
+
+    # ---- deciding and running ----
+    def last_runs(self, conn: sqlite3.Connection) -> Dict[str, datetime]:
+        rows = conn.execute("SELECT task, MAX(started_at) FROM maintenance_log WHERE status = 'ok' GROUP BY task")
+        out = {}
+        for task, started in rows.fetchall():
+            try:
+                out[task] = datetime.fromisoformat(str(started))
+            except ValueError:
+                pass
+        return out
+
+    def due_tasks(self, conn: sqlite3.Connection, force: bool = False) -> List[str]:
+        """Tasks whose condition holds now; ``force`` ignores intervals and thresholds where safe."""
+        s = self.settings
+        due = []
+        if pending_analyze():
+            due.append('analyze')
+        last = self.last_runs(conn).get('optimize')
+        interval = timedelta(seconds=float(s.get('optimize_interval_s', 6 * 3600)))
+        if force or last is None or datetime.now() - last >= interval:
+            due.append('optimize')
+        if force or wal_size(self.db_path) >= float(s.get('wal_checkpoint_mb', 64)) * 1024 * 1024:
+            due.append('checkpoint')
+        try:
+            from change_capture import compactable
+            if compactable(conn):
+                due.append('compact_changes')
+        except sqlite3.Error:
+            pass   # no change_log in this database
+        try:
+            from attachments import SETTINGS as ATTACHMENT_SETTINGS
+            last = self.last_runs(conn).get('collect_attachments')
+            interval = timedelta(seconds=float(ATTACHMENT_SETTINGS.get('collect_interval_s', 24 * 3600)))
+            if force or last is None or datetime.now() - last >= interval:
+                due.append('collect_attachments')
+        except ImportError:
+            pass
+        if s.get('incremental_vacuum', True):
+            if _pragma(conn, 'auto_vacuum') != 2:
+                max_mb = float(s.get('convert_auto_vacuum_max_mb', 500))
+                if os.path.getsize(self.db_path) <= max_mb * 1024 * 1024:
+                    due.append('auto_vacuum')
+            elif _pragma(conn, 'freelist_count') >= (1 if force else int(s.get('vacuum_free_pages', 2048))):
+                due.append('incremental_vacuum')
+        return due
+
+    def run_due(self, force: bool = False) -> List[Dict[str, Any]]:
+        """Run every due task on one connection, logging each; returns the log entries."""
+        results = []
+        conn = self.connect()
+        try:
+            ensure_schema(conn)
+            conn.commit()
+            for task in self.due_tasks(conn, force=force):
+                results.append(self._run_task(conn, task))
+            self._prune_log(conn)
+        finally:
+            conn.close()
+        self.last_results = results
+        return results
+
+    def _run_task(self, conn: sqlite3.Connection, task: str) -> Dict[str, Any]:
+        started = datetime.now()
+        t0 = time.perf_counter()
+        status = 'ok'
+        try:
+            if task == 'analyze':
+                with _pending_lock:
+                    tables = sorted(_pending_analyze)
+                    _pending_analyze.clear()
+                details = run_analyze(conn, tables)
+                conn.commit()
+            elif task == 'optimize':
+                details = run_optimize(conn)
+                conn.commit()
+            elif task == 'checkpoint':
+                details = run_checkpoint(conn, self.db_path)
+            elif task == 'compact_changes':
+                from change_capture import run_compact
+                details = run_compact(conn)
+            elif task == 'collect_attachments':
+                from attachments import run_collect
+                details = run_collect(conn, self.db_path)
+            elif task == 'auto_vacuum':
+                details = run_convert_auto_vacuum(conn, self.db_path)
+            elif task == 'incremental_vacuum':
+                details = run_incremental_vacuum(conn, self.db_path)
+            else:
+                raise ValueError(f"Unknown maintenance task: {task}")
+        except sqlite3.Error as e:
+            try:
+                conn.rollback()
+            except sqlite3.Error:
+                pass
+            status, details = 'failed', str(e)
+        duration_ms = (time.perf_counter() - t0) * 1000
+        entry = {'task': task, 'started_at': started.isoformat(sep=' ', timespec='seconds'),
+                 'duration_ms': round(duration_ms, 1), 'status': status, 'details': details}
+        try:
+            conn.execute("INSERT INTO maintenance_log (task, started_at, duration_ms, status, details) "
+                         "VALUES (?, ?, ?, ?, ?)",
+                         (task, entry['started_at'], entry['duration_ms'], status, details))
+            conn.commit()
+        except sqlite3.Error as e:
+            print(f"[WARN] maintenance log not written: {e}")
+        logger.debug("maintenance %s: %s in %.0f ms (%s)", task, status, duration_ms, details)
+        return entry
+
+    def _prune_log(self, conn: sqlite3.Connection) -> None:
+        days = int(self.settings.get('log_retention_days', 180))
+        if days > 0:
+            cutoff = (datetime.now() - timedelta(days=days)).isoformat(sep=' ', timespec='seconds')
+            conn.execute("DELETE FROM maintenance_log WHERE started_at < ?", (cutoff,))
+            conn.commit()
+
+    def status(self, conn: sqlite3.Connection) -> Dict[str, Any]:
+        """File sizes and vacuum state for the Maintenance window."""
+        page_size = _pragma(conn, 'page_size')
+        return {
+            'db_size': os.path.getsize(self.db_path) if os.path.exists(self.db_path) else 0,
+            'wal_size': wal_size(self.db_path),
+            'free_bytes': _pragma(conn, 'freelist_count') * page_size,
+            'auto_vacuum': {0: 'NONE', 1: 'FULL', 2: 'INCREMENTAL'}.get(_pragma(conn, 'auto_vacuum'), '?'),
+            'pending_analyze': pending_analyze(),
+            'idle_seconds': self.idle_seconds(),
+        }
@@ -0,0 +1,123 @@
+"""
+Named SQLite performance profiles
+
+``config.SCALABILITY_SETTINGS['sqlite']`` holds the settings every connection
+gets; ``SCALABILITY_SETTINGS['profiles']`` layers machine-specific tuning on top:
+
+* ``terminal``   - sales tills: moderate cache, small mmap window, frequent
+  WAL checkpoints so the WAL stays short;
+* ``reporting``  - back-office machines running analytics: large page cache
+  and a memory-mapped window big enough to read ``transactions`` without
+  copying pages through the cache;
+* ``low_memory`` - older laptops: small cache, no mmap, temp tables on disk.
+
+The active profile comes from ``CBPM_DB_PROFILE``, else
+``SCALABILITY_SETTINGS['profile']``; ``'auto'`` picks by installed memory
+(``low_memory`` below ``low_memory_below_gb``, ``reporting`` from
+``reporting_from_gb``, ``terminal`` otherwise). ``page_size`` only takes effect
+when a database file is created.
+
+``benchmarks/bench_profiles.py`` measures each profile on the report queries.
+"""
+
+import ctypes
+import logging
+import os
+import sqlite3
+import sys
+from typing import Any, Dict, Optional
+
+try:
+    from config import SCALABILITY_SETTINGS
+except Exception:
+    SCALABILITY_SETTINGS = {'sqlite': {}}
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PROFILE = 'terminal'
+
+# Applied in this order; page_size must precede the WAL switch on a new file
+PRAGMA_ORDER = ('page_size', 'busy_timeout', 'journal_mode', 'synchronous', 'foreign_keys', 'cache_size',
+                'cache_spill', 'temp_store', 'mmap_size', 'wal_autocheckpoint', 'journal_size_limit')
+
+_active: Optional[str] = None
+
+
+def total_memory_bytes() -> Optional[int]:
+    """Installed physical memory, or None when it cannot be determined."""
+    try:
+        if sys.platform == 'win32':
+            class MEMORYSTATUSEX(ctypes.Structure):
+                _fields_ = [('dwLength', ctypes.c_ulong), ('dwMemoryLoad', ctypes.c_ulong),
+                            ('ullTotalPhys', ctypes.c_ulonglong), ('ullAvailPhys', ctypes.c_ulonglong),
+                            ('ullTotalPageFile', ctypes.c_ulonglong), ('ullAvailPageFile', ctypes.c_ulonglong),
+                            ('ullTotalVirtual', ctypes.c_ulonglong), ('ullAvailVirtual', ctypes.c_ulonglong),
+                            ('ullAvailExtendedVirtual', ctypes.c_ulonglong)]
+            status = MEMORYSTATUSEX()
+            status.dwLength = ctypes.sizeof(MEMORYSTATUSEX)
+            if ctypes.windll.kernel32.GlobalMemoryStatusEx(ctypes.byref(status)):
+                return int(status.ullTotalPhys)
+            return None
+        return int(os.sysconf('SC_PAGE_SIZE')) * int(os.sysconf('SC_PHYS_PAGES'))
+    except (AttributeError, ValueError, OSError):
+        return None
+
+
+def select_profile(settings: Optional[Dict[str, Any]] = None) -> str:
+    """Name of the profile to use on this machine."""
+    settings = SCALABILITY_SETTINGS if settings is None else settings
+    profiles = settings.get('profiles', {})
+    name = os.environ.get('CBPM_DB_PROFILE') or settings.get('profile', 'auto')
+    if name != 'auto':
+        if name not in profiles:
+            print(f"[WARN] Unknown database profile '{name}', using {DEFAULT_PROFILE}")
+            return DEFAULT_PROFILE
+        return name
+    memory = total_memory_bytes()
+    if memory is None:
+        return DEFAULT_PROFILE
+    gb = memory / (1024 ** 3)
+    if gb < float(settings.get('low_memory_below_gb', 4)) and 'low_memory' in profiles:
+        return 'low_memory'
+    if gb >= float(settings.get('reporting_from_gb', 16)) and 'reporting' in profiles:
+        return 'reporting'
+    return DEFAULT_PROFILE
+
+
+def active_profile() -> str:
+    """The profile chosen for this process (selected once, on first use)."""
+    global _active
+    if _active is None:
+        _active = select_profile()
+        logger.debug("database profile: %s", _active)
+    return _active
+
+
+def profile_pragmas(name: Optional[str] = None, settings: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """Base ``sqlite`` settings overlaid with profile ``name`` (default: the active profile)."""
+    settings = SCALABILITY_SETTINGS if settings is None else settings
+    name = name or active_profile()
+    pragmas = dict(settings.get('sqlite', {}))
+    pragmas.update(settings.get('profiles', {}).get(name, {}))
+    return pragmas
+
+
+def apply_pragmas(conn: sqlite3.Connection, pragmas: Dict[str, Any], is_new: bool = False) -> None:
+    """Run the PRAGMAs in ``pragmas`` on ``conn``; each failure is ignored individually."""
+    for key in PRAGMA_ORDER:
+        if key not in pragmas or (key == 'page_size' and not is_new):
+            continue
+        value = pragmas[key]
+        if key == 'foreign_keys':
+            value = 'ON' if value else 'OFF'
+        elif key == 'cache_spill' and isinstance(value, bool):
+            value = int(value)
+        try:
+            conn.execute(f"PRAGMA {key}={value}").fetchall()
+        except sqlite3.DatabaseError:
+            if key == 'journal_mode':
+                # Fall back to WAL if the configured mode was rejected
+                try:
+                    conn.execute("PRAGMA journal_mode=WAL")
+                except sqlite3.DatabaseError:
+                    pass
@@ -0,0 +1,552 @@
+#!/usr/bin/env python3
+"""
+Local-network database service
+
+One machine in a depot runs this service and owns the SQLite file; every till
+points ``DATABASE_BACKEND`` at it (``mode='remote'``) and talks to it through
+``remote_db.RemoteDatabase`` instead of syncing whole files through Google
+Drive. All tills then see the same live stock.
+
+* Reads (``POST /query``) run on a pool of read-only connections; a batch of
+  statements shares one read transaction, so it sees a consistent state.
+* Writes go through a single writer thread that owns the only read-write
+  connection. ``POST /execute`` queues a batch of statements that is applied
+  atomically; queued batches from several tills are group-committed in one
+  transaction, each inside its own SAVEPOINT, so one failing batch does not
+  affect the others.
+* ``POST /changes`` serves the change-capture feed (change_capture.py):
+  ``{"consumer", "register": true}`` returns the starting version,
+  ``{"since", "limit", "with_rows", "ack"}`` returns the next batch and
+  acknowledges ``ack``.
+* ``POST /replay`` applies a till's offline journal (offline_journal.py) in
+  one transaction on the writer thread.
+* Interactive transactions (``POST /tx``, ``/tx/<id>``, ``/tx/<id>/commit``,
+  ``/tx/<id>/rollback``) serve code that needs ``lastrowid`` or reads its own
+  writes. While one is open the writer serves only that session, which is
+  SQLite's own single-writer rule. An idle session is rolled back after
+  ``tx_timeout_s`` so a crashed till cannot block the depot.
+* Notification e-mails the tills queue (notifications.py) are sent from this
+  machine by a :class:`notifications.NotificationWorker`.
+
+Requests carry the shared token from ``DATABASE_SERVICE['token']`` in the
+``X-CBPM-Token`` header. The service refuses to listen on anything but a
+loopback address without one, since the API runs any SQL it is sent. The
+Flask layer is a thin adapter over :meth:`DatabaseService.handle`.
+
+Usage (PowerShell examples):
+  py .\\db_service.py --db cameroon_construction.db --host 0.0.0.0 --port 8765 --token depot-secret
+  py .\\db_service.py --db cameroon_construction.db --host 127.0.0.1
+"""
+
+import argparse
+import base64
+import hmac
+import ipaddress
+import itertools
+import queue
+import re
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future
+from contextlib import contextmanager
+from datetime import date, datetime
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+try:
+    from flask import Flask, jsonify, request
+    HAS_FLASK = True
+except ImportError:
+    Flask = None
+    HAS_FLASK = False
+
+try:
+    from config import DATABASE_SERVICE as SETTINGS
+except Exception:
+    SETTINGS = {}
+
+TOKEN_HEADER = 'X-CBPM-Token'
+
+_TX_PATH_RE = re.compile(r'^/tx/([0-9a-f]+)(?:/(commit|rollback))?$')
+
+
+# ---- wire format (shared with remote_db.py) ----
+
+def encode_value(value: Any) -> Any:
+    """JSON-safe form of a SQLite value; dates use the same ISO text as the sqlite3 adapters in CBPM.py."""
+    if value is None or isinstance(value, (int, float, str)):
+        return value
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return {'$b': base64.b64encode(bytes(value)).decode('ascii')}
+    if isinstance(value, datetime):
+        return value.isoformat(sep=' ')
+    if isinstance(value, date):
+        return value.isoformat()
+    return str(value)
+
+
+def decode_value(value: Any) -> Any:
+    if isinstance(value, dict) and '$b' in value:
+        return base64.b64decode(value['$b'])
+    return value
+
+
+def encode_params(params: Any) -> Any:
+    if params is None:
+        return None
+    if isinstance(params, dict):
+        return {k: encode_value(v) for k, v in params.items()}
+    return [encode_value(v) for v in params]
+
+
+def decode_params(params: Any) -> Any:
+    if params is None:
+        return ()
+    if isinstance(params, dict):
+        return {k: decode_value(v) for k, v in params.items()}
+    return [decode_value(v) for v in params]
+
+
+def run_statement(conn: sqlite3.Connection, statement: Dict[str, Any]) -> Dict[str, Any]:
+    """Execute one ``{'sql', 'params', 'many'}`` statement and return its wire result."""
+    cur = conn.cursor()
+    if statement.get('many'):
+        cur.executemany(statement['sql'], [decode_params(p) for p in statement.get('params') or []])
+    else:
+        cur.execute(statement['sql'], decode_params(statement.get('params')))
+    columns = [d[0] for d in cur.description] if cur.description else None
+    rows = [[encode_value(v) for v in row] for row in cur.fetchall()] if columns else []
+    return {'columns': columns, 'rows': rows, 'rowcount': cur.rowcount, 'lastrowid': cur.lastrowid}
+
+
+def error_body(exc: BaseException) -> Dict[str, str]:
+    """Error payload; ``type`` names the sqlite3 exception class the client re-raises."""
+    kind = type(exc).__name__ if isinstance(exc, sqlite3.Error) else 'OperationalError'
+    return {'error': str(exc), 'type': kind}
+
+
+# ---- connections ----
+
+class ReadPool:
+    """Fixed-size pool of read-only connections shared by the request threads."""
+
+    def __init__(self, connect: Callable[[], sqlite3.Connection], size: int = 4):
+        self._connect = connect
+        self._idle: 'queue.LifoQueue[sqlite3.Connection]' = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(size)
+
+    @contextmanager
+    def acquire(self, timeout: float = 30.0) -> Iterator[sqlite3.Connection]:
+        if not self._slots.acquire(timeout=timeout):
+            raise sqlite3.OperationalError("database service busy: no read connection available")
+        try:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                conn = self._connect()
+            try:
+                yield conn
+            except sqlite3.Error:
+                if conn.in_transaction:
+                    conn.rollback()
+                raise
+            self._idle.put(conn)
+        finally:
+            self._slots.release()
+
+
+class _Job:
+    __slots__ = ('kind', 'statements', 'future', 'commit', 'fn')
+
+    def __init__(self, kind: str, statements: Optional[List[Dict]] = None, commit: bool = True,
+                 fn: Optional[Callable[[sqlite3.Connection], Any]] = None):
+        self.kind = kind
+        self.statements = statements or []
+        self.future: Future = Future()
+        self.commit = commit
+        self.fn = fn
+
+
+class Session:
+    """An interactive write transaction being served by the writer thread."""
+
+    def __init__(self, session_id: str):
+        self.id = session_id
+        self.jobs: 'queue.Queue[_Job]' = queue.Queue()
+        self.closed = False
+
+
+class WriterQueue:
+    """Single writer thread owning the read-write connection.
+
+    Args:
+        connect: Opens the write connection (autocommit; transactions are explicit).
+        group_max: Most queued batches committed together.
+        tx_timeout: Seconds an interactive session may stay idle before it is rolled back.
+    """
+
+    def __init__(self, connect: Callable[[], sqlite3.Connection], group_max: int = 32, tx_timeout: float = 30.0):
+        self._connect = connect
+        self.group_max = group_max
+        self.tx_timeout = tx_timeout
+        self._jobs: 'queue.Queue[_Job]' = queue.Queue()
+        self._sessions: Dict[str, Session] = {}
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self.batches = 0
+        self.commits = 0
+        self.last_write = time.monotonic()
+        self._thread = threading.Thread(target=self._run, name='db-writer', daemon=True)
+        self._thread.start()
+
+    @property
+    def depth(self) -> int:
+        return self._jobs.qsize()
+
+    # ---- API used by the request threads ----
+    def submit(self, statements: List[Dict], timeout: float = 60.0) -> List[Dict]:
+        job = _Job('batch', statements)
+        self._jobs.put(job)
+        return job.future.result(timeout)
+
+    def call(self, fn: Callable[[sqlite3.Connection], Any], timeout: float = 120.0) -> Any:
+        """Run ``fn(connection)`` on the writer thread; ``fn`` manages its own transaction."""
+        job = _Job('call', fn=fn)
+        self._jobs.put(job)
+        return job.future.result(timeout)
+
+    def begin(self, timeout: float = 60.0) -> str:
+        job = _Job('begin')
+        self._jobs.put(job)
+        return job.future.result(timeout)
+
+    def session_execute(self, session_id: str, statements: List[Dict], timeout: float = 60.0) -> List[Dict]:
+        return self._session_job(session_id, _Job('stmts', statements), timeout)
+
+    def session_end(self, session_id: str, commit: bool, timeout: float = 60.0) -> None:
+        self._session_job(session_id, _Job('end', commit=commit), timeout)
+
+    def _session_job(self, session_id: str, job: _Job, timeout: float):
+        with self._lock:
+            session = self._sessions.get(session_id)
+        if session is None or session.closed:
+            raise sqlite3.OperationalError("transaction is no longer open (timed out or already finished)")
+        session.jobs.put(job)
+        return job.future.result(timeout)
+
+    # ---- writer thread ----
+    def _run(self) -> None:
+        conn = self._connect()
+        carry: Optional[_Job] = None
+        while True:
+            job = carry or self._jobs.get()
+            carry = None
+            if job.kind == 'begin':
+                self._serve_session(conn, job)
+                continue
+            if job.kind == 'call':
+                try:
+                    job.future.set_result(job.fn(conn))
+                    self.commits += 1
+                    self.last_write = time.monotonic()
+                except Exception as e:
+                    if conn.in_transaction:
+                        conn.execute("ROLLBACK")
+                    job.future.set_exception(e)
+                continue
+            group = [job]
+            while len(group) < self.group_max:
+                try:
+                    nxt = self._jobs.get_nowait()
+                except queue.Empty:
+                    break
+                if nxt.kind != 'batch':
+                    carry = nxt
+                    break
+                group.append(nxt)
+            self._commit_group(conn, group)
+
+    def _commit_group(self, conn: sqlite3.Connection, group: List[_Job]) -> None:
+        outcomes: List[Tuple[_Job, Any, Optional[BaseException]]] = []
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            for job in group:
+                conn.execute("SAVEPOINT batch")
+                try:
+                    results = [run_statement(conn, st) for st in job.statements]
+                    conn.execute("RELEASE batch")
+                    outcomes.append((job, results, None))
+                except sqlite3.Error as e:
+                    conn.execute("ROLLBACK TO batch")
+                    conn.execute("RELEASE batch")
+                    outcomes.append((job, None, e))
+            conn.execute("COMMIT")
+            self.commits += 1
+            self.batches += len(group)
+            self.last_write = time.monotonic()
+        except sqlite3.Error as e:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            outcomes = [(job, None, e) for job in group]
+        for job, results, error in outcomes:
+            if error is not None:
+                job.future.set_exception(error)
+            else:
+                job.future.set_result(results)
+
+    def _serve_session(self, conn: sqlite3.Connection, begin_job: _Job) -> None:
+        session = Session(f"{next(self._ids):x}{int(time.time() * 1000) % 0xFFFFFF:x}")
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+        except sqlite3.Error as e:
+            begin_job.future.set_exception(e)
+            return
+        with self._lock:
+            self._sessions[session.id] = session
+        begin_job.future.set_result(session.id)
+        try:
+            while True:
+                try:
+                    job = session.jobs.get(timeout=self.tx_timeout)
+                except queue.Empty:
+                    print(f"[WARN] database service: transaction {session.id} idle for "
+                          f"{self.tx_timeout:.0f}s, rolled back")
+                    break
+                if job.kind == 'end':
+                    try:
+                        conn.execute("COMMIT" if job.commit else "ROLLBACK")
+                        self.commits += 1 if job.commit else 0
+                        self.last_write = time.monotonic()
+                        job.future.set_result(None)
+                    except sqlite3.Error as e:
+                        job.future.set_exception(e)
+                    break
+                try:
+                    # Like sqlite3, a failing statement leaves the transaction open
+                    job.future.set_result([run_statement(conn, st) for st in job.statements])
+                except sqlite3.Error as e:
+                    job.future.set_exception(e)
+        finally:
+            session.closed = True
+            with self._lock:
+                self._sessions.pop(session.id, None)
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            # Anything queued after the end is answered with an error
+            while True:
+                try:
+                    late = session.jobs.get_nowait()
+                except queue.Empty:
+                    break
+                late.future.set_exception(sqlite3.OperationalError("transaction is no longer open"))
+
+
+# ---- service ----
+
+class DatabaseService:
+    """Owns the database file and answers the HTTP API (independent of the web framework).
+
+    Args:
+        db_path: SQLite file served.
+        token: Shared secret required in ``X-CBPM-Token`` (empty disables the check).
+        read_connections: Size of the read pool.
+    """
+
+    def __init__(self, db_path: str, token: str = '', read_connections: int = 4,
+                 group_max: int = 32, tx_timeout: float = 30.0):
+        self.db_path = db_path
+        self.token = token
+        self.started = datetime.now()
+        self.requests = 0
+        self.reads = ReadPool(self._connect_read, read_connections)
+        self.writer = WriterQueue(self._connect_write, group_max=group_max, tx_timeout=tx_timeout)
+
+    def _connect(self) -> sqlite3.Connection:
+        from db_profiles import apply_pragmas, profile_pragmas
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None, check_same_thread=False)
+        apply_pragmas(conn, profile_pragmas())
+        return conn
+
+    def _connect_read(self) -> sqlite3.Connection:
+        conn = self._connect()
+        conn.execute("PRAGMA query_only=ON")
+        return conn
+
+    def _connect_write(self) -> sqlite3.Connection:
+        return self._connect()
+
+    # ---- operations ----
+    def query(self, statements: Sequence[Dict]) -> List[Dict]:
+        """Run read statements in one read transaction on a pooled connection."""
+        with self.reads.acquire() as conn:
+            conn.execute("BEGIN")
+            try:
+                return [run_statement(conn, st) for st in statements]
+            finally:
+                conn.execute("ROLLBACK")
+
+    def execute(self, statements: List[Dict]) -> List[Dict]:
+        """Apply a batch of write statements atomically through the writer queue."""
+        return self.writer.submit(statements)
+
+    def start_maintenance(self, connect: Callable[[], sqlite3.Connection]) -> None:
+        """Run ``db_maintenance`` tasks on this machine once the tills have stopped writing for a while."""
+        from db_maintenance import MaintenanceScheduler
+        scheduler = MaintenanceScheduler(self.db_path, connect)
+        if not scheduler.settings.get('enabled', True):
+            return
+
+        def loop():
+            while True:
+                time.sleep(float(scheduler.settings.get('check_interval_s', 300)))
+                quiet = time.monotonic() - self.writer.last_write
+                if quiet >= float(scheduler.settings.get('idle_seconds', 60)) and self.writer.depth == 0:
+                    try:
+                        scheduler.run_due()
+                    except Exception as e:
+                        print(f"[WARN] database maintenance failed: {e}")
+
+        threading.Thread(target=loop, name='db-maintenance', daemon=True).start()
+
+    def start_notifications(self, connect: Callable[[], sqlite3.Connection]) -> None:
+        """Send the queued notification e-mails from this machine (no-op without an SMTP server)."""
+        from notifications import NotificationWorker
+        NotificationWorker(connect).start()
+
+    def replay(self, operations: List[Dict]) -> List[Dict]:
+        """Apply offline-journal operations from a till (offline_journal.apply_operations)."""
+        from offline_journal import apply_operations
+        return self.writer.call(lambda conn: apply_operations(conn, operations))
+
+    def changes(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        """Change-capture feed (change_capture.py) for mirrors; registration and acks go through the writer."""
+        import change_capture
+        consumer = payload.get('consumer')
+        if payload.get('register'):
+            start = self.writer.call(lambda conn: change_capture.register_consumer(conn, consumer,
+                                                                                   payload.get('from_version')))
+            return {'consumer': consumer, 'next': start}
+        if payload.get('ack') is not None:
+            self.writer.call(lambda conn: change_capture.acknowledge(conn, consumer, payload['ack']))
+        if payload.get('since') is None:
+            return {'ok': True}
+        with self.reads.acquire() as conn:
+            conn.execute("BEGIN")
+            try:
+                batch = change_capture.changes_since(conn, int(payload['since']), payload.get('limit'),
+                                                     payload.get('tables'), with_rows=bool(payload.get('with_rows')))
+            finally:
+                conn.execute("ROLLBACK")
+        for change in batch['changes']:
+            if 'row' in change:
+                change['row'] = {k: encode_value(v) for k, v in change['row'].items()}
+        return batch
+
+    def health(self) -> Dict[str, Any]:
+        return {'ok': True, 'db': self.db_path, 'started': self.started.isoformat(timespec='seconds'),
+                'requests': self.requests, 'write_queue': self.writer.depth,
+                'write_batches': self.writer.batches, 'write_commits': self.writer.commits}
+
+    def handle(self, method: str, path: str, payload: Optional[Dict], token: str = '') -> Tuple[int, Dict]:
+        """Route one request; returns ``(status, json body)``."""
+        self.requests += 1
+        if self.token and not hmac.compare_digest((token or '').encode(), self.token.encode()):
+            return 401, {'error': 'invalid or missing service token', 'type': 'OperationalError'}
+        payload = payload or {}
+        statements = payload.get('statements') or []
+        try:
+            if path == '/health' and method == 'GET':
+                return 200, self.health()
+            if method != 'POST':
+                return 405, {'error': f'{method} not allowed', 'type': 'OperationalError'}
+            if path == '/query':
+                return 200, {'results': self.query(statements)}
+            if path == '/execute':
+                return 200, {'results': self.execute(statements)}
+            if path == '/changes':
+                return 200, self.changes(payload)
+            if path == '/replay':
+                return 200, {'outcomes': self.replay(payload['operations'])}
+            if path == '/tx':
+                return 200, {'tx': self.writer.begin()}
+            match = _TX_PATH_RE.match(path)
+            if match:
+                session_id, action = match.groups()
+                if action:
+                    self.writer.session_end(session_id, commit=(action == 'commit'))
+                    return 200, {'ok': True}
+                return 200, {'results': self.writer.session_execute(session_id, statements)}
+            return 404, {'error': f'unknown endpoint {path}', 'type': 'OperationalError'}
+        except sqlite3.IntegrityError as e:
+            return 409, error_body(e)
+        except sqlite3.Error as e:
+            return 400, error_body(e)
+        except (KeyError, TypeError, ValueError) as e:
+            return 400, {'error': f'malformed request: {e}', 'type': 'ProgrammingError'}
+        except LookupError as e:
+            # change_capture.ChangesCompacted: the mirror has to copy the database again
+            return 410, {'error': str(e), 'type': 'OperationalError'}
+        except Exception as e:
+            return 500, error_body(e)
+
+
+def create_app(service: DatabaseService):
+    """Flask application exposing ``service``."""
+    if not HAS_FLASK:
+        raise RuntimeError("Flask is required for the database service (pip install -r requirements.txt)")
+    app = Flask(__name__)
+
+    @app.route('/<path:path>', methods=['GET', 'POST'])
+    def dispatch(path):
+        status, body = service.handle(request.method, '/' + path, request.get_json(silent=True),
+                                      request.headers.get(TOKEN_HEADER, ''))
+        return jsonify(body), status
+
+    return app
+
+
+def is_loopback(host: str) -> bool:
+    """True if ``host`` only accepts connections from this machine."""
+    if host.strip().lower() == 'localhost':
+        return True
+    try:
+        return ipaddress.ip_address(host.strip().strip('[]')).is_loopback
+    except ValueError:
+        return False
+
+
+def main() -> int:
+    from config import DATABASE_NAME
+    parser = argparse.ArgumentParser(description="Serve a CBPM database to the tills on the local network.")
+    parser.add_argument('--db', default=DATABASE_NAME, help='SQLite database file to own')
+    parser.add_argument('--host', default=SETTINGS.get('host', '0.0.0.0'), help='Interface to listen on')
+    parser.add_argument('--port', type=int, default=int(SETTINGS.get('port', 8765)), help='TCP port')
+    parser.add_argument('--token', default=SETTINGS.get('token', ''), help='Shared secret the tills must send')
+    parser.add_argument('--read-connections', type=int, default=int(SETTINGS.get('read_connections', 4)))
+    args = parser.parse_args()
+    if not HAS_FLASK:
+        parser.error("Flask is required for the database service (pip install -r requirements.txt)")
+    if not args.token and not is_loopback(args.host):
+        parser.error(f"refusing to serve on {args.host} without a token: set DATABASE_SERVICE['token'] "
+                     f"(and the same value on every till) or pass --token, or listen on 127.0.0.1")
+
+    # Create or upgrade the schema with the local backend before serving it
+    from CBPM import DatabaseManager
+    manager = DatabaseManager(args.db, cloud_sync=False, backend='local')
+
+    service = DatabaseService(args.db, token=args.token, read_connections=args.read_connections,
+                              group_max=int(SETTINGS.get('group_commit_max', 32)),
+                              tx_timeout=float(SETTINGS.get('tx_timeout_s', 30)))
+    service.start_maintenance(manager.create_connection)
+    service.start_notifications(manager.create_connection)
+    if HAS_FLASK:
+        # Keep-alive, so each till reuses one TCP connection
+        from werkzeug.serving import WSGIRequestHandler
+        WSGIRequestHandler.protocol_version = 'HTTP/1.1'
+    print(f"Serving {args.db} on http://{args.host}:{args.port}")
+    create_app(service).run(host=args.host, port=args.port, threaded=True)
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
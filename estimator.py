@@ -0,0 +1,359 @@
+"""
+Bill-of-materials estimator
+
+Quantity take-off for the Material Calculator and for comparing layouts. The
+quantities come from data rather than formulas in the screen:
+
+* :data:`MATERIALS` - the materials a recipe can call for, how to find them in
+  ``building_materials`` (names tried in order), their fallback price and
+  whether they are bought in whole units (bags, pieces, sheets);
+* :data:`RECIPES` - per building component (foundation, walls, ground slab,
+  upper floors, roof), the quantity of each material per unit of a geometric
+  basis (metre of perimeter, m2 of wall...), with a waste allowance;
+* :data:`PROJECT_TYPES` - storeys, share of wall taken by openings, roof
+  pitch factor, footing size and components per project type.
+
+``config.BOM_ESTIMATOR['recipes']`` / ``['project_types']`` can override or
+extend the last two.
+
+:class:`BomEstimator` compiles the recipes of each project type once into a
+basis x line coefficient matrix, so pricing N layouts is one matrix product
+(NumPy when installed, plain Python otherwise) instead of N rounds of queries.
+Prices come from a :class:`PriceIndex`: the current shelf price of each
+material in one store, or averaged over the active stores that stock it,
+falling back to ``standard_price`` and then to :data:`MATERIALS`. Indexes are
+cached per database and store for ``price_ttl_s``; :func:`invalidate_prices`
+drops them after a price change.
+"""
+
+import math
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from money import to_amount
+
+try:
+    import numpy as np
+    HAS_NUMPY = True
+except Exception:
+    np = None
+    HAS_NUMPY = False
+
+try:
+    from config import BOM_ESTIMATOR as SETTINGS
+except Exception:
+    SETTINGS = {'price_ttl_s': 300}
+
+# key: (label, names tried in building_materials, unit, fallback price, bought in whole units)
+MATERIALS: Dict[str, Tuple[str, Tuple[str, ...], str, int, bool]] = {
+    'cement': ('Cement', ('Cement Portland', 'Cement'), 'bags', 6500, True),
+    'sand': ('Sand', ('Sand (River)', 'Sand'), 'm3', 15000, False),
+    'gravel': ('Gravel', ('Gravel (6/10)', 'Gravel'), 'm3', 20000, False),
+    'hardcore': ('Hardcore', ('Stone (Hardcore)', 'Hardcore'), 'm3', 25000, False),
+    'block_20': ('Blocks 20cm', ('Concrete Blocks (20cm)', 'Block'), 'pieces', 450, True),
+    'block_15': ('Blocks 15cm', ('Concrete Blocks (15cm)', 'Block'), 'pieces', 350, True),
+    'rebar_10': ('Rebar 10mm', ('Rebar 10mm', 'Rebar'), 'bars (12m)', 6800, True),
+    'rebar_12': ('Rebar 12mm', ('Rebar 12mm', 'Rebar'), 'bars (12m)', 9500, True),
+    'mesh': ('Wire mesh', ('Wire Mesh',), 'rolls', 45000, True),
+    'roof_sheet': ('Roofing sheets', ('Galvanized Sheets', 'Sheet'), 'sheets', 8500, True),
+    'timber': ('Timber', ('Ayous Planks', 'Planks'), 'm3', 280000, False),
+}
+
+# Geometric bases the recipes are expressed in
+BASES = ('perimeter', 'floor_area', 'upper_area', 'wall_area', 'roof_area')
+
+# component: [(material, basis, quantity per basis unit, waste share)]
+RECIPES: Dict[str, List[Tuple[str, str, float, float]]] = {
+    # Strip footing 0.6 x 0.4 m of 1:2:4 concrete (0.24 m3 per metre) and two courses of blocks
+    'Foundation': [
+        ('cement', 'perimeter', 1.56, 0.05),
+        ('sand', 'perimeter', 0.108, 0.10),
+        ('gravel', 'perimeter', 0.216, 0.10),
+        ('rebar_10', 'perimeter', 0.40, 0.08),
+        ('block_20', 'perimeter', 5.0, 0.05),
+    ],
+    # 15 cm blocks (12.5 per m2), mortar and plaster both faces
+    'Walls': [
+        ('block_15', 'wall_area', 12.5, 0.05),
+        ('cement', 'wall_area', 0.35, 0.05),
+        ('sand', 'wall_area', 0.045, 0.10),
+    ],
+    # 10 cm slab on 15 cm hardcore, mesh reinforced
+    'Ground slab': [
+        ('hardcore', 'floor_area', 0.15, 0.05),
+        ('cement', 'floor_area', 0.65, 0.05),
+        ('sand', 'floor_area', 0.045, 0.10),
+        ('gravel', 'floor_area', 0.09, 0.10),
+        ('mesh', 'floor_area', 0.022, 0.05),
+    ],
+    # 15 cm suspended slab, about 10 kg of 12 mm bars per m2
+    'Upper floors': [
+        ('cement', 'upper_area', 0.98, 0.05),
+        ('sand', 'upper_area', 0.068, 0.10),
+        ('gravel', 'upper_area', 0.135, 0.10),
+        ('rebar_12', 'upper_area', 0.94, 0.08),
+    ],
+    # Sheets covering 1.8 m2 each, trusses and purlins
+    'Roof': [
+        ('roof_sheet', 'roof_area', 0.56, 0.05),
+        ('timber', 'roof_area', 0.02, 0.10),
+    ],
+}
+
+_ALL_COMPONENTS = ('Foundation', 'Walls', 'Ground slab', 'Upper floors', 'Roof')
+PROJECT_TYPES: Dict[str, Dict[str, Any]] = {
+    'Single Story House': {'storeys': 1, 'openings': 0.15, 'roof_factor': 1.25, 'footing_factor': 1.0,
+                           'components': _ALL_COMPONENTS},
+    'Two Story House': {'storeys': 2, 'openings': 0.15, 'roof_factor': 1.25, 'footing_factor': 1.2,
+                        'components': _ALL_COMPONENTS},
+    'Apartment Building': {'storeys': 4, 'openings': 0.20, 'roof_factor': 1.15, 'footing_factor': 1.6,
+                           'components': _ALL_COMPONENTS},
+    'Commercial Building': {'storeys': 2, 'openings': 0.30, 'roof_factor': 1.15, 'footing_factor': 1.3,
+                            'components': _ALL_COMPONENTS},
+    'Warehouse': {'storeys': 1, 'openings': 0.05, 'roof_factor': 1.10, 'footing_factor': 1.2,
+                  'components': ('Foundation', 'Walls', 'Ground slab', 'Roof')},
+    'Custom Project': {'storeys': 1, 'openings': 0.15, 'roof_factor': 1.25, 'footing_factor': 1.0,
+                       'components': _ALL_COMPONENTS},
+}
+
+
+# ---- prices ----
+
+class PriceIndex:
+    """Unit price of every :data:`MATERIALS` key, resolved with two queries.
+
+    Args:
+        conn: Database connection.
+        store_id: Use this store's shelf prices; None averages the active stores stocking each material.
+    """
+
+    def __init__(self, conn: sqlite3.Connection, store_id: Optional[int] = None):
+        self.store_id = store_id
+        self.prices: Dict[str, int] = {}
+        self.sources: Dict[str, str] = {}
+        self.material_ids: Dict[str, Optional[int]] = {}
+        self.loaded_at = time.monotonic()
+        catalogue = conn.execute("SELECT id, name, standard_price FROM building_materials").fetchall()
+        by_name = {(name or '').lower(): (mid, price) for mid, name, price in catalogue}
+        resolved = {}
+        for key, (_, names, _, _, _) in MATERIALS.items():
+            found = None
+            for name in names:
+                found = by_name.get(name.lower())
+                if found is None:
+                    # First catalogue entry containing the name, in id order
+                    found = next(((mid, price) for mid, n, price in catalogue if name.lower() in (n or '').lower()),
+                                 None)
+                if found is not None:
+                    break
+            resolved[key] = found if found else (None, None)
+
+        # Shelf prices of the recipe materials only (idx_inventory_material)
+        ids = sorted({mid for mid, _ in resolved.values() if mid is not None})
+        marks = ', '.join('?' * len(ids))
+        if not ids:
+            shelf = {}
+        elif store_id is not None:
+            shelf = dict(conn.execute(f"SELECT material_id, unit_price FROM inventory WHERE store_id = ? "
+                                      f"AND material_id IN ({marks}) AND unit_price > 0", [store_id] + ids).fetchall())
+        else:
+            shelf = dict(conn.execute(
+                f"SELECT i.material_id, AVG(i.unit_price) FROM inventory i JOIN stores s ON s.id = i.store_id "
+                f"WHERE i.material_id IN ({marks}) AND s.is_active = 1 AND i.unit_price > 0 AND i.quantity > 0 "
+                f"GROUP BY i.material_id", ids).fetchall())
+        for key, (_, _, _, fallback, _) in MATERIALS.items():
+            mid, standard = resolved[key]
+            self.material_ids[key] = mid
+            if mid in shelf:
+                self.prices[key], self.sources[key] = to_amount(shelf[mid]), 'store' if store_id is not None else 'stores'
+            elif standard:
+                self.prices[key], self.sources[key] = to_amount(standard), 'standard'
+            else:
+                self.prices[key], self.sources[key] = fallback, 'default'
+
+    def vector(self, keys: Sequence[str]) -> List[int]:
+        return [self.prices[k] for k in keys]
+
+
+_price_cache: Dict[Tuple[str, Optional[int]], PriceIndex] = {}
+_price_lock = threading.Lock()
+
+
+def _database_key(conn: sqlite3.Connection) -> str:
+    try:
+        row = conn.execute("PRAGMA database_list").fetchone()
+        return row[2] or f"memory:{id(conn)}"
+    except Exception:
+        return f"connection:{id(conn)}"
+
+
+def price_index(conn: sqlite3.Connection, store_id: Optional[int] = None) -> PriceIndex:
+    """Cached :class:`PriceIndex` for the database of ``conn`` and ``store_id`` (``price_ttl_s``)."""
+    key = (_database_key(conn), store_id)
+    ttl = float(SETTINGS.get('price_ttl_s', 300))
+    with _price_lock:
+        index = _price_cache.get(key)
+        if index is not None and time.monotonic() - index.loaded_at < ttl:
+            return index
+    index = PriceIndex(conn, store_id)
+    with _price_lock:
+        _price_cache[key] = index
+    return index
+
+
+def invalidate_prices() -> None:
+    """Forget every cached price index (after inventory or catalogue prices change)."""
+    with _price_lock:
+        _price_cache.clear()
+
+
+# ---- take-off ----
+
+class BomEstimator:
+    """Quantities and costs of project layouts from :data:`RECIPES` and :data:`PROJECT_TYPES`.
+
+    A layout (variant) is a dict with ``project_type``, ``length``, ``width``,
+    ``height`` (wall height per storey, metres) and optionally ``storeys`` and
+    ``name``.
+    """
+
+    def __init__(self, recipes: Optional[Dict[str, List[Tuple[str, str, float, float]]]] = None,
+                 project_types: Optional[Dict[str, Dict[str, Any]]] = None):
+        self.recipes = dict(RECIPES, **(SETTINGS.get('recipes') or {}), **(recipes or {}))
+        self.project_types = dict(PROJECT_TYPES, **(SETTINGS.get('project_types') or {}), **(project_types or {}))
+        self.materials = list(MATERIALS)
+        self._compiled: Dict[str, Tuple[List[Tuple[str, str]], Any]] = {}
+
+    def _compile(self, project_type: str) -> Tuple[List[Tuple[str, str]], Any]:
+        """``(lines, coefficients)``: one line per (component, material).
+
+        Coefficients are a basis x line matrix with NumPy, otherwise the
+        ``(basis index, factor)`` of each line (every line uses one basis).
+        """
+        compiled = self._compiled.get(project_type)
+        if compiled is None:
+            params = self.project_types[project_type]
+            lines: List[Tuple[str, str]] = []
+            factors: List[Tuple[int, float]] = []
+            for component in params['components']:
+                scale = float(params.get('footing_factor', 1.0)) if component == 'Foundation' else 1.0
+                for material, basis, qty, waste in self.recipes.get(component, ()):
+                    lines.append((component, material))
+                    factors.append((BASES.index(basis), qty * (1 + waste) * scale))
+            if HAS_NUMPY:
+                coef = np.zeros((len(BASES), len(lines)))
+                for j, (b, factor) in enumerate(factors):
+                    coef[b, j] = factor
+            else:
+                coef = factors
+            compiled = self._compiled[project_type] = (lines, coef)
+        return compiled
+
+    def bases(self, variant: Dict[str, Any]) -> List[float]:
+        """Values of :data:`BASES` for a layout."""
+        params = self.project_types[variant.get('project_type') or 'Custom Project']
+        length, width, height = (float(variant[k]) for k in ('length', 'width', 'height'))
+        storeys = int(variant.get('storeys') or params.get('storeys', 1))
+        perimeter, floor = 2 * (length + width), length * width
+        return [perimeter, floor, floor * (storeys - 1),
+                perimeter * height * storeys * (1 - float(params.get('openings', 0))),
+                floor * float(params.get('roof_factor', 1.0))]
+
+    def estimate_many(self, variants: Sequence[Dict[str, Any]], prices: PriceIndex) -> List[Dict[str, Any]]:
+        """Estimate for each layout, in order.
+
+        Each result has ``variant``, ``quantities`` and ``costs`` per material
+        key (whole units rounded up), ``lines`` as ``(component, material,
+        quantity)`` and ``total`` in francs.
+        """
+        results: List[Optional[Dict[str, Any]]] = [None] * len(variants)
+        groups: Dict[str, List[int]] = {}
+        for i, variant in enumerate(variants):
+            project_type = variant.get('project_type') or 'Custom Project'
+            if project_type not in self.project_types:
+                raise ValueError(f"unknown project type: {project_type}")
+            groups.setdefault(project_type, []).append(i)
+        price = prices.vector(self.materials)
+        whole = [MATERIALS[m][4] for m in self.materials]
+        position = {m: j for j, m in enumerate(self.materials)}
+        # Whole units are rounded up and the rest to 0.01, half up with the same tolerance on both
+        # paths, so NumPy and plain Python give the same figures
+        for project_type, members in groups.items():
+            lines, coef = self._compile(project_type)
+            basis_rows = [self.bases(variants[i]) for i in members]
+            line_material = [position[m] for _, m in lines]
+            if HAS_NUMPY:
+                line_qty = np.asarray(basis_rows, dtype=float) @ coef
+                totals = np.zeros((len(members), len(self.materials)))
+                np.add.at(totals.T, line_material, line_qty.T)
+                totals = np.where(whole, np.ceil(totals - 1e-9), np.floor(totals * 100 + 0.5 + 1e-7) / 100)
+                costs = np.floor(totals * price + 0.5)
+                line_rows, total_rows, cost_rows = line_qty.tolist(), totals.tolist(), costs.tolist()
+            else:
+                line_rows = [[row[b] * factor for b, factor in coef] for row in basis_rows]
+                total_rows, cost_rows = [], []
+                for qty_row in line_rows:
+                    acc = [0.0] * len(self.materials)
+                    for j, q in zip(line_material, qty_row):
+                        acc[j] += q
+                    acc = [math.ceil(q - 1e-9) if w else math.floor(q * 100 + 0.5 + 1e-7) / 100
+                           for q, w in zip(acc, whole)]
+                    total_rows.append(acc)
+                    cost_rows.append([math.floor(q * p + 0.5) for q, p in zip(acc, price)])
+            for k, i in enumerate(members):
+                quantities = {m: int(total_rows[k][j]) if whole[j] else total_rows[k][j]
+                              for j, m in enumerate(self.materials) if total_rows[k][j]}
+                costs = {m: int(cost_rows[k][j]) for j, m in enumerate(self.materials) if total_rows[k][j]}
+                results[i] = {
+                    'variant': variants[i],
+                    'quantities': quantities,
+                    'costs': costs,
+                    'lines': [(c, m, q) for (c, m), q in zip(lines, line_rows[k]) if q],
+                    'total': sum(costs.values()),
+                }
+        return results
+
+    def estimate(self, variant: Dict[str, Any], prices: PriceIndex) -> Dict[str, Any]:
+        return self.estimate_many([variant], prices)[0]
+
+
+def layout_grid(project_type: str, lengths: Iterable[float], widths: Iterable[float], height: float,
+                storeys: Optional[int] = None) -> List[Dict[str, Any]]:
+    """Every length x width combination as layouts to compare."""
+    widths = list(widths)
+    return [{'project_type': project_type, 'length': length, 'width': width, 'height': height, 'storeys': storeys,
+             'name': f"{length:g} x {width:g} m"} for length in lengths for width in widths]
+
+
+def format_estimate(result: Dict[str, Any], prices: PriceIndex) -> str:
+    """Plain-text report of one estimate, by component, for the calculator window."""
+    variant = result['variant']
+    label = {k: v[0] for k, v in MATERIALS.items()}
+    unit = {k: v[2] for k, v in MATERIALS.items()}
+    length, width, height = (float(variant[k]) for k in ('length', 'width', 'height'))
+    out = [
+        "PROJECT CALCULATIONS",
+        f"Project Type: {variant.get('project_type') or 'Custom Project'}",
+        f"Dimensions: {length:g}m x {width:g}m x {height:g}m"
+        + (f", {variant['storeys']} storeys" if variant.get('storeys') else ''),
+        f"Floor Area: {length * width:.2f} sq meters",
+        "",
+    ]
+    component = None
+    for comp, material, qty in result['lines']:
+        if comp != component:
+            component = comp
+            out.append(f"{comp.upper()}:")
+        out.append(f"  • {label[material]}: {qty:,.2f} {unit[material]}")
+    out += ["", "MATERIALS TO BUY:"]
+    for material, qty in result['quantities'].items():
+        source = {'store': 'store price', 'stores': 'average store price', 'standard': 'standard price',
+                  'default': 'default price'}[prices.sources[material]]
+        out.append(f"  • {label[material]}: {qty:,g} {unit[material]} x {prices.prices[material]:,} "
+                   f"= {result['costs'][material]:,} FCFA ({source})")
+    out += ["", f"ESTIMATED TOTAL COST: {result['total']:,} FCFA", "",
+            "NOTE: Estimates cover the structure (external walls, floors, roof); finishes, doors, windows,",
+            "plumbing and electrical work are not included. Consult a construction professional for detailed planning."]
+    return '\n'.join(out)
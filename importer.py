@@ -0,0 +1,475 @@
+"""
+Bulk CSV/XLSX import for inventory, building materials and users
+
+Files are streamed in chunks (CSV via the csv module, XLSX via openpyxl in
+read-only mode), so memory use does not grow with the file. Each chunk is
+validated (numbers with :func:`money.parse_number`, so ``1,5`` is 1.5, user
+fields with :class:`utils.ValidationUtils`), store and material names are
+resolved against an in-memory index loaded once per import, and the valid
+rows are written with ``executemany`` inside one transaction per chunk (new
+materials row by row, so each id comes back from the insert). When the caller
+already has a transaction open, each chunk is a SAVEPOINT of it instead and
+committing is left to the caller.
+
+A dry run performs the same parsing, validation and name resolution without
+writing anything. Either way a report is returned and every rejected row is
+written to a rejects CSV (original columns plus ``line`` and ``error``) that
+can be fixed and re-imported.
+
+Usage:
+    importer = BulkImporter(conn, 'inventory', allowed_store_ids={3}, default_store_id=3)
+    report = importer.run('depot_stock.xlsx', dry_run=True, rejects_path='rejects.csv')
+"""
+
+import csv
+import os
+import re
+import sqlite3
+import time
+from datetime import date, datetime
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Set, Tuple
+
+from money import parse_number, to_amount
+from utils import ValidationUtils
+
+try:
+    import openpyxl
+    HAS_OPENPYXL = True
+except Exception:
+    openpyxl = None
+    HAS_OPENPYXL = False
+
+DEFAULT_CHUNK_SIZE = 500
+IMPORT_KINDS = ('inventory', 'materials', 'users')
+# Table each kind writes to (ANALYZE target after an import)
+IMPORT_TABLES = {'inventory': 'inventory', 'materials': 'building_materials', 'users': 'users'}
+DEFAULT_REORDER_LEVEL = 10
+
+# Accepted header spellings (after normalisation, currency suffix removed) -> canonical column
+COLUMN_ALIASES = {
+    'inventory': {
+        'store': 'store', 'store_name': 'store', 'store_id': 'store',
+        'material': 'material', 'material_name': 'material', 'material_id': 'material', 'name': 'material',
+        'quantity': 'quantity', 'qty': 'quantity', 'stock': 'quantity',
+        'unit_price': 'unit_price', 'price': 'unit_price',
+        'reorder_level': 'reorder_level', 'reorder': 'reorder_level',
+    },
+    'materials': {
+        'name': 'name', 'material': 'name', 'material_name': 'name',
+        'category': 'category', 'unit': 'unit',
+        'standard_price': 'standard_price', 'price': 'standard_price', 'unit_price': 'standard_price',
+        'supplier': 'supplier', 'description': 'description', 'local_name': 'local_name',
+    },
+    'users': {
+        'username': 'username', 'user': 'username', 'email': 'email',
+        'full_name': 'full_name', 'name': 'full_name', 'role': 'role',
+        'phone': 'phone', 'address': 'address', 'password': 'password',
+    },
+}
+
+# Currency suffix of a header such as 'Unit Price (FCFA)', dropped before the alias lookup
+_CURRENCY_SUFFIX_RE = re.compile(r'_(fcfa|xaf|cfa|frs|francs)$')
+
+REQUIRED_COLUMNS = {
+    'inventory': ('material', 'quantity'),
+    'materials': ('name',),
+    'users': ('username', 'email', 'full_name', 'role', 'password'),
+}
+
+
+def normalize_header(value: Any) -> str:
+    """``'Unit Price (FCFA)'`` -> ``'unit_price_fcfa'``."""
+    return re.sub(r'[^a-z0-9]+', '_', str(value or '').strip().lower()).strip('_')
+
+
+def column_for(kind: str, header: Any) -> Optional[str]:
+    """Canonical column of a header (``'Unit Price (FCFA)'`` -> ``'unit_price'``); None if not recognised."""
+    key = normalize_header(header)
+    aliases = COLUMN_ALIASES[kind]
+    return aliases.get(key) or aliases.get(_CURRENCY_SUFFIX_RE.sub('', key))
+
+
+def parse_quantity(value: Any) -> Optional[float]:
+    """Non-negative finite number from a cell (``"1,5"`` is 1.5); None when invalid."""
+    number = parse_number(value)
+    return number if number is not None and number >= 0 else None
+
+
+def normalize_name(value: Any) -> str:
+    """Case- and whitespace-insensitive key for store/material names."""
+    return ' '.join(str(value or '').split()).casefold()
+
+
+def iter_rows(path: str) -> Iterator[Tuple[int, List[str], List[Any]]]:
+    """Yield ``(line_number, headers, values)`` for each data row of a CSV or XLSX file."""
+    ext = os.path.splitext(path)[1].lower()
+    if ext in ('.xlsx', '.xlsm'):
+        if not HAS_OPENPYXL:
+            raise RuntimeError("openpyxl is required to import .xlsx files; save the sheet as CSV instead")
+        wb = openpyxl.load_workbook(path, read_only=True, data_only=True)
+        try:
+            rows = wb.active.iter_rows(values_only=True)
+            headers = [str(h) if h is not None else '' for h in next(rows, ())]
+            for line, values in enumerate(rows, start=2):
+                if values and any(v not in (None, '') for v in values):
+                    yield line, headers, list(values)
+        finally:
+            wb.close()
+        return
+    with open(path, newline='', encoding='utf-8-sig') as f:
+        reader = csv.reader(f)
+        headers = next(reader, [])
+        for values in reader:
+            if any(v.strip() for v in values):
+                yield reader.line_num, headers, values
+
+
+def iter_chunks(path: str, chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[List[Tuple[int, List[str], List[Any]]]]:
+    """Group :func:`iter_rows` into lists of at most ``chunk_size`` rows."""
+    chunk: List[Tuple[int, List[str], List[Any]]] = []
+    for row in iter_rows(path):
+        chunk.append(row)
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+class NameIndex:
+    """In-memory name/id lookup so each row resolves without a query."""
+
+    def __init__(self) -> None:
+        self.by_name: Dict[str, int] = {}
+        self.ids: Set[int] = set()
+
+    def add(self, name: Any, row_id: int) -> None:
+        self.by_name[normalize_name(name)] = int(row_id)
+        self.ids.add(int(row_id))
+
+    def resolve(self, value: Any) -> Optional[int]:
+        """Resolve a name, or a numeric id, to an id; None when unknown."""
+        if value is None or str(value).strip() == '':
+            return None
+        text = str(value).strip()
+        if re.fullmatch(r'\d+(\.0+)?', text):
+            rid = int(float(text))
+            if rid in self.ids:
+                return rid
+        return self.by_name.get(normalize_name(text))
+
+    def __contains__(self, value: Any) -> bool:
+        return normalize_name(value) in self.by_name
+
+
+class BulkImporter:
+    """Stream a CSV/XLSX file into one of :data:`IMPORT_KINDS`.
+
+    Args:
+        conn: Open sqlite3 connection (not closed by the importer).
+        kind: ``'inventory'``, ``'materials'`` or ``'users'``.
+        chunk_size: Rows per validation batch and per write transaction.
+        allowed_store_ids: Stores inventory may be written to; None allows all.
+        default_store_id: Store used for inventory rows without a store column.
+        owner_id: Importing user. Materials are created as this user's custom
+            materials when set; inventory rows may use global materials and
+            this user's custom ones (all materials when None).
+        inventory_mode: ``'set'`` replaces quantity/price of existing rows,
+            ``'add'`` adds the imported quantity to the current stock.
+        hash_password: Callable turning a password into the stored hash (users).
+        allowed_roles: Roles the importing user may assign (users).
+        created_by: Recorded as ``users.created_by``.
+        activate_users: Whether imported users are active immediately.
+    """
+
+    def __init__(self, conn: sqlite3.Connection, kind: str, chunk_size: int = DEFAULT_CHUNK_SIZE,
+                 allowed_store_ids: Optional[Set[int]] = None, default_store_id: Optional[int] = None,
+                 owner_id: Optional[int] = None, inventory_mode: str = 'set',
+                 hash_password: Optional[Callable[[str], str]] = None,
+                 allowed_roles: Optional[Sequence[str]] = None, created_by: Optional[int] = None,
+                 activate_users: bool = True):
+        if kind not in IMPORT_KINDS:
+            raise ValueError(f"Unknown import kind: {kind}")
+        if inventory_mode not in ('set', 'add'):
+            raise ValueError(f"Unknown inventory mode: {inventory_mode}")
+        self.conn = conn
+        self.kind = kind
+        self.chunk_size = max(1, int(chunk_size))
+        self.allowed_store_ids = set(allowed_store_ids) if allowed_store_ids is not None else None
+        self.default_store_id = default_store_id
+        self.owner_id = owner_id
+        self.inventory_mode = inventory_mode
+        self.hash_password = hash_password
+        self.allowed_roles = set(allowed_roles) if allowed_roles is not None else None
+        self.created_by = created_by
+        self.activate_users = activate_users
+        self.stores = NameIndex()
+        self.materials = NameIndex()
+        self.usernames: Set[str] = set()
+        self.emails: Set[str] = set()
+        # Names of materials validated in this run but not written yet
+        self.new_materials: Set[str] = set()
+
+    # ---- indexes ----
+    def _load_indexes(self) -> None:
+        cur = self.conn.cursor()
+        if self.kind == 'inventory':
+            cur.execute("SELECT id, name FROM stores")
+            for sid, name in cur.fetchall():
+                if self.allowed_store_ids is None or sid in self.allowed_store_ids:
+                    self.stores.add(name, sid)
+        if self.kind in ('inventory', 'materials'):
+            # Global materials first so an owner's custom material of the same name wins
+            if self.owner_id is None:
+                cur.execute("SELECT id, name FROM building_materials ORDER BY owner_id IS NOT NULL, id")
+            else:
+                cur.execute("SELECT id, name FROM building_materials WHERE owner_id IS NULL OR owner_id = ? "
+                            "ORDER BY owner_id IS NOT NULL, id", (self.owner_id,))
+            for mid, name in cur.fetchall():
+                self.materials.add(name, mid)
+        if self.kind == 'users':
+            cur.execute("SELECT username, email FROM users")
+            for username, email in cur.fetchall():
+                self.usernames.add(normalize_name(username))
+                if email:
+                    self.emails.add(normalize_name(email))
+
+    # ---- per-kind validation: row dict -> (params, error) ----
+    def _validate_inventory(self, row: Dict[str, Any]) -> Tuple[Optional[tuple], Optional[str]]:
+        store_value = row.get('store')
+        if store_value not in (None, ''):
+            store_id = self.stores.resolve(store_value)
+            if store_id is None:
+                return None, f"Unknown store or no access: {store_value}"
+        elif self.default_store_id is not None:
+            store_id = self.default_store_id
+        else:
+            return None, "Store is required"
+        material_id = self.materials.resolve(row.get('material'))
+        if material_id is None:
+            return None, f"Unknown material: {row.get('material')}"
+        quantity = parse_quantity(row.get('quantity'))
+        if quantity is None:
+            return None, f"Invalid quantity: {row.get('quantity')}"
+        price = None
+        if row.get('unit_price') not in (None, ''):
+            price = parse_quantity(row['unit_price'])
+            if price is None:
+                return None, f"Invalid unit price: {row.get('unit_price')}"
+        reorder = DEFAULT_REORDER_LEVEL
+        if row.get('reorder_level') not in (None, ''):
+            parsed = parse_quantity(row['reorder_level'])
+            if parsed is None or not parsed.is_integer():
+                return None, f"Invalid reorder level (whole number expected): {row.get('reorder_level')}"
+            reorder = int(parsed)
+        return (store_id, material_id, quantity, to_amount(price, None), reorder), None
+
+    def _validate_material(self, row: Dict[str, Any]) -> Tuple[Optional[tuple], Optional[str]]:
+        name = ' '.join(str(row.get('name') or '').split())
+        if not name:
+            return None, "Name is required"
+        if name in self.materials or normalize_name(name) in self.new_materials:
+            return None, f"Material already exists: {name}"
+        price = 0.0
+        if row.get('standard_price') not in (None, ''):
+            price = parse_quantity(row['standard_price'])
+            if price is None:
+                return None, f"Invalid price: {row.get('standard_price')}"
+        # Reserve the name so a later row of the same run is a duplicate; the id comes from the insert
+        self.new_materials.add(normalize_name(name))
+        return (name, str(row.get('category') or '').strip() or 'Other',
+                str(row.get('unit') or '').strip() or 'Piece', price,
+                str(row.get('supplier') or '').strip() or None, str(row.get('description') or '').strip() or None,
+                str(row.get('local_name') or '').strip() or None, date.today().isoformat(),
+                1 if self.owner_id is not None else 0, self.owner_id), None
+
+    def _validate_user(self, row: Dict[str, Any]) -> Tuple[Optional[tuple], Optional[str]]:
+        username = str(row.get('username') or '').strip()
+        email = str(row.get('email') or '').strip()
+        full_name = str(row.get('full_name') or '').strip()
+        role = str(row.get('role') or '').strip().lower()
+        password = str(row.get('password') or '')
+        phone = str(row.get('phone') or '').strip()
+        missing = [c for c, v in (('username', username), ('email', email), ('full_name', full_name),
+                                  ('role', role), ('password', password)) if not v]
+        if missing:
+            return None, "Missing " + ", ".join(missing)
+        if normalize_name(username) in self.usernames:
+            return None, f"Username already exists: {username}"
+        if not ValidationUtils.validate_email(email):
+            return None, f"Invalid email: {email}"
+        if normalize_name(email) in self.emails:
+            return None, f"Email already exists: {email}"
+        if self.allowed_roles is not None and role not in self.allowed_roles:
+            return None, f"Role not allowed: {role}"
+        if phone and not ValidationUtils.validate_phone(phone):
+            return None, f"Invalid phone: {phone}"
+        checks = ValidationUtils.validate_password(password)
+        failed = [k for k in ('length', 'has_upper', 'has_lower', 'has_digit') if not checks.get(k)]
+        if failed:
+            return None, "Weak password (" + ", ".join(failed) + ")"
+        self.usernames.add(normalize_name(username))
+        self.emails.add(normalize_name(email))
+        return (username, email, password, role, full_name, phone or None,
+                str(row.get('address') or '').strip() or None), None
+
+    # ---- writers: one executemany per chunk ----
+    def _write_inventory(self, cur: sqlite3.Cursor, rows: List[tuple]) -> None:
+        now = datetime.now().isoformat(sep=' ')
+        if self.inventory_mode == 'add':
+            quantity_sql = "quantity = COALESCE(inventory.quantity,0) + excluded.quantity"
+        else:
+            quantity_sql = "quantity = excluded.quantity"
+        cur.executemany(
+            "INSERT INTO inventory(store_id, material_id, quantity, unit_price, reorder_level, last_updated) "
+            "VALUES (?, ?, ?, COALESCE(?, (SELECT CAST(ROUND(standard_price) AS INTEGER) FROM building_materials "
+            "WHERE id = ?), 0), ?, ?) "
+            f"ON CONFLICT(store_id, material_id) DO UPDATE SET {quantity_sql}, "
+            "unit_price = COALESCE(?, inventory.unit_price), reorder_level = excluded.reorder_level, "
+            "last_updated = excluded.last_updated",
+            [(sid, mid, qty, price, mid, reorder, now, price) for sid, mid, qty, price, reorder in rows]
+        )
+
+    def _write_materials(self, cur: sqlite3.Cursor, rows: List[tuple]) -> None:
+        # One insert per row so each new material's id is read back and resolvable for the rest of the run
+        for params in rows:
+            cur.execute(
+                "INSERT INTO building_materials (name, category, unit, standard_price, supplier, description, "
+                "local_name, availability, created_date, is_custom, owner_id) "
+                "VALUES (?,?,?,?,?,?,?,'Available',?,?,?)",
+                params
+            )
+            self.materials.add(params[0], cur.lastrowid)
+
+    def _write_users(self, cur: sqlite3.Cursor, rows: List[tuple]) -> None:
+        hasher = self.hash_password
+        if hasher is None:
+            raise RuntimeError("A password hasher is required to import users")
+        today = date.today()
+        cur.executemany(
+            "INSERT INTO users (username, email, password_hash, role, full_name, phone, address, created_date, "
+            "is_active, first_login, failed_login_attempts, created_by) VALUES (?,?,?,?,?,?,?,?,?,1,0,?)",
+            [(u, e, hasher(p), r, n, ph, a, today, 1 if self.activate_users else 0, self.created_by)
+             for u, e, p, r, n, ph, a in rows]
+        )
+
+    # ---- driver ----
+    def run(self, path: str, dry_run: bool = False, rejects_path: Optional[str] = None,
+            progress: Optional[Callable[[Dict[str, Any]], None]] = None) -> Dict[str, Any]:
+        """Import ``path`` and return a report.
+
+        Args:
+            path: CSV or XLSX file; the first row holds column names.
+            dry_run: Validate and resolve only; nothing is written.
+            rejects_path: Where to write rejected rows; defaults to
+                ``<file>_rejects.csv`` when there are rejects.
+            progress: Called with the running report after each chunk.
+
+        Returns:
+            Dict: ``kind``, ``dry_run``, ``total``, ``valid``, ``written``,
+            ``rejected``, ``chunks``, ``elapsed``, ``errors`` (first 50
+            ``(line, message)`` pairs), ``rejects_path``, ``missing_columns``
+            and ``ignored_columns`` (headers that match no column).
+        """
+        start = time.perf_counter()
+        validate = {'inventory': self._validate_inventory, 'materials': self._validate_material,
+                    'users': self._validate_user}[self.kind]
+        write = {'inventory': self._write_inventory, 'materials': self._write_materials,
+                 'users': self._write_users}[self.kind]
+        report: Dict[str, Any] = {'kind': self.kind, 'dry_run': dry_run, 'total': 0, 'valid': 0, 'written': 0,
+                                  'rejected': 0, 'chunks': 0, 'elapsed': 0.0, 'errors': [],
+                                  'rejects_path': None, 'missing_columns': [], 'ignored_columns': []}
+        self._load_indexes()
+        rejects_file = None
+        rejects_writer = None
+        headers: List[str] = []
+        columns: List[Optional[str]] = []
+        try:
+            for chunk in iter_chunks(path, self.chunk_size):
+                if not columns:
+                    headers = [str(h) for h in chunk[0][1]]
+                    columns = [column_for(self.kind, h) for h in headers]
+                    report['ignored_columns'] = [h for h, c in zip(headers, columns) if not c and h.strip()]
+                    present = set(c for c in columns if c)
+                    if self.kind == 'inventory' and self.default_store_id is None:
+                        required = REQUIRED_COLUMNS['inventory'] + ('store',)
+                    else:
+                        required = REQUIRED_COLUMNS[self.kind]
+                    report['missing_columns'] = [c for c in required if c not in present]
+                    if report['missing_columns']:
+                        break
+                valid_rows: List[tuple] = []
+                for line, _headers, values in chunk:
+                    report['total'] += 1
+                    row = {}
+                    for col, value in zip(columns, values):
+                        if col and col not in row:
+                            row[col] = value.strip() if isinstance(value, str) else value
+                    params, error = validate(row)
+                    if error is None:
+                        valid_rows.append(params)
+                        continue
+                    report['rejected'] += 1
+                    if len(report['errors']) < 50:
+                        report['errors'].append((line, error))
+                    if rejects_writer is None:
+                        rejects_path = rejects_path or os.path.splitext(path)[0] + '_rejects.csv'
+                        rejects_file = open(rejects_path, 'w', newline='', encoding='utf-8')
+                        rejects_writer = csv.writer(rejects_file)
+                        rejects_writer.writerow(['line', 'error'] + headers)
+                        report['rejects_path'] = rejects_path
+                    rejects_writer.writerow([line, error] + ['' if v is None else v for v in values])
+                report['valid'] += len(valid_rows)
+                report['chunks'] += 1
+                if valid_rows and not dry_run:
+                    cur = self.conn.cursor()
+                    nested = self.conn.in_transaction
+                    cur.execute("SAVEPOINT import_chunk" if nested else "BEGIN IMMEDIATE")
+                    try:
+                        write(cur, valid_rows)
+                        if nested:
+                            cur.execute("RELEASE import_chunk")
+                        else:
+                            self.conn.commit()
+                    except Exception:
+                        if nested:
+                            cur.execute("ROLLBACK TO import_chunk")
+                            cur.execute("RELEASE import_chunk")
+                        else:
+                            self.conn.rollback()
+                        raise
+                    report['written'] += len(valid_rows)
+                if progress is not None:
+                    progress(dict(report))
+        finally:
+            if rejects_file is not None:
+                rejects_file.close()
+            if report['written'] and self.kind in ('inventory', 'materials'):
+                # Imported shelf or catalogue prices replace the Material Calculator's cached ones
+                import estimator
+                estimator.invalidate_prices()
+        report['elapsed'] = time.perf_counter() - start
+        return report
+
+
+def format_report(report: Dict[str, Any]) -> str:
+    """Human-readable summary of a :meth:`BulkImporter.run` report."""
+    lines = [
+        f"{'Dry run' if report['dry_run'] else 'Import'} of {report['kind']}: {report['total']} rows read",
+    ]
+    if report.get('ignored_columns'):
+        lines.append("Ignored columns (not recognised): " + ", ".join(report['ignored_columns']))
+    if report.get('missing_columns'):
+        lines.append("Missing required columns: " + ", ".join(report['missing_columns']))
+        return "\n".join(lines)
+    lines.append(f"Valid: {report['valid']}    Rejected: {report['rejected']}")
+    if not report['dry_run']:
+        lines.append(f"Written: {report['written']} in {report['chunks']} chunk(s)")
+    lines.append(f"Time: {report['elapsed']:.2f}s")
+    if report.get('rejects_path'):
+        lines.append(f"Rejected rows saved to: {report['rejects_path']}")
+    if report.get('errors'):
+        lines.append("")
+        lines.append("First errors:")
+        lines.extend(f"  line {line}: {msg}" for line, msg in report['errors'])
+    return "\n".join(lines)
@@ -0,0 +1,373 @@
+"""
+Job search service for the Cameroon Construction Project Management System
+
+The job board is read far more often than jobs are posted, so searches are served
+from narrow, indexed queries instead of loading the whole ``jobs`` table:
+
+* Results are paged with keyset pagination over ``(status, posted_date, id)``,
+  with a missing posted date sorting as '' (after every dated job); each page
+  is a short range scan of ``idx_jobs_status_posted`` that starts where the
+  previous page ended, however deep the user pages.
+* Facet counts by location, job type and salary band live in ``job_facets`` and
+  are kept current by triggers on ``jobs``, so the filter lists never require a
+  GROUP BY over the table.
+* Pages are cached per query. Every write to ``jobs`` bumps
+  ``job_search_meta.version`` (also via trigger), which invalidates the cache,
+  including for writes made by other processes sharing the database file.
+"""
+
+import logging
+import re
+import sqlite3
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+JOB_TYPES = ['Full-time', 'Part-time', 'Contract', 'Temporary', 'Internship']
+DEFAULT_JOB_TYPE = 'Full-time'
+
+# Lower bound (XAF) -> band label; a job is placed by the low end of its range
+SALARY_BANDS = [
+    (0, '< 100k'),
+    (100_000, '100k - 250k'),
+    (250_000, '250k - 500k'),
+    (500_000, '500k - 1M'),
+    (1_000_000, '1M+'),
+]
+UNSPECIFIED = 'Unspecified'
+
+# Facet name == jobs column it is computed from
+FACET_COLUMNS = ('location', 'job_type', 'salary_band')
+
+DEFAULT_PAGE_SIZE = 50
+
+_THOUSANDS_SEP = re.compile(r'(?<=\d)[,\s](?=\d{3}(?!\d))')
+_AMOUNT = re.compile(r'(\d+(?:\.\d+)?)\s*([kKmM])?(?![A-Za-z])')
+
+# Sort key of the result pages: jobs without a posted date sort last instead of breaking the cursor
+_POSTED_KEY = "COALESCE(posted_date, '')"
+
+_PAGE_COLUMNS = ('id', 'title', 'employer', 'location', 'job_type', 'salary_range', 'posted_date',
+                 'deadline', 'status', 'description', 'requirements')
+
+
+def parse_salary(salary_range: Optional[str]) -> Optional[float]:
+    """Return the lower bound of a free-text salary such as ``'300k-500k XAF'``.
+
+    Understands ``k``/``M`` suffixes and ``,``/space thousands separators
+    (``'200 000 - 350 000 FCFA'``). Returns None when no amount is found.
+    """
+    if not salary_range:
+        return None
+    text = _THOUSANDS_SEP.sub('', str(salary_range))
+    match = _AMOUNT.search(text)
+    if not match:
+        return None
+    amount = float(match.group(1))
+    suffix = (match.group(2) or '').lower()
+    if suffix == 'k':
+        amount *= 1_000
+    elif suffix == 'm':
+        amount *= 1_000_000
+    return amount
+
+
+def salary_band(salary_range: Optional[str]) -> str:
+    """Map a free-text salary range to one of :data:`SALARY_BANDS` (or ``'Unspecified'``)."""
+    amount = parse_salary(salary_range)
+    if amount is None:
+        return UNSPECIFIED
+    label = SALARY_BANDS[0][1]
+    for lower, name in SALARY_BANDS:
+        if amount >= lower:
+            label = name
+    return label
+
+
+def _facet_trigger_sql() -> List[str]:
+    """Triggers keeping ``job_facets`` and ``job_search_meta.version`` in step with ``jobs``."""
+
+    def bump(row: str, delta: str) -> str:
+        stmts = []
+        for col in FACET_COLUMNS:
+            if delta == '+ 1':
+                stmts.append(
+                    f"INSERT OR IGNORE INTO job_facets(status, facet, value, count) "
+                    f"VALUES (COALESCE({row}.status,''), '{col}', COALESCE({row}.{col},''), 0);")
+            stmts.append(
+                f"UPDATE job_facets SET count = count {delta} WHERE status = COALESCE({row}.status,'') "
+                f"AND facet = '{col}' AND value = COALESCE({row}.{col},'');")
+        return '\n'.join(stmts)
+
+    version = "UPDATE job_search_meta SET version = version + 1 WHERE id = 1;"
+    prune = "DELETE FROM job_facets WHERE count <= 0;"
+    watched = ', '.join(('status',) + FACET_COLUMNS)
+    return [
+        f"CREATE TRIGGER IF NOT EXISTS trg_jobs_facets_ai AFTER INSERT ON jobs BEGIN\n"
+        f"{bump('NEW', '+ 1')}\n{version}\nEND",
+        f"CREATE TRIGGER IF NOT EXISTS trg_jobs_facets_ad AFTER DELETE ON jobs BEGIN\n"
+        f"{bump('OLD', '- 1')}\n{prune}\n{version}\nEND",
+        f"CREATE TRIGGER IF NOT EXISTS trg_jobs_facets_au AFTER UPDATE OF {watched} ON jobs BEGIN\n"
+        f"{bump('OLD', '- 1')}\n{bump('NEW', '+ 1')}\n{prune}\nEND",
+        # Any edit (title, description, ...) changes what a cached page shows
+        f"CREATE TRIGGER IF NOT EXISTS trg_jobs_version_au AFTER UPDATE ON jobs BEGIN\n{version}\nEND",
+    ]
+
+
+def ensure_schema(conn: sqlite3.Connection) -> None:
+    """Create the job search columns, facet tables, triggers and indexes (idempotent).
+
+    On the first run against an existing database the facet counts are built
+    from the current rows and missing salary bands are backfilled.
+    """
+    cur = conn.cursor()
+    for ddl in ("ALTER TABLE jobs ADD COLUMN job_type TEXT DEFAULT 'Full-time'",
+                "ALTER TABLE jobs ADD COLUMN salary_band TEXT"):
+        try:
+            cur.execute(ddl)
+        except sqlite3.OperationalError:
+            pass
+    cur.execute('''
+                CREATE TABLE IF NOT EXISTS job_facets
+                (
+                    status TEXT NOT NULL,
+                    facet TEXT NOT NULL,
+                    value TEXT NOT NULL,
+                    count INTEGER NOT NULL DEFAULT 0,
+                    PRIMARY KEY (status, facet, value)
+                ) WITHOUT ROWID
+                ''')
+    cur.execute('''
+                CREATE TABLE IF NOT EXISTS job_search_meta
+                (
+                    id INTEGER PRIMARY KEY CHECK (id = 1),
+                    version INTEGER NOT NULL DEFAULT 0
+                )
+                ''')
+    # The indexes carry the rowid (= jobs.id), so they already order by (status, posted key, id);
+    # the second serves the "All statuses" view. Queries must use the same expression.
+    cur.execute(f"CREATE INDEX IF NOT EXISTS idx_jobs_status_posted ON jobs(status, {_POSTED_KEY})")
+    cur.execute(f"CREATE INDEX IF NOT EXISTS idx_jobs_posted ON jobs({_POSTED_KEY})")
+    # Superseded by idx_jobs_posted
+    cur.execute("DROP INDEX IF EXISTS idx_jobs_posted_date")
+    for ddl in _facet_trigger_sql():
+        cur.execute(ddl)
+
+    cur.execute("SELECT 1 FROM job_search_meta WHERE id = 1")
+    if cur.fetchone() is None:
+        cur.execute("INSERT INTO job_search_meta(id, version) VALUES (1, 0)")
+        rebuild_facets(conn)
+
+    cur.execute("SELECT id, salary_range FROM jobs WHERE salary_band IS NULL")
+    missing = cur.fetchall()
+    if missing:
+        cur.executemany("UPDATE jobs SET salary_band = ? WHERE id = ?",
+                        [(salary_band(salary), job_id) for job_id, salary in missing])
+
+
+def rebuild_facets(conn: sqlite3.Connection) -> None:
+    """Recount ``job_facets`` from scratch (repair tool; triggers keep it current otherwise)."""
+    cur = conn.cursor()
+    cur.execute("DELETE FROM job_facets")
+    for col in FACET_COLUMNS:
+        cur.execute(
+            f"INSERT INTO job_facets(status, facet, value, count) "
+            f"SELECT COALESCE(status,''), '{col}', COALESCE({col},''), COUNT(*) FROM jobs "
+            f"GROUP BY COALESCE(status,''), COALESCE({col},'')")
+    cur.execute("UPDATE job_search_meta SET version = version + 1 WHERE id = 1")
+
+
+class JobSearchService:
+    """Paged, cached job board queries.
+
+    Args:
+        connect: Zero-argument callable returning a new sqlite3 connection
+            (normally ``DatabaseManager.create_connection``).
+        page_size: Rows per page.
+        max_cached_pages: Pages kept in the LRU cache.
+        max_age: Seconds a cached page may be served without re-checking the
+            data version; 0 checks on every call.
+    """
+
+    def __init__(self, connect: Callable[[], sqlite3.Connection], page_size: int = DEFAULT_PAGE_SIZE,
+                 max_cached_pages: int = 64, max_age: float = 0):
+        self._connect = connect
+        self.page_size = page_size
+        self.max_cached_pages = max_cached_pages
+        self.max_age = max_age
+        self._pages: "OrderedDict[tuple, Dict[str, Any]]" = OrderedDict()
+        self._facets: Dict[Optional[str], Dict[str, List[Tuple[str, int]]]] = {}
+        self._jobs: Dict[int, Dict[str, Any]] = {}
+        self._version: Optional[int] = None
+        self._checked_at = 0.0
+        self.hits = 0
+        self.misses = 0
+
+    # ---- cache bookkeeping ----
+    def _sync_version(self, cur: sqlite3.Cursor) -> None:
+        now = time.monotonic()
+        if self._version is not None and self.max_age and now - self._checked_at < self.max_age:
+            return
+        cur.execute("SELECT version FROM job_search_meta WHERE id = 1")
+        row = cur.fetchone()
+        version = row[0] if row else None
+        self._checked_at = now
+        if version != self._version:
+            self.invalidate()
+            self._version = version
+
+    def invalidate(self) -> None:
+        """Drop all cached pages, facets and job rows."""
+        self._pages.clear()
+        self._facets.clear()
+        self._jobs.clear()
+
+    def _cache_page(self, key: tuple, page: Dict[str, Any]) -> None:
+        self._pages[key] = page
+        while len(self._pages) > self.max_cached_pages:
+            _, old = self._pages.popitem(last=False)
+            for job in old['rows']:
+                self._jobs.pop(job['id'], None)
+        for job in page['rows']:
+            self._jobs[job['id']] = job
+
+    # ---- queries ----
+    @staticmethod
+    def _build_query(keyword: str, location: Optional[str], location_text: str, job_type: Optional[str],
+                     band: Optional[str], status: Optional[str], posted_since: str,
+                     cursor: Optional[Tuple[Any, int]], limit: int) -> Tuple[str, List[Any]]:
+        sql = ("SELECT j.id, j.title, COALESCE(u.full_name,u.username) AS employer, j.location, j.job_type, "
+               "j.salary_range, j.posted_date, j.deadline, j.status, j.description, j.requirements "
+               "FROM jobs j JOIN users u ON u.id = j.employer_id WHERE 1=1 ")
+        params: List[Any] = []
+        if status:
+            sql += "AND j.status = ? "
+            params.append(status)
+        for col, value in (('location', location), ('job_type', job_type), ('salary_band', band)):
+            if value is None:
+                continue
+            if value == '':
+                sql += f"AND (j.{col} IS NULL OR j.{col} = '') "
+            else:
+                sql += f"AND j.{col} = ? "
+                params.append(value)
+        if location_text:
+            sql += "AND j.location LIKE ? "
+            params.append(f"%{location_text}%")
+        if keyword:
+            sql += "AND (j.title LIKE ? OR j.description LIKE ? OR j.requirements LIKE ?) "
+            like = f"%{keyword}%"
+            params.extend([like, like, like])
+        key = "COALESCE(j.posted_date, '')"
+        if posted_since:
+            sql += f"AND {key} >= ? "
+            params.append(posted_since)
+        if cursor is not None:
+            # The plain bound is what lets SQLite range-scan the index; the row value breaks ties on id
+            sql += f"AND {key} <= ? AND ({key}, j.id) < (?, ?) "
+            params.extend([cursor[0] or '', cursor[0] or '', cursor[1]])
+        sql += f"ORDER BY {key} DESC, j.id DESC LIMIT ?"
+        params.append(limit)
+        return sql, params
+
+    def search(self, keyword: str = '', location: Optional[str] = None, location_text: str = '',
+               job_type: Optional[str] = None, band: Optional[str] = None, status: Optional[str] = 'Open',
+               posted_since: str = '', cursor: Optional[Tuple[Any, int]] = None,
+               page_size: Optional[int] = None) -> Dict[str, Any]:
+        """Return one page of jobs, newest first.
+
+        Args:
+            keyword: Substring matched against title, description and requirements.
+            location: Exact location facet value ('' matches jobs without one).
+            location_text: Substring matched against the location.
+            job_type: Exact job type facet value.
+            band: Exact salary band facet value.
+            status: Job status, or None for all statuses.
+            posted_since: ``YYYY-MM-DD``; only jobs posted on or after it.
+            cursor: ``next_cursor`` of the previous page, or None for the first page.
+            page_size: Overrides the service default.
+
+        Returns:
+            Dict: ``rows`` (list of job dicts), ``next_cursor`` (None on the last
+            page) and ``cached`` (whether the page came from the cache).
+        """
+        limit = page_size or self.page_size
+        keyword, location_text, posted_since = keyword.strip(), location_text.strip(), posted_since.strip()
+        key = (keyword, location, location_text, job_type, band, status, posted_since,
+               tuple(cursor) if cursor else None, limit)
+        conn = self._connect()
+        try:
+            cur = conn.cursor()
+            self._sync_version(cur)
+            page = self._pages.get(key)
+            if page is not None:
+                self._pages.move_to_end(key)
+                self.hits += 1
+                return dict(page, cached=True)
+            self.misses += 1
+            sql, params = self._build_query(keyword, location, location_text, job_type, band, status,
+                                            posted_since, cursor, limit + 1)
+            cur.execute(sql, params)
+            fetched = cur.fetchall()
+        finally:
+            conn.close()
+        rows = [dict(zip(_PAGE_COLUMNS, r)) for r in fetched[:limit]]
+        next_cursor = None
+        if len(fetched) > limit:
+            last = rows[-1]
+            next_cursor = (last['posted_date'], last['id'])
+        page = {'rows': rows, 'next_cursor': next_cursor}
+        self._cache_page(key, page)
+        return dict(page, cached=False)
+
+    def facets(self, status: Optional[str] = 'Open') -> Dict[str, List[Tuple[str, int]]]:
+        """Return ``{facet: [(value, count), ...]}`` for location, job type and salary band.
+
+        Counts come from the trigger-maintained ``job_facets`` table; values are
+        ordered by descending count. ``status=None`` sums over all statuses.
+        """
+        conn = self._connect()
+        try:
+            cur = conn.cursor()
+            self._sync_version(cur)
+            if status in self._facets:
+                return self._facets[status]
+            if status:
+                cur.execute("SELECT facet, value, count FROM job_facets WHERE status = ? AND count > 0 "
+                            "ORDER BY facet, count DESC, value", (status,))
+            else:
+                cur.execute("SELECT facet, value, SUM(count) AS n FROM job_facets GROUP BY facet, value "
+                            "HAVING n > 0 ORDER BY facet, n DESC, value")
+            rows = cur.fetchall()
+        finally:
+            conn.close()
+        result: Dict[str, List[Tuple[str, int]]] = {col: [] for col in FACET_COLUMNS}
+        for facet, value, count in rows:
+            if facet in result:
+                result[facet].append((value, int(count)))
+        self._facets[status] = result
+        return result
+
+    def get_job(self, job_id: int) -> Optional[Dict[str, Any]]:
+        """Return a job as a dict, from a cached page when possible."""
+        try:
+            job_id = int(job_id)
+        except (TypeError, ValueError):
+            return None
+        conn = self._connect()
+        try:
+            cur = conn.cursor()
+            self._sync_version(cur)
+            job = self._jobs.get(job_id)
+            if job is not None:
+                return job
+            cur.execute(
+                "SELECT j.id, j.title, COALESCE(u.full_name,u.username) AS employer, j.location, j.job_type, "
+                "j.salary_range, j.posted_date, j.deadline, j.status, j.description, j.requirements "
+                "FROM jobs j JOIN users u ON u.id = j.employer_id WHERE j.id = ?", (job_id,))
+            row = cur.fetchone()
+        finally:
+            conn.close()
+        return dict(zip(_PAGE_COLUMNS, row)) if row else None
@@ -0,0 +1,626 @@
+#!/usr/bin/env python3
+"""
+Read API for the mobile front-end
+
+A read-only REST API over the CBPM database for the Kivy/Android client:
+materials, store inventory, open jobs and contract status.
+Phones are often on metered data, so every listing is built to be fetched
+again cheaply:
+
+* ``POST /api/v1/login`` with ``{"username", "password"}`` returns a signed
+  bearer token (HMAC-SHA256 over ``uid``/``role``/``exp`` with
+  ``MOBILE_API['secret']``); send it as ``Authorization: Bearer <token>``.
+* Listings are keyset-paginated: ``?limit=`` and the opaque ``next_cursor`` of
+  the previous page as ``?cursor=``. Each response carries ``version``, the
+  change-capture version (change_capture.py) it reflects; keep the one from the
+  first page.
+* ``?since=<version>`` returns only the rows that changed after that version
+  (``items``) and the ids that were deleted or no longer match the filters
+  (``deleted``), with ``"full": false``. When that cannot be worked out
+  cheaply (a joined table changed, or too many changes) the first page of the
+  full listing comes back with ``"full": true``; history that has been
+  compacted answers ``410`` and the client starts again without ``since``.
+* ETags are derived from the change-capture versions of the tables behind a
+  response, so a matching ``If-None-Match`` (or ``If-Modified-Since``) is
+  answered ``304`` without running the listing query. Bodies are gzip
+  compressed when the client accepts it, and kept per user in an LRU cache
+  until one of their tables changes.
+
+Without change capture the API still works; ETags are then hashed from the body.
+Settings come from ``config.MOBILE_API``. The Flask layer is a thin adapter
+over :meth:`MobileApi.handle`.
+
+Usage (PowerShell examples):
+  py .\\mobile_api.py --db cameroon_construction.db --port 8770
+  py .\\mobile_api.py --db cameroon_construction.db --host 0.0.0.0 --port 8770
+"""
+
+import argparse
+import base64
+import gzip
+import hashlib
+import hmac
+import json
+import re
+import secrets
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from email.utils import formatdate, parsedate_to_datetime
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+try:
+    from flask import Flask, Response, request
+    HAS_FLASK = True
+except ImportError:
+    Flask = None
+    HAS_FLASK = False
+
+try:
+    from config import MOBILE_API as SETTINGS
+except Exception:
+    SETTINGS = {}
+
+API_PREFIX = '/api/v1'
+# Part of every ETag; bump when the JSON shape of a response changes
+FORMAT_VERSION = '1'
+
+_STORE_INVENTORY_RE = re.compile(r'^/stores/(\d+)/inventory$')
+_CONTRACT_RE = re.compile(r'^/contracts/(\d+)$')
+
+
+class ApiError(Exception):
+    """An error answered with ``status`` and a JSON ``{"error": message}`` body."""
+
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+# ---- tokens ----
+
+def _b64encode(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b'=').decode('ascii')
+
+
+def _b64decode(text: str) -> bytes:
+    return base64.urlsafe_b64decode(text + '=' * (-len(text) % 4))
+
+
+def issue_token(secret: bytes, user_id: int, role: str, ttl_s: float) -> str:
+    """Signed bearer token for ``user_id``, valid for ``ttl_s`` seconds."""
+    claims = _b64encode(json.dumps({'uid': user_id, 'role': role, 'exp': int(time.time() + ttl_s)},
+                                   separators=(',', ':')).encode('utf-8'))
+    signature = _b64encode(hmac.new(secret, claims.encode('ascii'), hashlib.sha256).digest())
+    return f"{claims}.{signature}"
+
+
+def read_token(secret: bytes, token: str) -> Dict[str, Any]:
+    """Claims of a valid, unexpired token; raises :class:`ApiError` (401) otherwise."""
+    try:
+        claims, signature = token.split('.', 1)
+        expected = _b64encode(hmac.new(secret, claims.encode('ascii'), hashlib.sha256).digest())
+        if not hmac.compare_digest(signature, expected):
+            raise ValueError('bad signature')
+        payload = json.loads(_b64decode(claims))
+    except (ValueError, UnicodeError):
+        raise ApiError(401, 'invalid token')
+    if payload.get('exp', 0) < time.time():
+        raise ApiError(401, 'token expired')
+    return payload
+
+
+# ---- change counters ----
+
+class TableVersions:
+    """Latest change-capture version of each table, refreshed from ``change_log`` as it grows.
+
+    Each lookup costs one ``MAX(version)`` probe; only when it moved are the new
+    log entries grouped by table. The wall-clock time a table was first seen
+    at its current version serves as its ``Last-Modified``.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._seen = 0
+        self._versions: Dict[str, int] = {}
+        self._modified: Dict[str, float] = {}
+        self._started = time.time()
+
+    def snapshot(self, conn: sqlite3.Connection, tables: Sequence[str]) -> Tuple[int, Dict[str, int], float]:
+        """``(current version, {table: version}, last modified)`` as seen by ``conn``'s read transaction.
+
+        Another thread may already have seen later changes than this transaction;
+        versions above this transaction's top are reported as the top itself,
+        which still changes whenever the table does.
+        """
+        row = conn.execute("SELECT MAX(version) FROM change_log").fetchone()
+        top = int(row[0]) if row[0] is not None else 0
+        with self._lock:
+            if top > self._seen:
+                now = time.time()
+                for tbl, version in conn.execute("SELECT tbl, MAX(version) FROM change_log WHERE version > ? "
+                                                 "GROUP BY tbl", (self._seen,)):
+                    self._versions[tbl] = version
+                    self._modified[tbl] = now if self._seen else self._started
+                self._seen = top
+            versions = {t: min(self._versions.get(t, 0), top) for t in tables}
+            modified = max(self._modified.get(t, self._started) for t in tables)
+        return top, versions, modified
+
+
+class ResponseCache:
+    """Per-user LRU of rendered responses, keyed by user, path and query."""
+
+    def __init__(self, max_entries: int = 2000):
+        self.max_entries = max_entries
+        self._entries: 'OrderedDict[tuple, Dict[str, Any]]' = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: tuple, etag: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry['etag'] != etag:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key: tuple, entry: Dict[str, Any]) -> None:
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+# ---- listings ----
+
+def _store_scope(user: Dict[str, Any], alias: str = 's') -> Tuple[List[str], List[Any]]:
+    # Same rule as queries.list_inventory
+    if user['role'] in ('retail_store', 'contract_owner'):
+        return [f'{alias}.owner_id = ?'], [user['uid']]
+    if user['role'] == 'manager':
+        return [f'{alias}.manager_id = ?'], [user['uid']]
+    return [], []
+
+
+def _contract_scope(user: Dict[str, Any]) -> Tuple[List[str], List[Any]]:
+    if user['role'] in ('administrator', 'manager'):
+        return [], []
+    return ['(c.contract_owner_id = ? OR c.contractor_id = ?)'], [user['uid'], user['uid']]
+
+
+class Listing:
+    """One paginated resource.
+
+    Args:
+        select: ``SELECT ... FROM ...`` without a WHERE clause.
+        key: Column the pages are ordered by; also the ``id`` of each item.
+        keyed_tables: Tables whose rowid is that key; changes to them are sent as deltas.
+        other_tables: Other tables the items are built from; a change to them resends the listing.
+        filters: ``(conn, user, query, args) -> (clauses, params)``; may raise :class:`ApiError`.
+    """
+
+    def __init__(self, select: str, key: str, keyed_tables: Sequence[str], other_tables: Sequence[str],
+                 filters: Callable[..., Tuple[List[str], List[Any]]]):
+        self.select = select
+        self.key = key
+        self.keyed_tables = tuple(keyed_tables)
+        self.other_tables = tuple(other_tables)
+        self.filters = filters
+
+    @property
+    def tables(self) -> Tuple[str, ...]:
+        return self.keyed_tables + self.other_tables
+
+    def fetch(self, conn: sqlite3.Connection, clauses: List[str], params: List[Any],
+              limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        sql = self.select
+        if clauses:
+            sql += ' WHERE ' + ' AND '.join(clauses)
+        sql += f' ORDER BY {self.key}'
+        if limit is not None:
+            sql += ' LIMIT ?'
+            params = params + [limit]
+        cur = conn.execute(sql, params)
+        columns = [d[0] for d in cur.description]
+        return [dict(zip(columns, row)) for row in cur.fetchall()]
+
+
+def _material_filters(conn, user, query, args):
+    clauses = ['(COALESCE(bm.is_custom, 0) = 0 OR bm.owner_id = ?)']
+    params: List[Any] = [user['uid']]
+    if query.get('category'):
+        clauses.append('bm.category = ?')
+        params.append(query['category'])
+    search = (query.get('q') or '').strip()
+    if search:
+        clauses.append('(bm.name LIKE ? OR bm.local_name LIKE ?)')
+        params.extend([f"%{search}%", f"%{search}%"])
+    return clauses, params
+
+
+def _store_filters(conn, user, query, args):
+    return _store_scope(user)
+
+
+def _inventory_filters(conn, user, query, args):
+    store_id = int(args[0])
+    clauses, params = _store_scope(user)
+    visible = conn.execute('SELECT 1 FROM stores s WHERE ' + ' AND '.join(['s.id = ?'] + clauses),
+                           [store_id] + params).fetchone()
+    if not visible:
+        raise ApiError(404, f'store {store_id} not found')
+    return ['i.store_id = ?'], [store_id]
+
+
+def _job_filters(conn, user, query, args):
+    return ["j.status = 'Open'"], []
+
+
+def _contract_filters(conn, user, query, args):
+    clauses, params = _contract_scope(user)
+    if args:
+        clauses = clauses + ['c.id = ?']
+        params = params + [int(args[0])]
+    return clauses, params
+
+
+LISTINGS: Dict[str, Listing] = {
+    'materials': Listing(
+        'SELECT bm.id, bm.name, bm.local_name, bm.category, bm.unit, bm.standard_price, bm.availability '
+        'FROM building_materials bm',
+        'bm.id', ['building_materials'], [], _material_filters),
+    'stores': Listing(
+        'SELECT s.id, s.name, s.location, s.is_open, s.is_active FROM stores s',
+        's.id', ['stores'], [], _store_filters),
+    'inventory': Listing(
+        'SELECT i.id, i.material_id, bm.name AS material, bm.unit, i.quantity, i.unit_price, i.reorder_level, '
+        'i.last_updated FROM inventory i JOIN building_materials bm ON bm.id = i.material_id',
+        'i.id', ['inventory'], ['building_materials', 'stores'], _inventory_filters),
+    'jobs': Listing(
+        'SELECT j.id, j.title, j.description, j.location, j.salary_range, j.job_type, j.posted_date, '
+        'j.deadline FROM jobs j',
+        'j.id', ['jobs'], [], _job_filters),
+    # contract_balances is keyed by contract_id, so balance changes are deltas of the contract
+    'contracts': Listing(
+        'SELECT c.id, c.title, c.status, c.contract_kind, c.start_date, c.end_date, c.budget, '
+        'cb.paid, cb.pending, cb.last_payment_date FROM contracts c '
+        'LEFT JOIN contract_balances cb ON cb.contract_id = c.id',
+        'c.id', ['contracts', 'contract_balances'], [], _contract_filters),
+}
+
+
+def route(path: str) -> Tuple[str, Tuple[str, ...], bool]:
+    """``(listing name, path arguments, single item)`` for a GET path below the API prefix."""
+    if path in ('/materials', '/stores', '/jobs', '/contracts'):
+        return path[1:], (), False
+    match = _STORE_INVENTORY_RE.match(path)
+    if match:
+        return 'inventory', match.groups(), False
+    match = _CONTRACT_RE.match(path)
+    if match:
+        return 'contracts', match.groups(), True
+    raise ApiError(404, f'unknown endpoint {API_PREFIX}{path}')
+
+
+# ---- the API ----
+
+class MobileApi:
+    """Answers the mobile read API (independent of the web framework).
+
+    Args:
+        connect: Opens a connection to the database; one is kept per worker thread.
+        verify_password: ``(password, stored_hash) -> bool``, as ``SecurityManager.verify_password``.
+        settings: Overrides for ``config.MOBILE_API``.
+        connect_writable: Opens a connection that may write, used by login to count failed
+            attempts when ``connect`` gives read-only ones (default ``connect``).
+    """
+
+    def __init__(self, connect: Callable[[], sqlite3.Connection], verify_password: Callable[[str, str], bool],
+                 settings: Optional[Dict[str, Any]] = None,
+                 connect_writable: Optional[Callable[[], sqlite3.Connection]] = None):
+        self.settings = dict(SETTINGS)
+        self.settings.update(settings or {})
+        secret = self.settings.get('secret') or ''
+        if not secret:
+            print("[WARN] MOBILE_API['secret'] is not set; tokens will not survive a restart of the API")
+            secret = secrets.token_hex(32)
+        self.secret = secret.encode('utf-8')
+        self.connect = connect
+        self.connect_writable = connect_writable or connect
+        self.verify_password = verify_password
+        self.versions = TableVersions()
+        self.cache = ResponseCache(int(self.settings.get('cache_entries', 2000)))
+        self._local = threading.local()
+        self._tracked: Optional[set] = None
+        self._tracked_lock = threading.Lock()
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._local.conn = self.connect()
+            conn.isolation_level = None
+        return conn
+
+    def _writable_conn(self) -> sqlite3.Connection:
+        if self.connect_writable is self.connect:
+            return self._conn()
+        conn = getattr(self._local, 'writable', None)
+        if conn is None:
+            conn = self._local.writable = self.connect_writable()
+            conn.isolation_level = None
+        return conn
+
+    def _tracked_tables(self, conn: sqlite3.Connection) -> set:
+        """Tables with change-capture triggers (empty when change capture is off)."""
+        with self._tracked_lock:
+            if self._tracked is None:
+                import change_capture
+                rows = conn.execute("SELECT tbl_name FROM sqlite_master WHERE type = 'trigger' AND name LIKE ?",
+                                    (change_capture.TRIGGER_PREFIX + '%_ins',)).fetchall()
+                self._tracked = {r[0] for r in rows}
+            return self._tracked
+
+    # ---- endpoints ----
+    def login(self, body: Dict[str, Any]) -> Dict[str, Any]:
+        """Issue a token; failed attempts count towards the desktop's account suspension."""
+        from queries import get_login_user, record_failed_login, record_login
+        username = str(body.get('username') or '').strip()
+        password = str(body.get('password') or '')
+        if not username or not password:
+            raise ApiError(400, 'username and password are required')
+        conn = self._writable_conn()
+        cur = conn.cursor()
+        cur.execute("BEGIN IMMEDIATE")
+        try:
+            user = get_login_user(cur, username)
+            if user and user[4] and self.verify_password(password, user[7]):
+                record_login(cur, user[0])
+            elif user and user[4]:
+                remaining = record_failed_login(cur, username)
+                user = None
+            else:
+                remaining = None
+                user = None
+            cur.execute("COMMIT")
+        except Exception:
+            cur.execute("ROLLBACK")
+            raise
+        if not user:
+            if remaining == 0:
+                raise ApiError(403, 'account suspended after too many failed login attempts')
+            raise ApiError(401, 'invalid username or password')
+        ttl_s = float(self.settings.get('token_ttl_h', 12)) * 3600
+        return {'token': issue_token(self.secret, user[0], user[2], ttl_s), 'expires_in': int(ttl_s),
+                'user': {'id': user[0], 'username': user[1], 'role': user[2], 'full_name': user[3]}}
+
+    def _page(self, conn, listing: Listing, clauses, params, query) -> Dict[str, Any]:
+        limit = int(query.get('limit') or self.settings.get('page_size', 100))
+        limit = max(1, min(limit, int(self.settings.get('max_page_size', 500))))
+        if query.get('cursor'):
+            try:
+                after = int(_b64decode(query['cursor']).decode('ascii'))
+            except (ValueError, UnicodeError):
+                raise ApiError(400, 'invalid cursor')
+            clauses = clauses + [f'{listing.key} > ?']
+            params = params + [after]
+        items = listing.fetch(conn, clauses, params, limit + 1)
+        more = len(items) > limit
+        items = items[:limit]
+        next_cursor = _b64encode(str(items[-1]['id']).encode('ascii')) if more else None
+        return {'items': items, 'next_cursor': next_cursor, 'full': True}
+
+    def _delta(self, conn, listing: Listing, clauses, params, since: int,
+               versions: Dict[str, int]) -> Optional[Dict[str, Any]]:
+        """Rows changed after ``since``, or None when the full listing has to be sent."""
+        import change_capture
+        if any(versions[t] > since for t in listing.other_tables):
+            return None
+        max_changes = int(self.settings.get('max_delta', 1000))
+        changed = set()
+        cursor = since
+        while True:
+            batch = change_capture.changes_since(conn, cursor, tables=listing.keyed_tables)
+            changed.update(c['row_id'] for c in batch['changes'])
+            if len(changed) > max_changes:
+                return None
+            cursor = batch['next']
+            if not batch['more']:
+                break
+        items: List[Dict[str, Any]] = []
+        ids = sorted(changed)
+        for start in range(0, len(ids), 500):
+            chunk = ids[start:start + 500]
+            items.extend(listing.fetch(conn, clauses + [f'{listing.key} IN ({",".join("?" * len(chunk))})'],
+                                       params + chunk))
+        found = {item['id'] for item in items}
+        return {'items': items, 'deleted': [i for i in ids if i not in found], 'next_cursor': None, 'full': False}
+
+    def _render(self, conn, user, path: str, query: Dict[str, str],
+                versions: Optional[Dict[str, int]]) -> Tuple[Dict[str, Any], bool]:
+        name, args, single = route(path)
+        listing = LISTINGS[name]
+        clauses, params = listing.filters(conn, user, query, args)
+        if single:
+            items = listing.fetch(conn, clauses, params)
+            if not items:
+                raise ApiError(404, f'{path[1:]} not found')
+            return items[0], False
+        body = None
+        if query.get('since') and versions is not None:
+            try:
+                since = int(query['since'])
+            except ValueError:
+                raise ApiError(400, 'since must be a version number')
+            body = self._delta(conn, listing, clauses, params, since, versions)
+        if body is None:
+            body = self._page(conn, listing, clauses, params, query)
+        return body, True
+
+    def get(self, user: Dict[str, Any], path: str, query: Dict[str, str],
+            headers: Dict[str, str]) -> Tuple[int, Dict[str, str], bytes]:
+        """Serve one GET, honouring the conditional and compression headers."""
+        conn = self._conn()
+        name = route(path)[0]
+        tables = LISTINGS[name].tables
+        key = (user['uid'], user['role'], path, tuple(sorted(query.items())))
+        conn.execute("BEGIN")
+        try:
+            top = versions = etag = modified = None
+            if set(tables) <= self._tracked_tables(conn):
+                top, versions, modified = self.versions.snapshot(conn, tables)
+                digest = hashlib.blake2s(repr((FORMAT_VERSION, key, sorted(versions.items()))).encode('utf-8'),
+                                         digest_size=12).hexdigest()
+                etag = f'W/"{digest}"'
+                if self._not_modified(headers, etag, modified):
+                    return 304, self._cache_headers(etag, modified), b''
+                entry = self.cache.get(key, etag)
+                if entry is not None:
+                    return self._respond(entry, headers)
+            body, is_listing = self._render(conn, user, path, query, versions)
+            if top is not None and is_listing:
+                body['version'] = top
+        finally:
+            conn.execute("ROLLBACK")
+        data = json.dumps(body, separators=(',', ':'), default=str).encode('utf-8')
+        if etag is None:
+            etag = f'W/"{hashlib.blake2s(data, digest_size=12).hexdigest()}"'
+            if self._not_modified(headers, etag, None):
+                return 304, self._cache_headers(etag, None), b''
+        entry = {'etag': etag, 'modified': modified, 'body': data, 'gzip': None}
+        if modified is not None:
+            self.cache.put(key, entry)
+        return self._respond(entry, headers)
+
+    # ---- HTTP details ----
+    def _not_modified(self, headers: Dict[str, str], etag: str, modified: Optional[float]) -> bool:
+        if 'if-none-match' in headers:
+            tags = [t.strip() for t in headers['if-none-match'].split(',')]
+            return '*' in tags or etag in tags or etag[2:] in tags
+        if modified is not None and 'if-modified-since' in headers:
+            try:
+                since = parsedate_to_datetime(headers['if-modified-since']).timestamp()
+            except (TypeError, ValueError):
+                return False
+            return int(modified) <= since
+        return False
+
+    def _cache_headers(self, etag: str, modified: Optional[float]) -> Dict[str, str]:
+        out = {'ETag': etag, 'Cache-Control': 'private, no-cache', 'Vary': 'Accept-Encoding, Authorization'}
+        # A Last-Modified within the current second could hide a change later in that second
+        if modified is not None and time.time() - modified >= 1:
+            out['Last-Modified'] = formatdate(modified, usegmt=True)
+        return out
+
+    def _respond(self, entry: Dict[str, Any], headers: Dict[str, str]) -> Tuple[int, Dict[str, str], bytes]:
+        out = self._cache_headers(entry['etag'], entry['modified'])
+        out['Content-Type'] = 'application/json'
+        data = entry['body']
+        if 'gzip' in headers.get('accept-encoding', '') and len(data) >= int(self.settings.get('gzip_min_bytes', 512)):
+            if entry['gzip'] is None:
+                entry['gzip'] = gzip.compress(data, compresslevel=6)
+            data = entry['gzip']
+            out['Content-Encoding'] = 'gzip'
+        return 200, out, data
+
+    def handle(self, method: str, path: str, query: Dict[str, str], headers: Dict[str, str],
+               body: bytes = b'') -> Tuple[int, Dict[str, str], bytes]:
+        """Route one request; returns ``(status, headers, body bytes)``."""
+        headers = {k.lower(): v for k, v in headers.items()}
+        try:
+            if not path.startswith(API_PREFIX + '/'):
+                raise ApiError(404, f'unknown endpoint {path}')
+            path = path[len(API_PREFIX):]
+            if path == '/login':
+                if method != 'POST':
+                    raise ApiError(405, f'{method} not allowed')
+                try:
+                    payload = json.loads(body.decode('utf-8') or '{}')
+                except ValueError:
+                    raise ApiError(400, 'request body must be JSON')
+                return self._json(200, self.login(payload if isinstance(payload, dict) else {}))
+            if method != 'GET':
+                raise ApiError(405, f'{method} not allowed')
+            auth = headers.get('authorization', '')
+            if not auth.lower().startswith('bearer '):
+                raise ApiError(401, 'missing bearer token')
+            user = read_token(self.secret, auth[7:].strip())
+            return self.get(user, path, query, headers)
+        except ApiError as e:
+            status, headers_out, data = self._json(e.status, {'error': str(e)})
+            if e.status == 401:
+                headers_out['WWW-Authenticate'] = 'Bearer'
+            return status, headers_out, data
+        except LookupError:
+            # change_capture.ChangesCompacted: the client must download the listing again
+            return self._json(410, {'error': 'changes since that version are no longer kept; '
+                                             'fetch the listing again without since'})
+        except (ValueError, sqlite3.Error) as e:
+            return self._json(400, {'error': str(e)})
+        except Exception as e:
+            return self._json(500, {'error': str(e)})
+
+    def _json(self, status: int, body: Dict[str, Any]) -> Tuple[int, Dict[str, str], bytes]:
+        return status, {'Content-Type': 'application/json', 'Cache-Control': 'no-store'}, json.dumps(body).encode('utf-8')
+
+
+def create_app(api: MobileApi):
+    """Flask application exposing ``api``."""
+    if not HAS_FLASK:
+        raise RuntimeError("Flask is required for the mobile API (pip install -r requirements.txt)")
+    app = Flask(__name__)
+
+    @app.route('/<path:path>', methods=['GET', 'POST'])
+    def dispatch(path):
+        status, headers, data = api.handle(request.method, '/' + path, request.args.to_dict(),
+                                           dict(request.headers), request.get_data())
+        return Response(data, status=status, headers=headers)
+
+    return app
+
+
+def main() -> int:
+    from config import DATABASE_NAME
+    parser = argparse.ArgumentParser(description="Serve the read API used by the mobile front-end.")
+    parser.add_argument('--db', default=DATABASE_NAME, help='SQLite database file to serve')
+    parser.add_argument('--host', default=SETTINGS.get('host', '0.0.0.0'), help='Interface to listen on')
+    parser.add_argument('--port', type=int, default=int(SETTINGS.get('port', 8770)), help='TCP port')
+    args = parser.parse_args()
+    if not HAS_FLASK:
+        parser.error("Flask is required for the mobile API (pip install -r requirements.txt)")
+
+    # Create or upgrade the schema (including the change-capture triggers) before serving it
+    from CBPM import DatabaseManager, SecurityManager
+    DatabaseManager(args.db, cloud_sync=False, backend='local')
+
+    def connect_writable() -> sqlite3.Connection:
+        from db_profiles import apply_pragmas, profile_pragmas
+        conn = sqlite3.connect(args.db, timeout=30)
+        apply_pragmas(conn, profile_pragmas())
+        return conn
+
+    def connect() -> sqlite3.Connection:
+        conn = connect_writable()
+        conn.execute("PRAGMA query_only=ON")
+        return conn
+
+    # Listings stay read-only; only login writes (failed-attempt counts, last login)
+    api = MobileApi(connect, SecurityManager().verify_password, connect_writable=connect_writable)
+    print(f"Serving the mobile API for {args.db} on http://{args.host}:{args.port}{API_PREFIX}")
+    create_app(api).run(host=args.host, port=args.port, threaded=True)
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,271 @@
+"""
+Integer money amounts
+
+FCFA (XAF) has no minor unit, so every amount in the sales, stock and
+payment ledgers is stored as an ``INTEGER`` number of francs rather than a
+``REAL``. SQLite then sums them exactly, with no floating-point error building
+up in month-end totals, and the screens format plain integers instead of
+re-parsing floats row by row.
+
+* :func:`to_amount` turns a number (int, float, Decimal) into an
+  :data:`Amount`, rounding half away from zero; :func:`parse_amount` does the
+  same for text typed by a user (``"12 500"``, ``"12,500 FCFA"``), and
+  :func:`parse_number` reads quantities with the same separator rules, and
+  :func:`payment_amount` reads payments, which may be in a currency with cents.
+* :func:`line_total` is quantity x unit price, rounded once.
+* :func:`formatter` builds a formatting function once, for use in row loops;
+  :func:`format_rows` applies it to the money columns of result rows.
+* :func:`ensure_schema` migrates the ``REAL`` columns listed in
+  :data:`MONEY_COLUMNS` of an existing database to ``INTEGER``, rebuilding
+  each table once (SQLite cannot change a column type in place).
+"""
+
+import math
+import re
+import sqlite3
+from decimal import ROUND_HALF_UP, Decimal, InvalidOperation
+from typing import Any, Callable, Dict, Iterable, List, NewType, Optional, Sequence
+
+# Whole francs
+Amount = NewType('Amount', int)
+
+CURRENCY_LABEL = 'FCFA'
+# Currency codes of the franc, which has no minor unit
+FRANC_CODES = ('XAF', 'FCFA', 'CFA')
+
+# Ledger columns stored as whole francs. Budgets and catalogue prices (contracts, building_materials,
+# purchase requests, transfers) stay REAL: they are quoted figures, not summed ledgers. So do
+# payments and refunds, which may be in USD or EUR (see payment_amount).
+MONEY_COLUMNS: Dict[str, Sequence[str]] = {
+    'transactions': ('unit_price', 'total_amount'),
+    'inventory': ('unit_price',),
+    'contract_payments': ('amount',),
+    'contract_ledger': ('amount',),
+    'contract_balances': ('paid', 'pending'),
+}
+
+_CURRENCY_RE = re.compile(r'(?i)fcfa|xaf|cfa|frs?\.?|[$€£₦]')
+_SPACES_RE = re.compile(r'[\s  \']')
+_THOUSANDS_RE = re.compile(r'^-?\d{1,3}(,\d{3})+$')
+_ONE = Decimal(1)
+
+
+# ---- conversion ----
+
+def to_amount(value: Any, default: Optional[int] = 0) -> Optional[Amount]:
+    """``value`` in whole francs, rounded half away from zero; ``default`` for None or ''.
+
+    Raises:
+        ValueError: ``value`` is not a number.
+    """
+    if type(value) is int:
+        return Amount(value)
+    if value is None or value == '':
+        return default if default is None else Amount(default)
+    if isinstance(value, str):
+        parsed = parse_amount(value)
+        if parsed is None:
+            raise ValueError(f"not an amount: {value!r}")
+        return parsed
+    try:
+        # repr() keeps the float's shortest decimal form, so 2.675 rounds as 2.675 and not 2.67499...
+        return Amount(int(Decimal(repr(value) if isinstance(value, float) else value)
+                          .quantize(_ONE, rounding=ROUND_HALF_UP)))
+    except (InvalidOperation, ValueError, TypeError):
+        raise ValueError(f"not an amount: {value!r}")
+
+
+def parse_amount(text: Any, default: Optional[int] = None) -> Optional[Amount]:
+    """Amount typed by a user, or ``default`` when the text is empty or not a number.
+
+    Currency labels and spaces are ignored. A comma followed by groups of three
+    digits is a thousands separator (``12,500``); otherwise it is the decimal
+    separator (``12,5``). With both, the last one is the decimal separator.
+    """
+    s = _number_text(text)
+    if not s:
+        return default
+    try:
+        return Amount(int(Decimal(s).quantize(_ONE, rounding=ROUND_HALF_UP)))
+    except (InvalidOperation, ValueError):
+        return default
+
+
+def parse_number(value: Any, default: Optional[float] = None) -> Optional[float]:
+    """Quantity from a cell or text box (``"1,5"``, ``"2 000"``, ``12.5``), or ``default``.
+
+    Separators follow :func:`parse_amount`; infinities and NaN count as not a number.
+    """
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        number = float(value)
+    else:
+        s = _number_text(value)
+        if not s:
+            return default
+        try:
+            number = float(Decimal(s))
+        except (InvalidOperation, ValueError):
+            return default
+    return number if math.isfinite(number) else default
+
+
+def payment_amount(value: Any, currency: Optional[str] = 'XAF', default: Optional[float] = None) -> Optional[float]:
+    """Payment amount in ``currency``: whole francs for XAF, cents kept for other currencies; or ``default``."""
+    if (currency or 'XAF').upper() in FRANC_CODES:
+        return parse_amount(value, default) if isinstance(value, str) else to_amount(value, default)
+    number = parse_number(value)
+    return default if number is None else round(number, 2)
+
+
+def _number_text(text: Any) -> str:
+    """``text`` without currency labels or spaces, with ``.`` as the only decimal separator."""
+    if text is None:
+        return ''
+    s = _SPACES_RE.sub('', _CURRENCY_RE.sub('', str(text)))
+    if '.' in s and ',' in s:
+        # Whichever comes last is the decimal separator (12,500.50 or 12.500,50)
+        s = s.replace(',', '') if s.rfind('.') > s.rfind(',') else s.replace('.', '').replace(',', '.')
+    elif _THOUSANDS_RE.match(s):
+        s = s.replace(',', '')
+    else:
+        s = s.replace(',', '.')
+    return s
+
+
+def line_total(quantity: Any, unit_price: Any) -> Amount:
+    """``quantity * unit_price`` in whole francs (quantities may be fractional, e.g. metres)."""
+    price = to_amount(unit_price)
+    if type(quantity) is int:
+        return Amount(quantity * price)
+    return to_amount(Decimal(repr(float(quantity or 0))) * price)
+
+
+# ---- formatting ----
+
+def format_amount(value: Any, currency: str = '') -> str:
+    """``12,500`` (or ``12,500 FCFA`` with ``currency``); '' for None."""
+    return formatter(currency)(value)
+
+
+def formatter(currency: str = '') -> Callable[[Any], str]:
+    """Formatting function for amounts, built once for use in row loops.
+
+    Integers (what the migrated columns return) take the fast path; anything
+    else is converted with :func:`to_amount` first, and shown as is if that fails.
+    """
+    pattern = ('{:,} ' + currency) if currency else '{:,}'
+    fmt = pattern.format
+
+    def format_value(value: Any) -> str:
+        if type(value) is int:
+            return fmt(value)
+        if value is None or value == '':
+            return ''
+        try:
+            return fmt(to_amount(value))
+        except ValueError:
+            return str(value)
+
+    return format_value
+
+
+def format_rows(rows: Iterable[Sequence[Any]], money_columns: Sequence[int],
+                whole_columns: Sequence[int] = ()) -> List[List[Any]]:
+    """Rows as lists with ``money_columns`` formatted as amounts and ``whole_columns`` as integers."""
+    fmt = formatter()
+    out = []
+    for row in rows:
+        values = list(row)
+        for i in money_columns:
+            values[i] = fmt(values[i])
+        for i in whole_columns:
+            v = values[i]
+            if v is not None and type(v) is not int:
+                try:
+                    values[i] = int(v)
+                except (TypeError, ValueError):
+                    pass
+            elif v is None:
+                values[i] = ''
+        out.append(values)
+    return out
+
+
+# ---- schema ----
+
+def pending_migrations(conn: sqlite3.Connection) -> Dict[str, List[str]]:
+    """``{table: [columns]}`` of money columns not yet declared INTEGER."""
+    pending: Dict[str, List[str]] = {}
+    for table, columns in MONEY_COLUMNS.items():
+        declared = {r[1]: (r[2] or '').upper() for r in conn.execute(f'PRAGMA table_info("{table}")')}
+        todo = [c for c in columns if c in declared and declared[c] != 'INTEGER']
+        if todo:
+            pending[table] = todo
+    return pending
+
+
+def ensure_schema(conn: sqlite3.Connection) -> List[str]:
+    """Convert the money columns of an existing database to INTEGER francs; returns the rebuilt tables.
+
+    Each table is rebuilt with SQLite's documented procedure (create the new
+    table, copy, drop, rename, recreate indexes and triggers, including the
+    change-capture ones) in a single transaction. Values are rounded to the
+    franc. Nothing is done once every column is INTEGER, so this is cheap to
+    call on every start.
+    """
+    pending = pending_migrations(conn)
+    if not pending:
+        return []
+    if conn.in_transaction:
+        conn.commit()
+    foreign_keys = conn.execute("PRAGMA foreign_keys").fetchone()[0]
+    legacy_alter = conn.execute("PRAGMA legacy_alter_table").fetchone()[0]
+    # Foreign keys can only be switched off outside a transaction; the legacy rename leaves
+    # views and other tables' triggers that name the table untouched, as the rebuild needs
+    conn.execute("PRAGMA foreign_keys=OFF")
+    conn.execute("PRAGMA legacy_alter_table=ON")
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            for table, columns in pending.items():
+                _rebuild(conn, table, columns)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+    finally:
+        conn.execute(f"PRAGMA legacy_alter_table={int(legacy_alter)}")
+        conn.execute(f"PRAGMA foreign_keys={int(foreign_keys)}")
+    return list(pending)
+
+
+def _rebuild(conn: sqlite3.Connection, table: str, columns: Sequence[str]) -> None:
+    sql = conn.execute("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = ?", (table,)).fetchone()[0]
+    temp = f"{table}__money"
+    sql, n = re.subn(r'^\s*CREATE\s+TABLE\s+(?:IF\s+NOT\s+EXISTS\s+)?(?:"[^"]+"|\[[^\]]+\]|`[^`]+`|\w+)',
+                     f'CREATE TABLE "{temp}"', sql, count=1, flags=re.I)
+    if not n:
+        raise sqlite3.OperationalError(f"cannot parse the definition of {table}")
+    for column in columns:
+        sql, n = re.subn(rf'(["`\[]?\b{column}\b["`\]]?\s+)REAL\b', r'\1INTEGER', sql, count=1, flags=re.I)
+        if not n:
+            raise sqlite3.OperationalError(f"cannot find the type of {table}.{column}")
+    names = [r[1] for r in conn.execute(f'PRAGMA table_info("{table}")')]
+    select = ', '.join(f'CAST(ROUND("{c}") AS INTEGER)' if c in columns else f'"{c}"' for c in names)
+    dependents = conn.execute("SELECT sql FROM sqlite_master WHERE tbl_name = ? AND type IN ('index', 'trigger') "
+                              "AND sql IS NOT NULL", (table,)).fetchall()
+    has_sequence = conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'sqlite_sequence'").fetchone()
+    sequence = conn.execute("SELECT seq FROM sqlite_sequence WHERE name = ?", (table,)).fetchone() \
+        if has_sequence else None
+
+    conn.execute(f'DROP TABLE IF EXISTS "{temp}"')
+    conn.execute(sql)
+    quoted = ', '.join(f'"{c}"' for c in names)
+    conn.execute(f'INSERT INTO "{temp}" ({quoted}) SELECT {select} FROM "{table}"')
+    conn.execute(f'DROP TABLE "{table}"')
+    conn.execute(f'ALTER TABLE "{temp}" RENAME TO "{table}"')
+    for (statement,) in dependents:
+        conn.execute(statement)
+    if sequence is not None:
+        # Keep AUTOINCREMENT from reusing the ids of rows deleted before the rebuild
+        conn.execute("UPDATE sqlite_sequence SET seq = MAX(seq, ?) WHERE name = ?", (sequence[0], table))
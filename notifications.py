@@ -0,0 +1,522 @@
+"""
+Outbound notification queue
+
+Events that someone should hear about (stock falling to its reorder level, a
+payment waiting for confirmation, a change in a job application, an
+interview being scheduled) are written as rows of ``notification_queue`` in
+the same transaction as the change itself. A queued e-mail therefore exists
+exactly when the change was committed, and nothing is lost if the application
+closes before it is sent. Sending is done by :class:`NotificationWorker`, a
+background thread, never on the Tk thread:
+
+* it claims up to ``batch_size`` due rows at a time (``status = 'sending'``,
+  tagged with the worker's token) and sends them over one SMTP connection;
+* a token bucket keeps it under ``rate_per_minute`` messages;
+* a failed send is retried after an exponential backoff with jitter, up to
+  ``max_attempts``; a permanent refusal (5xx, unknown recipient) fails the row
+  at once;
+* rows left in ``sending`` by a worker that died are handed out again after
+  ``stale_claim_s``, so delivery is at least once;
+* sent and failed rows are deleted after ``retention_days``.
+
+The event helpers (:func:`low_stock`, :func:`payment_pending`,
+:func:`application_status`, :func:`interview_scheduled`) look up the
+recipients and their addresses, fill the templates in :data:`TEMPLATES` and
+call :func:`enqueue`; none of them commit. Users without an e-mail address are
+skipped. With an empty ``smtp_host`` messages are queued but no worker runs;
+they go out once a server is configured.
+
+The worker runs inside the application for a local database and inside
+``db_service.py`` for terminals that use the database server. It can also be
+run on its own, e.g. against a local stand-in server (which offers neither
+TLS nor login, hence ``--no-starttls``)::
+
+    python -m aiosmtpd -n -l localhost:8025
+    python notifications.py --db cameroon_construction.db --smtp-host localhost --smtp-port 8025 --no-starttls --once
+
+or against a real server with ``--ssl`` or STARTTLS and ``--username`` (the
+password is asked for unless it is set in the configuration).
+
+Settings come from ``config.NOTIFICATIONS``.
+"""
+
+import argparse
+import random
+import smtplib
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+from email.message import EmailMessage
+from email.utils import formatdate, make_msgid
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+try:
+    from config import NOTIFICATIONS as SETTINGS
+except Exception:
+    SETTINGS = {'enabled': True, 'smtp_host': ''}
+
+EVENTS = ('low_stock', 'payment_pending', 'application_status', 'interview_scheduled')
+STATUSES = ('pending', 'sending', 'sent', 'failed')
+
+# (subject, body) per event, filled with NotificationUtils.format_notification_message
+TEMPLATES: Dict[str, Tuple[str, str]] = {
+    'low_stock': (
+        "Low stock: {material} at {store}",
+        "Hello {name},\n\n{material} at {store} is down to {quantity:g} {unit} "
+        "(reorder level {reorder_level:g}).\n\nPlease arrange a restock.\n",
+    ),
+    'payment_pending': (
+        "Payment of {amount} {currency} awaiting confirmation",
+        "Hello {name},\n\nA payment of {amount} {currency} ({reference}) for {subject} has been recorded "
+        "and is waiting for your confirmation.\n",
+    ),
+    'application_status': (
+        "Your application for {job}: {status}",
+        "Hello {name},\n\nThe status of your application for \"{job}\" is now: {status}.\n",
+    ),
+    'interview_scheduled': (
+        "Interview scheduled: {job}",
+        "Hello {name},\n\nAn interview for \"{job}\" has been scheduled on {when}.\n"
+        "Location: {location}\n\n{notes}\n",
+    ),
+}
+
+
+def _setting(key: str, default: Any) -> Any:
+    return SETTINGS.get(key, default)
+
+
+def _now() -> str:
+    return datetime.now().isoformat(sep=' ', timespec='seconds')
+
+
+def ensure_schema(conn: sqlite3.Connection) -> None:
+    """Create ``notification_queue`` (idempotent)."""
+    conn.execute(
+        '''
+        CREATE TABLE IF NOT EXISTS notification_queue
+        (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            event TEXT NOT NULL,
+            recipient_user_id INTEGER,
+            recipient_email TEXT NOT NULL,
+            subject TEXT NOT NULL,
+            body TEXT NOT NULL,
+            status TEXT NOT NULL DEFAULT 'pending',
+            attempts INTEGER NOT NULL DEFAULT 0,
+            next_attempt_at TEXT NOT NULL,
+            last_error TEXT,
+            claimed_by TEXT,
+            claimed_at TEXT,
+            dedup_key TEXT UNIQUE,
+            created_at TEXT NOT NULL,
+            sent_at TEXT
+        )
+        '''
+    )
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_notification_queue_due ON notification_queue(status, next_attempt_at)")
+
+
+# ---- queueing ----
+
+def enqueue(cur: sqlite3.Cursor, event: str, subject: str, body: str, user_id: Optional[int] = None,
+            email: Optional[str] = None, dedup_key: Optional[str] = None) -> Optional[int]:
+    """Queue one e-mail without committing; returns its id.
+
+    ``email`` defaults to the address of ``user_id``. None is returned (and
+    nothing queued) when notifications are disabled, the event is switched
+    off, there is no address, ``dedup_key`` was already queued, or the
+    database predates the queue.
+    """
+    events = _setting('events', None)
+    if not _setting('enabled', True) or (events is not None and event not in events):
+        return None
+    if not email and user_id is not None:
+        row = cur.execute("SELECT email FROM users WHERE id = ?", (user_id,)).fetchone()
+        email = row[0] if row else None
+    email = (email or '').strip()
+    if '@' not in email:
+        return None
+    now = _now()
+    try:
+        cur.execute(
+            "INSERT OR IGNORE INTO notification_queue (event, recipient_user_id, recipient_email, subject, body, "
+            "next_attempt_at, dedup_key, created_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (event, user_id, email, subject, body, now, dedup_key, now))
+    except sqlite3.OperationalError as e:
+        if 'no such table' in str(e):
+            return None
+        raise
+    return cur.lastrowid if cur.rowcount else None
+
+
+def _queue_event(cur: sqlite3.Cursor, event: str, user_ids: Iterable[Optional[int]], dedup_key: str,
+                 **values: Any) -> List[int]:
+    from utils import NotificationUtils
+    subject_t, body_t = TEMPLATES[event]
+    ids = []
+    for user_id in dict.fromkeys(u for u in user_ids if u):
+        row = cur.execute("SELECT COALESCE(full_name, username), email FROM users WHERE id = ?", (user_id,)).fetchone()
+        if not row:
+            continue
+        fields = dict(values, name=row[0] or '')
+        qid = enqueue(cur, event, NotificationUtils.format_notification_message(subject_t, **fields),
+                      NotificationUtils.format_notification_message(body_t, **fields),
+                      user_id=user_id, email=row[1], dedup_key=f"{dedup_key}:{user_id}")
+        if qid:
+            ids.append(qid)
+    return ids
+
+
+def low_stock(cur: sqlite3.Cursor, store_id: int, material_id: int, quantity: float,
+              reorder_level: float) -> List[int]:
+    """Tell the store's owner and manager that a material reached its reorder level."""
+    row = cur.execute(
+        "SELECT s.name, s.owner_id, s.manager_id, m.name, COALESCE(m.unit, '') FROM stores s, building_materials m "
+        "WHERE s.id = ? AND m.id = ?", (store_id, material_id)).fetchone()
+    if not row:
+        return []
+    store, owner_id, manager_id, material, unit = row
+    # One alert per drop below the level: the key changes with the time of the drop
+    return _queue_event(cur, 'low_stock', (owner_id, manager_id), f"low_stock:{store_id}:{material_id}:{_now()}",
+                        store=store, material=material, unit=unit, quantity=float(quantity or 0),
+                        reorder_level=float(reorder_level or 0))
+
+
+def payment_pending(cur: sqlite3.Cursor, kind: str, payment_id: int) -> List[int]:
+    """Tell whoever confirms a pending payment about it.
+
+    ``kind`` is ``'contract'`` (``contract_payments``: the contract owner
+    confirms) or ``'payment'`` (``payments``: the payee).
+    """
+    from money import CURRENCY_LABEL, FRANC_CODES, format_amount
+    if kind == 'contract':
+        row = cur.execute(
+            "SELECT cp.amount, COALESCE(cp.reference, ''), c.title, c.contract_owner_id, 'XAF' FROM contract_payments cp "
+            "JOIN contracts c ON c.id = cp.contract_id WHERE cp.id = ?", (payment_id,)).fetchone()
+        subject_prefix = 'contract '
+    else:
+        row = cur.execute("SELECT amount, COALESCE(reference, ''), COALESCE(purpose, ''), payee_id, "
+                          "COALESCE(currency, 'XAF') FROM payments WHERE id = ?", (payment_id,)).fetchone()
+        subject_prefix = ''
+    if not row:
+        return []
+    amount, reference, subject, recipient, currency = row
+    if currency.upper() in FRANC_CODES:
+        amount, currency = format_amount(amount), CURRENCY_LABEL
+    else:
+        # Payments in USD or EUR keep their cents
+        amount = f"{float(amount or 0):,.2f}"
+    return _queue_event(cur, 'payment_pending', (recipient,), f"payment_pending:{kind}:{payment_id}",
+                        amount=amount, currency=currency, reference=reference or 'no reference',
+                        subject=f"{subject_prefix}{subject}".strip() or 'a payment')
+
+
+def _application(cur: sqlite3.Cursor, application_id: int) -> Optional[Tuple[int, str]]:
+    return cur.execute("SELECT ja.applicant_id, j.title FROM job_applications ja JOIN jobs j ON j.id = ja.job_id "
+                       "WHERE ja.id = ?", (application_id,)).fetchone()
+
+
+def application_status(cur: sqlite3.Cursor, application_id: int, status: str) -> List[int]:
+    """Tell the applicant about a new status of their application (once per status)."""
+    row = _application(cur, application_id)
+    if not row:
+        return []
+    return _queue_event(cur, 'application_status', (row[0],), f"application_status:{application_id}:{status}",
+                        job=row[1], status=status)
+
+
+def interview_scheduled(cur: sqlite3.Cursor, application_id: int, when: str, location: str = '',
+                        notes: str = '') -> List[int]:
+    """Tell the applicant when and where their interview is (again if it is moved)."""
+    row = _application(cur, application_id)
+    if not row:
+        return []
+    return _queue_event(cur, 'interview_scheduled', (row[0],), f"interview_scheduled:{application_id}:{when}",
+                        job=row[1], when=when, location=location or 'to be confirmed', notes=notes)
+
+
+def queue_status(conn: sqlite3.Connection) -> Dict[str, int]:
+    """Number of rows per status."""
+    counts = dict.fromkeys(STATUSES, 0)
+    counts.update(conn.execute("SELECT status, COUNT(*) FROM notification_queue GROUP BY status").fetchall())
+    return counts
+
+
+# ---- sending ----
+
+_workers: List['NotificationWorker'] = []
+
+
+def wake() -> None:
+    """Have the workers of this process look at the queue now (call after committing queued rows)."""
+    for worker in list(_workers):
+        worker.wake()
+
+
+def smtp_connect(settings: Dict[str, Any]) -> smtplib.SMTP:
+    """Open an SMTP session as configured (SSL or STARTTLS, optional login)."""
+    host, timeout = settings.get('smtp_host'), float(settings.get('timeout_s', 30))
+    if settings.get('ssl'):
+        smtp = smtplib.SMTP_SSL(host, int(settings.get('smtp_port') or 465), timeout=timeout)
+    else:
+        smtp = smtplib.SMTP(host, int(settings.get('smtp_port') or 25), timeout=timeout)
+        if settings.get('starttls'):
+            smtp.starttls()
+    if settings.get('username'):
+        smtp.login(settings['username'], settings.get('password') or '')
+    return smtp
+
+
+class _TokenBucket:
+    def __init__(self, per_minute: float, burst: int):
+        self.rate = max(per_minute, 0.001) / 60.0
+        self.capacity = max(1, burst)
+        self.tokens = float(self.capacity)
+        self.stamp = time.monotonic()
+
+    def wait_time(self) -> float:
+        """Seconds until a token is available (0 = take one now)."""
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.stamp) * self.rate)
+        self.stamp = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+
+class NotificationWorker:
+    """Sends queued notifications from a background thread.
+
+    Args:
+        connect: Returns a new connection to the database holding the queue.
+        settings: Overrides for ``config.NOTIFICATIONS``.
+        smtp_factory: Opens an SMTP session from the settings (default :func:`smtp_connect`).
+    """
+
+    def __init__(self, connect: Callable[[], sqlite3.Connection], settings: Optional[Dict[str, Any]] = None,
+                 smtp_factory: Optional[Callable[[Dict[str, Any]], smtplib.SMTP]] = None):
+        self.connect = connect
+        self.settings = dict(SETTINGS, **(settings or {}))
+        self.smtp_factory = smtp_factory or smtp_connect
+        self.token = f"{socket.gethostname()}:{uuid.uuid4().hex[:8]}"
+        self.bucket = _TokenBucket(float(self.settings.get('rate_per_minute', 60)),
+                                   int(self.settings.get('batch_size', 20)))
+        self.sent = self.failed = self.retried = 0
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._last_prune = 0.0
+
+    @property
+    def configured(self) -> bool:
+        return bool(self.settings.get('enabled', True) and self.settings.get('smtp_host'))
+
+    def start(self) -> bool:
+        """Start the sending thread; False when there is no SMTP server to send to."""
+        if not self.configured or (self._thread is not None and self._thread.is_alive()):
+            return False
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name='notifications', daemon=True)
+        self._thread.start()
+        _workers.append(self)
+        return True
+
+    def stop(self, timeout: float = 5.0) -> None:
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        if self in _workers:
+            _workers.remove(self)
+
+    def wake(self) -> None:
+        self._wake.set()
+
+    def _loop(self) -> None:
+        poll = float(self.settings.get('poll_interval_s', 15))
+        while not self._stop.is_set():
+            try:
+                busy = self.run_once() > 0
+            except Exception as e:
+                print(f"[WARN] notification sending failed: {e}")
+                busy = False
+            if not busy:
+                self._wake.wait(poll)
+                self._wake.clear()
+
+    # ---- one pass ----
+    def run_once(self) -> int:
+        """Claim and send one batch; returns the number of rows handled (sent, retried or failed)."""
+        conn = self.connect()
+        try:
+            self._release_stale(conn)
+            self._prune(conn)
+            batch = self._claim(conn)
+            if batch:
+                self._send_batch(conn, batch)
+            return len(batch)
+        finally:
+            conn.close()
+
+    def _release_stale(self, conn: sqlite3.Connection) -> None:
+        cutoff = (datetime.now() - timedelta(seconds=float(self.settings.get('stale_claim_s', 600))))
+        conn.execute("UPDATE notification_queue SET status = 'pending', claimed_by = NULL WHERE status = 'sending' "
+                     "AND claimed_at < ?", (cutoff.isoformat(sep=' ', timespec='seconds'),))
+        conn.commit()
+
+    def _prune(self, conn: sqlite3.Connection) -> None:
+        if time.monotonic() - self._last_prune < 3600:
+            return
+        self._last_prune = time.monotonic()
+        cutoff = datetime.now() - timedelta(days=float(self.settings.get('retention_days', 30)))
+        conn.execute("DELETE FROM notification_queue WHERE status IN ('sent', 'failed') AND created_at < ?",
+                     (cutoff.isoformat(sep=' ', timespec='seconds'),))
+        conn.commit()
+
+    def _claim(self, conn: sqlite3.Connection) -> List[Tuple]:
+        now = _now()
+        # A single UPDATE, so two workers on the same database never claim the same row
+        conn.execute(
+            "UPDATE notification_queue SET status = 'sending', claimed_by = ?, claimed_at = ? WHERE id IN "
+            "(SELECT id FROM notification_queue WHERE status = 'pending' AND next_attempt_at <= ? "
+            "ORDER BY next_attempt_at, id LIMIT ?)",
+            (self.token, now, now, int(self.settings.get('batch_size', 20))))
+        conn.commit()
+        return conn.execute("SELECT id, recipient_email, subject, body, attempts FROM notification_queue "
+                            "WHERE status = 'sending' AND claimed_by = ? ORDER BY id", (self.token,)).fetchall()
+
+    def _message(self, email: str, subject: str, body: str) -> EmailMessage:
+        msg = EmailMessage()
+        sender = self.settings.get('from_address') or 'noreply@localhost'
+        msg['From'] = sender
+        msg['To'] = email
+        msg['Subject'] = subject
+        msg['Date'] = formatdate(localtime=True)
+        msg['Message-ID'] = make_msgid(domain=sender.rpartition('@')[2] or None)
+        msg.set_content(body)
+        return msg
+
+    def _send_batch(self, conn: sqlite3.Connection, batch: Sequence[Tuple]) -> None:
+        smtp = None
+        try:
+            for i, (qid, email, subject, body, attempts) in enumerate(batch):
+                delay = self.bucket.wait_time()
+                while delay > 0 and not self._stop.wait(delay):
+                    delay = self.bucket.wait_time()
+                if self._stop.is_set():
+                    self._release(conn, [row[0] for row in batch[i:]])
+                    return
+                try:
+                    if smtp is None:
+                        smtp = self.smtp_factory(self.settings)
+                    smtp.send_message(self._message(email, subject, body))
+                except smtplib.SMTPRecipientsRefused as e:
+                    # Raised for temporary (4xx) refusals as well
+                    codes = [code for code, _ in e.recipients.values()]
+                    self._failed(conn, qid, attempts, e, permanent=all(code >= 500 for code in codes))
+                except smtplib.SMTPResponseException as e:
+                    self._failed(conn, qid, attempts, e, permanent=500 <= e.smtp_code < 600)
+                except (smtplib.SMTPException, OSError) as e:
+                    # Connection trouble: this row and the rest of the batch wait for the next attempt
+                    for row in batch[i:]:
+                        self._failed(conn, row[0], row[4], e, permanent=False)
+                    smtp = None
+                    return
+                else:
+                    conn.execute("UPDATE notification_queue SET status = 'sent', attempts = attempts + 1, "
+                                 "sent_at = ?, last_error = NULL, claimed_by = NULL WHERE id = ?", (_now(), qid))
+                    conn.commit()
+                    self.sent += 1
+        finally:
+            if smtp is not None:
+                try:
+                    smtp.quit()
+                except Exception:
+                    pass
+
+    def _release(self, conn: sqlite3.Connection, ids: Sequence[int]) -> None:
+        conn.executemany("UPDATE notification_queue SET status = 'pending', claimed_by = NULL WHERE id = ?",
+                         [(i,) for i in ids])
+        conn.commit()
+
+    def backoff(self, attempts: int) -> float:
+        """Seconds before retry number ``attempts``: doubling from ``backoff_base_s``, capped, with jitter."""
+        base = float(self.settings.get('backoff_base_s', 30))
+        delay = min(float(self.settings.get('backoff_max_s', 3600)), base * (2 ** max(0, attempts - 1)))
+        return delay * random.uniform(0.5, 1.0)
+
+    def _failed(self, conn: sqlite3.Connection, qid: int, attempts: int, error: Exception, permanent: bool) -> None:
+        attempts += 1
+        message = str(error)[:500] or type(error).__name__
+        if permanent or attempts >= int(self.settings.get('max_attempts', 8)):
+            conn.execute("UPDATE notification_queue SET status = 'failed', attempts = ?, last_error = ?, "
+                         "claimed_by = NULL WHERE id = ?", (attempts, message, qid))
+            self.failed += 1
+        else:
+            retry_at = datetime.now() + timedelta(seconds=self.backoff(attempts))
+            conn.execute("UPDATE notification_queue SET status = 'pending', attempts = ?, last_error = ?, "
+                         "next_attempt_at = ?, claimed_by = NULL WHERE id = ?",
+                         (attempts, message, retry_at.isoformat(sep=' ', timespec='seconds'), qid))
+            self.retried += 1
+        conn.commit()
+
+
+def main() -> int:
+    from config import DATABASE_NAME
+    parser = argparse.ArgumentParser(description="Send the queued CBPM notification e-mails.")
+    parser.add_argument('--db', default=DATABASE_NAME, help='SQLite database file holding the queue')
+    parser.add_argument('--smtp-host', default=_setting('smtp_host', ''), help='SMTP server')
+    parser.add_argument('--smtp-port', type=int, default=int(_setting('smtp_port', 25)), help='SMTP port')
+    parser.add_argument('--starttls', dest='starttls', action='store_true', help='Upgrade the connection with STARTTLS')
+    parser.add_argument('--no-starttls', dest='starttls', action='store_false', help='Send without STARTTLS')
+    parser.add_argument('--ssl', action='store_true', default=bool(_setting('ssl', False)),
+                        help='Connect over SSL (usually port 465) instead of STARTTLS')
+    parser.add_argument('--username', default=_setting('username', ''), help='SMTP login (none when empty)')
+    parser.add_argument('--once', action='store_true', help='Send what is due and exit')
+    parser.add_argument('--status', action='store_true', help='Print the queue counts and exit')
+    parser.set_defaults(starttls=bool(_setting('starttls', False)))
+    args = parser.parse_args()
+
+    def connect() -> sqlite3.Connection:
+        return sqlite3.connect(args.db, timeout=30)
+
+    conn = connect()
+    try:
+        ensure_schema(conn)
+        if args.status:
+            for status, count in queue_status(conn).items():
+                print(f"{status:8s} {count}")
+            return 0
+    finally:
+        conn.close()
+    if not args.smtp_host:
+        parser.error("no SMTP server: pass --smtp-host or set NOTIFICATIONS['smtp_host'] in config.py")
+    password = _setting('password', '')
+    if args.username and not (password and args.username == _setting('username', '')):
+        import getpass
+        password = getpass.getpass(f"SMTP password for {args.username}: ")
+    worker = NotificationWorker(connect, {'smtp_host': args.smtp_host, 'smtp_port': args.smtp_port,
+                                          'starttls': args.starttls, 'ssl': args.ssl,
+                                          'username': args.username, 'password': password})
+    if args.once:
+        while worker.run_once():
+            pass
+        print(f"sent {worker.sent}, retrying {worker.retried}, failed {worker.failed}")
+        return 0
+    worker.start()
+    print(f"Sending notifications from {args.db} through {args.smtp_host}:{args.smtp_port} (Ctrl+C to stop)")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        worker.stop()
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
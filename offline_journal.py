@@ -0,0 +1,389 @@
+"""
+Offline operation journal
+
+Stock-changing writes (sales, transfers, payments, inventory adjustments) are
+recorded as operations in a journal file kept beside the database, before they
+are applied anywhere. The journal is a separate SQLite file, so
+``sync_from_cloud`` replacing the database leaves it intact. Each operation
+carries an ``op_id`` (its idempotency key), the terminal that made it, a
+per-terminal sequence number and the time it happened.
+
+:func:`apply_operations` applies a batch in one transaction on the
+authoritative store, each operation inside its own SAVEPOINT, and records it
+in ``applied_operations``. An operation already listed there is reported as
+``duplicate`` and not applied again, so replaying after a crash or a timeout
+is safe. The same function runs on the local file and, for remote terminals,
+on the database service (``POST /replay``).
+
+:meth:`OfflineJournal.replay` sends every operation not yet known to be in the
+authoritative store. Local mode replays into a freshly downloaded cloud copy;
+remote mode replays to the server once it is reachable again. The result is a
+report of the outcomes.
+
+Conflict rules (deterministic: a batch is applied in ``created_at``, terminal,
+sequence order, so earlier operations draw on stock first):
+
+* sale - always recorded, since the goods have left the shop. Stock is floored
+  at zero; a shortfall makes the outcome ``adjusted`` with the missing quantity.
+* transfer - all or nothing. An unknown material or insufficient stock at the
+  source rejects the whole transfer, the same rule as online.
+* payment - rejected if the reference already exists or the payee is unknown.
+* adjustment - applied as a delta (so concurrent counts on different tills add
+  up). A result below zero is floored at zero and reported as ``adjusted``. An
+  adjustment for a stock line that does not exist is rejected.
+
+Settings come from ``config.OFFLINE_JOURNAL``.
+"""
+
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+try:
+    from config import OFFLINE_JOURNAL as SETTINGS
+except Exception:
+    SETTINGS = {'batch_size': 500}
+
+KINDS = ('sale', 'transfer', 'payment', 'adjustment')
+FINAL_STATUSES = ('applied', 'adjusted', 'duplicate', 'rejected')
+
+
+class OperationRejected(ValueError):
+    """An operation broke a conflict rule; it is recorded as ``rejected`` and nothing of it is written."""
+
+
+def terminal_id() -> str:
+    return str(SETTINGS.get('terminal_id') or socket.gethostname() or 'terminal')
+
+
+def replay_order(op: Dict[str, Any]) -> Tuple[str, str, int]:
+    return op['created_at'], op['terminal_id'], int(op.get('seq') or 0)
+
+
+# ---- authoritative side ----
+
+def ensure_schema(conn: sqlite3.Connection) -> None:
+    """Create the ledger of operations applied to this database."""
+    conn.execute(
+        '''
+        CREATE TABLE IF NOT EXISTS applied_operations
+        (
+            op_id TEXT PRIMARY KEY,
+            terminal_id TEXT NOT NULL,
+            seq INTEGER,
+            kind TEXT NOT NULL,
+            created_at TEXT NOT NULL,
+            applied_at TEXT NOT NULL,
+            status TEXT NOT NULL,
+            detail TEXT
+        ) WITHOUT ROWID
+        '''
+    )
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_applied_operations_applied ON applied_operations(applied_at)")
+
+
+def _apply_sale(cur: sqlite3.Cursor, op: Dict[str, Any]) -> Tuple[str, str, Any]:
+    from queries import apply_sale
+    p = op['payload']
+    total, shortfall = apply_sale(cur, p['store_id'], p['material_id'], float(p['quantity']),
+                                  float(p['unit_price']), op.get('user_id'), p.get('customer_name') or '',
+                                  datetime.fromisoformat(op['created_at']))
+    if shortfall > 0:
+        return 'adjusted', f"sold {shortfall:g} more than in stock; stock set to 0", total
+    return 'applied', '', total
+
+
+def _apply_transfer(cur: sqlite3.Cursor, op: Dict[str, Any]) -> Tuple[str, str, Any]:
+    from queries import apply_transfer
+    p = op['payload']
+    try:
+        result = apply_transfer(cur, p['source_id'], p['dest_id'], p['items'], p['reference'], op.get('user_id'),
+                                p.get('signature_name') or '', datetime.fromisoformat(op['created_at']))
+    except ValueError as e:
+        raise OperationRejected(str(e)) from e
+    return 'applied', '', list(result)
+
+
+def _apply_payment(cur: sqlite3.Cursor, op: Dict[str, Any]) -> Tuple[str, str, Any]:
+    from money import payment_amount
+    p = op['payload']
+    if cur.execute("SELECT 1 FROM users WHERE id = ?", (p['payee_id'],)).fetchone() is None:
+        raise OperationRejected(f"payee {p['payee_id']} does not exist")
+    if cur.execute("SELECT 1 FROM payments WHERE reference = ?", (p['reference'],)).fetchone():
+        raise OperationRejected(f"payment reference {p['reference']} already exists")
+    cur.execute(
+        """
+        INSERT INTO payments (
+            reference, payer_id, payee_id, store_id, amount, currency, method, purpose,
+            status, created_at, meta, require_receipt, receipt_printed,
+            payer_account, method_account, link_type, link_id
+        )
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, 'Pending', ?, ?, ?, 0, ?, ?, ?, ?)
+        """,
+        (p['reference'], op.get('user_id'), p['payee_id'], p.get('store_id'),
+         payment_amount(p['amount'], p.get('currency')), p.get('currency'),
+         p.get('method'), p.get('purpose'), op['created_at'], json.dumps(p.get('meta') or {}),
+         int(p.get('require_receipt') or 0), p.get('payer_account'), p.get('method_account'),
+         p.get('link_type'), p.get('link_id'))
+    )
+    payment_id = cur.lastrowid
+    from notifications import payment_pending
+    payment_pending(cur, 'payment', payment_id)
+    return 'applied', '', payment_id
+
+
+def _apply_adjustment(cur: sqlite3.Cursor, op: Dict[str, Any]) -> Tuple[str, str, Any]:
+    p = op['payload']
+    row = cur.execute("SELECT id, quantity FROM inventory WHERE store_id = ? AND material_id = ?",
+                      (p['store_id'], p['material_id'])).fetchone()
+    if row is None:
+        raise OperationRejected(f"no stock line for material {p['material_id']} in store {p['store_id']}")
+    inventory_id, on_hand = row
+    wanted = float(on_hand or 0) + float(p['delta'])
+    cur.execute("UPDATE inventory SET quantity = ?, last_updated = ? WHERE id = ?",
+                (max(0.0, wanted), op['created_at'], inventory_id))
+    if wanted < 0:
+        return 'adjusted', f"stock would have been {wanted:g}; set to 0", 0.0
+    return 'applied', '', wanted
+
+
+APPLIERS: Dict[str, Callable[[sqlite3.Cursor, Dict[str, Any]], Tuple[str, str, Any]]] = {
+    'sale': _apply_sale,
+    'transfer': _apply_transfer,
+    'payment': _apply_payment,
+    'adjustment': _apply_adjustment,
+}
+
+
+def apply_operations(conn: sqlite3.Connection, ops: Sequence[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Apply ``ops`` on the authoritative database in one transaction.
+
+    Returns:
+        List: One ``{op_id, status, detail, result}`` per operation, in replay order.
+
+    Raises:
+        sqlite3.Error: When the batch as a whole fails (e.g. the database is locked); nothing is written.
+    """
+    ordered = sorted(ops, key=replay_order)
+    outcomes = []
+    applied_at = datetime.now().isoformat(sep=' ')
+    cur = conn.cursor()
+    cur.execute("BEGIN IMMEDIATE")
+    try:
+        done: Dict[str, Tuple[str, str]] = {}
+        ids = [op['op_id'] for op in ordered]
+        for start in range(0, len(ids), 500):
+            chunk = ids[start:start + 500]
+            cur.execute(f"SELECT op_id, status, detail FROM applied_operations WHERE op_id IN "
+                        f"({','.join('?' * len(chunk))})", chunk)
+            done.update((op_id, (status, detail)) for op_id, status, detail in cur.fetchall())
+        ledger = []
+        for op in ordered:
+            if op['op_id'] in done:
+                status, detail = done[op['op_id']]
+                outcomes.append({'op_id': op['op_id'], 'status': 'duplicate',
+                                 'detail': f"already {status}" + (f": {detail}" if detail else ''), 'result': None})
+                continue
+            cur.execute("SAVEPOINT op")
+            try:
+                applier = APPLIERS.get(op['kind'])
+                if applier is None:
+                    raise OperationRejected(f"unknown operation kind {op['kind']!r}")
+                status, detail, result = applier(cur, op)
+                cur.execute("RELEASE op")
+            except (OperationRejected, sqlite3.IntegrityError, KeyError, TypeError) as e:
+                cur.execute("ROLLBACK TO op")
+                cur.execute("RELEASE op")
+                status, detail, result = 'rejected', str(e) if not isinstance(e, KeyError) else f"missing {e}", None
+            done[op['op_id']] = (status, detail)
+            ledger.append((op['op_id'], op['terminal_id'], op.get('seq'), op['kind'], op['created_at'],
+                           applied_at, status, detail))
+            outcomes.append({'op_id': op['op_id'], 'status': status, 'detail': detail, 'result': result})
+        cur.executemany("INSERT INTO applied_operations (op_id, terminal_id, seq, kind, created_at, applied_at, "
+                        "status, detail) VALUES (?, ?, ?, ?, ?, ?, ?, ?)", ledger)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    from notifications import wake
+    wake()   # stock alerts and pending payments queued by the operations
+    return outcomes
+
+
+# ---- terminal side ----
+
+class OfflineJournal:
+    """Durable list of this terminal's operations and what became of them.
+
+    Args:
+        path: Journal file (``<database>.journal.db`` by default, see ``DatabaseManager``).
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.terminal_id = terminal_id()
+        self.last_report: Optional[Dict[str, Any]] = None
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(path, timeout=5, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            '''
+            CREATE TABLE IF NOT EXISTS journal_operations
+            (
+                seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                op_id TEXT UNIQUE NOT NULL,
+                kind TEXT NOT NULL,
+                created_at TEXT NOT NULL,
+                user_id INTEGER,
+                payload TEXT NOT NULL,
+                status TEXT NOT NULL DEFAULT 'pending',
+                detail TEXT,
+                confirmed INTEGER NOT NULL DEFAULT 0,
+                replayed_at TEXT
+            )
+            '''
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_journal_unconfirmed ON journal_operations(confirmed, seq)")
+        self._conn.commit()
+
+    def close(self) -> None:
+        self._conn.close()
+
+    def _op(self, row: tuple) -> Dict[str, Any]:
+        seq, op_id, kind, created_at, user_id, payload = row
+        return {'op_id': op_id, 'terminal_id': self.terminal_id, 'seq': seq, 'kind': kind,
+                'created_at': created_at, 'user_id': user_id, 'payload': json.loads(payload)}
+
+    def record(self, kind: str, payload: Dict[str, Any], user_id: Optional[int] = None) -> Dict[str, Any]:
+        """Append a pending operation and return it."""
+        if kind not in KINDS:
+            raise ValueError(f"Unknown operation kind: {kind}")
+        op_id = uuid.uuid4().hex
+        created_at = datetime.now().isoformat(sep=' ')
+        with self._lock:
+            cur = self._conn.execute(
+                "INSERT INTO journal_operations (op_id, kind, created_at, user_id, payload) VALUES (?, ?, ?, ?, ?)",
+                (op_id, kind, created_at, user_id, json.dumps(payload, default=str)))
+            self._conn.commit()
+            seq = cur.lastrowid
+        return {'op_id': op_id, 'terminal_id': self.terminal_id, 'seq': seq, 'kind': kind,
+                'created_at': created_at, 'user_id': user_id, 'payload': payload}
+
+    def unsent(self, limit: int, after_seq: int = 0) -> List[Dict[str, Any]]:
+        """Operations not known to be in the authoritative store, oldest first."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT seq, op_id, kind, created_at, user_id, payload FROM journal_operations "
+                "WHERE confirmed = 0 AND status != 'rejected' AND seq > ? ORDER BY seq LIMIT ?",
+                (after_seq, limit)).fetchall()
+        return [self._op(r) for r in rows]
+
+    def mark(self, outcomes: Sequence[Dict[str, Any]], shared: bool) -> None:
+        """Store outcomes. ``shared``: they came from the shared store, not a local copy that may be replaced.
+
+        In a local copy only ``duplicate`` confirms an operation: the copy came from the shared file and
+        already held it.
+        """
+        now = datetime.now().isoformat(sep=' ')
+        rows = []
+        for o in outcomes:
+            confirmed = 1 if shared or o['status'] in ('duplicate', 'rejected') else 0
+            if o['status'] == 'duplicate':
+                # Keep the original outcome; only note that the store already has it
+                rows.append((None, None, confirmed, now, o['op_id']))
+            else:
+                rows.append((o['status'], o.get('detail') or None, confirmed, now, o['op_id']))
+        with self._lock:
+            self._conn.executemany(
+                "UPDATE journal_operations SET status = COALESCE(?, CASE status WHEN 'pending' THEN 'duplicate' "
+                "ELSE status END), detail = COALESCE(?, detail), confirmed = ?, replayed_at = ? WHERE op_id = ?",
+                rows)
+            self._conn.commit()
+
+    def replay(self, apply_batch: Callable[[List[Dict[str, Any]]], List[Dict[str, Any]]], shared: bool,
+               batch_size: Optional[int] = None) -> Dict[str, Any]:
+        """Send unsent operations in batches through ``apply_batch``; returns an outcome report.
+
+        Stops at the first batch that fails as a whole (e.g. connectivity lost) and reports the error;
+        the operations stay unsent and go out with the next replay.
+        """
+        batch_size = int(batch_size or SETTINGS.get('batch_size', 500))
+        report: Dict[str, Any] = {'started': datetime.now(), 'sent': 0, 'batches': 0, 'error': None,
+                                  'counts': {s: 0 for s in FINAL_STATUSES}, 'problems': []}
+        t0 = time.perf_counter()
+        after = 0
+        while True:
+            ops = self.unsent(batch_size, after)
+            if not ops:
+                break
+            after = ops[-1]['seq']
+            try:
+                outcomes = apply_batch(ops)
+            except Exception as e:
+                report['error'] = str(e)
+                break
+            self.mark(outcomes, shared)
+            report['sent'] += len(ops)
+            report['batches'] += 1
+            by_id = {op['op_id']: op for op in ops}
+            for o in outcomes:
+                report['counts'][o['status']] = report['counts'].get(o['status'], 0) + 1
+                if o['status'] in ('adjusted', 'rejected'):
+                    op = by_id.get(o['op_id'], {})
+                    report['problems'].append((op.get('seq'), op.get('kind'), o['status'], o.get('detail') or ''))
+        report['elapsed'] = time.perf_counter() - t0
+        report['ops_per_s'] = report['sent'] / report['elapsed'] if report['elapsed'] > 0 else 0.0
+        self.last_report = report
+        return report
+
+    def counts(self) -> Dict[str, int]:
+        """Operations per status, plus ``unsent`` (not yet known to be in the authoritative store)."""
+        with self._lock:
+            out = dict(self._conn.execute("SELECT status, COUNT(*) FROM journal_operations GROUP BY status"))
+            out['unsent'] = self._conn.execute(
+                "SELECT COUNT(*) FROM journal_operations WHERE confirmed = 0 AND status != 'rejected'").fetchone()[0]
+        return out
+
+    def recent(self, limit: int = 200) -> List[tuple]:
+        """``(seq, kind, created_at, status, confirmed, detail, replayed_at)``, newest first."""
+        with self._lock:
+            return self._conn.execute(
+                "SELECT seq, kind, created_at, status, confirmed, detail, replayed_at FROM journal_operations "
+                "ORDER BY seq DESC LIMIT ?", (limit,)).fetchall()
+
+    def prune(self, retention_days: Optional[int] = None) -> int:
+        """Delete confirmed operations older than ``retention_days``; returns how many."""
+        days = int(retention_days if retention_days is not None else SETTINGS.get('retention_days', 90))
+        cutoff = (datetime.now() - timedelta(days=days)).isoformat(sep=' ')
+        with self._lock:
+            cur = self._conn.execute("DELETE FROM journal_operations WHERE confirmed = 1 AND created_at < ?",
+                                     (cutoff,))
+            self._conn.commit()
+        return cur.rowcount
+
+
+def default_path(db_path: str) -> str:
+    return SETTINGS.get('path') or os.path.splitext(os.path.abspath(db_path))[0] + '.journal.db'
+
+
+def format_report(report: Dict[str, Any]) -> str:
+    """Human-readable summary of an :meth:`OfflineJournal.replay` report."""
+    counts = report['counts']
+    lines = [f"Replayed {report['sent']} operation(s) in {report['batches']} batch(es)",
+             f"Applied: {counts.get('applied', 0)}    Adjusted: {counts.get('adjusted', 0)}    "
+             f"Already applied: {counts.get('duplicate', 0)}    Rejected: {counts.get('rejected', 0)}",
+             f"Time: {report['elapsed']:.2f}s ({report['ops_per_s']:,.0f} ops/s)"]
+    if report.get('error'):
+        lines.append(f"Stopped: {report['error']} (remaining operations will be sent on the next replay)")
+    if report.get('problems'):
+        lines.append("")
+        lines.append("Needs review:")
+        lines.extend(f"  #{seq} {kind} {status}: {detail}" for seq, kind, status, detail in report['problems'][:50])
+    return "\n".join(lines)
@@ -0,0 +1,340 @@
+"""
+Per-store price book
+
+A material's selling price comes from three places: the store's
+``inventory.unit_price``, the price typed into the store's last sale of it,
+and the catalogue ``building_materials.standard_price``. Screens used to work
+this out with their own LEFT JOINs, each slightly differently. The effective
+price is now kept, already resolved, in ``store_prices``
+(``(store_id, material_id) -> price, source``), with ``source`` one of:
+
+* ``store`` - the inventory line has a price;
+* ``sale`` - no inventory price, so the last sale price in that store;
+* ``standard`` - neither, so the catalogue price.
+
+Triggers keep the table in step with the inventory, sales and catalogue
+price changes, in the same statement, and bump
+``price_book_state.generation``. :class:`PriceBook` is the in-memory side: a
+dict per store, loaded with one query on first use, so a price lookup on the
+sale path is a dict access. The cache is dropped when the generation has
+moved, which is checked at most every ``recheck_s`` seconds.
+Pairs without a row (a store that never stocked or sold the material) fall
+back to the catalogue price.
+
+:func:`bulk_change` applies a price change to many inventory lines (e.g. +5%
+on Cement in every Douala store) as one ``UPDATE``; :func:`preview_change`
+shows what it would do first.
+
+Settings come from ``config.PRICE_BOOK``.
+"""
+
+import threading
+import time
+import sqlite3
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from money import Amount, to_amount
+
+try:
+    from config import PRICE_BOOK as SETTINGS
+except Exception:
+    SETTINGS = {'recheck_s': 2}
+
+SOURCES = ('store', 'sale', 'standard')
+
+_BUMP = "UPDATE price_book_state SET generation = generation + 1 WHERE id = 1;"
+
+_UPSERT = '''
+    INSERT INTO store_prices (store_id, material_id, price, source, updated_at)
+    {select}
+    ON CONFLICT(store_id, material_id) DO UPDATE SET
+        price = excluded.price, source = excluded.source, updated_at = excluded.updated_at;
+'''
+
+# Price of a pair without an inventory price: last sale, else the catalogue ({s}, {m}: store and material ids)
+_FALLBACK_SELECT = '''
+    SELECT {s}, {m}, CAST(ROUND(COALESCE(sale, std)) AS INTEGER),
+           CASE WHEN sale IS NOT NULL THEN 'sale' ELSE 'standard' END, datetime('now', 'localtime')
+    FROM (SELECT (SELECT t.unit_price FROM transactions t
+                  WHERE t.store_id = {s} AND t.material_id = {m} AND t.transaction_type = 'sale' AND t.unit_price > 0
+                  ORDER BY t.id DESC LIMIT 1) AS sale,
+                 (SELECT standard_price FROM building_materials WHERE id = {m}) AS std)
+    WHERE COALESCE(sale, std) IS NOT NULL'''
+
+_STORE_SELECT = ("SELECT {s}, {m}, CAST(ROUND({p}) AS INTEGER), 'store', datetime('now', 'localtime') "
+                 "WHERE {p} > 0")
+
+
+def _store(s: str, m: str, p: str) -> str:
+    return _UPSERT.format(select=_STORE_SELECT.format(s=s, m=m, p=p))
+
+
+def _fallback(s: str, m: str, when: str = '1') -> str:
+    return _UPSERT.format(select=_FALLBACK_SELECT.format(s=s, m=m) + f' AND {when}')
+
+
+_NO_PRICE = 'COALESCE(NEW.unit_price, 0) <= 0'
+_MOVED = '(OLD.store_id IS NOT NEW.store_id OR OLD.material_id IS NOT NEW.material_id)'
+
+TRIGGERS = {
+    'pb_inventory_insert': f'''
+        CREATE TRIGGER pb_inventory_insert AFTER INSERT ON inventory
+        BEGIN
+            {_store('NEW.store_id', 'NEW.material_id', 'NEW.unit_price')}
+            {_fallback('NEW.store_id', 'NEW.material_id', _NO_PRICE)}
+            {_BUMP}
+        END''',
+    'pb_inventory_update': f'''
+        CREATE TRIGGER pb_inventory_update AFTER UPDATE OF unit_price, store_id, material_id ON inventory
+        BEGIN
+            DELETE FROM store_prices WHERE store_id = OLD.store_id AND material_id = OLD.material_id AND {_MOVED};
+            {_fallback('OLD.store_id', 'OLD.material_id', _MOVED)}
+            {_store('NEW.store_id', 'NEW.material_id', 'NEW.unit_price')}
+            {_fallback('NEW.store_id', 'NEW.material_id', _NO_PRICE)}
+            {_BUMP}
+        END''',
+    'pb_inventory_delete': f'''
+        CREATE TRIGGER pb_inventory_delete AFTER DELETE ON inventory
+        BEGIN
+            {_fallback('OLD.store_id', 'OLD.material_id')}
+            {_BUMP}
+        END''',
+    # A sale only matters where the store has no inventory price of its own
+    'pb_sale_insert': f'''
+        CREATE TRIGGER pb_sale_insert AFTER INSERT ON transactions
+        WHEN NEW.transaction_type = 'sale' AND NEW.unit_price > 0
+             AND (SELECT source FROM store_prices WHERE store_id = NEW.store_id AND material_id = NEW.material_id)
+                 IS NOT 'store'
+        BEGIN
+            {_UPSERT.format(select="SELECT NEW.store_id, NEW.material_id, CAST(ROUND(NEW.unit_price) AS INTEGER), "
+                                   "'sale', datetime('now', 'localtime') WHERE 1")}
+            {_BUMP}
+        END''',
+    'pb_material_price': f'''
+        CREATE TRIGGER pb_material_price AFTER UPDATE OF standard_price ON building_materials
+        BEGIN
+            DELETE FROM store_prices WHERE material_id = NEW.id AND source = 'standard' AND NEW.standard_price IS NULL;
+            UPDATE store_prices SET price = CAST(ROUND(NEW.standard_price) AS INTEGER),
+                                    updated_at = datetime('now', 'localtime')
+            WHERE material_id = NEW.id AND source = 'standard' AND NEW.standard_price IS NOT NULL;
+            {_BUMP}
+        END''',
+    'pb_material_delete': f'''
+        CREATE TRIGGER pb_material_delete AFTER DELETE ON building_materials
+        BEGIN
+            DELETE FROM store_prices WHERE material_id = OLD.id;
+            {_BUMP}
+        END''',
+    'pb_store_delete': f'''
+        CREATE TRIGGER pb_store_delete AFTER DELETE ON stores
+        BEGIN
+            DELETE FROM store_prices WHERE store_id = OLD.id;
+            {_BUMP}
+        END''',
+}
+
+
+def ensure_schema(conn: sqlite3.Connection) -> bool:
+    """Create ``store_prices``, its triggers and state (idempotent); True if the table was filled now.
+
+    The table is filled once, when the state row is first created; the triggers keep it current after that.
+    """
+    cur = conn.cursor()
+    cur.execute('''
+                CREATE TABLE IF NOT EXISTS store_prices
+                (
+                    store_id INTEGER NOT NULL,
+                    material_id INTEGER NOT NULL,
+                    price INTEGER NOT NULL,
+                    source TEXT NOT NULL,
+                    updated_at TEXT,
+                    PRIMARY KEY (store_id, material_id)
+                ) WITHOUT ROWID
+                ''')
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_store_prices_material ON store_prices(material_id, source)")
+    cur.execute("CREATE TABLE IF NOT EXISTS price_book_state (id INTEGER PRIMARY KEY CHECK (id = 1), "
+                "generation INTEGER NOT NULL DEFAULT 0)")
+    created = cur.execute("INSERT OR IGNORE INTO price_book_state (id, generation) VALUES (1, 0)").rowcount == 1
+    existing = {r[0] for r in cur.execute("SELECT name FROM sqlite_master WHERE type = 'trigger' AND name LIKE 'pb_%'")}
+    for name, sql in TRIGGERS.items():
+        if name not in existing:
+            cur.execute(sql)
+    if not created:
+        return False
+    rebuild(conn)
+    return True
+
+
+def rebuild(conn: sqlite3.Connection) -> int:
+    """Recompute every row (first run and repair); returns the number of rows."""
+    cur = conn.cursor()
+    cur.execute("DELETE FROM store_prices")
+    cur.execute("INSERT INTO store_prices (store_id, material_id, price, source, updated_at) "
+                "SELECT store_id, material_id, CAST(ROUND(unit_price) AS INTEGER), 'store', datetime('now', 'localtime') "
+                "FROM inventory WHERE unit_price > 0")
+    # Last sale of each pair in one pass over the sales, rather than one lookup per pair
+    cur.execute("INSERT OR IGNORE INTO store_prices (store_id, material_id, price, source, updated_at) "
+                "SELECT store_id, material_id, CAST(ROUND(unit_price) AS INTEGER), 'sale', datetime('now', 'localtime') "
+                "FROM transactions WHERE id IN (SELECT MAX(id) FROM transactions WHERE transaction_type = 'sale' "
+                "AND unit_price > 0 GROUP BY store_id, material_id)")
+    cur.execute("INSERT OR IGNORE INTO store_prices (store_id, material_id, price, source, updated_at) "
+                "SELECT i.store_id, i.material_id, CAST(ROUND(m.standard_price) AS INTEGER), 'standard', "
+                "datetime('now', 'localtime') FROM inventory i JOIN building_materials m ON m.id = i.material_id "
+                "WHERE m.standard_price IS NOT NULL")
+    cur.execute(_BUMP)
+    return cur.execute("SELECT COUNT(*) FROM store_prices").fetchone()[0]
+
+
+def generation(conn: sqlite3.Connection) -> int:
+    row = conn.execute("SELECT generation FROM price_book_state WHERE id = 1").fetchone()
+    return row[0] if row else 0
+
+
+# ---- lookups ----
+
+class PriceBook:
+    """Effective prices held in memory, per store.
+
+    Args:
+        connect: Returns a new connection (``DatabaseManager.create_connection``).
+        recheck_s: How long a loaded store may be used before the generation is
+            checked again (``config.PRICE_BOOK['recheck_s']``).
+    """
+
+    def __init__(self, connect, recheck_s: Optional[float] = None):
+        self.connect = connect
+        self.recheck_s = float(SETTINGS.get('recheck_s', 2) if recheck_s is None else recheck_s)
+        self._stores: Dict[int, Dict[int, Tuple[Amount, str]]] = {}
+        self._standard: Optional[Dict[int, Amount]] = None
+        self._generation: Optional[int] = None
+        self._checked = 0.0
+        self._lock = threading.Lock()
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._stores.clear()
+            self._standard = None
+            self._checked = 0.0
+
+    def _fresh(self, conn: sqlite3.Connection) -> None:
+        now = time.monotonic()
+        if now - self._checked < self.recheck_s:
+            return
+        current = generation(conn)
+        if current != self._generation:
+            self._stores.clear()
+            self._standard = None
+            self._generation = current
+        self._checked = now
+
+    def store(self, store_id: int) -> Dict[int, Tuple[Amount, str]]:
+        """``{material_id: (price, source)}`` of a store, catalogue prices included."""
+        with self._lock:
+            if (time.monotonic() - self._checked < self.recheck_s and store_id in self._stores
+                    and self._standard is not None):
+                return self._stores[store_id]
+            conn = self.connect()
+            try:
+                self._fresh(conn)
+                if self._standard is None:
+                    self._standard = {mid: to_amount(price) for mid, price in conn.execute(
+                        "SELECT id, standard_price FROM building_materials WHERE standard_price IS NOT NULL")}
+                prices = self._stores.get(store_id)
+                if prices is None:
+                    prices = {mid: (price, 'standard') for mid, price in self._standard.items()}
+                    prices.update((mid, (Amount(price), source)) for mid, price, source in conn.execute(
+                        "SELECT material_id, price, source FROM store_prices WHERE store_id = ?", (store_id,)))
+                    self._stores[store_id] = prices
+                return prices
+            finally:
+                conn.close()
+
+    def entry(self, store_id: int, material_id: int) -> Optional[Tuple[Amount, str]]:
+        """``(price, source)`` of a material in a store; None if it has no price anywhere."""
+        return self.store(store_id).get(material_id)
+
+    def price(self, store_id: int, material_id: int, default: Optional[int] = None) -> Optional[Amount]:
+        found = self.store(store_id).get(material_id)
+        return found[0] if found else default
+
+
+# ---- bulk changes ----
+
+def _change_sql(percent: Optional[float] = None, amount: Optional[int] = None, set_to: Optional[int] = None,
+                round_to: int = 1, categories: Optional[Sequence[str]] = None,
+                material_ids: Optional[Iterable[int]] = None, store_ids: Optional[Iterable[int]] = None,
+                city: Optional[str] = None, region: Optional[str] = None) -> Tuple[str, str, List[Any]]:
+    """``(new price expression, WHERE clause, parameters)`` over ``inventory i``."""
+    if sum(x is not None for x in (percent, amount, set_to)) != 1:
+        raise ValueError("give exactly one of percent, amount or set_to")
+    step = max(1, int(round_to or 1))
+    if percent is not None:
+        expr, params = "i.unit_price * (100 + ?) / 100.0", [float(percent)]
+    elif amount is not None:
+        expr, params = "i.unit_price + ?", [int(to_amount(amount))]
+    else:
+        expr, params = "?", [int(to_amount(set_to))]
+    expr = f"CAST(MAX(0, ROUND(({expr}) / {step}.0) * {step}) AS INTEGER)"
+
+    where, where_params = [], []
+    if set_to is None:
+        where.append("i.unit_price > 0")   # relative changes need a price to change
+    if categories:
+        where.append(f"i.material_id IN (SELECT id FROM building_materials WHERE category IN "
+                     f"({', '.join('?' * len(categories))}))")
+        where_params += list(categories)
+    if material_ids is not None:
+        ids = [int(m) for m in material_ids]
+        where.append(f"i.material_id IN ({', '.join('?' * len(ids)) or 'NULL'})")
+        where_params += ids
+    store_filters, store_params = [], []
+    if store_ids is not None:
+        ids = [int(s) for s in store_ids]
+        store_filters.append(f"id IN ({', '.join('?' * len(ids)) or 'NULL'})")
+        store_params += ids
+    if city:
+        store_filters.append("city = ? COLLATE NOCASE")
+        store_params.append(city.strip())
+    if region:
+        store_filters.append("region = ?")
+        store_params.append(region)
+    if store_filters:
+        where.append(f"i.store_id IN (SELECT id FROM stores WHERE {' AND '.join(store_filters)})")
+        where_params += store_params
+    return expr, ' AND '.join(where) or '1', params + where_params
+
+
+def preview_change(conn: sqlite3.Connection, limit: int = 50, **change: Any) -> Tuple[int, int, List[tuple]]:
+    """What :func:`bulk_change` would do: ``(lines, change in stock value, sample rows)``.
+
+    Sample rows are ``(store, material, quantity, old price, new price)``.
+    """
+    expr, where, params = _change_sql(**change)
+    count, delta = conn.execute(
+        f"SELECT COUNT(*), COALESCE(SUM(({expr} - COALESCE(i.unit_price, 0)) * COALESCE(i.quantity, 0)), 0) "
+        f"FROM inventory i WHERE {where}", params).fetchone()
+    rows = conn.execute(
+        f"SELECT s.name, m.name, i.quantity, i.unit_price, {expr} FROM inventory i "
+        f"JOIN stores s ON s.id = i.store_id JOIN building_materials m ON m.id = i.material_id "
+        f"WHERE {where} ORDER BY s.name, m.name LIMIT ?", params + [int(limit)]).fetchall()
+    return count, int(round(delta)), rows
+
+
+def bulk_change(cur: sqlite3.Cursor, stamp: Optional[str] = None, **change: Any) -> int:
+    """Apply a price change to every matching inventory line in one UPDATE, without committing.
+
+    Keyword arguments (exactly one of the first three):
+        percent: Relative change, e.g. 5 for +5%.
+        amount: Francs added (negative to lower prices).
+        set_to: New price.
+        round_to: Round new prices to a multiple of this many francs.
+        categories, material_ids: Materials affected (default all).
+        store_ids, city, region: Stores affected (default all).
+
+    Returns:
+        int: Number of inventory lines changed. ``store_prices`` follows through its triggers.
+    """
+    expr, where, params = _change_sql(**change)
+    cur.execute(f"UPDATE inventory AS i SET unit_price = {expr}, last_updated = COALESCE(?, datetime('now', 'localtime')) "
+                f"WHERE {where}", params[:1] + [stamp] + params[1:])
+    return cur.rowcount
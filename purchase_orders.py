@@ -0,0 +1,202 @@
+"""
+Batch approval of store-to-store purchase requests
+
+Approving a purchase request moves stock from the retail (source) store to the
+buyer's store, records a Sale and a Purchase transaction, and marks the request
+Approved. :func:`approve_purchase_requests` does this for any number of
+requests at once:
+
+* one ``BEGIN IMMEDIATE`` transaction for the whole batch, or a SAVEPOINT
+  inside the caller's transaction when one is already open (the caller then
+  commits);
+* one query that loads every selected request together with its source stock
+  (summed, so duplicate inventory rows cannot repeat a request), store names
+  and store ownership;
+* stock is allocated in request order (oldest first), so requests that together
+  exceed the available quantity are approved until the stock runs out and the
+  rest are reported, never driving inventory negative;
+* inventory deltas are aggregated per (store, material) and applied with
+  ``executemany`` — source rows with a guarded UPDATE, destination rows with an
+  UPSERT on ``ux_inventory_store_material``;
+* a per-request result list is returned for the caller to report.
+"""
+
+import json
+import sqlite3
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Tuple
+
+from money import line_total, to_amount
+
+DEFAULT_REORDER_LEVEL = 10
+
+
+def _result(request_id: int, ok: bool, message: str) -> Dict[str, Any]:
+    return {'request_id': request_id, 'ok': ok, 'message': message}
+
+
+def approve_purchase_requests(conn: sqlite3.Connection, request_ids: Iterable[int], user_id: int,
+                              is_admin: bool = False) -> List[Dict[str, Any]]:
+    """Approve purchase requests and transfer their stock in a single transaction.
+
+    Args:
+        conn: Open sqlite3 connection; committed on success, rolled back on error. If the
+            caller already has a transaction open, the batch runs in a SAVEPOINT of it and
+            the caller's transaction is neither committed nor rolled back.
+        request_ids: Requests to approve.
+        user_id: Approving user; must own or manage each source store unless ``is_admin``.
+        is_admin: Skip the per-store permission check.
+
+    Returns:
+        List[Dict]: One ``{'request_id', 'ok', 'message'}`` per requested id, in
+        the order the requests were processed (oldest first).
+    """
+    ids = []
+    for rid in request_ids:
+        try:
+            rid = int(rid)
+        except (TypeError, ValueError):
+            continue
+        if rid not in ids:
+            ids.append(rid)
+    if not ids:
+        return []
+
+    cur = conn.cursor()
+    now = datetime.now().isoformat(sep=' ')
+    nested = conn.in_transaction
+    cur.execute("SAVEPOINT approve_requests" if nested else "BEGIN IMMEDIATE")
+    try:
+        placeholders = ','.join('?' * len(ids))
+        cur.execute(
+            "SELECT pr.id, pr.store_id, pr.buyer_store_id, pr.material_id, pr.quantity, pr.unit_price, pr.status, "
+            "s.name, s.owner_id, s.manager_id, bs.name, "
+            "(SELECT SUM(inv.quantity) FROM inventory inv "
+            " WHERE inv.store_id = pr.store_id AND inv.material_id = pr.material_id) "
+            "FROM purchase_requests pr "
+            "LEFT JOIN stores s ON s.id = pr.store_id "
+            "LEFT JOIN stores bs ON bs.id = pr.buyer_store_id "
+            f"WHERE pr.id IN ({placeholders}) ORDER BY pr.created_at, pr.id",
+            ids
+        )
+        rows = cur.fetchall()
+
+        results: List[Dict[str, Any]] = []
+        found = set()
+        seen = set()
+        stock: Dict[Tuple[int, int], float] = {}
+        src_deltas: Dict[Tuple[int, int], float] = {}
+        dst_deltas: Dict[Tuple[int, int], List[Any]] = {}   # (store, material) -> [qty, last unit price]
+        tx_rows: List[tuple] = []
+        approved: List[Tuple[int, Dict[str, Any]]] = []
+
+        for (rid, store_id, buyer_store_id, material_id, qty, price, status,
+             store_name, owner_id, manager_id, buyer_store_name, src_qty) in rows:
+            found.add(rid)
+            if rid in seen:
+                continue
+            seen.add(rid)
+            if not is_admin and user_id not in (owner_id, manager_id):
+                results.append(_result(rid, False, "You don't have permission for this store."))
+                continue
+            if status != 'Pending':
+                results.append(_result(rid, False, "Only pending requests can be approved."))
+                continue
+            if not buyer_store_id:
+                results.append(_result(rid, False, "Destination store is missing on this request."))
+                continue
+            qty = float(qty or 0)
+            price = to_amount(price)
+            key = (store_id, material_id)
+            if key not in stock:
+                stock[key] = float(src_qty) if src_qty is not None else None
+            if stock[key] is None or stock[key] < qty:
+                results.append(_result(rid, False, "Insufficient stock at retail store to fulfill this request."))
+                continue
+
+            stock[key] -= qty
+            src_deltas[key] = src_deltas.get(key, 0.0) + qty
+            dst = dst_deltas.setdefault((buyer_store_id, material_id), [0.0, price])
+            dst[0] += qty
+            dst[1] = price
+            total_amount = line_total(qty, price)
+            tx_rows.append((store_id, f"{buyer_store_name or ''} (ID:{buyer_store_id})", material_id, qty, price,
+                            total_amount, 'Sale', 'Completed', now, user_id))
+            tx_rows.append((buyer_store_id, f"{store_name or ''} (ID:{store_id})", material_id, qty, price,
+                            total_amount, 'Purchase', 'Completed', now, user_id))
+            approved.append((rid, {"request_id": rid, "from_store": store_id, "to_store": buyer_store_id,
+                                   "material_id": material_id, "qty": qty, "price": price}))
+            results.append(_result(rid, True, f"Approved: {qty:g} transferred to {buyer_store_name or 'buyer store'}."))
+
+        for rid in ids:
+            if rid not in found:
+                results.append(_result(rid, False, "Request not found."))
+
+        if approved:
+            # The stock check used the sum over duplicate rows (databases where ux_inventory_store_material
+            # could not be created), so the deduction is spread over them, largest first, none going negative
+            src_updates: List[Tuple[float, str, int]] = []
+            for (store_id, material_id), delta in src_deltas.items():
+                inv_rows = cur.execute("SELECT id, COALESCE(quantity,0) FROM inventory WHERE store_id = ? "
+                                       "AND material_id = ? ORDER BY quantity DESC, id",
+                                       (store_id, material_id)).fetchall()
+                for inv_id, available in inv_rows:
+                    take = min(delta, max(float(available), 0.0))
+                    if take > 0:
+                        src_updates.append((take, now, inv_id))
+                        delta -= take
+                    if delta <= 0:
+                        break
+            cur.executemany("UPDATE inventory SET quantity = COALESCE(quantity,0) - ?, last_updated = ? WHERE id = ?",
+                            src_updates)
+            dst_rows = [(store_id, material_id, qty, price, DEFAULT_REORDER_LEVEL, now)
+                        for (store_id, material_id), (qty, price) in dst_deltas.items()]
+            try:
+                cur.executemany(
+                    "INSERT INTO inventory(store_id, material_id, quantity, unit_price, reorder_level, last_updated) "
+                    "VALUES (?,?,?,?,?,?) "
+                    "ON CONFLICT(store_id, material_id) DO UPDATE SET "
+                    "quantity = COALESCE(inventory.quantity,0) + excluded.quantity, "
+                    "unit_price = excluded.unit_price, last_updated = excluded.last_updated",
+                    dst_rows
+                )
+            except sqlite3.OperationalError:
+                # Databases where ux_inventory_store_material could not be created
+                for store_id, material_id, qty, price, reorder, ts in dst_rows:
+                    cur.execute("UPDATE inventory SET quantity = COALESCE(quantity,0) + ?, unit_price = ?, last_updated = ? "
+                                "WHERE id = (SELECT MIN(id) FROM inventory WHERE store_id = ? AND material_id = ?)",
+                                (qty, price, ts, store_id, material_id))
+                    if cur.rowcount == 0:
+                        cur.execute("INSERT INTO inventory(store_id, material_id, quantity, unit_price, reorder_level, last_updated) "
+                                    "VALUES (?,?,?,?,?,?)", (store_id, material_id, qty, price, reorder, ts))
+            cur.executemany(
+                "INSERT INTO transactions(store_id, customer_name, material_id, quantity, unit_price, total_amount, "
+                "transaction_type, payment_status, transaction_date, user_id) VALUES (?,?,?,?,?,?,?,?,?,?)",
+                tx_rows
+            )
+            cur.executemany(
+                "UPDATE purchase_requests SET status='Approved', approved_by=?, approved_at=? WHERE id=? AND status='Pending'",
+                [(user_id, now, rid) for rid, _ in approved]
+            )
+            cur.executemany(
+                "INSERT INTO audit_log (user_id, action, details, timestamp) VALUES (?, ?, ?, ?)",
+                [(user_id, "Approve Purchase Request & Transfer", json.dumps(details), now) for _, details in approved]
+            )
+        if nested:
+            cur.execute("RELEASE approve_requests")
+        else:
+            conn.commit()
+        return results
+    except Exception:
+        if nested:
+            cur.execute("ROLLBACK TO approve_requests")
+            cur.execute("RELEASE approve_requests")
+        else:
+            conn.rollback()
+        raise
+
+
+def summarize_results(results: List[Dict[str, Any]]) -> Tuple[int, int]:
+    """Return ``(approved, failed)`` counts for a result list."""
+    ok = sum(1 for r in results if r.get('ok'))
+    return ok, len(results) - ok
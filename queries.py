@@ -0,0 +1,565 @@
+"""
+Shared SQL for the busiest CBPM screens
+
+The Tk windows and ``benchmarks/bench_queries.py`` both call these functions,
+so the benchmarks measure exactly the statements the application runs.
+Read functions take a cursor and return plain rows or dicts. Write functions
+take a connection and commit (or roll back and re-raise) themselves.
+"""
+
+import sqlite3
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from money import Amount, line_total, to_amount
+from store_contacts import CATEGORY_SQL, EMAIL_SQL, PHONE_SQL
+
+
+# ---- inventory ----
+
+def list_inventory(cur: sqlite3.Cursor, role: Optional[str] = None, user_id: Optional[int] = None,
+                   store_id: Optional[int] = None, search: str = '') -> List[tuple]:
+    """Inventory Management list: ``(id, store, material, quantity, unit_price, reorder_level, last_updated)``.
+
+    Owners (retail_store/contract_owner) see their stores, managers the stores
+    they manage, everyone else all stores.
+    """
+    query = '''
+        SELECT i.id, s.name AS store, bm.name AS material, i.quantity, i.unit_price, i.reorder_level, i.last_updated
+        FROM inventory i
+        JOIN stores s ON s.id = i.store_id
+        JOIN building_materials bm ON bm.id = i.material_id
+    '''
+    params: List[Any] = []
+    where_clauses = []
+    if store_id is not None:
+        where_clauses.append('i.store_id = ?')
+        params.append(store_id)
+    if role in ('retail_store', 'contract_owner'):
+        where_clauses.append('s.owner_id = ?')
+        params.append(user_id)
+    elif role == 'manager':
+        where_clauses.append('s.manager_id = ?')
+        params.append(user_id)
+    search = (search or '').strip()
+    if search:
+        where_clauses.append('(bm.name LIKE ? OR s.name LIKE ?)')
+        like = f"%{search}%"
+        params.extend([like, like])
+    if where_clauses:
+        query += ' WHERE ' + ' AND '.join(where_clauses)
+    query += ' ORDER BY i.last_updated DESC'
+    cur.execute(query, params)
+    return cur.fetchall()
+
+
+def count_low_stock(cur: sqlite3.Cursor) -> int:
+    cur.execute("SELECT COUNT(*) FROM inventory WHERE quantity <= reorder_level")
+    return cur.fetchone()[0]
+
+
+# ---- stores ----
+
+# Sort keys of the store list: SQL expression (s = stores, owner = users)
+STORE_SORTS = {
+    'id': 's.id',
+    'name': 's.name COLLATE NOCASE',
+    'owner': 'owner.full_name COLLATE NOCASE',
+    'manager': 'manager.full_name COLLATE NOCASE',
+    'location': 's.location COLLATE NOCASE',
+    'city': 's.city COLLATE NOCASE',
+    'region': 's.region',
+    'category': CATEGORY_SQL,
+    'phone': PHONE_SQL,
+    'status': 's.is_active',
+    'created': 's.created_date',
+}
+
+
+def list_stores(cur: sqlite3.Cursor, role: Optional[str] = None, user_id: Optional[int] = None,
+                search: str = '', status: str = 'All', region: str = 'All', category: str = 'All',
+                sort: str = 'created', descending: bool = True) -> List[tuple]:
+    """Manage Stores list, filtered and sorted in SQL.
+
+    Rows are ``(id, name, owner, manager, location, category, phone, email,
+    is_active, created_date, owner_id, city, region)``. Retail store owners see their stores and managers the stores they manage.
+    Category and region are compared on their columns (see store_contacts.py);
+    rows not yet given a region are matched on their location text.
+    """
+    query = f'''
+        SELECT s.id, s.name, owner.full_name, COALESCE(manager.full_name, 'Not Assigned'), s.location,
+               {CATEGORY_SQL}, {PHONE_SQL}, {EMAIL_SQL}, s.is_active, s.created_date, s.owner_id,
+               s.city, s.region
+        FROM stores s
+        JOIN users owner ON s.owner_id = owner.id
+        LEFT JOIN users manager ON s.manager_id = manager.id
+    '''
+    params: List[Any] = []
+    where_clauses = []
+    if role == 'retail_store':
+        where_clauses.append('s.owner_id = ?')
+        params.append(user_id)
+    elif role == 'manager':
+        where_clauses.append('s.manager_id = ?')
+        params.append(user_id)
+    search = (search or '').strip()
+    if search:
+        where_clauses.append('(s.name LIKE ? OR s.location LIKE ? OR owner.full_name LIKE ?)')
+        like = f"%{search}%"
+        params.extend([like, like, like])
+    if status == 'Active':
+        where_clauses.append('s.is_active = 1')
+    elif status == 'Inactive':
+        where_clauses.append('s.is_active = 0')
+    if region and region != 'All':
+        where_clauses.append('(s.region = ? OR (s.region IS NULL AND s.location LIKE ?))')
+        params.extend([region, f"%{region}%"])
+    if category and category != 'All':
+        where_clauses.append(f'{CATEGORY_SQL} = ?')
+        params.append(category)
+    if where_clauses:
+        query += ' WHERE ' + ' AND '.join(where_clauses)
+    order = STORE_SORTS.get(sort, STORE_SORTS['created'])
+    direction = 'DESC' if descending else 'ASC'
+    query += f' ORDER BY {order} {direction}, s.id {direction}'
+    cur.execute(query, params)
+    return cur.fetchall()
+
+
+def store_categories(cur: sqlite3.Cursor) -> List[str]:
+    """Categories in use, for the store list filter (read from the category index)."""
+    cur.execute(f"SELECT DISTINCT {CATEGORY_SQL} AS c FROM stores s WHERE c IS NOT NULL ORDER BY c")
+    return [r[0] for r in cur.fetchall()]
+
+
+# ---- sales aggregates ----
+
+def _range_filter(date_column: str, start: str, end: str, store_id: Optional[int]) -> Tuple[str, List[Any]]:
+    where = f"WHERE date(t.{date_column}) BETWEEN ? AND ?"
+    params: List[Any] = [start, end]
+    if store_id:
+        where += " AND t.store_id = ?"
+        params.append(store_id)
+    return where, params
+
+
+def _has_rollup(cur: sqlite3.Cursor) -> bool:
+    """True on a reporting snapshot, which carries the ``sales_daily`` rollup (reporting_snapshot.py)."""
+    cur.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'sales_daily'")
+    return cur.fetchone() is not None
+
+
+def _rollup_filter(date_column: str, start: str, end: str, store_id: Optional[int]) -> Tuple[str, List[Any]]:
+    where = "WHERE r.basis = ? AND r.day BETWEEN ? AND ?"
+    params: List[Any] = [date_column, start, end]
+    if store_id:
+        where += " AND r.store_id = ?"
+        params.append(store_id)
+    return where, params
+
+
+def _rollup_breakdown(cur: sqlite3.Cursor, rwhere: str, rparams: Sequence[Any]) -> Dict[str, Any]:
+    cur.execute(f"SELECT COALESCE(SUM(r.revenue),0), COALESCE(SUM(r.tx_count),0) FROM sales_daily r {rwhere}", rparams)
+    total, tx_count = cur.fetchone()
+    cur.execute(
+        f"""
+        SELECT s.name, SUM(r.tx_count) AS tx, COALESCE(SUM(r.revenue),0) AS total
+        FROM sales_daily r
+        JOIN stores s ON s.id = r.store_id
+        {rwhere}
+        GROUP BY s.id
+        ORDER BY total DESC
+        """, rparams
+    )
+    rows_store = cur.fetchall()
+    cur.execute(
+        f"""
+        SELECT bm.name, COALESCE(SUM(r.quantity),0) AS qty, COALESCE(SUM(r.revenue),0) AS total
+        FROM sales_daily r
+        JOIN building_materials bm ON bm.id = r.material_id
+        {rwhere}
+        GROUP BY bm.id
+        ORDER BY total DESC
+        """, rparams
+    )
+    return {'total': total, 'tx_count': tx_count, 'rows_store': rows_store, 'rows_mat': cur.fetchall()}
+
+
+def _sales_breakdown(cur: sqlite3.Cursor, date_column: str, start: str, end: str,
+                     store_id: Optional[int], rollup: bool = False) -> Dict[str, Any]:
+    where, params = _range_filter(date_column, start, end, store_id)
+    if rollup:
+        data = _rollup_breakdown(cur, *_rollup_filter(date_column, start, end, store_id))
+        data['rows_tx'] = _sales_rows(cur, where, params, date_column)
+        return data
+    cur.execute(f"SELECT COALESCE(SUM(t.total_amount),0), COUNT(*) FROM transactions t {where}", params)
+    total, tx_count = cur.fetchone()
+    cur.execute(
+        f"""
+        SELECT s.name, COUNT(*) AS tx, COALESCE(SUM(t.total_amount),0) AS total
+        FROM transactions t
+        JOIN stores s ON s.id = t.store_id
+        {where}
+        GROUP BY s.id
+        ORDER BY total DESC
+        """, params
+    )
+    rows_store = cur.fetchall()
+    cur.execute(
+        f"""
+        SELECT bm.name, COALESCE(SUM(t.quantity),0) AS qty, COALESCE(SUM(t.total_amount),0) AS total
+        FROM transactions t
+        JOIN building_materials bm ON bm.id = t.material_id
+        {where}
+        GROUP BY bm.id
+        ORDER BY total DESC
+        """, params
+    )
+    rows_mat = cur.fetchall()
+    return {'total': total, 'tx_count': tx_count, 'rows_store': rows_store, 'rows_mat': rows_mat,
+            'rows_tx': _sales_rows(cur, where, params, date_column)}
+
+
+def _sales_rows(cur: sqlite3.Cursor, where: str, params: Sequence[Any], date_column: str) -> List[tuple]:
+    cur.execute(
+        f"""
+        SELECT t.{date_column}, s.name, COALESCE(t.customer_name,''), bm.name, t.quantity, t.unit_price, t.total_amount
+        FROM transactions t
+        JOIN stores s ON s.id = t.store_id
+        JOIN building_materials bm ON bm.id = t.material_id
+        {where}
+        ORDER BY t.{date_column} DESC
+        """, params
+    )
+    return cur.fetchall()
+
+
+def store_analytics(cur: sqlite3.Cursor, start: str, end: str, store_id: Optional[int] = None) -> Dict[str, Any]:
+    """Store Analytics aggregates for ``start``..``end`` (inclusive, by transaction date).
+
+    On a reporting snapshot the totals, breakdowns and daily trend come from
+    the ``sales_daily`` rollup; the transaction list always reads ``transactions``.
+
+    Returns:
+        Dict: ``total_sales``, ``tx_count``, ``low_stock``, ``rows_store``,
+        ``rows_mat``, ``rows_daily`` and ``rows_tx``.
+    """
+    rollup = _has_rollup(cur)
+    data = _sales_breakdown(cur, 'transaction_date', start, end, store_id, rollup)
+    if rollup:
+        rwhere, rparams = _rollup_filter('transaction_date', start, end, store_id)
+        cur.execute(f"SELECT r.day, COALESCE(SUM(r.revenue),0) FROM sales_daily r {rwhere} GROUP BY r.day ORDER BY r.day",
+                    rparams)
+    else:
+        where, params = _range_filter('transaction_date', start, end, store_id)
+        cur.execute(
+            f"""
+            SELECT date(t.transaction_date) AS d, COALESCE(SUM(t.total_amount),0)
+            FROM transactions t
+            {where}
+            GROUP BY d
+            ORDER BY d
+            """, params
+        )
+    return {
+        'total_sales': data['total'], 'tx_count': data['tx_count'], 'low_stock': count_low_stock(cur),
+        'rows_store': data['rows_store'], 'rows_mat': data['rows_mat'], 'rows_daily': cur.fetchall(),
+        'rows_tx': data['rows_tx'],
+    }
+
+
+def financial_report(cur: sqlite3.Cursor, start: str, end: str, store_id: Optional[int] = None) -> Dict[str, Any]:
+    """Financial Reports figures for ``start``..``end`` (by ``transactions.timestamp``).
+
+    Returns:
+        Dict: ``total_revenue``, ``tx_count``, ``top_store``, ``top_material``,
+        ``rows_store``, ``rows_mat`` and ``rows_tx``.
+    """
+    data = _sales_breakdown(cur, 'timestamp', start, end, store_id, _has_rollup(cur))
+    # The breakdowns are ordered by total, so their first rows are the top store and material
+    return {
+        'total_revenue': data['total'], 'tx_count': data['tx_count'],
+        'top_store': data['rows_store'][0][0] if data['rows_store'] else None,
+        'top_material': data['rows_mat'][0][0] if data['rows_mat'] else None,
+        'rows_store': data['rows_store'], 'rows_mat': data['rows_mat'], 'rows_tx': data['rows_tx'],
+    }
+
+
+def daily_report(cur: sqlite3.Cursor, day: str) -> Dict[str, Any]:
+    """Daily Report cards and tables for ``day`` (YYYY-MM-DD).
+
+    Returns:
+        Dict: ``tx_count``, ``tx_total``, ``top_store``, ``top_store_total``,
+        ``low_stock``, ``rows_tx`` and ``rows_low``.
+    """
+    cur.execute("SELECT COUNT(*), COALESCE(SUM(total_amount), 0) FROM transactions WHERE date(transaction_date) = ?",
+                (day,))
+    tx_count, tx_total = cur.fetchone()
+    cur.execute("""
+        SELECT s.name, COALESCE(SUM(t.total_amount),0) AS total
+        FROM stores s
+        LEFT JOIN transactions t ON t.store_id = s.id AND date(t.timestamp)=?
+        GROUP BY s.id
+        ORDER BY total DESC
+        LIMIT 1
+    """, (day,))
+    row = cur.fetchone()
+    low_stock = count_low_stock(cur)
+    cur.execute(
+        """
+        SELECT t.timestamp, s.name, COALESCE(t.customer_name,''), bm.name, t.quantity, t.unit_price, t.total_amount
+        FROM transactions t
+        JOIN stores s ON s.id = t.store_id
+        JOIN building_materials bm ON bm.id = t.material_id
+        WHERE date(t.timestamp)=?
+        ORDER BY t.timestamp DESC
+        """, (day,)
+    )
+    rows_tx = cur.fetchall()
+    cur.execute(
+        """
+        SELECT s.name, bm.name, i.quantity, i.reorder_level, i.last_updated
+        FROM inventory i
+        JOIN stores s ON s.id = i.store_id
+        JOIN building_materials bm ON bm.id = i.material_id
+        WHERE i.quantity <= i.reorder_level
+        ORDER BY i.quantity ASC
+        """
+    )
+    return {
+        'tx_count': tx_count, 'tx_total': tx_total,
+        'top_store': row[0] if row else 'N/A', 'top_store_total': row[1] if row else 0,
+        'low_stock': low_stock, 'rows_tx': rows_tx, 'rows_low': cur.fetchall(),
+    }
+
+
+# ---- audit log ----
+
+def search_audit_log(cur: sqlite3.Cursor, user_id: Optional[int] = None, date_from: str = '', date_to: str = '',
+                     text: str = '', limit: Optional[int] = 500, details_length: Optional[int] = 200) -> List[tuple]:
+    """Audit Log rows ``(timestamp, user, action, details, ip)``, newest first.
+
+    Args:
+        details_length: Truncate details to this many characters (None keeps them whole).
+        limit: Maximum rows (None for all, as used by the CSV export).
+    """
+    details = f"substr(COALESCE(a.details,''),1,{int(details_length)})" if details_length else "a.details"
+    query = (
+        f"SELECT a.timestamp, COALESCE(u.full_name,u.username) AS user, a.action, {details}, COALESCE(a.ip_address,'') "
+        "FROM audit_log a LEFT JOIN users u ON u.id = a.user_id WHERE 1=1 "
+    )
+    params: List[Any] = []
+    if user_id:
+        query += "AND a.user_id = ? "
+        params.append(user_id)
+    if date_from:
+        query += "AND date(a.timestamp) >= ? "
+        params.append(date_from)
+    if date_to:
+        query += "AND date(a.timestamp) <= ? "
+        params.append(date_to)
+    if text:
+        query += "AND (a.action LIKE ? OR a.details LIKE ?) "
+        like = f"%{text}%"
+        params.extend([like, like])
+    query += "ORDER BY a.timestamp DESC"
+    if limit:
+        query += f" LIMIT {int(limit)}"
+    cur.execute(query, params)
+    return cur.fetchall()
+
+
+# ---- login ----
+
+def get_login_user(cur: sqlite3.Cursor, username: str) -> Optional[tuple]:
+    """``(id, username, role, full_name, is_active, first_login, failed_login_attempts, password_hash)``."""
+    cur.execute('''
+                SELECT id, username, role, full_name, is_active, first_login, failed_login_attempts, password_hash
+                FROM users
+                WHERE username = ?
+                ''', (username,))
+    return cur.fetchone()
+
+
+def verify_login(cur: sqlite3.Cursor, username: str, password: str,
+                 verify_password: Callable[[str, str], bool]) -> Optional[tuple]:
+    """The login row when ``password`` matches, else None (no side effects)."""
+    user = get_login_user(cur, username)
+    if user and verify_password(password, user[7]):
+        return user
+    return None
+
+
+def max_login_attempts() -> int:
+    try:
+        from config import SECURITY_SETTINGS
+        return int(SECURITY_SETTINGS.get('max_failed_login_attempts', 5))
+    except Exception:
+        return 5
+
+
+def record_failed_login(cur: sqlite3.Cursor, username: str) -> Optional[int]:
+    """Count a failed login without committing; the account is suspended at the limit.
+
+    Returns:
+        Optional[int]: Attempts left (0 when the account has just been suspended); None for an unknown username.
+    """
+    cur.execute('SELECT id, failed_login_attempts FROM users WHERE username = ?', (username,))
+    row = cur.fetchone()
+    if not row:
+        return None
+    user_id, attempts = row[0], int(row[1] or 0) + 1
+    limit = max_login_attempts()
+    if attempts >= limit:
+        cur.execute('UPDATE users SET is_active = 0, failed_login_attempts = ? WHERE id = ?', (attempts, user_id))
+        return 0
+    cur.execute('UPDATE users SET failed_login_attempts = ? WHERE id = ?', (attempts, user_id))
+    return limit - attempts
+
+
+def record_login(cur: sqlite3.Cursor, user_id: int) -> None:
+    """Reset the failed-attempt count after a successful login, without committing."""
+    cur.execute('UPDATE users SET failed_login_attempts = 0, last_login = ? WHERE id = ?', (datetime.now(), user_id))
+
+
+# ---- writes ----
+
+def apply_sale(cur: sqlite3.Cursor, store_id: int, material_id: int, quantity: float, unit_price: float,
+               user_id: int, customer_name: str = '', now: Optional[datetime] = None) -> Tuple[Amount, float]:
+    """Sale statements of :func:`record_sale` without committing.
+
+    Returns:
+        Tuple: ``(total_amount, shortfall)``; ``shortfall`` is the quantity sold beyond the recorded stock.
+    """
+    unit_price = to_amount(unit_price)
+    total_amount = line_total(quantity, unit_price)
+    stamp = (now or datetime.now()).isoformat(sep=' ')
+    cur.execute("SELECT quantity, unit_price, reorder_level FROM inventory WHERE store_id=? AND material_id=?",
+                (store_id, material_id))
+    inv = cur.fetchone()
+    cur.execute(
+        """
+        INSERT INTO transactions (store_id, material_id, quantity, unit_price, total_amount, transaction_type, transaction_date, user_id, customer_name)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """,
+        (store_id, material_id, quantity, unit_price, total_amount, 'sale', stamp, user_id, customer_name)
+    )
+    shortfall = 0.0
+    if inv:
+        on_hand = inv[0] or 0
+        shortfall = max(0.0, quantity - on_hand)
+        cur.execute(
+            "UPDATE inventory SET quantity=?, last_updated=? WHERE store_id=? AND material_id=?",
+            (max(0, on_hand - quantity), stamp, store_id, material_id)
+        )
+        reorder_level = inv[2] or 0
+        if on_hand > reorder_level >= on_hand - quantity:
+            # Queued in this transaction, so the alert exists exactly when the sale does
+            from notifications import low_stock
+            low_stock(cur, store_id, material_id, max(0, on_hand - quantity), reorder_level)
+    return total_amount, shortfall
+
+
+def record_sale(conn: sqlite3.Connection, store_id: int, material_id: int, quantity: float, unit_price: float,
+                user_id: int, customer_name: str = '') -> Amount:
+    """Insert a sale and draw down the store's stock (floored at zero); returns the total in francs."""
+    cur = conn.cursor()
+    try:
+        total_amount, _ = apply_sale(cur, store_id, material_id, quantity, unit_price, user_id, customer_name)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return total_amount
+
+
+def execute_transfer(conn: sqlite3.Connection, source_id: int, dest_id: int, items: Sequence[Dict[str, Any]],
+                     reference: str, user_id: int, signature_name: str,
+                     now: Optional[datetime] = None) -> Tuple[int, int, float]:
+    """Move stock between stores and record the transfer, all in one transaction.
+
+    Args:
+        items: Dicts with ``material`` (name), ``quantity``, ``unit_price``,
+            ``total`` and optional ``unit``, ``reason`` and ``notes``.
+
+    Returns:
+        Tuple: ``(transfer_id, total_items, total_value)``.
+
+    Raises:
+        ValueError: When a material is unknown or the source lacks stock; nothing is written.
+    """
+    cur = conn.cursor()
+    cur.execute('BEGIN')
+    try:
+        result = apply_transfer(cur, source_id, dest_id, items, reference, user_id, signature_name, now)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return result
+
+
+def apply_transfer(cur: sqlite3.Cursor, source_id: int, dest_id: int, items: Sequence[Dict[str, Any]],
+                   reference: str, user_id: int, signature_name: str,
+                   now: Optional[datetime] = None) -> Tuple[int, int, float]:
+    """Transfer statements of :func:`execute_transfer`, run in the caller's transaction."""
+    now = now or datetime.now()
+    stamp = now.isoformat(sep=' ')
+    total_items = len(items)
+    total_value = sum(i['total'] for i in items)
+    cur.execute(
+        """
+        INSERT INTO transfers (reference, source_store_id, dest_store_id, total_items, total_value,
+                               status, reason, notes, signature_name, signature_date, created_at, initiated_by)
+        VALUES (?, ?, ?, ?, ?, 'Completed', ?, ?, ?, ?, ?, ?)
+        """,
+        (
+            reference, source_id, dest_id, total_items, total_value,
+            ', '.join(sorted(set(i['reason'] for i in items if i.get('reason')))),
+            '; '.join(filter(None, (i.get('notes') for i in items))),
+            signature_name, stamp, stamp, user_id
+        )
+    )
+    transfer_id = cur.lastrowid
+    for it in items:
+        cur.execute("SELECT id, unit FROM building_materials WHERE name = ?", (it['material'],))
+        res = cur.fetchone()
+        if not res:
+            raise ValueError(f"Material not found: {it['material']}")
+        material_id, unit_from_db = res
+        qty = float(it['quantity'])
+        unit_price = to_amount(it['unit_price'])
+        cur.execute(
+            """
+            UPDATE inventory SET quantity = quantity - ?, last_updated = ?
+            WHERE store_id = ? AND material_id = ? AND quantity >= ?
+            """,
+            (qty, stamp, source_id, material_id, qty)
+        )
+        if cur.rowcount == 0:
+            raise ValueError(f"Insufficient stock for {it['material']} at source store")
+        cur.execute("SELECT quantity FROM inventory WHERE store_id = ? AND material_id = ?", (dest_id, material_id))
+        if cur.fetchone():
+            cur.execute(
+                """
+                UPDATE inventory SET quantity = quantity + ?, last_updated = ?, unit_price = ?
+                WHERE store_id = ? AND material_id = ?
+                """,
+                (qty, stamp, unit_price, dest_id, material_id)
+            )
+        else:
+            cur.execute(
+                """
+                INSERT INTO inventory (store_id, material_id, quantity, unit_price, reorder_level, last_updated)
+                VALUES (?, ?, ?, ?, 10, ?)
+                """,
+                (dest_id, material_id, qty, unit_price, stamp)
+            )
+        cur.execute(
+            """
+            INSERT INTO transfer_items (transfer_id, material_id, quantity, unit, unit_price, total)
+            VALUES (?, ?, ?, ?, ?, ?)
+            """,
+            (transfer_id, material_id, qty, unit_from_db or it.get('unit'), it['unit_price'], it['total'])
+        )
+    return transfer_id, total_items, total_value
@@ -0,0 +1,335 @@
+"""
+SQLite statement instrumentation and slow-query log
+
+``DatabaseManager.create_connection`` opens connections with
+:class:`InstrumentedConnection`, whose cursors time every ``execute``,
+``executemany`` and the fetches that follow. Timings are aggregated per
+statement fingerprint (the SQL with literals replaced by ``?`` and whitespace
+collapsed), so the hundreds of inline queries in the application group into a
+manageable list.
+
+Statements slower than ``QUERY_INSTRUMENTATION['slow_ms']`` are kept in a
+bounded slow log together with their ``EXPLAIN QUERY PLAN`` and, when a path is
+configured, appended to a JSON-lines file. The administrator Performance window
+reads :data:`STATS`; :meth:`QueryStats.dump_json` writes the same data to disk.
+"""
+
+import atexit
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from functools import lru_cache
+from typing import Any, Deque, Dict, List, Optional
+
+try:
+    from config import QUERY_INSTRUMENTATION as SETTINGS
+except Exception:
+    SETTINGS = {'enabled': True, 'slow_ms': 200}
+
+SAMPLES_PER_QUERY = 512
+
+# CBPM_QUERY_STATS=0/1 overrides the configured setting
+ENABLED = os.environ.get('CBPM_QUERY_STATS', '1' if SETTINGS.get('enabled', True) else '0') not in ('0', 'false', 'no')
+
+_STRING_RE = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_RE = re.compile(r"(?<![\w.])-?\d+(?:\.\d+)?\b")
+_IN_LIST_RE = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_WS_RE = re.compile(r"\s+")
+
+
+@lru_cache(maxsize=4096)
+def fingerprint(sql: str) -> str:
+    """Normalise ``sql`` so statements differing only in literals group together.
+
+    >>> fingerprint("SELECT * FROM t WHERE id IN (1, 2, 3) AND name = 'x'")
+    'SELECT * FROM t WHERE id IN (?, ...) AND name = ?'
+    """
+    text = _STRING_RE.sub('?', sql)
+    text = _NUMBER_RE.sub('?', text)
+    text = _IN_LIST_RE.sub('(?, ...)', text)
+    return _WS_RE.sub(' ', text).strip()
+
+
+def _percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(pct / 100.0 * (len(values) - 1))))]
+
+
+class _Entry:
+    __slots__ = ('count', 'total', 'max', 'rows', 'samples')
+
+    def __init__(self) -> None:
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.rows = 0
+        self.samples: Deque[List[float]] = deque(maxlen=SAMPLES_PER_QUERY)
+
+
+class QueryStats:
+    """Thread-safe per-fingerprint timing aggregates and a bounded slow-query log."""
+
+    def __init__(self, slow_ms: float = 200.0, max_slow: int = 200, slow_log_path: Optional[str] = None,
+                 explain_slow: bool = True):
+        self.slow_ms = slow_ms
+        self.explain_slow = explain_slow
+        self.slow_log_path = slow_log_path
+        self.connections_opened = 0
+        self.started = datetime.now()
+        self._entries: Dict[str, _Entry] = {}
+        self._slow: Deque[Dict[str, Any]] = deque(maxlen=max_slow)
+        self._lock = threading.Lock()
+
+    # ---- recording (called by the instrumented cursor) ----
+    def connection_opened(self) -> None:
+        with self._lock:
+            self.connections_opened += 1
+
+    def begin(self, fp: str, elapsed: float, rows: int) -> List[float]:
+        """Record one execution; returns its mutable sample so fetch time can be added."""
+        sample = [elapsed]
+        with self._lock:
+            entry = self._entries.get(fp)
+            if entry is None:
+                entry = self._entries[fp] = _Entry()
+            entry.count += 1
+            entry.total += elapsed
+            entry.rows += rows
+            entry.samples.append(sample)
+            if elapsed > entry.max:
+                entry.max = elapsed
+        return sample
+
+    def extend(self, fp: str, sample: List[float], elapsed: float, rows: int) -> None:
+        """Add fetch time and rows to the execution recorded by :meth:`begin`."""
+        with self._lock:
+            entry = self._entries.get(fp)
+            if entry is None:
+                return
+            sample[0] += elapsed
+            entry.total += elapsed
+            entry.rows += rows
+            if sample[0] > entry.max:
+                entry.max = sample[0]
+
+    def slow(self, sql: str, params: Any, elapsed: float, plan: Optional[List[str]]) -> None:
+        item = {
+            'time': datetime.now().isoformat(timespec='seconds'),
+            'ms': round(elapsed * 1000, 2),
+            'fingerprint': fingerprint(sql),
+            'sql': sql.strip(),
+            'params': repr(params)[:300] if params is not None else '',
+            'plan': plan or [],
+        }
+        with self._lock:
+            self._slow.append(item)
+        print(f"[SLOW SQL] {item['ms']:.1f} ms: {item['fingerprint'][:160]}")
+        if self.slow_log_path:
+            try:
+                os.makedirs(os.path.dirname(os.path.abspath(self.slow_log_path)), exist_ok=True)
+                with open(self.slow_log_path, 'a', encoding='utf-8') as f:
+                    f.write(json.dumps(item, ensure_ascii=False) + '\n')
+            except Exception as e:
+                print(f"[WARN] slow query log not written: {e}")
+
+    # ---- reporting ----
+    def snapshot(self, sort: str = 'total_ms') -> List[Dict[str, Any]]:
+        """One dict per fingerprint (calls, total/avg/p95/max ms, rows), sorted descending by ``sort``."""
+        with self._lock:
+            items = [(fp, e.count, e.total, e.max, e.rows, [s[0] for s in e.samples])
+                     for fp, e in self._entries.items()]
+        rows = [{
+            'fingerprint': fp,
+            'calls': count,
+            'total_ms': total * 1000,
+            'avg_ms': total * 1000 / count if count else 0.0,
+            'p95_ms': _percentile(samples, 95) * 1000,
+            'max_ms': mx * 1000,
+            'rows': nrows,
+        } for fp, count, total, mx, nrows, samples in items]
+        rows.sort(key=lambda r: r.get(sort, 0), reverse=True)
+        return rows
+
+    def slow_queries(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            return list(reversed(self._slow))
+
+    def reset(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._slow.clear()
+            self.connections_opened = 0
+            self.started = datetime.now()
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'started': self.started.isoformat(timespec='seconds'),
+            'dumped': datetime.now().isoformat(timespec='seconds'),
+            'slow_ms': self.slow_ms,
+            'connections_opened': self.connections_opened,
+            'queries': self.snapshot(),
+            'slow_queries': self.slow_queries(),
+        }
+
+    def dump_json(self, path: str) -> str:
+        """Write :meth:`to_dict` to ``path`` and return the path."""
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.to_dict(), f, indent=2, ensure_ascii=False)
+        return path
+
+
+STATS = QueryStats(
+    slow_ms=float(SETTINGS.get('slow_ms', 200)),
+    max_slow=int(SETTINGS.get('max_slow_entries', 200)),
+    slow_log_path=SETTINGS.get('slow_log_path'),
+    explain_slow=bool(SETTINGS.get('explain_slow', True)),
+)
+
+
+def _explain(conn: sqlite3.Connection, sql: str, params: Any) -> Optional[List[str]]:
+    head = sql.lstrip()[:6].upper()
+    if not (head.startswith('SELECT') or head.startswith('WITH')):
+        return None
+    try:
+        cur = sqlite3.Connection.cursor(conn)   # plain cursor: not instrumented
+        cur.execute("EXPLAIN QUERY PLAN " + sql, params if params is not None else ())
+        return [row[-1] for row in cur.fetchall()]
+    except Exception:
+        return None
+
+
+class InstrumentedCursor(sqlite3.Cursor):
+    """Cursor that reports execute and fetch timings to :data:`STATS`."""
+
+    _fp: Optional[str] = None
+    _sql: str = ''
+    _params: Any = None
+    _sample: Optional[List[float]] = None
+    _reported = False
+
+    def _start(self, sql: str, params: Any, elapsed: float) -> None:
+        self._fp = fingerprint(sql)
+        self._sql = sql
+        self._params = params
+        self._reported = False
+        rows = self.rowcount if self.rowcount and self.rowcount > 0 else 0
+        self._sample = STATS.begin(self._fp, elapsed, rows)
+        self._check_slow()
+
+    def _check_slow(self) -> None:
+        if self._reported or self._sample is None or self._sample[0] * 1000 < STATS.slow_ms:
+            return
+        self._reported = True
+        plan = _explain(self.connection, self._sql, self._params) if STATS.explain_slow else None
+        STATS.slow(self._sql, self._params, self._sample[0], plan)
+
+    def _fetched(self, elapsed: float, rows: int) -> None:
+        if self._fp is not None and self._sample is not None:
+            STATS.extend(self._fp, self._sample, elapsed, rows)
+            self._check_slow()
+
+    def execute(self, sql, parameters=()):
+        start = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            self._start(sql, parameters or None, time.perf_counter() - start)
+
+    def executemany(self, sql, seq_of_parameters):
+        start = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            self._start(sql, None, time.perf_counter() - start)
+
+    def executescript(self, sql_script):
+        start = time.perf_counter()
+        try:
+            return super().executescript(sql_script)
+        finally:
+            self._start(sql_script, None, time.perf_counter() - start)
+
+    def fetchone(self):
+        start = time.perf_counter()
+        row = super().fetchone()
+        self._fetched(time.perf_counter() - start, 1 if row is not None else 0)
+        return row
+
+    def fetchmany(self, size=None):
+        start = time.perf_counter()
+        rows = super().fetchmany(self.arraysize if size is None else size)
+        self._fetched(time.perf_counter() - start, len(rows))
+        return rows
+
+    def fetchall(self):
+        start = time.perf_counter()
+        rows = super().fetchall()
+        self._fetched(time.perf_counter() - start, len(rows))
+        return rows
+
+    def __next__(self):
+        start = time.perf_counter()
+        try:
+            row = super().__next__()
+        except StopIteration:
+            self._fetched(time.perf_counter() - start, 0)
+            raise
+        self._fetched(time.perf_counter() - start, 1)
+        return row
+
+
+class InstrumentedConnection(sqlite3.Connection):
+    """Connection whose cursors are instrumented.
+
+    The ``execute`` shortcuts are routed through :meth:`cursor` as well; the
+    base class would run them on a plain cursor of its own.
+    """
+
+    def cursor(self, factory=InstrumentedCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+    def executescript(self, sql_script):
+        return self.cursor().executescript(sql_script)
+
+
+_FACTORIES: Dict[type, type] = {sqlite3.Connection: InstrumentedConnection}
+
+
+def connection_factory(base: type = sqlite3.Connection) -> type:
+    """The ``factory=`` argument for ``sqlite3.connect``, honouring the enabled flag.
+
+    ``base`` is another ``sqlite3.Connection`` subclass to combine with the
+    instrumentation (e.g. ``db_maintenance.OptimizingConnection``).
+    """
+    STATS.connection_opened()
+    if not ENABLED:
+        return base
+    cls = _FACTORIES.get(base)
+    if cls is None:
+        cls = _FACTORIES[base] = type('Instrumented' + base.__name__, (InstrumentedConnection, base), {})
+    return cls
+
+
+def _dump_at_exit() -> None:
+    path = SETTINGS.get('dump_on_exit')
+    if path and STATS.connections_opened:
+        try:
+            STATS.dump_json(path)
+        except Exception as e:
+            print(f"[WARN] query stats not written: {e}")
+
+
+atexit.register(_dump_at_exit)
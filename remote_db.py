@@ -0,0 +1,324 @@
+"""
+Client for the local-network database service (db_service.py)
+
+With ``DATABASE_BACKEND['mode'] = 'remote'``, ``DatabaseManager.create_connection``
+returns a :class:`RemoteConnection` instead of opening the SQLite file. It mirrors
+the parts of ``sqlite3.Connection`` the application uses (``cursor``,
+``execute``, ``executemany``, ``commit``, ``rollback``, ``close``), so the screens
+and ``queries.py`` run unchanged against the depot's server:
+
+* reads outside a transaction are sent to ``/query`` (one round trip, served
+  from the server's read pool);
+* the first INSERT/UPDATE/DELETE opens a server-side transaction, as
+  ``sqlite3`` opens one implicitly; everything up to ``commit()``/``rollback()``
+  runs inside it, so ``lastrowid`` and reads of the pending writes behave as
+  they do locally; ``BEGIN``/``COMMIT``/``ROLLBACK`` statements do the same;
+* DDL outside a transaction, and :meth:`RemoteConnection.execute_batch`, go to
+  ``/execute`` and are applied atomically in one round trip;
+* ``PRAGMA x = y`` is ignored: connection settings belong to the server.
+
+Errors from the server are raised as the matching ``sqlite3`` exception, and an
+unreachable server as ``sqlite3.OperationalError``, so the existing
+``except sqlite3.Error`` handlers report them. Only the standard library is used.
+"""
+
+import http.client
+import json
+import re
+import socket
+import sqlite3
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+from urllib.parse import urlsplit
+
+from db_service import TOKEN_HEADER, decode_value, encode_params
+
+try:
+    from config import DATABASE_BACKEND as SETTINGS
+except Exception:
+    SETTINGS = {'mode': 'local'}
+
+_COMMENT_RE = re.compile(r'^\s*(?:(?:--[^\n]*\n)|(?:/\*.*?\*/)|\s)*', re.S)
+_WRITE_RE = re.compile(r'\b(INSERT|UPDATE|DELETE|REPLACE)\b', re.I)
+_DML = {'INSERT', 'UPDATE', 'DELETE', 'REPLACE', 'UPSERT'}
+_READ = {'SELECT', 'VALUES', 'EXPLAIN'}
+
+
+def statement_kind(sql: str) -> str:
+    """``read``, ``write``, ``begin``, ``commit``, ``rollback``, ``setting`` or ``ddl``."""
+    head = _COMMENT_RE.sub('', sql, count=1)
+    keyword = head.split(None, 1)[0].upper().rstrip(';') if head.strip() else ''
+    if keyword in _READ:
+        return 'read'
+    if keyword == 'WITH':
+        return 'write' if _WRITE_RE.search(head) else 'read'
+    if keyword in _DML:
+        return 'write'
+    if keyword == 'BEGIN':
+        return 'begin'
+    if keyword in ('COMMIT', 'END'):
+        return 'commit'
+    if keyword == 'ROLLBACK' and not re.match(r'ROLLBACK\s+(TRANSACTION\s+)?TO\b', head, re.I):
+        return 'rollback'
+    if keyword == 'PRAGMA':
+        return 'setting' if '=' in head else 'read'
+    if keyword in ('SAVEPOINT', 'RELEASE', 'ROLLBACK'):
+        return 'write'
+    return 'ddl'
+
+
+class ServiceUnavailable(sqlite3.OperationalError):
+    """The database server could not be reached (as opposed to an error reported by it)."""
+
+
+class RemoteDatabase:
+    """Connection factory for one database service.
+
+    Args:
+        url: Base URL of the service, e.g. ``http://192.168.1.10:8765``.
+        token: Shared secret (``DATABASE_SERVICE['token']`` on the server).
+        timeout: Seconds to wait for each request.
+    """
+
+    def __init__(self, url: Optional[str] = None, token: Optional[str] = None, timeout: Optional[float] = None):
+        self.url = (url or SETTINGS.get('url', 'http://127.0.0.1:8765')).rstrip('/')
+        self.token = SETTINGS.get('token', '') if token is None else token
+        self.timeout = float(timeout if timeout is not None else SETTINGS.get('timeout', 15))
+        parts = urlsplit(self.url)
+        self._https = parts.scheme == 'https'
+        self._netloc = parts.netloc
+        self._prefix = parts.path.rstrip('/')
+        self._local = threading.local()
+
+    def connect(self) -> 'RemoteConnection':
+        return RemoteConnection(self)
+
+    def health(self) -> Dict[str, Any]:
+        """Server status; raises :class:`ServiceUnavailable` when unreachable."""
+        return self.request('GET', '/health')
+
+    def apply_operations(self, operations: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Replay offline-journal operations on the server; returns their outcomes."""
+        return self.request('POST', '/replay', {'operations': operations})['outcomes']
+
+    # ---- transport ----
+    def _http(self) -> http.client.HTTPConnection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            cls = http.client.HTTPSConnection if self._https else http.client.HTTPConnection
+            conn = self._local.conn = cls(self._netloc, timeout=self.timeout)
+        return conn
+
+    def _drop(self) -> None:
+        conn = getattr(self._local, 'conn', None)
+        self._local.conn = None
+        if conn is not None:
+            conn.close()
+
+    def request(self, method: str, path: str, payload: Optional[Dict] = None) -> Dict[str, Any]:
+        """Send one request on this thread's keep-alive connection and decode the reply."""
+        body = json.dumps(payload).encode('utf-8') if payload is not None else None
+        headers = {'Content-Type': 'application/json', TOKEN_HEADER: self.token}
+        for attempt in (1, 2):
+            conn = self._http()
+            reused = conn.sock is not None
+            try:
+                conn.request(method, self._prefix + path, body=body, headers=headers)
+            except (BrokenPipeError, ConnectionResetError, http.client.HTTPException) as e:
+                # The server dropped an idle keep-alive connection before the request was sent
+                self._drop()
+                if reused and attempt == 1:
+                    continue
+                raise ServiceUnavailable(f"database server unreachable ({self.url}): {e}") from e
+            except OSError as e:
+                self._drop()
+                raise ServiceUnavailable(f"database server unreachable ({self.url}): {e}") from e
+            try:
+                response = conn.getresponse()
+                data = response.read()
+            except http.client.RemoteDisconnected as e:
+                self._drop()
+                if reused and attempt == 1 and path in ('/health', '/query'):
+                    continue
+                raise ServiceUnavailable(f"database server closed the connection: {e}") from e
+            except (socket.timeout, OSError, http.client.HTTPException) as e:
+                self._drop()
+                raise ServiceUnavailable(f"database server did not respond ({self.url}): {e}") from e
+            if response.getheader('Connection', '').lower() == 'close':
+                self._drop()
+            try:
+                reply = json.loads(data.decode('utf-8')) if data else {}
+            except ValueError:
+                reply = {'error': data[:200].decode('utf-8', 'replace'), 'type': 'OperationalError'}
+            if response.status >= 400:
+                error_cls = getattr(sqlite3, str(reply.get('type', '')), None)
+                if not (isinstance(error_cls, type) and issubclass(error_cls, sqlite3.Error)):
+                    error_cls = sqlite3.OperationalError
+                raise error_cls(reply.get('error') or f"database server error {response.status}")
+            return reply
+        raise ServiceUnavailable(f"database server unreachable ({self.url})")
+
+
+class RemoteCursor:
+    """``sqlite3.Cursor`` look-alike over results returned by the service."""
+
+    arraysize = 1
+
+    def __init__(self, connection: 'RemoteConnection'):
+        self.connection = connection
+        self.description = None
+        self.rowcount = -1
+        self.lastrowid = None
+        self._rows: List[tuple] = []
+        self._pos = 0
+
+    def _load(self, result: Optional[Dict[str, Any]]) -> 'RemoteCursor':
+        result = result or {}
+        columns = result.get('columns')
+        self.description = tuple((c, None, None, None, None, None, None) for c in columns) if columns else None
+        self._rows = [tuple(decode_value(v) for v in row) for row in result.get('rows') or []]
+        self._pos = 0
+        self.rowcount = result.get('rowcount', -1)
+        if result.get('lastrowid') is not None:
+            self.lastrowid = result['lastrowid']
+        return self
+
+    def execute(self, sql: str, parameters: Any = ()) -> 'RemoteCursor':
+        return self._load(self.connection._run(sql, parameters))
+
+    def executemany(self, sql: str, seq_of_parameters: Iterable[Any]) -> 'RemoteCursor':
+        return self._load(self.connection._run(sql, list(seq_of_parameters), many=True))
+
+    def fetchone(self) -> Optional[tuple]:
+        if self._pos >= len(self._rows):
+            return None
+        row = self._rows[self._pos]
+        self._pos += 1
+        return row
+
+    def fetchmany(self, size: Optional[int] = None) -> List[tuple]:
+        size = size or self.arraysize
+        rows = self._rows[self._pos:self._pos + size]
+        self._pos += len(rows)
+        return rows
+
+    def fetchall(self) -> List[tuple]:
+        rows = self._rows[self._pos:]
+        self._pos = len(self._rows)
+        return rows
+
+    def __iter__(self):
+        while True:
+            row = self.fetchone()
+            if row is None:
+                return
+            yield row
+
+    def close(self) -> None:
+        self._rows = []
+
+
+class RemoteConnection:
+    """``sqlite3.Connection`` look-alike backed by the database service."""
+
+    def __init__(self, database: RemoteDatabase):
+        self.database = database
+        self._tx: Optional[str] = None
+        self._closed = False
+
+    @property
+    def in_transaction(self) -> bool:
+        return self._tx is not None
+
+    def _check_open(self) -> None:
+        if self._closed:
+            raise sqlite3.ProgrammingError("Cannot operate on a closed database.")
+
+    def _statement(self, sql: str, parameters: Any, many: bool = False) -> Dict[str, Any]:
+        if many:
+            return {'sql': sql, 'params': [encode_params(p) for p in parameters], 'many': True}
+        return {'sql': sql, 'params': encode_params(parameters)}
+
+    def _begin(self) -> None:
+        if self._tx is None:
+            self._tx = self.database.request('POST', '/tx')['tx']
+
+    def _run(self, sql: str, parameters: Any, many: bool = False) -> Optional[Dict[str, Any]]:
+        self._check_open()
+        kind = statement_kind(sql)
+        if kind == 'begin':
+            if self._tx is not None:
+                raise sqlite3.OperationalError("cannot start a transaction within a transaction")
+            self._begin()
+            return None
+        if kind == 'commit':
+            self.commit()
+            return None
+        if kind == 'rollback':
+            self.rollback()
+            return None
+        if kind == 'setting':
+            return None
+        statement = self._statement(sql, parameters, many)
+        if self._tx is None:
+            if kind == 'read':
+                return self.database.request('POST', '/query', {'statements': [statement]})['results'][0]
+            if kind == 'ddl':
+                return self.database.request('POST', '/execute', {'statements': [statement]})['results'][0]
+            self._begin()
+        return self.database.request('POST', f'/tx/{self._tx}', {'statements': [statement]})['results'][0]
+
+    # ---- sqlite3.Connection API ----
+    def cursor(self) -> RemoteCursor:
+        self._check_open()
+        return RemoteCursor(self)
+
+    def execute(self, sql: str, parameters: Any = ()) -> RemoteCursor:
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql: str, seq_of_parameters: Iterable[Any]) -> RemoteCursor:
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+    def commit(self) -> None:
+        self._check_open()
+        if self._tx is not None:
+            tx, self._tx = self._tx, None
+            self.database.request('POST', f'/tx/{tx}/commit')
+
+    def rollback(self) -> None:
+        self._check_open()
+        if self._tx is not None:
+            tx, self._tx = self._tx, None
+            self.database.request('POST', f'/tx/{tx}/rollback')
+
+    def close(self) -> None:
+        if self._closed:
+            return
+        try:
+            # sqlite3 discards uncommitted changes on close
+            self.rollback()
+        except sqlite3.Error:
+            pass
+        self._closed = True
+
+    def execute_batch(self, statements: Sequence[Any]) -> List[RemoteCursor]:
+        """Apply ``(sql, params)`` pairs atomically in one round trip; returns a cursor per statement.
+
+        Outside a transaction the batch is queued on the server and may be
+        committed together with other tills' batches; inside one it joins it.
+        """
+        self._check_open()
+        payload = {'statements': [self._statement(sql, params or ()) for sql, params in statements]}
+        path = f'/tx/{self._tx}' if self._tx is not None else '/execute'
+        results = self.database.request('POST', path, payload)['results']
+        return [RemoteCursor(self)._load(r) for r in results]
+
+    def __enter__(self) -> 'RemoteConnection':
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        if exc_type is None:
+            self.commit()
+        else:
+            self.rollback()
+        return False
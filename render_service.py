@@ -0,0 +1,457 @@
+"""
+Background document rendering for the Cameroon Construction Project Management System
+
+Contract and inventory PDFs are laid out in a worker process so the Tkinter event
+loop never blocks on ReportLab. Page geometry, paragraph styles, table styles and
+registered fonts are built once per worker and reused for every job, and several
+contracts or store sections can be rendered into a single document in one job.
+"""
+
+import logging
+import os
+import queue
+import time
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import lru_cache
+from types import SimpleNamespace
+from typing import Any, Callable, Dict, List, Optional
+
+try:
+    from config import DOCUMENT_RENDER_SETTINGS
+except Exception:
+    DOCUMENT_RENDER_SETTINGS = {}
+
+logger = logging.getLogger(__name__)
+
+JOB_CONTRACTS = 'contracts'
+JOB_INVENTORY = 'inventory'
+
+
+# ---------------------------------------------------------------------------
+# Worker side: everything below runs inside the rendering process
+# ---------------------------------------------------------------------------
+
+@lru_cache(maxsize=1)
+def _reportlab() -> SimpleNamespace:
+    """Import ReportLab once per worker process.
+
+    Returns:
+        SimpleNamespace: The ReportLab names used by the renderers.
+
+    Raises:
+        ImportError: If ReportLab is not installed.
+    """
+    from reportlab.lib import colors
+    from reportlab.lib.pagesizes import A4
+    from reportlab.lib.styles import getSampleStyleSheet
+    from reportlab.lib.units import cm
+    from reportlab.lib.utils import simpleSplit
+    from reportlab.pdfgen import canvas
+    from reportlab.platypus import PageBreak, Paragraph, SimpleDocTemplate, Spacer, Table, TableStyle
+    return SimpleNamespace(
+        colors=colors, A4=A4, getSampleStyleSheet=getSampleStyleSheet, cm=cm,
+        simpleSplit=simpleSplit, canvas=canvas, PageBreak=PageBreak, Paragraph=Paragraph,
+        SimpleDocTemplate=SimpleDocTemplate, Spacer=Spacer, Table=Table, TableStyle=TableStyle,
+    )
+
+
+@lru_cache(maxsize=1)
+def _fonts() -> Dict[str, str]:
+    """Register the configured body font once and return the font names to use.
+
+    Falls back to the built-in Helvetica family when no TTF is configured or the
+    file cannot be registered.
+    """
+    fonts = {'regular': 'Helvetica', 'bold': 'Helvetica-Bold', 'italic': 'Helvetica-Oblique'}
+    font_path = DOCUMENT_RENDER_SETTINGS.get('font_path')
+    if not font_path or not os.path.exists(font_path):
+        return fonts
+    try:
+        from reportlab.pdfbase import pdfmetrics
+        from reportlab.pdfbase.ttfonts import TTFont
+        pdfmetrics.registerFont(TTFont('CBPMBody', font_path))
+        fonts['regular'] = 'CBPMBody'
+    except Exception as e:
+        logger.warning("Could not register font %s: %s", font_path, e)
+    return fonts
+
+
+@lru_cache(maxsize=1)
+def _contract_template() -> SimpleNamespace:
+    """Pre-compute the contract page layout shared by every contract page."""
+    rl = _reportlab()
+    width, height = rl.A4
+    return SimpleNamespace(
+        width=width,
+        height=height,
+        left=2.0 * rl.cm,
+        right=width - 2.0 * rl.cm,
+        top=height - 2.0 * rl.cm,
+        bottom=2.5 * rl.cm,
+        label_indent=3.7 * rl.cm,
+        text_width=width - 4.0 * rl.cm,
+        fonts=_fonts(),
+    )
+
+
+@lru_cache(maxsize=1)
+def _inventory_styles() -> SimpleNamespace:
+    """Build the inventory stylesheet and table style once per worker."""
+    rl = _reportlab()
+    return SimpleNamespace(
+        sheet=rl.getSampleStyleSheet(),
+        table=rl.TableStyle([
+            ('BACKGROUND', (0, 0), (-1, 0), rl.colors.lightgrey),
+            ('GRID', (0, 0), (-1, -1), 0.5, rl.colors.grey),
+            ('FONTSIZE', (0, 0), (-1, -1), 8),
+            ('ALIGN', (4, 1), (8, -1), 'RIGHT'),
+        ]),
+    )
+
+
+def _wrap(text: Any, font: str, size: float, width: float) -> List[str]:
+    """Wrap text to the given width, caching repeated strings like boilerplate clauses."""
+    return list(_wrap_cached(str(text or ''), font, size, width))
+
+
+@lru_cache(maxsize=1024)
+def _wrap_cached(text: str, font: str, size: float, width: float) -> tuple:
+    return tuple(_reportlab().simpleSplit(text, font, size, width))
+
+
+def _define_contract_footer(c: Any, footer: str) -> None:
+    """Compile the static page footer into a reusable PDF form (XObject)."""
+    t = _contract_template()
+    c.beginForm('cbpm_contract_footer')
+    c.setFont(t.fonts['italic'], 9)
+    c.drawString(t.left, 1.6 * _reportlab().cm, footer)
+    c.endForm()
+
+
+def _draw_contract(c: Any, contract: Dict[str, Any]) -> None:
+    """Lay out one contract starting at the top of the current page."""
+    rl = _reportlab()
+    t = _contract_template()
+    f = t.fonts
+    y = t.top
+
+    def ensure_space() -> None:
+        nonlocal y
+        if y < t.bottom:
+            c.doForm('cbpm_contract_footer')
+            c.showPage()
+            y = t.top
+
+    def label_value(label: str, value: Any) -> None:
+        nonlocal y
+        ensure_space()
+        c.setFont(f['bold'], 11)
+        c.drawString(t.left, y, f"{label}:")
+        c.setFont(f['regular'], 11)
+        wrapped = _wrap(value, f['regular'], 11, t.right - t.left - t.label_indent)
+        if wrapped:
+            c.drawString(t.left + t.label_indent, y, wrapped[0])
+            for line in wrapped[1:]:
+                y -= 0.55 * rl.cm
+                c.drawString(t.left + t.label_indent, y, line)
+        y -= 0.7 * rl.cm
+
+    def paragraph(label: str, text: Any) -> None:
+        nonlocal y
+        ensure_space()
+        c.setFont(f['bold'], 12)
+        c.drawString(t.left, y, f"{label}:")
+        y -= 0.5 * rl.cm
+        c.setFont(f['regular'], 11)
+        for line in _wrap(text, f['regular'], 11, t.text_width):
+            if y < t.bottom:
+                ensure_space()
+                c.setFont(f['regular'], 11)
+            c.drawString(t.left, y, line)
+            y -= 0.5 * rl.cm
+        y -= 0.3 * rl.cm
+
+    c.setFont(f['bold'], 16)
+    c.drawString(t.left, y, f"Contract #{contract.get('id')}: {contract.get('title') or ''}")
+    y -= 0.8 * rl.cm
+    c.setFont(f['regular'], 10)
+    c.drawString(t.left, y, f"Owner: {contract.get('owner_name') or ''}")
+    c.drawRightString(t.right, y, f"Date Created: {contract.get('created_date') or ''}")
+    y -= 0.6 * rl.cm
+    c.drawString(t.left, y, f"Contractor: {contract.get('contractor_name') or 'Not Assigned'}")
+    c.drawRightString(t.right, y, f"Status: {contract.get('status') or ''}")
+    y -= 0.4 * rl.cm
+    c.line(t.left, y, t.right, y)
+    y -= 0.6 * rl.cm
+
+    if 'contract_kind' in contract:
+        label_value("Contract Kind", contract.get('contract_kind') or 'Labour Only')
+        label_value("Includes Materials", "Yes" if contract.get('includes_materials') in (1, True) else "No")
+    budget = contract.get('budget')
+    label_value("Budget", f"{float(budget):,.0f} FCFA" if budget is not None else "N/A")
+    label_value("Start Date", contract.get('start_date') or 'N/A')
+    label_value("End Date", contract.get('end_date') or 'N/A')
+
+    paragraph("Description", contract.get('description') or "No description provided.")
+    if 'requirements' in contract:
+        paragraph("Requirements", contract.get('requirements') or "No requirements provided.")
+
+    if y < 3.0 * rl.cm:
+        c.doForm('cbpm_contract_footer')
+        c.showPage()
+    c.setFont(f['bold'], 12)
+    c.drawString(t.left, 3.2 * rl.cm, 'Digital Signatures')
+    c.setFont(f['regular'], 10)
+    c.drawString(t.left, 2.6 * rl.cm, contract.get('owner_signature_line') or 'Owner: Not signed')
+    c.drawString(t.left, 2.2 * rl.cm, contract.get('contractor_signature_line') or 'Contractor: Not signed')
+    c.doForm('cbpm_contract_footer')
+    c.setFont(f['italic'], 9)
+    c.drawRightString(t.right, 1.6 * rl.cm, contract.get('printed_at') or '')
+    c.showPage()
+
+
+def render_contracts(contracts: List[Dict[str, Any]], filename: str,
+                     footer: str = 'Generated by Cameroon Building Project Management System') -> Dict[str, Any]:
+    """Render one or more contracts into a single PDF.
+
+    Args:
+        contracts: Contract payloads as prepared by the UI (plain dicts, picklable).
+        filename: Destination PDF path.
+        footer: Footer text compiled once and stamped on every page.
+
+    Returns:
+        Dict: Job summary with the output path and number of contracts rendered.
+    """
+    rl = _reportlab()
+    c = rl.canvas.Canvas(filename, pagesize=rl.A4)
+    _define_contract_footer(c, footer)
+    for contract in contracts:
+        _draw_contract(c, contract)
+    c.save()
+    return {'path': filename, 'documents': len(contracts)}
+
+
+def _write_inventory_text(sections: List[Dict[str, Any]], header: List[str], filename: str, title: str) -> str:
+    """Plain-text fallback used when ReportLab is unavailable."""
+    from datetime import datetime as _dt
+    alt = filename[:-4] + ".txt" if filename.lower().endswith('.pdf') else filename + ".txt"
+    with open(alt, 'w', encoding='utf-8') as f:
+        f.write(f"{title}\nGenerated: {_dt.now().isoformat(sep=' ')}\n")
+        for section in sections:
+            if section.get('heading'):
+                f.write(f"\n== {section['heading']} ==\n")
+            for line in (section.get('filters'), section.get('summary')):
+                if line:
+                    f.write(f"{line}\n")
+            if section.get('rows') is None:
+                continue
+            f.write("\n" + " | ".join(str(h) for h in header) + "\n")
+            f.write("-" * 120 + "\n")
+            for row in section.get('rows', []):
+                f.write(" | ".join(str(x) for x in row) + "\n")
+    return alt
+
+
+def render_inventory(sections: List[Dict[str, Any]], header: List[str], filename: str,
+                     title: str = "Inventory Report") -> Dict[str, Any]:
+    """Render inventory sections (one per store) into a single PDF.
+
+    Args:
+        sections: Dicts with ``heading``, ``filters``, ``summary`` and ``rows``
+            (None for a text-only section, such as an overall summary), and
+            optionally ``page_break`` (default True; ignored for the first).
+        header: Column headings repeated at the top of every table.
+        filename: Destination PDF path.
+        title: Document title.
+
+    Returns:
+        Dict: Job summary. ``fallback`` is True when a TXT report was written instead.
+    """
+    try:
+        rl = _reportlab()
+    except ImportError:
+        return {'path': _write_inventory_text(sections, header, filename, title),
+                'documents': len(sections), 'fallback': True}
+    styles = _inventory_styles()
+    doc = rl.SimpleDocTemplate(filename, pagesize=rl.A4)
+    story: List[Any] = [rl.Paragraph(title, styles.sheet['Title'])]
+    for i, section in enumerate(sections):
+        if i and section.get('page_break', True):
+            story.append(rl.PageBreak())
+        if section.get('heading'):
+            story.append(rl.Paragraph(section['heading'], styles.sheet['Heading2']))
+        for line in (section.get('filters'), section.get('summary')):
+            if line:
+                story.append(rl.Paragraph(line, styles.sheet['Normal']))
+                story.append(rl.Spacer(1, 8))
+        if section.get('rows') is None:
+            continue
+        tbl = rl.Table([list(header)] + [list(r) for r in section.get('rows', [])], repeatRows=1)
+        tbl.setStyle(styles.table)
+        story.append(tbl)
+    doc.build(story)
+    return {'path': filename, 'documents': len(sections), 'fallback': False}
+
+
+_RENDERERS: Dict[str, Callable[..., Dict[str, Any]]] = {
+    JOB_CONTRACTS: render_contracts,
+    JOB_INVENTORY: render_inventory,
+}
+
+
+def _run_job(kind: str, kwargs: Dict[str, Any]) -> Dict[str, Any]:
+    """Worker entry point; never raises so results always reach the UI."""
+    start = time.perf_counter()
+    try:
+        result = _RENDERERS[kind](**kwargs)
+        result['ok'] = True
+    except ImportError:
+        result = {'ok': False, 'error': 'missing_reportlab',
+                  'message': "ReportLab is required to print PDF. Please install it with:\n\npip install reportlab"}
+    except Exception as e:
+        result = {'ok': False, 'error': type(e).__name__, 'message': str(e)}
+    result['kind'] = kind
+    result['elapsed'] = time.perf_counter() - start
+    return result
+
+
+# ---------------------------------------------------------------------------
+# UI side
+# ---------------------------------------------------------------------------
+
+class DocumentRenderService:
+    """Submit rendering jobs to a worker process and deliver results on the Tk thread.
+
+    Callbacks passed to :meth:`submit` are queued when a job finishes and invoked
+    from the Tk event loop by a short ``after`` poll, so they may touch widgets.
+    """
+
+    def __init__(self, root: Any = None, use_processes: Optional[bool] = None,
+                 max_workers: Optional[int] = None, poll_ms: int = 100):
+        self.root = root
+        self.use_processes = DOCUMENT_RENDER_SETTINGS.get('use_worker_process', True) \
+            if use_processes is None else use_processes
+        self.max_workers = max_workers or int(DOCUMENT_RENDER_SETTINGS.get('max_workers', 1))
+        self.poll_ms = poll_ms
+        self._executor: Optional[Executor] = None
+        self._results: "queue.Queue[tuple]" = queue.Queue()
+        self._pending = 0
+        self._polling = False
+
+    def _get_executor(self) -> Executor:
+        if self._executor is None:
+            if self.use_processes:
+                try:
+                    self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+                except Exception as e:
+                    logger.warning("Render worker process unavailable, using a thread: %s", e)
+                    self.use_processes = False
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers,
+                                                    thread_name_prefix='cbpm-render')
+        return self._executor
+
+    def submit(self, kind: str, on_done: Optional[Callable[[Dict[str, Any]], None]] = None,
+               **kwargs: Any) -> Future:
+        """Queue a rendering job.
+
+        Args:
+            kind: ``JOB_CONTRACTS`` or ``JOB_INVENTORY``.
+            on_done: Called with the job summary once the file is ready (or failed).
+            **kwargs: Arguments for the renderer; must be picklable.
+
+        Returns:
+            Future: The job future.
+        """
+        try:
+            future = self._get_executor().submit(_run_job, kind, kwargs)
+        except (BrokenProcessPool, RuntimeError) as e:
+            logger.warning("Render worker unavailable (%s); falling back to a thread", e)
+            self._reset_to_threads()
+            future = self._get_executor().submit(_run_job, kind, kwargs)
+        self._pending += 1
+
+        def _done(fut: Future) -> None:
+            try:
+                result = fut.result()
+            except BrokenProcessPool:
+                result = _run_job(kind, kwargs)
+            except Exception as e:
+                result = {'ok': False, 'kind': kind, 'error': type(e).__name__, 'message': str(e)}
+            self._results.put((on_done, result))
+
+        future.add_done_callback(_done)
+        self._ensure_polling()
+        return future
+
+    def submit_contracts(self, contracts: List[Dict[str, Any]], filename: str,
+                         on_done: Optional[Callable[[Dict[str, Any]], None]] = None, **kwargs: Any) -> Future:
+        """Render one or many contracts into ``filename`` as a single job."""
+        return self.submit(JOB_CONTRACTS, on_done, contracts=contracts, filename=filename, **kwargs)
+
+    def submit_inventory(self, sections: List[Dict[str, Any]], header: List[str], filename: str,
+                         on_done: Optional[Callable[[Dict[str, Any]], None]] = None, **kwargs: Any) -> Future:
+        """Render one or many store inventory sections into ``filename`` as a single job."""
+        return self.submit(JOB_INVENTORY, on_done, sections=sections, header=header, filename=filename, **kwargs)
+
+    def _reset_to_threads(self) -> None:
+        try:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False)
+        except Exception:
+            pass
+        self._executor = None
+        self.use_processes = False
+
+    def _ensure_polling(self) -> None:
+        if self.root is None:
+            return
+        if not self._polling:
+            self._polling = True
+            try:
+                self.root.after(self.poll_ms, self._poll)
+            except Exception:
+                self._polling = False
+
+    def _poll(self) -> None:
+        """Deliver finished jobs on the Tk thread, then reschedule while work is pending."""
+        self.drain()
+        if self._pending > 0:
+            try:
+                self.root.after(self.poll_ms, self._poll)
+                return
+            except Exception:
+                pass
+        self._polling = False
+
+    def drain(self) -> int:
+        """Invoke callbacks for all finished jobs. Returns the number delivered."""
+        delivered = 0
+        while True:
+            try:
+                callback, result = self._results.get_nowait()
+            except queue.Empty:
+                break
+            self._pending = max(0, self._pending - 1)
+            delivered += 1
+            if result.get('ok'):
+                logger.info("Rendered %s job (%s document(s)) in %.2fs -> %s", result.get('kind'),
+                            result.get('documents'), result.get('elapsed', 0.0), result.get('path'))
+            else:
+                logger.warning("Render job %s failed: %s", result.get('kind'), result.get('message'))
+            if callback is not None:
+                try:
+                    callback(result)
+                except Exception:
+                    logger.exception("Render callback failed")
+        return delivered
+
+    def shutdown(self, wait: bool = False) -> None:
+        """Stop the worker. Pending jobs are cancelled unless ``wait`` is True."""
+        if self._executor is not None:
+            try:
+                self._executor.shutdown(wait=wait, cancel_futures=not wait)
+            except Exception:
+                pass
+            self._executor = None
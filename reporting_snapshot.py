@@ -0,0 +1,263 @@
+"""
+Read-only reporting snapshot
+
+Store Analytics, Financial Reports and System Statistics aggregate the whole
+``transactions`` table. Run against the live file they compete with the tills
+for the WAL and the page cache. :class:`SnapshotManager` copies the live
+database with the SQLite backup API into a separate file every
+``REPORTING_SNAPSHOT['refresh_interval_s']`` seconds (on a background thread).
+It then adds reporting-only indexes and the ``sales_daily`` rollup to the copy,
+and publishes it under a new name. Report screens open the newest published
+file read-only (``immutable=1``: no locks, no WAL) and show how old it is.
+
+Each snapshot file is written once and never modified, so readers that still
+hold an older one are unaffected by a refresh. Superseded files are deleted
+when no longer open (Windows keeps open files locked; they are retried on the
+next refresh).
+"""
+
+import glob
+import logging
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, Optional
+from urllib.request import pathname2url
+
+try:
+    from config import REPORTING_SNAPSHOT as SETTINGS
+except Exception:
+    SETTINGS = {'enabled': True, 'refresh_interval_s': 900}
+
+logger = logging.getLogger(__name__)
+
+# Expression indexes matching the date(...) filters in queries.py, covering the summed columns
+REPORTING_INDEXES = (
+    "CREATE INDEX IF NOT EXISTS idx_rpt_tx_day ON transactions("
+    "date(transaction_date), store_id, material_id, quantity, total_amount)",
+    "CREATE INDEX IF NOT EXISTS idx_rpt_tx_ts_day ON transactions("
+    "date(timestamp), store_id, material_id, quantity, total_amount)",
+    "CREATE INDEX IF NOT EXISTS idx_rpt_audit_day ON audit_log(date(timestamp))",
+)
+
+# Daily sales per store and material, once per date basis used by the report screens
+ROLLUP_SQL = (
+    '''
+    CREATE TABLE sales_daily
+    (
+        basis TEXT NOT NULL,
+        day TEXT NOT NULL,
+        store_id INTEGER,
+        material_id INTEGER,
+        tx_count INTEGER NOT NULL,
+        quantity REAL NOT NULL,
+        revenue INTEGER NOT NULL
+    )
+    ''',
+    '''
+    INSERT INTO sales_daily (basis, day, store_id, material_id, tx_count, quantity, revenue)
+    SELECT 'transaction_date', date(transaction_date), store_id, material_id,
+           COUNT(*), COALESCE(SUM(quantity), 0), COALESCE(SUM(total_amount), 0)
+    FROM transactions WHERE date(transaction_date) IS NOT NULL
+    GROUP BY 2, 3, 4
+    ''',
+    '''
+    INSERT INTO sales_daily (basis, day, store_id, material_id, tx_count, quantity, revenue)
+    SELECT 'timestamp', date(timestamp), store_id, material_id,
+           COUNT(*), COALESCE(SUM(quantity), 0), COALESCE(SUM(total_amount), 0)
+    FROM transactions WHERE date(timestamp) IS NOT NULL
+    GROUP BY 2, 3, 4
+    ''',
+    "CREATE INDEX idx_sales_daily ON sales_daily(basis, day, store_id, material_id)",
+)
+
+
+class SnapshotManager:
+    """Builds, publishes and opens the reporting snapshot of ``db_path``.
+
+    Args:
+        db_path: The live database.
+        settings: Overrides for ``config.REPORTING_SNAPSHOT``.
+    """
+
+    def __init__(self, db_path: str, settings: Optional[Dict[str, Any]] = None):
+        self.db_path = os.path.abspath(db_path)
+        self.settings = dict(SETTINGS, **(settings or {}))
+        directory = self.settings.get('directory') or os.path.join(os.path.dirname(self.db_path),
+                                                                   'reporting_snapshots')
+        self.directory = directory
+        self.prefix = os.path.splitext(os.path.basename(self.db_path))[0] + '.reporting-'
+        self.building = False
+        self.last_error: Optional[str] = None
+        self._lock = threading.Lock()
+        self._root = None
+        self._after_id = None
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.settings.get('enabled', True))
+
+    # ---- published files ----
+    def _published(self):
+        return sorted(glob.glob(os.path.join(glob.escape(self.directory), self.prefix + '*.db')))
+
+    def current_path(self) -> Optional[str]:
+        files = self._published()
+        return files[-1] if files else None
+
+    def freshness(self) -> Optional[Dict[str, Any]]:
+        """``built_at``, ``age_s`` and ``stale`` of the current snapshot, or None if there is none."""
+        path = self.current_path()
+        if not path:
+            return None
+        stamp = os.path.basename(path)[len(self.prefix):-3]
+        try:
+            built_at = datetime.strptime(stamp, '%Y%m%d-%H%M%S')
+        except ValueError:
+            built_at = datetime.fromtimestamp(os.path.getmtime(path))
+        age = (datetime.now() - built_at).total_seconds()
+        stale_after = float(self.settings.get('stale_after_s', 2 * self.settings.get('refresh_interval_s', 900)))
+        return {'path': path, 'built_at': built_at, 'age_s': age, 'stale': age > stale_after}
+
+    def describe(self) -> str:
+        """One-line freshness text for the report screens."""
+        if not self.enabled:
+            return "Live data"
+        if self.building and not self.current_path():
+            return "Preparing reporting snapshot... (showing live data)"
+        info = self.freshness()
+        if info is None:
+            return "Live data (no reporting snapshot yet)"
+        minutes = int(info['age_s'] // 60)
+        age = "just now" if minutes < 1 else f"{minutes} min ago" if minutes < 120 else f"{minutes // 60} h ago"
+        text = f"Data as of {info['built_at']:%d/%m/%Y %H:%M} ({age})"
+        if self.building:
+            text += " - updating..."
+        elif info['stale']:
+            text += " - out of date"
+        return text
+
+    def connect(self) -> Optional[sqlite3.Connection]:
+        """Read-only connection to the current snapshot, or None when there is none (use the live DB)."""
+        if not self.enabled:
+            return None
+        path = self.current_path()
+        if not path:
+            return None
+        uri = f"file:{pathname2url(path)}?mode=ro&immutable=1"
+        conn = sqlite3.connect(uri, uri=True)
+        try:
+            from db_profiles import profile_pragmas
+            pragmas = profile_pragmas('reporting')
+            conn.execute(f"PRAGMA cache_size={int(pragmas.get('cache_size', -65536))}")
+            conn.execute(f"PRAGMA mmap_size={int(pragmas.get('mmap_size', 0))}")
+        except Exception:
+            pass
+        return conn
+
+    # ---- building ----
+    def build(self, log: Callable[[str], None] = lambda msg: None) -> str:
+        """Copy the live database, add reporting indexes and rollups, publish; returns the new path."""
+        with self._lock:
+            self.building = True
+            try:
+                return self._build(log)
+            except Exception as e:
+                self.last_error = str(e)
+                raise
+            finally:
+                self.building = False
+
+    def _build(self, log: Callable[[str], None]) -> str:
+        os.makedirs(self.directory, exist_ok=True)
+        stamp = datetime.now().strftime('%Y%m%d-%H%M%S')
+        final = os.path.join(self.directory, f"{self.prefix}{stamp}.db")
+        tmp = final + '.tmp'
+        t0 = time.perf_counter()
+        source = sqlite3.connect(self.db_path, timeout=5)
+        target = sqlite3.connect(tmp)
+        try:
+            # One step: a single read transaction, which in WAL mode does not block the tills
+            source.backup(target)
+            log(f"copied in {time.perf_counter() - t0:.1f}s")
+            target.execute("PRAGMA journal_mode=DELETE")
+            for sql in REPORTING_INDEXES:
+                try:
+                    target.execute(sql)
+                except sqlite3.OperationalError as e:
+                    print(f"[WARN] reporting index skipped: {e}")
+            for sql in ROLLUP_SQL:
+                target.execute(sql)
+            target.execute("CREATE TABLE snapshot_meta (key TEXT PRIMARY KEY, value TEXT)")
+            target.executemany("INSERT INTO snapshot_meta VALUES (?, ?)",
+                               [('built_at', datetime.now().isoformat(timespec='seconds')),
+                                ('source', self.db_path)])
+            target.commit()
+            target.execute("ANALYZE")
+            target.commit()
+        finally:
+            target.close()
+            source.close()
+        os.replace(tmp, final)
+        self.last_error = None
+        log(f"published {os.path.basename(final)} in {time.perf_counter() - t0:.1f}s")
+        self._remove_superseded(final)
+        return final
+
+    def _remove_superseded(self, keep: str) -> None:
+        for path in self._published() + glob.glob(os.path.join(glob.escape(self.directory), self.prefix + '*.tmp')):
+            if path != keep:
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass   # still open by a report window; removed after a later refresh
+
+    def refresh_in_background(self) -> bool:
+        """Build on a daemon thread; False if a build is already running. Poll :attr:`building`."""
+        if self.building or not self.enabled:
+            return False
+        self.building = True
+
+        def work():
+            try:
+                self.build(log=lambda msg: logger.debug("reporting snapshot: %s", msg))
+            except Exception as e:
+                print(f"[WARN] reporting snapshot failed: {e}")
+            finally:
+                self.building = False
+
+        threading.Thread(target=work, name='reporting-snapshot', daemon=True).start()
+        return True
+
+    # ---- periodic refresh from the Tk loop ----
+    def start(self, root) -> None:
+        """Build now if missing or stale, then every ``refresh_interval_s`` seconds."""
+        if not self.enabled:
+            return
+        self._root = root
+        info = self.freshness()
+        if info is None or info['age_s'] >= float(self.settings.get('refresh_interval_s', 900)):
+            self.refresh_in_background()
+        self._schedule()
+
+    def stop(self) -> None:
+        if self._root is not None and self._after_id is not None:
+            try:
+                self._root.after_cancel(self._after_id)
+            except Exception:
+                pass
+        self._root = None
+        self._after_id = None
+
+    def _schedule(self) -> None:
+        if self._root is not None:
+            self._after_id = self._root.after(int(float(self.settings.get('refresh_interval_s', 900)) * 1000),
+                                              self._tick)
+
+    def _tick(self) -> None:
+        try:
+            self.refresh_in_background()
+        finally:
+            self._schedule()
@@ -0,0 +1,394 @@
+"""
+Synthetic data generator for load testing and benchmarks
+
+Builds a database with the application's own schema
+(``DatabaseManager.create_tables``), then fills it with realistic volumes:
+thousands of stores, millions of transactions, audit rows, jobs and job
+applications, purchase requests and contract payments.
+
+Distributions are deliberately skewed, like production data:
+
+* a few owners hold many stores and a few stores do most of the sales
+  (Zipf-like weights);
+* a small set of materials accounts for most sales lines;
+* timestamps are weighted toward recent days;
+* a few jobs receive most of the applications.
+
+Every value comes from a single ``random.Random(seed)``, so the same seed and
+scale produce the same database.
+
+Usage:
+    python setup.py --synthetic small --db load_test.db
+    python seed_data.py --scale medium --db load_test.db --transactions 2000000
+"""
+
+import argparse
+import bisect
+import itertools
+import json
+import os
+import random
+import sqlite3
+import sys
+import time
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence
+
+from store_contacts import contact_columns
+
+# Row counts at scale 1.0 ("medium"); every count is multiplied by the scale factor
+BASE_COUNTS = {
+    'stores': 2_000,
+    'owners': 400,
+    'managers': 1_200,
+    'contractors': 800,
+    'employers': 300,
+    'job_seekers': 10_000,
+    'transactions': 1_000_000,
+    'audit_log': 500_000,
+    'jobs': 20_000,
+    'applications': 150_000,
+    'purchase_requests': 20_000,
+    'contracts': 3_000,
+    'contract_payments': 15_000,
+}
+
+SCALES = {'tiny': 0.005, 'small': 0.05, 'medium': 1.0, 'large': 5.0}
+
+DEFAULT_SEED = 42
+DEFAULT_PASSWORD = 'LoadTest123'
+BATCH_SIZE = 20_000
+HISTORY_DAYS = 730
+
+CITIES = ['Douala', 'Yaoundé', 'Bafoussam', 'Garoua', 'Bamenda', 'Maroua', 'Ngaoundéré', 'Bertoua',
+          'Kribi', 'Limbe', 'Buea', 'Ebolowa', 'Kumba', 'Edéa', 'Dschang', 'Foumban']
+STORE_CATEGORIES = ['General Building Materials', 'Cement & Concrete', 'Steel & Metal Products',
+                    'Timber & Wood Products', 'Roofing Materials', 'Plumbing & Electrical', 'Paint & Finishes',
+                    'Tools & Equipment', 'Wholesale Distributor', 'Retail Outlet']
+FIRST_NAMES = ['Jean', 'Marie', 'Paul', 'Alice', 'David', 'Esther', 'Samuel', 'Grace', 'Emmanuel', 'Brigitte',
+               'Joseph', 'Christelle', 'Pierre', 'Sandrine', 'André', 'Josiane', 'Didier', 'Aurélie']
+LAST_NAMES = ['Mballa', 'Nguesso', 'Foko', 'Kamto', 'Tchoua', 'Ngono', 'Essomba', 'Fotso', 'Nkeng', 'Atangana',
+              'Eto', 'Manga', 'Mbarga', 'Ndjock', 'Tabi', 'Abena', 'Owona', 'Djomo']
+JOB_TITLES = ['Mason', 'Electrician', 'Carpenter', 'Plumber', 'Site Supervisor', 'Welder', 'Painter',
+              'Heavy Equipment Operator', 'Tiler', 'Roofer', 'Quantity Surveyor', 'Foreman', 'Labourer']
+JOB_TYPES = ['Full-time', 'Part-time', 'Contract', 'Temporary', 'Internship']
+AUDIT_ACTIONS = ['Login', 'Logout', 'Record Sale', 'Product Transfer', 'Update Inventory', 'Create Store',
+                 'Approve Purchase Request & Transfer', 'Create Contract', 'Add Payment', 'Apply Job']
+APPLICATION_STATUSES = ['Submitted', 'Submitted', 'Submitted', 'Reviewed', 'Shortlisted', 'Rejected', 'Hired']
+REQUEST_STATUSES = ['Pending', 'Pending', 'Approved', 'Approved', 'Approved', 'Rejected']
+
+
+def scaled_counts(scale: float, overrides: Optional[Dict[str, int]] = None) -> Dict[str, int]:
+    """Row counts for ``scale``, with explicit ``overrides`` taking precedence."""
+    counts = {k: max(1, int(v * scale)) for k, v in BASE_COUNTS.items()}
+    counts['stores'] = max(2, counts['stores'])
+    for key, value in (overrides or {}).items():
+        if value is not None:
+            counts[key] = int(value)
+    return counts
+
+
+class SkewedChoice:
+    """Draw items with Zipf-like weights (item ``i`` has weight ``1 / (i + 1) ** s``).
+
+    The item list is shuffled first so that "popular" is not tied to id order.
+    """
+
+    def __init__(self, rng: random.Random, items: Sequence[Any], s: float = 1.1):
+        self.rng = rng
+        self.items = list(items)
+        rng.shuffle(self.items)
+        self.cum = list(itertools.accumulate(1.0 / (i + 1) ** s for i in range(len(self.items))))
+
+    def __call__(self) -> Any:
+        return self.items[bisect.bisect(self.cum, self.rng.random() * self.cum[-1])]
+
+
+def recent_timestamp(rng: random.Random, now: datetime, mean_days: float = 90.0) -> datetime:
+    """A timestamp in the last ``HISTORY_DAYS`` days, weighted toward today."""
+    days = min(rng.expovariate(1.0 / mean_days), HISTORY_DAYS)
+    return now - timedelta(days=days, seconds=rng.randint(0, 86_399))
+
+
+def _batched(rows: Iterable[tuple], size: int = BATCH_SIZE) -> Iterator[List[tuple]]:
+    it = iter(rows)
+    while True:
+        batch = list(itertools.islice(it, size))
+        if not batch:
+            return
+        yield batch
+
+
+def _insert(conn: sqlite3.Connection, sql: str, rows: Iterable[tuple]) -> int:
+    """executemany in batches, one transaction per batch; returns the row count."""
+    total = 0
+    for batch in _batched(rows):
+        conn.executemany(sql, batch)
+        conn.commit()
+        total += len(batch)
+    return total
+
+
+def _person(rng: random.Random) -> str:
+    return f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}"
+
+
+def _phone(rng: random.Random) -> str:
+    return f"2376{rng.randint(50_000_000, 99_999_999)}"
+
+
+def generate(db_path: str, scale: float = 1.0, seed: int = DEFAULT_SEED, overrides: Optional[Dict[str, int]] = None,
+             password: str = DEFAULT_PASSWORD, log: Callable[[str], None] = print) -> Dict[str, int]:
+    """Create ``db_path`` with the application schema and synthetic data.
+
+    Args:
+        db_path: Database file; must not exist yet (the generator only appends ids
+            it allocates itself).
+        scale: Multiplier for :data:`BASE_COUNTS`.
+        seed: RNG seed; the same seed and counts give the same data.
+        overrides: Per-table counts replacing the scaled ones (keys of :data:`BASE_COUNTS`).
+        password: Password shared by every generated user (hashed once).
+        log: Progress callback.
+
+    Returns:
+        Dict[str, int]: Rows inserted per table.
+    """
+    if os.path.exists(db_path):
+        raise FileExistsError(f"{db_path} already exists; remove it or choose another path")
+    from CBPM import DatabaseManager
+    from utils import SecurityUtils
+    from contract_balances import rebuild_balances
+    from job_search import salary_band
+
+    counts = scaled_counts(scale, overrides)
+    rng = random.Random(seed)
+    now = datetime.now().replace(microsecond=0)
+    started = time.perf_counter()
+    inserted: Dict[str, int] = {}
+
+    log(f"Creating schema in {db_path}...")
+    DatabaseManager(db_path).create_tables()
+    conn = sqlite3.connect(db_path)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=OFF")
+    conn.execute("PRAGMA cache_size=-200000")
+
+    # ---- users ----
+    hash_val, salt = SecurityUtils.hash_password(password)
+    password_hash = f"{hash_val}:{salt}"
+    next_user = (conn.execute("SELECT COALESCE(MAX(id), 0) FROM users").fetchone()[0] or 0) + 1
+    role_ids: Dict[str, List[int]] = {}
+    user_rows = []
+    for role, key in (('retail_store', 'owners'), ('contract_owner', 'owners'), ('manager', 'managers'),
+                      ('contractor', 'contractors'), ('employer', 'employers'), ('job_seeker', 'job_seekers')):
+        n = counts[key] // 2 if key == 'owners' else counts[key]
+        ids = list(range(next_user, next_user + max(1, n)))
+        next_user += len(ids)
+        role_ids[role] = ids
+        for uid in ids:
+            created = recent_timestamp(rng, now, 365).date()
+            user_rows.append((uid, f"{role}_{uid}", f"{role}_{uid}@example.cm", password_hash, role, _person(rng),
+                              _phone(rng), rng.choice(CITIES), created, 1, 0, 0))
+    inserted['users'] = _insert(conn, "INSERT INTO users (id, username, email, password_hash, role, full_name, phone, "
+                                      "address, created_date, is_active, first_login, failed_login_attempts) "
+                                      "VALUES (?,?,?,?,?,?,?,?,?,?,?,?)", user_rows)
+    del user_rows
+    log(f"  users: {inserted['users']}")
+
+    # ---- stores: owners follow a skewed distribution, most stores have a manager ----
+    owners = role_ids['retail_store'] + role_ids['contract_owner']
+    pick_owner = SkewedChoice(rng, owners, 0.9)
+    managers = role_ids['manager']
+    next_store = (conn.execute("SELECT COALESCE(MAX(id), 0) FROM stores").fetchone()[0] or 0) + 1
+    store_ids = list(range(next_store, next_store + counts['stores']))
+    store_rows = []
+    for sid in store_ids:
+        city = rng.choice(CITIES)
+        contact = {'phone': _phone(rng), 'category': rng.choice(STORE_CATEGORIES)}
+        columns = contact_columns(contact, city)
+        store_rows.append((sid, f"{city} Materials {sid}", city, pick_owner(),
+                           rng.choice(managers) if rng.random() < 0.8 else None,
+                           json.dumps(contact), recent_timestamp(rng, now, 365).date(),
+                           1 if rng.random() < 0.97 else 0,
+                           columns['category'], columns['phone'], columns['city'], columns['region']))
+    inserted['stores'] = _insert(conn, "INSERT INTO stores (id, name, location, owner_id, manager_id, contact_info, "
+                                       "created_date, is_active, category, phone, city, region) "
+                                       "VALUES (?,?,?,?,?,?,?,?,?,?,?,?)", store_rows)
+    del store_rows
+    log(f"  stores: {inserted['stores']}")
+
+    # ---- inventory: every store stocks a skewed subset of the catalogue ----
+    materials = conn.execute("SELECT id, standard_price FROM building_materials").fetchall()
+    price_of = {mid: float(price or 1000) for mid, price in materials}
+    material_ids = [mid for mid, _ in materials]
+    pick_material = SkewedChoice(rng, material_ids, 1.0)
+
+    def inventory_rows():
+        for sid in store_ids:
+            stocked = set()
+            for _ in range(rng.randint(len(material_ids) // 4, len(material_ids))):
+                stocked.add(pick_material())
+            for mid in stocked:
+                yield (sid, mid, float(rng.randint(0, 2_000)), round(price_of[mid] * rng.uniform(0.9, 1.3)),
+                       rng.choice((5, 10, 20, 50)), recent_timestamp(rng, now, 30).isoformat(sep=' '))
+    inserted['inventory'] = _insert(conn, "INSERT INTO inventory (store_id, material_id, quantity, unit_price, "
+                                          "reorder_level, last_updated) VALUES (?,?,?,?,?,?)", inventory_rows())
+    log(f"  inventory: {inserted['inventory']}")
+
+    # ---- transactions: hot stores and hot materials dominate ----
+    pick_store = SkewedChoice(rng, store_ids, 1.0)
+    store_user = dict(conn.execute("SELECT id, COALESCE(manager_id, owner_id) FROM stores").fetchall())
+
+    def transaction_rows():
+        for _ in range(counts['transactions']):
+            sid = pick_store()
+            mid = pick_material()
+            qty = float(max(1, int(rng.paretovariate(1.5))))
+            price = round(price_of[mid] * rng.uniform(0.9, 1.3))
+            ts = recent_timestamp(rng, now).isoformat(sep=' ')
+            kind = 'Sale' if rng.random() < 0.85 else 'Purchase'
+            status = 'Paid' if rng.random() < 0.9 else 'Pending'
+            yield (sid, _person(rng), mid, qty, price, qty * price, kind, status, ts, ts, store_user[sid])
+    t0 = time.perf_counter()
+    inserted['transactions'] = _insert(conn, "INSERT INTO transactions (store_id, customer_name, material_id, quantity, "
+                                             "unit_price, total_amount, transaction_type, payment_status, "
+                                             "transaction_date, timestamp, user_id) VALUES (?,?,?,?,?,?,?,?,?,?,?)",
+                                       transaction_rows())
+    log(f"  transactions: {inserted['transactions']} ({time.perf_counter() - t0:.1f}s)")
+
+    # ---- purchase requests between stores ----
+    def request_rows():
+        for _ in range(counts['purchase_requests']):
+            sid = pick_store()
+            buyer_store = rng.choice(store_ids)
+            while buyer_store == sid:
+                buyer_store = rng.choice(store_ids)
+            mid = pick_material()
+            status = rng.choice(REQUEST_STATUSES)
+            created = recent_timestamp(rng, now, 30)
+            approved = (created + timedelta(hours=rng.randint(1, 72))).isoformat(sep=' ') if status == 'Approved' else None
+            yield (created.isoformat(sep=' '), store_user[buyer_store], sid, buyer_store, mid,
+                   float(rng.randint(1, 50)), round(price_of[mid] * 1.1), status,
+                   store_user[sid] if approved else None, approved)
+    inserted['purchase_requests'] = _insert(conn, "INSERT INTO purchase_requests (created_at, buyer_id, store_id, "
+                                                  "buyer_store_id, material_id, quantity, unit_price, status, "
+                                                  "approved_by, approved_at) VALUES (?,?,?,?,?,?,?,?,?,?)",
+                                            request_rows())
+    log(f"  purchase_requests: {inserted['purchase_requests']}")
+
+    # ---- jobs and applications: a few jobs attract most applicants ----
+    employers = role_ids['employer'] + role_ids['contract_owner']
+    next_job = (conn.execute("SELECT COALESCE(MAX(id), 0) FROM jobs").fetchone()[0] or 0) + 1
+    job_ids = list(range(next_job, next_job + counts['jobs']))
+    job_dates = {}
+
+    def job_rows():
+        for jid in job_ids:
+            posted = recent_timestamp(rng, now, 120)
+            job_dates[jid] = posted
+            low = rng.randint(5, 40) * 10_000
+            salary = f"{low:,} - {low + rng.randint(1, 20) * 10_000:,} FCFA"
+            yield (jid, f"{rng.choice(JOB_TITLES)} - {rng.choice(CITIES)}", "Synthetic job posting",
+                   rng.choice(employers), rng.choice(CITIES), salary, salary_band(salary),
+                   "Experience required", 'Open' if rng.random() < 0.7 else 'Closed', posted.isoformat(sep=' '),
+                   (posted + timedelta(days=30)).date(), rng.choice(JOB_TYPES))
+    # job_facets is kept current by the job_search triggers
+    inserted['jobs'] = _insert(conn, "INSERT INTO jobs (id, title, description, employer_id, location, salary_range, "
+                                     "salary_band, requirements, status, posted_date, deadline, job_type) "
+                                     "VALUES (?,?,?,?,?,?,?,?,?,?,?,?)", job_rows())
+    log(f"  jobs: {inserted['jobs']}")
+
+    pick_job = SkewedChoice(rng, job_ids, 1.2)
+    seekers = role_ids['job_seeker']
+
+    def application_rows():
+        seen = set()
+        for _ in range(counts['applications']):
+            jid, uid = pick_job(), rng.choice(seekers)
+            if (jid, uid) in seen:
+                continue
+            seen.add((jid, uid))
+            applied = job_dates[jid] + timedelta(hours=rng.randint(1, 24 * 20))
+            yield (jid, uid, min(applied, now).isoformat(sep=' '), rng.choice(APPLICATION_STATUSES))
+    inserted['job_applications'] = _insert(conn, "INSERT INTO job_applications (job_id, applicant_id, "
+                                                 "application_date, status) VALUES (?,?,?,?)", application_rows())
+    log(f"  job_applications: {inserted['job_applications']}")
+
+    # ---- contracts and payments ----
+    contract_owners = role_ids['contract_owner']
+    contractors = role_ids['contractor']
+    next_contract = (conn.execute("SELECT COALESCE(MAX(id), 0) FROM contracts").fetchone()[0] or 0) + 1
+    contract_ids = list(range(next_contract, next_contract + counts['contracts']))
+    contract_rows = []
+    for cid in contract_ids:
+        created = recent_timestamp(rng, now, 240)
+        contract_rows.append((cid, f"Contract {cid}: {rng.choice(JOB_TITLES)} works", rng.choice(contract_owners),
+                              rng.choice(contractors), float(rng.randint(10, 500) * 100_000), created.date(),
+                              rng.choice(('Active', 'Active', 'Completed', 'Draft'))))
+    inserted['contracts'] = _insert(conn, "INSERT INTO contracts (id, title, contract_owner_id, contractor_id, budget, "
+                                          "created_date, status) VALUES (?,?,?,?,?,?,?)", contract_rows)
+    del contract_rows
+    pick_contract = SkewedChoice(rng, contract_ids, 0.8)
+
+    def payment_rows():
+        for _ in range(counts['contract_payments']):
+            created = recent_timestamp(rng, now, 90)
+            confirmed = rng.random() < 0.75
+            yield (pick_contract(), float(rng.randint(1, 50) * 50_000), 'Confirmed' if confirmed else 'Pending',
+                   created.isoformat(sep=' '), created.isoformat(sep=' ') if confirmed else None)
+    inserted['contract_payments'] = _insert(conn, "INSERT INTO contract_payments (contract_id, amount, status, "
+                                                  "requested_at, confirmed_at) VALUES (?,?,?,?,?)", payment_rows())
+    rebuild_balances(conn)
+    conn.commit()
+    log(f"  contracts: {inserted['contracts']}, contract_payments: {inserted['contract_payments']}")
+
+    # ---- audit log: heavy users produce most of the rows ----
+    active_users = role_ids['retail_store'] + role_ids['contract_owner'] + managers + contractors
+    pick_user = SkewedChoice(rng, active_users, 1.0)
+
+    def audit_rows():
+        for _ in range(counts['audit_log']):
+            uid = pick_user()
+            action = rng.choice(AUDIT_ACTIONS)
+            yield (uid, action, f"{action} by user {uid}", recent_timestamp(rng, now).isoformat(sep=' '))
+    inserted['audit_log'] = _insert(conn, "INSERT INTO audit_log (user_id, action, details, timestamp) "
+                                          "VALUES (?,?,?,?)", audit_rows())
+    log(f"  audit_log: {inserted['audit_log']}")
+
+    conn.execute("ANALYZE")
+    conn.commit()
+    conn.close()
+    log(f"Done in {time.perf_counter() - started:.1f}s. Every user's password is '{password}'.")
+    return inserted
+
+
+def build_arg_parser(parser: Optional[argparse.ArgumentParser] = None) -> argparse.ArgumentParser:
+    """Arguments shared by this script and ``setup.py --synthetic``."""
+    parser = parser or argparse.ArgumentParser(description="Generate a synthetic CBPM database for load testing.")
+    parser.add_argument('--db', default='load_test.db', help='Database file to create')
+    parser.add_argument('--seed', type=int, default=DEFAULT_SEED, help='RNG seed')
+    parser.add_argument('--password', default=DEFAULT_PASSWORD, help='Password for every generated user')
+    for key in BASE_COUNTS:
+        parser.add_argument(f"--{key.replace('_', '-')}", type=int, dest=key, default=None,
+                            help=f"Override the {key} count")
+    return parser
+
+
+def scale_factor(value: str) -> float:
+    """Accept a preset name from :data:`SCALES` or a number."""
+    if value in SCALES:
+        return SCALES[value]
+    return float(value)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = build_arg_parser()
+    parser.add_argument('--scale', default='small', help=f"Preset ({', '.join(SCALES)}) or a factor")
+    args = parser.parse_args(argv)
+    overrides = {k: getattr(args, k) for k in BASE_COUNTS}
+    generate(args.db, scale_factor(args.scale), args.seed, overrides, args.password)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -419,5 +419,22 @@ def main():
     return True
 
 
+def synthetic_main(argv=None):
+    """Generate a load-test database with the application schema (see seed_data.py)"""
+    import argparse
+    import seed_data
+
+    parser = argparse.ArgumentParser(description="Set up CBPM, or generate a synthetic load-test database.")
+    parser.add_argument('--synthetic', metavar='SCALE',
+                        help=f"Generate synthetic data instead of the sample data: {', '.join(seed_data.SCALES)} or a factor")
+    seed_data.build_arg_parser(parser)
+    args = parser.parse_args(argv)
+    if not args.synthetic:
+        return main()
+    overrides = {k: getattr(args, k) for k in seed_data.BASE_COUNTS}
+    seed_data.generate(args.db, seed_data.scale_factor(args.synthetic), args.seed, overrides, args.password)
+    return True
+
+
 if __name__ == "__main__":
-    main()
+    synthetic_main()
@@ -0,0 +1,163 @@
+"""
+Store contact columns
+
+Store creation used to keep everything but the name and location in the
+``stores.contact_info`` JSON text, so the store list decoded it for every row
+on every refresh and could not filter or sort by category, and the region
+filter was a ``location LIKE '%region%'`` scan. The fields the lists use now
+have their own indexed columns:
+
+* ``category``, ``phone``, ``email`` - copied from ``contact_info``;
+* ``city``, ``region`` - taken from ``location`` (``"City, Region, Cameroon"``,
+  or a bare city name, looked up in :data:`CITY_REGIONS`).
+
+``contact_info`` is still written (address, GPS, hours, tax ids... are only
+shown on the details screen). :func:`ensure_schema` adds the columns and fills
+them for rows that predate them. Rows inserted afterwards by something that
+only knows ``contact_info`` (an older build on a shared database, a script)
+are covered by the generated columns ``json_category``, ``json_phone`` and
+``json_email``, which read the JSON on the fly; the lists read
+``COALESCE(category, json_category)`` and the category index is on that
+expression. Where SQLite is too old for generated columns (before 3.31) or
+lacks JSON functions, the ``json_*`` columns are plain and stay NULL, and such
+rows are filled on the next start instead.
+"""
+
+import json
+import sqlite3
+from typing import Any, Dict, Optional, Tuple
+
+# Writable columns, in the order they are added
+CONTACT_COLUMNS = ('category', 'phone', 'email', 'city', 'region')
+
+# Values of the generated fallback columns
+_JSON_COLUMNS = {
+    'json_category': '$.category',
+    'json_phone': '$.phone',
+    'json_email': '$.email',
+}
+
+# Expressions the store lists select, filter and sort on (s = stores)
+CATEGORY_SQL = 'COALESCE(s.category, s.json_category)'
+PHONE_SQL = 'COALESCE(s.phone, s.json_phone)'
+EMAIL_SQL = 'COALESCE(s.email, s.json_email)'
+
+REGIONS = ('Adamawa', 'Centre', 'East', 'Far North', 'Littoral',
+           'North', 'Northwest', 'South', 'Southwest', 'West')
+
+# Main towns, for locations saved as a bare city name
+CITY_REGIONS = {
+    'bafang': 'West', 'bafoussam': 'West', 'bamenda': 'Northwest', 'batouri': 'East', 'bertoua': 'East',
+    'buea': 'Southwest', 'douala': 'Littoral', 'dschang': 'West', 'ebolowa': 'South', 'edea': 'Littoral',
+    'edéa': 'Littoral', 'foumban': 'West', 'garoua': 'North', 'guider': 'North', 'kousseri': 'Far North',
+    'kribi': 'South', 'kumba': 'Southwest', 'kumbo': 'Northwest', 'limbe': 'Southwest', 'maroua': 'Far North',
+    'mbalmayo': 'Centre', 'meiganga': 'Adamawa', 'mokolo': 'Far North', 'ngaoundere': 'Adamawa',
+    'ngaoundéré': 'Adamawa', 'nkongsamba': 'Littoral', 'obala': 'Centre', 'sangmelima': 'South',
+    'tibati': 'Adamawa', 'wum': 'Northwest', 'yaounde': 'Centre', 'yaoundé': 'Centre',
+}
+
+_REGION_NAMES = {r.lower(): r for r in REGIONS}
+_REGION_NAMES.update({'center': 'Centre', 'north west': 'Northwest', 'south west': 'Southwest',
+                      'extreme north': 'Far North', 'far-north': 'Far North'})
+
+
+def split_location(location: Optional[str]) -> Tuple[Optional[str], Optional[str]]:
+    """``(city, region)`` of a store location; either is None when it cannot be told."""
+    parts = [p.strip() for p in (location or '').split(',')]
+    parts = [p for p in parts if p and p.lower() != 'cameroon']
+    region = city = None
+    for part in parts:
+        name = _REGION_NAMES.get(part.lower().replace(' region', ''))
+        if name and region is None:
+            region = name
+        elif city is None:
+            city = part
+    if region is None and city is not None:
+        region = CITY_REGIONS.get(city.lower())
+    return city, region
+
+
+def contact_columns(contact: Optional[Dict[str, Any]], location: Optional[str] = None,
+                    city: Optional[str] = None, region: Optional[str] = None) -> Dict[str, Optional[str]]:
+    """Column values for a store, from its contact dict and location (or an explicit city/region)."""
+    contact = contact if isinstance(contact, dict) else {}
+    if city is None and region is None:
+        city, region = split_location(location)
+
+    def text(value: Any) -> Optional[str]:
+        value = str(value).strip() if value is not None else ''
+        return value or None
+
+    return {
+        'category': text(contact.get('category')),
+        'phone': text(contact.get('phone')),
+        'email': text(contact.get('email')),
+        'city': text(city),
+        'region': text(region),
+    }
+
+
+def parse_contact_info(text: Optional[str]) -> Dict[str, Any]:
+    """``contact_info`` as a dict; {} for NULL or unreadable text.
+
+    Legacy free text of ``Key: value`` lines (``"Phone: 677 12 34 56"``) is read
+    as lower-cased keys.
+    """
+    if not text:
+        return {}
+    try:
+        data = json.loads(text)
+    except (TypeError, ValueError):
+        data = {}
+        for line in str(text).splitlines():
+            key, sep, value = line.partition(':')
+            if sep and key.strip():
+                data[key.strip().lower()] = value.strip()
+    return data if isinstance(data, dict) else {}
+
+
+def _generated_columns_supported(conn: sqlite3.Connection) -> bool:
+    if sqlite3.sqlite_version_info < (3, 31, 0):
+        return False
+    try:
+        conn.execute("SELECT json_valid('{}'), json_extract('{}', '$.a')")
+    except sqlite3.OperationalError:
+        return False
+    return True
+
+
+def ensure_schema(conn: sqlite3.Connection) -> int:
+    """Add the contact columns and indexes (idempotent); returns the number of rows filled in.
+
+    Rows with none of the columns set are filled from ``contact_info`` and
+    ``location``, so this also picks up rows written by older builds since the
+    last start.
+    """
+    cur = conn.cursor()
+    existing = {r[1] for r in cur.execute("PRAGMA table_xinfo(stores)")}
+    for column in CONTACT_COLUMNS:
+        if column not in existing:
+            cur.execute(f"ALTER TABLE stores ADD COLUMN {column} TEXT")
+    generated = _generated_columns_supported(conn)
+    for column, path in _JSON_COLUMNS.items():
+        if column in existing:
+            continue
+        if generated:
+            cur.execute(f"ALTER TABLE stores ADD COLUMN {column} TEXT GENERATED ALWAYS AS "
+                        f"(CASE WHEN json_valid(contact_info) THEN json_extract(contact_info, '{path}') END) VIRTUAL")
+        else:
+            cur.execute(f"ALTER TABLE stores ADD COLUMN {column} TEXT")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_stores_category ON stores(COALESCE(category, json_category))")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_stores_region ON stores(region, city)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_stores_city ON stores(city)")
+
+    cur.execute("SELECT id, location, contact_info FROM stores WHERE category IS NULL AND phone IS NULL "
+                "AND email IS NULL AND city IS NULL AND region IS NULL")
+    updates = []
+    for store_id, location, contact_info in cur.fetchall():
+        values = contact_columns(parse_contact_info(contact_info), location)
+        if any(values.values()):
+            updates.append(tuple(values[c] for c in CONTACT_COLUMNS) + (store_id,))
+    if updates:
+        cur.executemany(f"UPDATE stores SET {', '.join(f'{c} = ?' for c in CONTACT_COLUMNS)} WHERE id = ?", updates)
+    return len(updates)
@@ -0,0 +1,246 @@
+"""
+Tkinter event-handler profiler
+
+Every Python callback Tk runs (button and menu commands, ``bind`` handlers,
+variable traces, ``after`` jobs) goes through ``tkinter.CallWrapper``.
+:func:`install` swaps that class for :class:`ProfilingCallWrapper`, which times
+each call and aggregates wall time per handler (``module:qualname:line``).
+Calls longer than ``UI_PROFILING['slow_ms']`` are counted as blocking the event
+loop and printed; in capture mode the slow call is also re-run under
+``cProfile`` the next time it fires (once per handler) and the stats are written to
+``capture_dir`` (a ``.prof`` file for snakeviz/pstats and a ``.txt`` summary).
+
+Nothing is patched unless profiling is enabled, so the cost when off is zero
+(after :func:`uninstall`, already wrapped callbacks cost one flag check).
+Only callbacks registered after :func:`install` are measured: screens opened
+after enabling it from the admin menu are covered, windows already open are not.
+
+Enable at startup with ``CBPM_UI_PROFILE=1`` (timing) or ``CBPM_UI_PROFILE=capture``
+(timing + cProfile of slow handlers), or from Admin > System > UI Profiler.
+"""
+
+import cProfile
+import io
+import logging
+import os
+import pstats
+import re
+import threading
+import time
+import tkinter
+from collections import deque
+from datetime import datetime
+from typing import Any, Callable, Deque, Dict, List, Optional, Set
+
+try:
+    from config import UI_PROFILING as SETTINGS
+except Exception:
+    SETTINGS = {'enabled': False, 'slow_ms': 100, 'capture': False}
+
+logger = logging.getLogger(__name__)
+
+_ORIGINAL_CALL_WRAPPER = tkinter.CallWrapper
+
+
+def handler_name(func: Callable) -> str:
+    """Readable identity for a Tk callback, looking through ``after``'s ``callit`` wrapper."""
+    code = getattr(func, '__code__', None)
+    if code is not None and code.co_name == 'callit' and 'func' in code.co_freevars and func.__closure__:
+        inner = func.__closure__[code.co_freevars.index('func')].cell_contents
+        return 'after: ' + handler_name(inner)
+    target = getattr(func, '__func__', func)
+    code = getattr(target, '__code__', None)
+    qualname = getattr(target, '__qualname__', None) or type(target).__qualname__
+    module = getattr(target, '__module__', None) or '?'
+    if code is not None:
+        return f"{module}:{qualname}:{code.co_firstlineno}"
+    return f"{module}:{qualname}"
+
+
+class _Entry:
+    __slots__ = ('calls', 'total', 'max', 'slow', 'nested')
+
+    def __init__(self) -> None:
+        self.calls = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.slow = 0
+        self.nested = 0
+
+
+class HandlerStats:
+    """Per-handler wall-time aggregates, the recent blocking calls and cProfile captures."""
+
+    def __init__(self, slow_ms: float = 100.0, max_events: int = 200):
+        self.slow_ms = slow_ms
+        self.capture = False
+        self.capture_dir = 'logs/ui_profiles'
+        self.max_captures = 20
+        self.started = datetime.now()
+        self.captures: List[str] = []
+        self._entries: Dict[str, _Entry] = {}
+        self._events: Deque[Dict[str, Any]] = deque(maxlen=max_events)
+        self._armed: Set[str] = set()
+        self._captured: Set[str] = set()
+        self._lock = threading.Lock()
+
+    def record(self, name: str, elapsed: float, nested: bool) -> None:
+        """Add one call; ``nested`` means it ran its own event loop (wait_window, update)."""
+        slow = not nested and elapsed * 1000 >= self.slow_ms
+        with self._lock:
+            entry = self._entries.get(name)
+            if entry is None:
+                entry = self._entries[name] = _Entry()
+            entry.calls += 1
+            entry.total += elapsed
+            if elapsed > entry.max:
+                entry.max = elapsed
+            if nested:
+                entry.nested += 1
+            if slow:
+                entry.slow += 1
+                self._events.append({'time': datetime.now().isoformat(timespec='seconds'), 'handler': name,
+                                     'ms': round(elapsed * 1000, 1)})
+                if self.capture and name not in self._captured and len(self.captures) < self.max_captures:
+                    self._armed.add(name)
+        if slow:
+            print(f"[SLOW UI] {elapsed * 1000:.0f} ms in {name}")
+
+    def take_armed(self, name: str) -> bool:
+        """True once for a handler that was slow and should be profiled on its next call."""
+        if not self._armed:
+            return False
+        with self._lock:
+            if name in self._armed:
+                self._armed.discard(name)
+                self._captured.add(name)
+                return True
+        return False
+
+    def save_capture(self, name: str, profile: cProfile.Profile, elapsed: float) -> Optional[str]:
+        try:
+            os.makedirs(self.capture_dir, exist_ok=True)
+            slug = re.sub(r'[^A-Za-z0-9_.-]+', '_', name)[-80:]
+            base = os.path.join(self.capture_dir, f"{datetime.now():%Y%m%d_%H%M%S}_{int(elapsed * 1000)}ms_{slug}")
+            profile.dump_stats(base + '.prof')
+            out = io.StringIO()
+            out.write(f"{name}\n{elapsed * 1000:.1f} ms\n\n")
+            pstats.Stats(profile, stream=out).sort_stats('cumulative').print_stats(40)
+            with open(base + '.txt', 'w', encoding='utf-8') as f:
+                f.write(out.getvalue())
+        except Exception as e:
+            print(f"[WARN] UI profile not written: {e}")
+            return None
+        with self._lock:
+            self.captures.append(base + '.prof')
+        return base + '.prof'
+
+    def snapshot(self, sort: str = 'total_ms') -> List[Dict[str, Any]]:
+        """One dict per handler (calls, total/avg/max ms, slow and nested counts), sorted descending."""
+        with self._lock:
+            items = [(name, e.calls, e.total, e.max, e.slow, e.nested) for name, e in self._entries.items()]
+        rows = [{'handler': name, 'calls': calls, 'total_ms': total * 1000,
+                 'avg_ms': total * 1000 / calls if calls else 0.0, 'max_ms': mx * 1000,
+                 'slow': slow, 'nested': nested}
+                for name, calls, total, mx, slow, nested in items]
+        rows.sort(key=lambda r: r.get(sort, 0), reverse=True)
+        return rows
+
+    def slow_events(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            return list(reversed(self._events))
+
+    def reset(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._events.clear()
+            self._armed.clear()
+            self._captured.clear()
+            self.captures = []
+            self.started = datetime.now()
+
+
+STATS = HandlerStats(slow_ms=float(SETTINGS.get('slow_ms', 100)))
+
+# Nesting depth of profiled callbacks on the Tk thread, and whether an inner call happened
+_depth = 0
+_inner_ran = False
+_profiling = False
+# Cleared by uninstall() so callbacks wrapped earlier go straight through
+_active = False
+
+
+class ProfilingCallWrapper(_ORIGINAL_CALL_WRAPPER):
+    """``tkinter.CallWrapper`` that reports each callback's wall time to :data:`STATS`."""
+
+    def __init__(self, func, subst, widget):
+        super().__init__(func, subst, widget)
+        self.name = handler_name(func)
+
+    def __call__(self, *args):
+        global _depth, _inner_ran, _profiling
+        if not _active:
+            return super().__call__(*args)
+        outer_inner_ran = _inner_ran
+        _inner_ran = False
+        _depth += 1
+        profile = None
+        if not _profiling and STATS.take_armed(self.name):
+            profile = cProfile.Profile()
+            _profiling = True
+        start = time.perf_counter()
+        try:
+            if profile is not None:
+                profile.enable()
+            return super().__call__(*args)
+        finally:
+            if profile is not None:
+                profile.disable()
+                _profiling = False
+            elapsed = time.perf_counter() - start
+            nested = _inner_ran
+            _depth -= 1
+            _inner_ran = outer_inner_ran or _depth > 0
+            STATS.record(self.name, elapsed, nested)
+            if profile is not None:
+                path = STATS.save_capture(self.name, profile, elapsed)
+                if path:
+                    print(f"[SLOW UI] profile written to {path}")
+
+
+def is_installed() -> bool:
+    return tkinter.CallWrapper is ProfilingCallWrapper
+
+
+def install(capture: Optional[bool] = None, slow_ms: Optional[float] = None) -> None:
+    """Start timing Tk callbacks registered from now on."""
+    global _active
+    STATS.capture = bool(SETTINGS.get('capture', False) if capture is None else capture)
+    STATS.capture_dir = SETTINGS.get('capture_dir', STATS.capture_dir)
+    STATS.max_captures = int(SETTINGS.get('max_captures', STATS.max_captures))
+    if slow_ms is not None:
+        STATS.slow_ms = float(slow_ms)
+    _active = True
+    tkinter.CallWrapper = ProfilingCallWrapper
+
+
+def uninstall() -> None:
+    """Stop timing; callbacks wrapped while installed fall through to the plain call."""
+    global _active
+    _active = False
+    tkinter.CallWrapper = _ORIGINAL_CALL_WRAPPER
+
+
+def install_from_settings() -> bool:
+    """Install when ``CBPM_UI_PROFILE`` (0/1/capture) or ``UI_PROFILING['enabled']`` asks for it."""
+    env = os.environ.get('CBPM_UI_PROFILE', '').strip().lower()
+    if env in ('0', 'false', 'no'):
+        return False
+    if env == 'capture':
+        install(capture=True)
+    elif env or SETTINGS.get('enabled', False):
+        install()
+    else:
+        return False
+    logger.debug("UI profiler on (slow > %.0f ms%s)", STATS.slow_ms, ', capturing profiles' if STATS.capture else '')
+    return True
@@ -8,8 +8,19 @@ import datetime
 import json
 import re
 import os
+from functools import lru_cache
 from typing import Dict, List, Any, Optional, Tuple
 
+# NumPy/pandas are optional; reports fall back to pure Python without them
+try:
+    import numpy as np
+    import pandas as pd
+    HAS_PANDAS = True
+except Exception:
+    np = None
+    pd = None
+    HAS_PANDAS = False
+
 
 class ValidationUtils:
     """Utility class for data validation"""
@@ -95,32 +106,100 @@ class CurrencyUtils:
         }
 
 
+# Bounded caches for repeated timestamps (report and tree rendering see the same values often)
+DATE_CACHE_SIZE = 8192
+
+# Accepted input formats, in precedence order
+DATE_FORMATS = ('%Y-%m-%d', '%d/%m/%Y', '%m/%d/%Y', '%Y-%m-%d %H:%M:%S')
+
+
+def _looks_like_iso(value: str, fmt: str) -> bool:
+    """True when ``value`` has the exact shape ``fromisoformat`` parses identically to ``fmt``."""
+    if fmt == '%Y-%m-%d':
+        return len(value) == 10 and value[4] == '-' and value[7] == '-' and value.isascii()
+    if fmt == '%Y-%m-%d %H:%M:%S':
+        return (len(value) == 19 and value[4] == '-' and value[7] == '-' and value[10] == ' '
+                and value[13] == ':' and value[16] == ':' and value.isascii())
+    return False
+
+
+@lru_cache(maxsize=DATE_CACHE_SIZE)
+def _parse_exact(value: str, fmt: str) -> Optional[datetime.datetime]:
+    """Parse ``value`` with one format, using ``fromisoformat`` for ISO-shaped input."""
+    try:
+        if _looks_like_iso(value, fmt):
+            return datetime.datetime.fromisoformat(value)
+        return datetime.datetime.strptime(value, fmt)
+    except ValueError:
+        return None
+
+
+@lru_cache(maxsize=DATE_CACHE_SIZE)
+def _parse_any(value: str) -> Optional[datetime.datetime]:
+    # ISO datetimes cannot match any earlier format, so go straight to the fast path
+    if _looks_like_iso(value, '%Y-%m-%d %H:%M:%S'):
+        parsed = _parse_exact(value, '%Y-%m-%d %H:%M:%S')
+        if parsed is not None:
+            return parsed
+    for fmt in DATE_FORMATS:
+        parsed = _parse_exact(value, fmt)
+        if parsed is not None:
+            return parsed
+    return None
+
+
+@lru_cache(maxsize=DATE_CACHE_SIZE)
+def _format_cached(date_obj: Any, format_str: str, zone: Any = None) -> str:
+    # ``zone`` only keys the cache: aware datetimes for the same instant in different
+    # zones compare (and hash) equal but format differently
+    if isinstance(date_obj, str):
+        try:
+            date_obj = datetime.datetime.fromisoformat(date_obj.replace('Z', '+00:00'))
+        except ValueError:
+            return date_obj
+    return date_obj.strftime(format_str)
+
+
 class DateTimeUtils:
     """Utility class for date and time operations"""
 
+    DATE_FORMATS = list(DATE_FORMATS)
+
     @staticmethod
     def format_date(date_obj: Any, format_str: str = '%d/%m/%Y') -> str:
         """Format datetime object to string"""
-        if isinstance(date_obj, str):
-            try:
-                date_obj = datetime.datetime.fromisoformat(date_obj.replace('Z', '+00:00'))
-            except ValueError:
-                return date_obj
-
-        return date_obj.strftime(format_str)
+        zone = None
+        if isinstance(date_obj, datetime.datetime) and date_obj.tzinfo is not None:
+            zone = (date_obj.tzinfo, date_obj.utcoffset())
+        try:
+            return _format_cached(date_obj, format_str, zone)
+        except TypeError:
+            # Unhashable input; format without caching
+            return _format_cached.__wrapped__(date_obj, format_str)
 
     @staticmethod
     def parse_date(date_str: str) -> Optional[datetime.datetime]:
         """Parse date string to datetime object"""
-        formats = ['%Y-%m-%d', '%d/%m/%Y', '%m/%d/%Y', '%Y-%m-%d %H:%M:%S']
+        if not isinstance(date_str, str):
+            # Keep strptime's behaviour for non-string input
+            return datetime.datetime.strptime(date_str, DATE_FORMATS[0])
+        return _parse_any(date_str)
 
-        for format_str in formats:
-            try:
-                return datetime.datetime.strptime(date_str, format_str)
-            except ValueError:
-                continue
+    @staticmethod
+    def cache_info() -> Dict[str, Any]:
+        """Hit/miss statistics of the date parsing and formatting caches"""
+        return {
+            'parse': _parse_any.cache_info()._asdict(),
+            'parse_exact': _parse_exact.cache_info()._asdict(),
+            'format': _format_cached.cache_info()._asdict(),
+        }
 
-        return None
+    @staticmethod
+    def clear_caches() -> None:
+        """Empty the date parsing and formatting caches"""
+        _parse_any.cache_clear()
+        _parse_exact.cache_clear()
+        _format_cached.cache_clear()
 
     @staticmethod
     def get_date_range(days: int = 30) -> Tuple[datetime.datetime, datetime.datetime]:
@@ -135,15 +214,146 @@ class DateTimeUtils:
         return date_obj.weekday() < 5
 
 
+class DateParser:
+    """Date parser for one column or source that sniffs the format once
+
+    The first value that parses fixes the column's format; later values try that
+    format first (via the ``fromisoformat`` fast path for ISO columns) and only
+    fall back to the full format list on a miss. Ambiguous day/month values keep
+    DateTimeUtils.parse_date precedence, so results always match parse_date.
+    """
+
+    def __init__(self, formats: Optional[List[str]] = None):
+        self.formats = tuple(formats or DATE_FORMATS)
+        self.detected: Optional[str] = None
+        self.misses = 0
+
+    def parse(self, value: Any) -> Optional[datetime.datetime]:
+        """Parse one value; None when no format matches"""
+        if not isinstance(value, str) or not value:
+            return None
+        fmt = self.detected
+        if fmt is not None:
+            if fmt == '%m/%d/%Y':
+                # Day-first wins for ambiguous values, as in parse_date
+                day_first = _parse_exact(value, '%d/%m/%Y')
+                if day_first is not None:
+                    return day_first
+            parsed = _parse_exact(value, fmt)
+            if parsed is not None:
+                return parsed
+            self.misses += 1
+        for candidate in self.formats:
+            parsed = _parse_exact(value, candidate)
+            if parsed is not None:
+                if self.detected is None:
+                    self.detected = candidate
+                return parsed
+        return None
+
+    def parse_many(self, values: List[Any]) -> List[Optional[datetime.datetime]]:
+        """Parse a whole column"""
+        parse = self.parse
+        return [parse(v) for v in values]
+
+
 class ReportUtils:
-    """Utility class for report generation"""
+    """Utility class for report generation
+
+    Each report has a pure-Python implementation and a columnar (NumPy/pandas)
+    implementation. The columnar path is used automatically for large inputs when
+    pandas is installed; the ``*_from_db`` variants read rows straight from SQLite
+    into columns without building per-row dicts.
+    """
+
+    # Inputs smaller than this are faster in plain Python than via a DataFrame
+    COLUMNAR_MIN_ROWS = 2000
+
+    # Same formats, in the same order, as DateTimeUtils.parse_date
+    DATE_FORMATS = list(DATE_FORMATS)
+
+    LOW_STOCK_THRESHOLD = 10
+
+    @staticmethod
+    def _use_columnar(row_count: int, columnar: Optional[bool]) -> bool:
+        if columnar is None:
+            return HAS_PANDAS and row_count >= ReportUtils.COLUMNAR_MIN_ROWS
+        return bool(columnar) and HAS_PANDAS
+
+    @staticmethod
+    def _sniff_format_order(series: Any, sample_size: int = 1000) -> List[str]:
+        """Order DATE_FORMATS by how often they match a sample of the column.
+
+        Trying the dominant format first means the expensive failing passes only
+        run over the few leftover values. Day-first still precedes month-first so
+        ambiguous values like 03/04/2025 resolve exactly as parse_date would.
+        """
+        sample = series[series != ''].head(sample_size).astype(str)
+        if sample.empty:
+            return list(ReportUtils.DATE_FORMATS)
+        hits = {fmt: int(pd.to_datetime(sample, format=fmt, errors='coerce').notna().sum())
+                for fmt in ReportUtils.DATE_FORMATS}
+        order = sorted(ReportUtils.DATE_FORMATS, key=lambda f: (-hits[f], ReportUtils.DATE_FORMATS.index(f)))
+        order = [f for f in order if hits[f] > 0] + [f for f in order if hits[f] == 0]
+        dmy, mdy = order.index('%d/%m/%Y'), order.index('%m/%d/%Y')
+        if mdy < dmy:
+            order.remove('%d/%m/%Y')
+            order.insert(mdy, '%d/%m/%Y')
+        return order
 
     @staticmethod
-    def generate_inventory_report(store_data: List[Dict]) -> Dict:
-        """Generate inventory summary report"""
+    def parse_dates_vectorized(values: Any) -> Any:
+        """Parse a column of date strings in one pass per format.
+
+        Mirrors DateTimeUtils.parse_date: the first format that matches a value
+        wins and unparseable values become NaT. Formats are tried most-common
+        first (sniffed from a sample), and each pass only sees values still
+        unparsed.
+
+        Args:
+            values: A pandas Series (or list) of date strings.
+
+        Returns:
+            pandas.Series: datetime64 values.
+        """
+        series = values if isinstance(values, pd.Series) else pd.Series(values, dtype=object)
+        series = series.astype(object).where(series.notna(), '')
+        parsed = pd.Series(pd.NaT, index=series.index, dtype='datetime64[ns]')
+        remaining = np.ones(len(series), dtype=bool)
+        for fmt in ReportUtils._sniff_format_order(series):
+            if not remaining.any():
+                break
+            attempt = pd.to_datetime(series[remaining].astype(str), format=fmt, errors='coerce')
+            hit = attempt.notna().to_numpy()
+            if hit.any():
+                idx = np.flatnonzero(remaining)[hit]
+                parsed.iloc[idx] = attempt[hit].to_numpy()
+                remaining[idx] = False
+        return parsed
+
+    @staticmethod
+    def generate_inventory_report(store_data: List[Dict], columnar: Optional[bool] = None) -> Dict:
+        """Generate inventory summary report
+
+        Args:
+            store_data: Items with ``quantity``, ``price`` and ``category`` keys.
+            columnar: Use the pandas path. Off by default: converting a list of dicts
+                into a frame costs about as much as the report itself, so large
+                inventories should use generate_inventory_report_from_db instead.
+        """
+        if columnar and HAS_PANDAS:
+            frame = pd.DataFrame.from_records(store_data, columns=['quantity', 'price', 'category'])
+            if any('category' not in item for item in store_data):
+                missing = [i for i, item in enumerate(store_data) if 'category' not in item]
+                frame.loc[missing, 'category'] = 'Unknown'
+            return ReportUtils._inventory_report_columnar(frame, store_data)
+        return ReportUtils._inventory_report_python(store_data)
+
+    @staticmethod
+    def _inventory_report_python(store_data: List[Dict]) -> Dict:
         total_items = len(store_data)
         total_value = sum(item.get('quantity', 0) * item.get('price', 0) for item in store_data)
-        low_stock_items = [item for item in store_data if item.get('quantity', 0) < 10]
+        low_stock_items = [item for item in store_data if item.get('quantity', 0) < ReportUtils.LOW_STOCK_THRESHOLD]
 
         categories: Dict[str, Dict[str, float]] = {}
         for item in store_data:
@@ -163,27 +373,105 @@ class ReportUtils:
         }
 
     @staticmethod
-    def generate_sales_report(transactions: List[Dict], period_days: int = 30) -> Dict:
-        """Generate sales summary report"""
+    def _inventory_report_columnar(frame: Any, records: Optional[List[Dict]] = None) -> Dict:
+        """Columnar inventory summary over a frame with quantity/price/category columns."""
+        qty = pd.to_numeric(frame['quantity'], errors='coerce').fillna(0).to_numpy(dtype='float64')
+        price = pd.to_numeric(frame['price'], errors='coerce').fillna(0).to_numpy(dtype='float64')
+        value = qty * price
+        low_mask = qty < ReportUtils.LOW_STOCK_THRESHOLD
+        low_idx = np.flatnonzero(low_mask)
+        if records is not None:
+            low_stock_items = [records[i] for i in low_idx]
+        else:
+            low_stock_items = frame.iloc[low_idx].to_dict('records')
+
+        grouped = pd.DataFrame({'category': frame['category'].to_numpy(dtype=object), 'value': value}) \
+            .groupby('category', sort=False, dropna=False)['value'].agg(['count', 'sum'])
+        categories = {cat: {'count': int(row['count']), 'value': float(row['sum'])}
+                      for cat, row in grouped.iterrows()}
+
+        return {
+            'total_items': int(len(frame)),
+            'total_value': float(value.sum()),
+            'low_stock_count': int(low_mask.sum()),
+            'low_stock_items': low_stock_items,
+            'categories': categories,
+            'generated_date': datetime.datetime.now().isoformat()
+        }
+
+    @staticmethod
+    def generate_inventory_report_from_db(conn: Any, store_id: Optional[int] = None) -> Dict:
+        """Generate the inventory report directly from the ``inventory`` table.
+
+        Totals and per-category group-bys run inside SQLite, so only the low-stock
+        rows are materialised in Python.
+
+        Args:
+            conn: Open sqlite3 connection.
+            store_id: Restrict to one store; None covers all stores.
+        """
+        base = "FROM inventory i JOIN building_materials bm ON bm.id = i.material_id"
+        params: Tuple = ()
+        if store_id is not None:
+            base += " WHERE i.store_id = ?"
+            params = (store_id,)
+        categories: Dict[str, Dict[str, float]] = {}
+        total_items, total_value = 0, 0.0
+        for category, count, value in conn.execute(
+                f"SELECT bm.category, COUNT(*), COALESCE(SUM(i.quantity * i.unit_price), 0) {base} "
+                f"GROUP BY bm.category", params):
+            categories[category] = {'count': count, 'value': value}
+            total_items += count
+            total_value += value
+        low_sql = (f"SELECT i.id, i.store_id, bm.name, i.quantity, i.unit_price AS price, bm.category {base}"
+                   + (" AND" if store_id is not None else " WHERE") + " i.quantity < ?")
+        cur = conn.execute(low_sql, params + (ReportUtils.LOW_STOCK_THRESHOLD,))
+        cols = [d[0] for d in cur.description]
+        low_stock_items = [dict(zip(cols, r)) for r in cur.fetchall()]
+        return {
+            'total_items': total_items,
+            'total_value': total_value,
+            'low_stock_count': len(low_stock_items),
+            'low_stock_items': low_stock_items,
+            'categories': categories,
+            'generated_date': datetime.datetime.now().isoformat()
+        }
+
+    @staticmethod
+    def generate_sales_report(transactions: List[Dict], period_days: int = 30,
+                              columnar: Optional[bool] = None) -> Dict:
+        """Generate sales summary report
+
+        Args:
+            transactions: Items with ``transaction_date`` and ``total_amount`` keys.
+            period_days: Length of the reporting window ending now.
+            columnar: Force (True) or disable (False) the pandas path; None picks by size.
+        """
+        if ReportUtils._use_columnar(len(transactions), columnar):
+            frame = pd.DataFrame.from_records(transactions, columns=['transaction_date', 'total_amount'])
+            return ReportUtils._sales_report_columnar(frame, period_days)
+        return ReportUtils._sales_report_python(transactions, period_days)
+
+    @staticmethod
+    def _sales_report_python(transactions: List[Dict], period_days: int = 30) -> Dict:
         end_date = datetime.datetime.now()
         start_date = end_date - datetime.timedelta(days=period_days)
 
-        period_transactions: List[Dict] = []
+        # One parser for the column: the format is sniffed once, then the fast path is used
+        parser = DateParser()
+        period_transactions: List[Tuple[datetime.datetime, Dict]] = []
         for trans in transactions:
-            trans_date = DateTimeUtils.parse_date(trans.get('transaction_date', ''))
+            trans_date = parser.parse(trans.get('transaction_date', ''))
             if trans_date and start_date <= trans_date <= end_date:
-                period_transactions.append(trans)
+                period_transactions.append((trans_date, trans))
 
         total_sales = len(period_transactions)
-        total_revenue = sum(trans.get('total_amount', 0) for trans in period_transactions)
+        total_revenue = sum(trans.get('total_amount', 0) for _, trans in period_transactions)
         avg_sale = total_revenue / total_sales if total_sales > 0 else 0
 
-        # Group by date
+        # Group by date (reusing the date parsed during filtering)
         daily_sales: Dict[str, Dict[str, float]] = {}
-        for trans in period_transactions:
-            parsed = DateTimeUtils.parse_date(trans.get('transaction_date', ''))
-            if parsed is None:
-                continue
+        for parsed, trans in period_transactions:
             date_key = DateTimeUtils.format_date(parsed)
             if date_key not in daily_sales:
                 daily_sales[date_key] = {'count': 0, 'revenue': 0}
@@ -200,6 +488,67 @@ class ReportUtils:
             'daily_breakdown': daily_sales
         }
 
+    @staticmethod
+    def _sales_report_columnar(frame: Any, period_days: int = 30) -> Dict:
+        """Columnar sales summary over a frame with transaction_date/total_amount columns."""
+        end_date = datetime.datetime.now()
+        start_date = end_date - datetime.timedelta(days=period_days)
+
+        parsed = ReportUtils.parse_dates_vectorized(frame['transaction_date'])
+        amounts = pd.to_numeric(frame['total_amount'], errors='coerce').fillna(0)
+        in_period = parsed.notna() & (parsed >= start_date) & (parsed <= end_date)
+        period_dates = parsed[in_period]
+        period_amounts = amounts[in_period]
+
+        total_sales = int(in_period.sum())
+        total_revenue = float(period_amounts.sum())
+        avg_sale = total_revenue / total_sales if total_sales > 0 else 0
+
+        daily_sales: Dict[str, Dict[str, float]] = {}
+        if total_sales:
+            grouped = pd.DataFrame({'day': period_dates.dt.normalize(), 'revenue': period_amounts}) \
+                .groupby('day', sort=False)['revenue'].agg(['count', 'sum'])
+            for day, row in grouped.iterrows():
+                daily_sales[day.strftime('%d/%m/%Y')] = {'count': int(row['count']), 'revenue': float(row['sum'])}
+
+        return {
+            'period_days': period_days,
+            'start_date': start_date.strftime('%d/%m/%Y'),
+            'end_date': end_date.strftime('%d/%m/%Y'),
+            'total_sales': total_sales,
+            'total_revenue': total_revenue,
+            'average_sale': avg_sale,
+            'daily_breakdown': daily_sales
+        }
+
+    @staticmethod
+    def generate_sales_report_from_db(conn: Any, period_days: int = 30, store_id: Optional[int] = None,
+                                      transaction_type: Optional[str] = 'sale') -> Dict:
+        """Generate the sales report directly from the ``transactions`` table.
+
+        Args:
+            conn: Open sqlite3 connection.
+            period_days: Length of the reporting window ending now.
+            store_id: Restrict to one store; None covers all stores.
+            transaction_type: Restrict to one transaction type; None includes all.
+        """
+        sql = "SELECT transaction_date, total_amount FROM transactions"
+        clauses: List[str] = []
+        params: List[Any] = []
+        if store_id is not None:
+            clauses.append("store_id = ?")
+            params.append(store_id)
+        if transaction_type is not None:
+            clauses.append("transaction_type = ?")
+            params.append(transaction_type)
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        if HAS_PANDAS:
+            return ReportUtils._sales_report_columnar(pd.read_sql_query(sql, conn, params=params), period_days)
+        rows = conn.execute(sql, params).fetchall()
+        return ReportUtils._sales_report_python(
+            [{'transaction_date': d, 'total_amount': a} for d, a in rows], period_days)
+
 
 class SecurityUtils:
     """Utility class for security operations"""